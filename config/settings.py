@@ -2,15 +2,190 @@ FRAUD_THRESHOLD = 0.75
 MAX_LATENCY_MS = 500
 ML_SCORING_TIMEOUT_MS = 200
 GRAPH_ANALYSIS_TIMEOUT_MS = 150
+BIOMETRIC_TIMEOUT_MS = 100
+# Stage deadlines are capped at MAX_LATENCY_MS minus this reserve for ensemble + state updates
+DEADLINE_RESERVE_MS = 25
 
 REDIS_HOST = "localhost"
 REDIS_PORT = 6379
 REDIS_TTL = 3600
+# Local cache entries expire on the engine clock; expired ones are dropped a
+# bucket of this many seconds at a time
+CACHE_EXPIRY_SWEEP_INTERVAL_S = 60
 
 GRAPH_WINDOW_HOURS = 24
 MIN_FRAUD_RING_SIZE = 3
 MAX_TRANSACTION_VELOCITY = 10
+GRAPH_CLEANUP_INTERVAL_S = 60
+
+# Clock for windows, TTLs and expiry (utils/clock.py). 'event': the newest
+# transaction time seen, less EVENT_CLOCK_ALLOWED_LATENESS_S; a timestamp
+# more than EVENT_CLOCK_MAX_AHEAD_S past the system time only advances it
+# that far. 'wall': the system time
+CLOCK = 'event'
+EVENT_CLOCK_ALLOWED_LATENESS_S = 0
+EVENT_CLOCK_MAX_AHEAD_S = 300
+
+# Per-account lock striping for detector state
+LOCK_STRIPES = 64
 
 BIOMETRIC_WEIGHT = 0.2
 ML_SCORE_WEIGHT = 0.5
 GRAPH_SCORE_WEIGHT = 0.3
+
+# Trained model (scripts/train_model.py); without it ML scores are heuristic
+MODEL_PATH = 'models/fraud_model.pkl'
+
+# Write-behind state updates (history, counters, graph edges, biometric profiles)
+WRITE_BEHIND_ENABLED = False
+WRITE_BEHIND_QUEUE_SIZE = 10000
+WRITE_BEHIND_BATCH_SIZE = 256
+WRITE_BEHIND_FLUSH_INTERVAL_MS = 5
+
+# Redis circuit breaker
+REDIS_SOCKET_TIMEOUT_MS = 20
+REDIS_BREAKER_FAILURE_THRESHOLD = 3
+REDIS_BREAKER_RESET_TIMEOUT_S = 5
+
+# Shared detector stage scheduler (lower priority value runs first)
+SCORING_POOL_SIZE = 8
+STAGE_PRIORITIES = {'biometric': 0, 'ml': 1, 'graph': 2}
+INLINE_STAGE_THRESHOLD_MS = 1.0
+
+# Adaptive micro-batching in front of the engine
+MICRO_BATCHING_ENABLED = False
+MICRO_BATCH_MAX_SIZE = 64
+MICRO_BATCH_MAX_WAIT_MS = 2
+
+# Cascade scoring: graph + ML stages run only when the partial score
+# (heuristic + biometric) is within this band of FRAUD_THRESHOLD. A band of
+# GRAPH_SCORE_WEIGHT means a skipped graph stage alone can't flip a decision.
+CASCADE_ENABLED = False
+CASCADE_UNCERTAINTY_BAND = 0.3
+
+# Idempotent results for retried transaction_ids
+IDEMPOTENCY_ENABLED = True
+IDEMPOTENCY_WINDOW_S = 900
+IDEMPOTENCY_BUCKETS = 15
+IDEMPOTENCY_MAX_ENTRIES = 200000
+IDEMPOTENCY_REDIS_BACKED = False
+
+# Account-affinity routing: one acceptor consistent-hashes sender_id onto
+# worker processes, each owning its accounts' detector state
+AFFINITY_ROUTING_ENABLED = False
+AFFINITY_WORKERS = 4
+AFFINITY_RING_REPLICAS = 128
+# Longest an API request waits for its worker, queueing included
+AFFINITY_REQUEST_TIMEOUT_MS = 2000
+# How often the dispatcher checks for (and restarts) dead worker processes
+AFFINITY_HEALTH_CHECK_S = 0.5
+# How long a stopping worker gets to close its engine before it is terminated
+AFFINITY_STOP_TIMEOUT_S = 10.0
+# Tries per worker when a rebalance export or import hits a dead worker
+AFFINITY_REBALANCE_ATTEMPTS = 3
+
+# Preload-and-fork serving (python -m rtf_digi_payments.prefork): the master
+# imports the serving modules and loads the model, gc.freeze()s them so
+# refcount/GC writes don't unshare the pages, then forks WORKERS processes
+PREFORK_WORKERS = 4
+PREFORK_GC_FREEZE = True
+
+# Synthetic transactions each engine scores at start-up before /ready passes;
+# their accounts (WARMUP_ACCOUNT_PREFIX...) are removed afterwards
+WARMUP_TRANSACTIONS = 200
+WARMUP_ACCOUNTS = 20
+WARMUP_ACCOUNT_PREFIX = '__warmup__'
+
+# Process pool for CPU-bound batch stages (cycle search, model inference);
+# 0 keeps everything in-process
+PROCESS_POOL_WORKERS = 0
+PROCESS_POOL_MIN_TASK_ROWS = 16
+
+# Batch and NDJSON streaming endpoints: transactions per analyze_batch call,
+# and parsed chunks buffered ahead of scoring (bounds in-flight memory)
+BATCH_MAX_TRANSACTIONS = 10000
+STREAM_CHUNK_SIZE = 256
+STREAM_MAX_PENDING_CHUNKS = 2
+# Longest NDJSON line accepted; longer ones get a per-line error and are skipped
+STREAM_MAX_LINE_BYTES = 64 * 1024
+
+# API fast path: engine-built FraudScores are returned without response_model
+# re-validation and encoded with orjson when it is installed
+API_FAST_PATH = True
+
+# Admission control: degraded (heuristic-only) scoring past the soft limit or
+# latency target, 503 + Retry-After past the hard limit
+ADMISSION_ENABLED = True
+ADMISSION_SOFT_LIMIT = 64
+ADMISSION_HARD_LIMIT = 256
+ADMISSION_LATENCY_TARGET_MS = 250
+ADMISSION_RETRY_AFTER_S = 1
+
+# gRPC streaming service (rtf_digi_payments.grpc_server); streams reuse
+# STREAM_CHUNK_SIZE / STREAM_MAX_PENDING_CHUNKS for batching and flow control
+GRPC_PORT = 50051
+GRPC_MAX_CONCURRENT_STREAMS = 100
+
+# Decision log (utils/monitor.py): a background writer drains a bounded queue
+# into JSON lines; past the high-water mark only 1 in SAMPLE_EVERY routine
+# records is kept, and records are dropped (and counted) when the queue is full
+DECISION_LOG_ENABLED = False
+DECISION_LOG_FILE = 'logs/fraud_detection.log'
+DECISION_LOG_QUEUE_SIZE = 50000
+DECISION_LOG_BATCH_SIZE = 512
+DECISION_LOG_FLUSH_INTERVAL_MS = 50
+DECISION_LOG_MAX_BYTES = 64 * 1024 * 1024
+DECISION_LOG_ROTATE_INTERVAL_S = 3600
+DECISION_LOG_BACKUP_COUNT = 5
+DECISION_LOG_SAMPLE_HIGH_WATER = 0.5
+DECISION_LOG_SAMPLE_EVERY = 10
+
+# Attach per-stage timings (ms) to 1 in N FraudScores; 0 disables sampling.
+# Stage latency histograms are always kept and exported on /metrics
+STAGE_TIMINGS_SAMPLE_EVERY = 0
+
+# Decision archive (decision_archive.py): Arrow IPC segments of every decision
+# with its features and model version, written by a background thread
+DECISION_ARCHIVE_ENABLED = False
+DECISION_ARCHIVE_DIR = 'data/decisions'
+DECISION_ARCHIVE_QUEUE_SIZE = 50000
+DECISION_ARCHIVE_BATCH_SIZE = 1024
+DECISION_ARCHIVE_FLUSH_INTERVAL_MS = 200
+DECISION_ARCHIVE_SEGMENT_ROWS = 250000
+DECISION_ARCHIVE_SEGMENT_BYTES = 64 * 1024 * 1024
+# Attempts at writing a batch, each to a fresh segment, before it goes to the dead-letter file
+DECISION_ARCHIVE_WRITE_ATTEMPTS = 3
+
+# Memory footprint report (GET /admin/memory): per-store sizes are scaled up
+# from this many sampled entries; with TRACEMALLOC_FRAMES > 0 the API starts
+# tracemalloc and the report adds the top allocating source lines
+MEMORY_SAMPLE_SIZE = 2000
+MEMORY_TRACEMALLOC_FRAMES = 0
+
+# Engine state checkpoints (snapshot.py): a delta of changed accounts every
+# INTERVAL_S and a full snapshot every FULL_EVERY deltas, restored on start.
+# One engine per directory; affinity workers use a subdirectory each
+CHECKPOINT_ENABLED = False
+CHECKPOINT_DIR = 'data/checkpoints'
+CHECKPOINT_INTERVAL_S = 300
+CHECKPOINT_FULL_EVERY = 12
+CHECKPOINT_RESTORE_ON_START = True
+
+# Cold-import budgets (ms, from python -X importtime) that tests enforce for
+# the serving entry points, about 1.5x a cold import on a dev machine, and
+# packages that must never load on that path
+IMPORT_TIME_BUDGET_MS = {
+    'rtf_digi_payments': 10,
+    'rtf_digi_payments.grpc_server': 400,
+    'rtf_digi_payments.fraud_engine': 650,
+    'rtf_digi_payments.api': 950,
+}
+SERVING_PATH_EXCLUDED_PACKAGES = ('matplotlib', 'pandas', 'lightgbm', 'sklearn', 'scipy', 'pyarrow')
+
+# Offline replay (replay.py): input is read and scored REPLAY_CHUNK_SIZE rows
+# at a time, each worker's queue holds at most REPLAY_QUEUE_CHUNKS chunks, and
+# output part files roll over every REPLAY_FILE_ROWS rows. 0 workers: one per CPU
+REPLAY_WORKERS = 0
+REPLAY_CHUNK_SIZE = 10000
+REPLAY_QUEUE_CHUNKS = 4
+REPLAY_FILE_ROWS = 1000000
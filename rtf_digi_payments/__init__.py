@@ -1,23 +1,11 @@
 """Top-level shim package to expose `src/rtf_digi_payments` as `rtf_digi_payments`.
 
 This allows importing `rtf_digi_payments.*` during local development without
-installing the package (it forwards to `src.rtf_digi_payments`).
+installing the package. Submodules are looked up in `src/rtf_digi_payments`,
+and the package's lazy exports are re-exported from there.
 """
-from importlib import import_module
-from types import ModuleType
+import os
 
-_src_pkg = None
-try:
-    _src_pkg = import_module('src.rtf_digi_payments')
-except Exception:
-    _src_pkg = None
+__path__ = [os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src', 'rtf_digi_payments')]
 
-if _src_pkg:
-    # Expose attributes from the src package module
-    for _name in dir(_src_pkg):
-        if _name.startswith('_'):
-            continue
-        globals()[_name] = getattr(_src_pkg, _name)
-
-    # Make submodule imports work (so `from rtf_digi_payments import models` works)
-    __path__ = getattr(_src_pkg, '__path__', __path__)
+from ._exports import __all__, __dir__, __getattr__  # noqa: E402
@@ -13,6 +13,7 @@ def benchmark_latency(n_transactions=1000):
     
     print(f"Running benchmark with {n_transactions} transactions...\n")
     
+    start = time.perf_counter()
     for i in range(n_transactions):
         txn = Transaction(
             transaction_id=f"BENCH_{i}",
@@ -30,6 +31,7 @@ def benchmark_latency(n_transactions=1000):
         
         result = engine.analyze_transaction(txn)
         latencies.append(result.latency_ms)
+    elapsed = time.perf_counter() - start
     
     latencies = np.array(latencies)
     
@@ -50,8 +52,11 @@ def benchmark_latency(n_transactions=1000):
     else:
         print("\n[FAIL] FAILED: Average latency exceeds 500ms")
     
-    throughput = n_transactions / (latencies.sum() / 1000)
-    print(f"\nEstimated Throughput: {throughput:.0f} TPS")
+    # Wall-clock time, so transaction construction and anything outside the
+    # engine's own latency measurement count against throughput too
+    throughput = n_transactions / elapsed
+    print(f"\nSequential Throughput: {throughput:.0f} TPS ({elapsed:.2f}s wall clock)")
+    print("Per-component and concurrent numbers: scripts/benchmark_suite.py")
 
 if __name__ == "__main__":
     benchmark_latency(1000)
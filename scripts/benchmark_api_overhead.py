@@ -0,0 +1,100 @@
+import os, sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import argparse
+import json
+import time
+import warnings
+from datetime import datetime
+from pydantic import TypeAdapter
+from rtf_digi_payments.models.transaction import Transaction, TransactionRecord, BiometricData, FraudScore
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def per_call_us(fn, n):
+    start = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return (time.perf_counter() - start) / n * 1e6
+
+def make_transaction(i=0):
+    return Transaction(
+        transaction_id=f"OVH_{i}",
+        sender_id=f"USER_{i % 100}",
+        receiver_id=f"USER_{(i + 1) % 100}",
+        amount=2500.0,
+        timestamp=datetime.now(),
+        device_id="DEV_1",
+        ip_address="10.0.0.1",
+        biometric=BiometricData(typing_speed=52.0, swipe_velocity=110.0)
+    )
+
+def score_fields():
+    return dict(
+        transaction_id="OVH_0", fraud_probability=0.4213, ml_score=0.5, graph_score=0.0,
+        biometric_score=0.61, is_fraudulent=False, latency_ms=0.83, reason=None, degraded_stages=[], skipped_stages=[]
+    )
+
+def micro(n):
+    txn = make_transaction()
+    score = FraudScore(**score_fields())
+    adapter = TypeAdapter(FraudScore)
+
+    def validated_response():
+        # FastAPI's response_model path: validate, serialise, stdlib json
+        content = adapter.dump_python(adapter.validate_python(score), mode='json')
+        return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode()
+
+    def fast_response():
+        content = score.model_dump()
+        if orjson is not None:
+            return orjson.dumps(content)
+        return json.dumps(content, default=str).encode()
+
+    rows = [
+        # The biometric stage called the deprecated .dict() on every request
+        ("biometric dict per request", lambda: txn.biometric.dict(),
+         lambda: TransactionRecord.from_transaction(txn)),
+        # Not adopted: slower than validated construction on pydantic-core
+        ("FraudScore model_construct", lambda: FraudScore(**score_fields()),
+         lambda: FraudScore.model_construct(**score_fields())),
+        ("response encoding", validated_response, fast_response),
+    ]
+    print(f"{'step':<30}{'before us':>12}{'after us':>12}{'saved us':>12}")
+    for name, before, after in rows:
+        b, a = per_call_us(before, n), per_call_us(after, n)
+        print(f"{name:<30}{b:>12.2f}{a:>12.2f}{b - a:>12.2f}")
+
+def end_to_end(n):
+    from fastapi.testclient import TestClient
+    from rtf_digi_payments import api
+
+    client = TestClient(api.app)
+    payloads = [json.loads(make_transaction(i).model_dump_json()) for i in range(2 * n + 200)]
+    for payload in payloads[:200]:
+        client.post("/api/v1/analyze", json=payload)  # warm up
+
+    # Interleaved so engine state growth and noise hit both modes equally
+    timings = {False: 0.0, True: 0.0}
+    for i, payload in enumerate(payloads[200:]):
+        fast = bool(i % 2)
+        api.API_FAST_PATH = fast
+        start = time.perf_counter()
+        client.post("/api/v1/analyze", json=payload)
+        timings[fast] += time.perf_counter() - start
+    validated, fast = timings[False] / n * 1e6, timings[True] / n * 1e6
+    print(f"\nEnd to end (TestClient, includes scoring): validated {validated:.0f}us, "
+          f"fast path {fast:.0f}us, saved {validated - fast:.0f}us per request")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-request API overhead before/after the fast path")
+    parser.add_argument("--iterations", type=int, default=20000)
+    parser.add_argument("--requests", type=int, default=1000)
+    args = parser.parse_args()
+    warnings.simplefilter("ignore", DeprecationWarning)
+    print(f"orjson: {'yes' if orjson is not None else 'not installed, stdlib fallback'}\n")
+    micro(args.iterations)
+    end_to_end(args.requests)
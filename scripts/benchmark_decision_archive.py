@@ -0,0 +1,77 @@
+import os, sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import argparse
+import tempfile
+import time
+import numpy as np
+from datetime import datetime, timedelta
+from rtf_digi_payments.decision_archive import DecisionArchive
+from rtf_digi_payments.models.transaction import TransactionRecord, FraudScore
+
+def make_decisions(n, n_accounts, days):
+    rng = np.random.default_rng(7)
+    start = datetime(2024, 1, 1)
+    step = timedelta(days=days) / n
+    probabilities = rng.beta(1.2, 4, n)  # ~2% at or above the 0.75 threshold
+    for i in range(n):
+        record = TransactionRecord(
+            f"ARCH_{i}", f"USER_{rng.integers(n_accounts)}", f"USER_{rng.integers(n_accounts)}",
+            float(rng.lognormal(7, 1)), start + i * step, f"DEV_{i % 997}", "10.0.0.1",
+            {'typing_speed': 50.0} if i % 3 else None
+        )
+        score = FraudScore(
+            transaction_id=record.transaction_id, fraud_probability=float(probabilities[i]), ml_score=0.3,
+            graph_score=0.0, biometric_score=0.5, is_fraudulent=bool(probabilities[i] >= 0.75), latency_ms=1.2
+        )
+        yield record, score, rng.random(9)
+
+def timed(fn, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000, result
+
+def benchmark(n, n_accounts, days):
+    with tempfile.TemporaryDirectory() as directory:
+        archive = DecisionArchive(directory, max_queue_size=n)
+        decisions = list(make_decisions(n, n_accounts, days))
+
+        start = time.perf_counter()
+        for record, score, features in decisions:
+            archive.append(record, score, features, 1)
+        append_us = (time.perf_counter() - start) / n * 1e6
+        start = time.perf_counter()
+        archive.close()
+        drain_s = time.perf_counter() - start
+        stats = archive.get_stats()
+
+        reader = archive.reader()
+        last_week = (datetime(2024, 1, 1) + timedelta(days=days - 7), datetime(2024, 1, 1) + timedelta(days=days))
+        # An account with a flagged decision in the last week
+        account = next(record.sender_id for record, score, _ in reversed(decisions) if score.is_fraudulent)
+        print(f"{n} decisions over {days} days, {stats['segments_sealed']} segments, "
+              f"{stats['bytes_written'] / 1e6:.1f} MB\n")
+        print(f"append on the scoring thread: {append_us:.2f} us/decision "
+              f"(writer drained the rest in {drain_s:.2f}s)\n")
+        print(f"{'query':<46}{'ms':>10}{'rows':>10}")
+        rows = [
+            ("flagged for one account, last week", lambda: reader.query(*last_week, account=account, flagged=True)),
+            ("all flagged, last week", lambda: reader.query(*last_week, flagged=True,
+                                                            columns=['transaction_id', 'fraud_probability'])),
+            ("score distribution by hour, last week", lambda: reader.score_distribution_by_hour(*last_week)),
+            ("score distribution by hour, everything", lambda: reader.score_distribution_by_hour()),
+        ]
+        for name, query in rows:
+            ms, table = timed(query)
+            print(f"{name:<46}{ms:>10.1f}{table.num_rows:>10}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Decision archive append cost and query latency")
+    parser.add_argument("--decisions", type=int, default=500000)
+    parser.add_argument("--accounts", type=int, default=20000)
+    parser.add_argument("--days", type=int, default=60)
+    args = parser.parse_args()
+    benchmark(args.decisions, args.accounts, args.days)
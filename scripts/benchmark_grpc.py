@@ -0,0 +1,143 @@
+import os, sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import argparse
+import asyncio
+import subprocess
+import time
+import aiohttp
+import grpc
+import numpy as np
+from datetime import datetime, timedelta
+from rtf_digi_payments.grpc_server import transaction_to_proto
+from rtf_digi_payments.models.transaction import Transaction, BiometricData
+from rtf_digi_payments.proto import fraud_pb2_grpc
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+def make_transactions(prefix, n):
+    start = datetime.now() - timedelta(hours=1)
+    return [Transaction(
+        transaction_id=f"{prefix}_{i}",
+        sender_id=f"USER_{(i * 7919) % 2000}",
+        receiver_id=f"USER_{(i * 104729 + 1) % 2000}",
+        amount=float(100 + (i * 37) % 9000),
+        timestamp=start + timedelta(milliseconds=i * 20),
+        device_id=f"DEV_{i % 500}",
+        ip_address=f"10.0.{i % 255}.1",
+        biometric=BiometricData(typing_speed=45.0 + i % 15)
+    ) for i in range(n)]
+
+def start_server(args):
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join([os.path.join(ROOT, "src"), ROOT])}
+    return subprocess.Popen([sys.executable, *args], env=env, cwd=ROOT,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+async def wait_for_rest(url, timeout_s=30):
+    deadline = time.monotonic() + timeout_s
+    async with aiohttp.ClientSession() as session:
+        while True:
+            try:
+                async with session.get(f"{url}/health") as response:
+                    if response.status == 200:
+                        return
+            except aiohttp.ClientError:
+                if time.monotonic() > deadline:
+                    raise
+            await asyncio.sleep(0.2)
+
+async def paced(i, start, rate):
+    # Open-loop schedule: the i-th send is due at start + i / rate
+    if rate:
+        delay = start + i / rate - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+async def rest_run(url, transactions, concurrency, rate=None):
+    payloads = [txn.model_dump(mode="json") for txn in transactions]
+    latencies = []
+    queue = iter(enumerate(payloads))
+
+    async def worker(session, start):
+        for i, payload in queue:
+            await paced(i, start, rate)
+            sent = time.perf_counter()
+            async with session.post(f"{url}/api/v1/analyze", json=payload) as response:
+                await response.read()
+            latencies.append(time.perf_counter() - sent)
+
+    async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=concurrency)) as session:
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(session, start) for _ in range(concurrency)))
+        return len(payloads) / (time.perf_counter() - start), latencies
+
+async def grpc_run(target, transactions, n_streams, rate=None):
+    latencies = []
+    stream_rate = rate / n_streams if rate else None
+
+    async def one_stream(stub, chunk, start):
+        sent = []
+
+        async def requests():
+            for i, txn in enumerate(chunk):
+                await paced(i, start, stream_rate)
+                message = transaction_to_proto(txn)
+                sent.append(time.perf_counter())
+                yield message
+
+        # Results arrive in request order, so the i-th result matches sent[i]
+        i = 0
+        async for _ in stub.Analyze(requests()):
+            latencies.append(time.perf_counter() - sent[i])
+            i += 1
+
+    async with grpc.aio.insecure_channel(target) as channel:
+        await channel.channel_ready()
+        stub = fraud_pb2_grpc.FraudDetectionStub(channel)
+        chunks = [transactions[i::n_streams] for i in range(n_streams)]
+        start = time.perf_counter()
+        await asyncio.gather(*(one_stream(stub, chunk, start) for chunk in chunks))
+        return len(transactions) / (time.perf_counter() - start), latencies
+
+def report(name, tps, latencies):
+    ms = np.array(latencies) * 1000
+    print(f"{name:<32}{tps:>10.0f}{np.percentile(ms, 50):>10.1f}{np.percentile(ms, 95):>10.1f}"
+          f"{np.percentile(ms, 99):>10.1f}")
+
+async def compare(args):
+    rest_url = f"http://127.0.0.1:{args.rest_port}"
+    grpc_target = f"127.0.0.1:{args.grpc_port}"
+    servers = [
+        start_server(["-m", "uvicorn", "rtf_digi_payments.api:app", "--port", str(args.rest_port),
+                      "--log-level", "warning"]),
+        start_server(["-m", "rtf_digi_payments.grpc_server", "--port", str(args.grpc_port)])
+    ]
+    try:
+        await wait_for_rest(rest_url)
+        # Warm both servers (model load, first-seen accounts) before timing
+        await rest_run(rest_url, make_transactions("WARM_REST", 200), args.concurrency)
+        await grpc_run(grpc_target, make_transactions("WARM_GRPC", 200), args.streams)
+
+        print(f"{args.transactions} transactions, one server process each, {os.cpu_count()} CPUs\n")
+        print(f"{'transport':<32}{'TPS':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+        # Saturating runs measure capacity; the paced runs compare latency at
+        # the same offered load, below both transports' capacity
+        for label, rate in (("max", None), (f"{args.rate}/s", args.rate)):
+            report(f"REST x{args.concurrency} conns, {label}", *await rest_run(
+                rest_url, make_transactions(f"CMP_REST_{rate or 0}", args.transactions), args.concurrency, rate))
+            report(f"gRPC x{args.streams} streams, {label}", *await grpc_run(
+                grpc_target, make_transactions(f"CMP_GRPC_{rate or 0}", args.transactions), args.streams, rate))
+    finally:
+        for server in servers:
+            server.terminate()
+            server.wait()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare REST per-request scoring with gRPC streaming")
+    parser.add_argument("--transactions", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=32, help="REST connections")
+    parser.add_argument("--streams", type=int, default=4, help="Concurrent gRPC streams")
+    parser.add_argument("--rate", type=int, default=300, help="Offered load (TPS) for the paced runs")
+    parser.add_argument("--rest-port", type=int, default=8090)
+    parser.add_argument("--grpc-port", type=int, default=50090)
+    asyncio.run(compare(parser.parse_args()))
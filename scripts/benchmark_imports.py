@@ -0,0 +1,50 @@
+"""Cold-import time of the package entry points against their start-up budget.
+
+Each entry point is imported in a fresh ``python -X importtime`` process and
+the fastest of ``--repeat`` runs is kept. The run lists the modules that cost
+the most and any serving-path import of an excluded package. It exits 1 when
+an entry point is over budget (``IMPORT_TIME_BUDGET_MS``) or loads an
+excluded package (``SERVING_PATH_EXCLUDED_PACKAGES``).
+"""
+import os, sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import argparse
+import json
+from config.settings import IMPORT_TIME_BUDGET_MS, SERVING_PATH_EXCLUDED_PACKAGES
+from rtf_digi_payments.utils.importtime import measure_import, slowest
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import-time budget check for the package entry points")
+    parser.add_argument("modules", nargs="*", help="modules to measure (default: every budgeted entry point)")
+    parser.add_argument("--repeat", type=int, default=3, help="cold imports per module; the fastest counts")
+    parser.add_argument("--top", type=int, default=8, help="slowest modules to list per entry point")
+    parser.add_argument("--output", help="write the measurements as JSON")
+    args = parser.parse_args()
+
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([os.path.join(ROOT, "src"), ROOT]))
+    failed = False
+    rows = []
+    for module in args.modules or sorted(IMPORT_TIME_BUDGET_MS, key=IMPORT_TIME_BUDGET_MS.get):
+        measurement = measure_import(module, repeat=args.repeat, env=env)
+        budget = IMPORT_TIME_BUDGET_MS.get(module)
+        excluded = sorted(set(measurement['packages']) & set(SERVING_PATH_EXCLUDED_PACKAGES))
+        over = budget is not None and measurement['total_ms'] > budget
+        failed = failed or over or (budget is not None and bool(excluded))
+
+        status = "OVER BUDGET" if over else "ok"
+        print(f"{module:<36}{measurement['total_ms']:>9.1f} ms  budget {budget if budget is not None else '-':>6}  {status}")
+        if excluded:
+            print(f"    loads excluded packages: {', '.join(excluded)}")
+        for name, self_us in slowest(measurement, args.top):
+            print(f"    {self_us / 1000:>8.1f} ms  {name}")
+        rows.append({'module': module, 'total_ms': round(measurement['total_ms'], 1), 'budget_ms': budget,
+                     'excluded_packages': excluded, 'slowest': slowest(measurement, args.top)})
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(rows, f, indent=2)
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,125 @@
+"""Bytes per active account as the account population grows.
+
+Each population size is built in a fresh subprocess, so RSS deltas are not
+polluted by earlier runs. Accounts are populated through the components'
+own update methods:
+- two outgoing transfers each
+- five biometric samples
+- a local history and a transaction counter
+
+The RSS growth is then set against the engine's ``memory_report``
+estimate. The cache store is only populated while Redis is unreachable,
+because only then do histories stay in the in-process fallback.
+
+10M accounts need tens of GB of RAM, so it is not in the default sizes.
+Pass it with ``--sizes``.
+"""
+import os, sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import argparse
+import gc
+import json
+import subprocess
+import time
+import tracemalloc
+import numpy as np
+from datetime import datetime
+
+
+def populate(engine, n_accounts: int, seed: int = 3):
+    rng = np.random.default_rng(seed)
+    now = datetime.now()
+    accounts = [f"ACC_{i}" for i in range(n_accounts)]
+    receivers = rng.integers(0, n_accounts, (n_accounts, 2)).tolist()
+    amounts = rng.uniform(10, 5000, (n_accounts, 2)).tolist()
+    typing = rng.normal(55, 8, 1000).tolist()
+    swipe = rng.normal(110, 15, 1000).tolist()
+
+    graph = engine.graph_detector
+    biometric = engine.biometric_analyzer
+    cache = engine.cache_manager
+    for i, account in enumerate(accounts):
+        graph.add_transactions([(account, accounts[r], a, now) for r, a in zip(receivers[i], amounts[i])])
+        for k in range(5):
+            biometric.update_profile(account, {'typing_speed': typing[(i + k) % 1000],
+                                               'swipe_velocity': swipe[(i + 2 * k) % 1000]})
+        cache.update_user_history(account, {'amount': amounts[i][0], 'timestamp': now,
+                                            'device_id': f"DEV_{i % 97}", 'ip_address': '10.0.0.1'})
+        cache.increment_transaction_count(account)
+
+
+def measure(n_accounts: int, trace: bool) -> dict:
+    from rtf_digi_payments.fraud_engine import FraudDetectionEngine
+    from rtf_digi_payments.utils.memory import process_rss_bytes
+
+    engine = FraudDetectionEngine()
+    gc.collect()
+    if trace:
+        tracemalloc.start()
+    rss_before = process_rss_bytes()
+    start = time.perf_counter()
+    populate(engine, n_accounts)
+    populate_s = time.perf_counter() - start
+    gc.collect()
+    rss_after = process_rss_bytes()
+    traced = tracemalloc.get_traced_memory()[0] if trace else None
+
+    start = time.perf_counter()
+    report = engine.memory_report()
+    report_ms = (time.perf_counter() - start) * 1000
+    return {
+        'accounts': n_accounts,
+        'active_accounts': report['active_accounts'],
+        'rss_delta_bytes': rss_after - rss_before,
+        'traced_bytes': traced,
+        'estimated_bytes': report['estimated_bytes'],
+        'bytes_per_account': report['bytes_per_account'],
+        'populate_s': round(populate_s, 2),
+        'report_ms': round(report_ms, 1),
+        'redis': engine.cache_manager.use_redis
+    }
+
+
+def run(sizes, trace: bool):
+    rows = []
+    for n in sizes:
+        command = [sys.executable, __file__, '--single', str(n)] + (['--tracemalloc'] if trace else [])
+        output = subprocess.run(command, capture_output=True, text=True, check=True).stdout
+        rows.append(json.loads(output.strip().splitlines()[-1]))
+        row = rows[-1]
+        if row['redis']:
+            print("note: Redis is reachable, so histories live there and the cache store stays empty")
+
+    stores = ['graph', 'transaction_times', 'biometric_profiles', 'cache']
+    print(f"{'accounts':>10}{'RSS B/acct':>12}{'est B/acct':>12}{'est/RSS':>9}"
+          + "".join(f"{name[:12]:>14}" for name in stores)
+          + (f"{'traced B/acct':>15}" if trace else "") + f"{'report ms':>11}")
+    for row in rows:
+        accounts = row['active_accounts']
+        rss = row['rss_delta_bytes'] / accounts
+        estimated = row['bytes_per_account']['total']
+        print(f"{row['accounts']:>10}{rss:>12.0f}{estimated:>12.0f}{estimated / rss:>9.2f}"
+              + "".join(f"{row['bytes_per_account'][name]:>14.0f}" for name in stores)
+              + (f"{row['traced_bytes'] / accounts:>15.0f}" if trace else "") + f"{row['report_ms']:>11.1f}")
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-account memory footprint as the population scales")
+    parser.add_argument("--sizes", default="10000,100000,1000000",
+                        help="comma-separated account counts, e.g. 10000,100000,1000000,10000000")
+    parser.add_argument("--tracemalloc", action="store_true",
+                        help="also report bytes traced by tracemalloc (slows population ~2x)")
+    parser.add_argument("--output", help="write the rows as JSON")
+    parser.add_argument("--single", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single:
+        print(json.dumps(measure(args.single, args.tracemalloc)))
+        sys.exit(0)
+
+    rows = run([int(n) for n in args.sizes.split(',')], args.tracemalloc)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(rows, f, indent=2)
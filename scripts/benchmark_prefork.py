@@ -0,0 +1,158 @@
+"""Worker memory sharing and first-request latency of the prefork server.
+
+Memory: N workers are started three ways, and a short load is driven
+through each:
+- prefork with gc.freeze()
+- prefork without it
+- N independent ``uvicorn rtf_digi_payments.api:app`` processes
+
+Each worker's proportional set size (Pss) and private/shared bytes are then
+read from /proc/<pid>/smaps_rollup. Pss splits shared pages between the
+processes sharing them, so the Pss sum is what the fleet really costs.
+
+Cold start: one prefork worker without warmup is compared with one that has
+the default warmup. The first requests after /ready are timed for each.
+
+Linux only (/proc).
+"""
+import os, sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import argparse
+import http.client
+import json
+import signal
+import subprocess
+import time
+import requests
+from load_test import make_payload
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+ENV = dict(os.environ, PYTHONPATH=os.pathsep.join([os.path.join(ROOT, "src"), ROOT]))
+
+
+def start_prefork(port, workers, freeze=True, warmup=None):
+    command = [sys.executable, "-m", "rtf_digi_payments.prefork", "--workers", str(workers),
+               "--port", str(port), "--log-level", "warning"]
+    if not freeze:
+        command.append("--no-gc-freeze")
+    if warmup is not None:
+        command += ["--warmup", str(warmup)]
+    return [subprocess.Popen(command, env=ENV, cwd=ROOT, stderr=subprocess.DEVNULL)]
+
+
+def start_independent(port, workers):
+    return [subprocess.Popen([sys.executable, "-m", "uvicorn", "rtf_digi_payments.api:app",
+                              "--port", str(port + i), "--log-level", "warning"],
+                             env=ENV, cwd=ROOT, stderr=subprocess.DEVNULL)
+            for i in range(workers)]
+
+
+def worker_pids(processes, prefork):
+    if not prefork:
+        return [process.pid for process in processes]
+    pid = processes[0].pid
+    with open(f"/proc/{pid}/task/{pid}/children") as f:
+        return [int(child) for child in f.read().split()]
+
+
+def wait_ready(urls, workers, timeout=120):
+    # Through a shared socket any worker may answer, so wait to see them all
+    seen = set()
+    deadline = time.time() + timeout
+    while len(seen) < workers and time.time() < deadline:
+        for url in urls:
+            try:
+                response = requests.get(f"{url}/ready", timeout=1)
+                if response.status_code == 200:
+                    seen.add(response.json()["pid"])
+            except requests.RequestException:
+                pass
+        time.sleep(0.05)
+    if len(seen) < workers:
+        raise RuntimeError(f"only {len(seen)} of {workers} workers became ready")
+
+
+def smaps(pid):
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                values[parts[0].rstrip(":")] = int(parts[1]) * 1024
+    return values
+
+
+def stop(processes):
+    for process in processes:
+        process.send_signal(signal.SIGTERM)
+    for process in processes:
+        try:
+            process.wait(timeout=20)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def memory_run(label, port, workers, requests_per_worker):
+    prefork = label != "independent"
+    processes = start_prefork(port, workers, freeze=label == "prefork+freeze") if prefork \
+        else start_independent(port, workers)
+    urls = [f"http://127.0.0.1:{port}"] if prefork else [f"http://127.0.0.1:{port + i}" for i in range(workers)]
+    try:
+        wait_ready(urls, workers)
+        session = requests.Session()
+        for i in range(requests_per_worker * workers):
+            session.post(f"{urls[i % len(urls)]}/api/v1/analyze", json=make_payload(i))
+        rows = [smaps(pid) for pid in worker_pids(processes, prefork)]
+    finally:
+        stop(processes)
+    mb = 1024 * 1024
+    return {
+        'label': label,
+        'pss_total_mb': sum(row['Pss'] for row in rows) / mb,
+        'rss_mb': sum(row['Rss'] for row in rows) / len(rows) / mb,
+        'private_mb': sum(row['Private_Clean'] + row['Private_Dirty'] for row in rows) / len(rows) / mb,
+        'shared_mb': sum(row['Shared_Clean'] + row['Shared_Dirty'] for row in rows) / len(rows) / mb
+    }
+
+
+def cold_start_run(port, warmup, n_requests):
+    processes = start_prefork(port, 1, warmup=warmup)
+    url = f"http://127.0.0.1:{port}"
+    try:
+        wait_ready([url], 1)
+        # http.client writes headers and body in one send; requests' two writes
+        # would add a delayed-ACK stall to every request and hide the difference
+        connection = http.client.HTTPConnection("127.0.0.1", port)
+        latencies = []
+        for i in range(n_requests):
+            body = json.dumps(make_payload(i)).encode()
+            start = time.perf_counter()
+            connection.request("POST", "/api/v1/analyze", body, {"Content-Type": "application/json"})
+            connection.getresponse().read()
+            latencies.append((time.perf_counter() - start) * 1000)
+        connection.close()
+        return latencies
+    finally:
+        stop(processes)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Prefork worker memory sharing and warmup benchmark")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=500, help="requests per worker before measuring memory")
+    parser.add_argument("--first", type=int, default=5, help="first requests timed in the cold-start comparison")
+    parser.add_argument("--port", type=int, default=18600)
+    args = parser.parse_args()
+
+    print(f"{'mode':<18}{'Pss total MB':>14}{'RSS/worker':>12}{'private/worker':>16}{'shared/worker':>15}")
+    for offset, label in enumerate(("prefork+freeze", "prefork", "independent")):
+        row = memory_run(label, args.port + offset * 10, args.workers, args.requests)
+        print(f"{row['label']:<18}{row['pss_total_mb']:>14.1f}{row['rss_mb']:>12.1f}"
+              f"{row['private_mb']:>16.1f}{row['shared_mb']:>15.1f}")
+
+    print(f"\nfirst {args.first} requests after /ready (ms)")
+    for offset, warmup in enumerate((0, None)):
+        latencies = cold_start_run(args.port + 40 + offset, warmup, args.first)
+        label = "no warmup" if warmup == 0 else "warmup"
+        print(f"{label:<12}" + "".join(f"{latency:>8.1f}" for latency in latencies))
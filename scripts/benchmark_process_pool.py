@@ -0,0 +1,66 @@
+import os, sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import argparse
+import time
+import numpy as np
+from datetime import datetime, timedelta
+from rtf_digi_payments.fraud_engine import FraudDetectionEngine
+from rtf_digi_payments.models.transaction import Transaction, BiometricData
+
+def make_batches(n_batches, batch_size, n_accounts, seed=11):
+    rng = np.random.default_rng(seed)
+    start = datetime.now() - timedelta(hours=2)
+    batches = []
+    for b in range(n_batches):
+        batch = []
+        for k in range(batch_size):
+            i = b * batch_size + k
+            sender, receiver = rng.choice(n_accounts, size=2, replace=False)
+            batch.append(Transaction(
+                transaction_id=f"SCALE_{i}",
+                sender_id=f"USER_{sender}",
+                receiver_id=f"USER_{receiver}",
+                amount=float(rng.lognormal(7, 1.2)),
+                timestamp=start + timedelta(milliseconds=i * 50),
+                device_id=f"DEV_{sender}",
+                ip_address=f"10.0.{sender % 255}.1",
+                biometric=BiometricData(typing_speed=float(rng.normal(50, 8)))
+            ))
+        batches.append(batch)
+    return batches
+
+def run(workers, batches):
+    engine = FraudDetectionEngine(idempotency=False, process_pool_workers=workers)
+    try:
+        engine.analyze_batch(batches[0])  # start workers, publish the model
+        start = time.perf_counter()
+        for batch in batches[1:]:
+            engine.analyze_batch(batch)
+        wall = time.perf_counter() - start
+        return sum(len(batch) for batch in batches[1:]) / wall
+    finally:
+        engine.close()
+
+def benchmark(max_workers, n_batches, batch_size, n_accounts):
+    batches = make_batches(n_batches + 1, batch_size, n_accounts)
+    levels = [0] + [w for w in (1, 2, 4, 8, 16, 32) if w < max_workers] + [max_workers]
+
+    print(f"Process pool scaling: {n_batches} batches x {batch_size}, {n_accounts} accounts, "
+          f"{os.cpu_count()} CPUs\n")
+    print(f"{'workers':>8}{'TPS':>10}{'speedup':>10}")
+    baseline = None
+    for workers in levels:
+        tps = run(workers, batches)
+        baseline = baseline or tps
+        label = workers if workers else "inline"
+        print(f"{label:>8}{tps:>10.0f}{tps / baseline:>9.2f}x")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scale analyze_batch from in-process to N worker processes")
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count())
+    parser.add_argument("--batches", type=int, default=20)
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--accounts", type=int, default=1000, help="Fewer accounts means a denser graph")
+    args = parser.parse_args()
+    benchmark(args.max_workers, args.batches, args.batch_size, args.accounts)
@@ -0,0 +1,85 @@
+"""Throughput and peak memory of offline replay.
+
+Synthetic transactions over a fixed pool of accounts are written to a
+Parquet file, then replayed with each worker count in ``--workers``. Each
+run is a fresh process. Peak RSS is that of its largest process, the master
+or one of its workers. Replay itself holds a bounded number of chunks, so
+across input sizes memory only grows with engine state, which is bounded by
+the account pool and the graph window.
+"""
+import os, sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import argparse
+import json
+import random
+import shutil
+import subprocess
+import tempfile
+from datetime import datetime, timedelta
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+ENV = dict(os.environ, PYTHONPATH=os.pathsep.join([os.path.join(ROOT, "src"), ROOT]))
+
+# Run in a child so ru_maxrss covers only this replay and its workers
+RUN = """
+import json, resource, sys
+from rtf_digi_payments.replay import replay
+result = replay([sys.argv[1]], sys.argv[2], workers=int(sys.argv[3]))
+peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+print(json.dumps({'rows_per_s': result['rows_per_s'], 'seconds': result['seconds'],
+                  'rows': result['decisions']['rows'], 'peak_rss_mb': peak / 1024}))
+"""
+
+
+def write_input(path, n_rows, n_accounts, chunk_size=10000):
+    random.seed(7)
+    start = datetime(2024, 1, 1)
+    writer = None
+    for offset in range(0, n_rows, chunk_size):
+        rows = range(offset, min(offset + chunk_size, n_rows))
+        batch = pa.RecordBatch.from_pydict({
+            'transaction_id': [f"TXN_{i}" for i in rows],
+            'sender_id': [f"ACC_{random.randrange(n_accounts)}" for _ in rows],
+            'receiver_id': [f"ACC_{random.randrange(n_accounts)}" for _ in rows],
+            'amount': [round(random.lognormvariate(4, 1), 2) for _ in rows],
+            'timestamp': pa.array([start + timedelta(seconds=i) for i in rows], pa.timestamp('us')),
+            'device_id': [f"DEV_{random.randrange(n_accounts)}" for _ in rows],
+            'ip_address': [f"10.0.{random.randrange(256)}.{random.randrange(256)}" for _ in rows],
+            'biometric_typing_speed': [random.gauss(50, 10) for _ in rows],
+        })
+        if writer is None:
+            writer = pq.ParquetWriter(path, batch.schema)
+        writer.write_batch(batch)
+    writer.close()
+
+
+def run(path, output, workers):
+    shutil.rmtree(output, ignore_errors=True)
+    completed = subprocess.run([sys.executable, "-c", RUN, path, output, str(workers)],
+                               env=ENV, cwd=ROOT, capture_output=True, text=True, check=True)
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline replay throughput and memory benchmark")
+    parser.add_argument("--rows", default="20000,80000", help="comma-separated input sizes")
+    parser.add_argument("--accounts", type=int, default=5000)
+    parser.add_argument("--workers", default=None, help="comma-separated worker counts (default: 1 and one per CPU)")
+    args = parser.parse_args()
+    worker_counts = sorted({int(w) for w in args.workers.split(",")} if args.workers else {1, os.cpu_count() or 1})
+
+    directory = tempfile.mkdtemp(prefix="replay-bench-")
+    try:
+        print(f"{'rows':>10}{'workers':>9}{'rows/s':>10}{'rows/min':>12}{'seconds':>10}{'max RSS MB':>13}")
+        for n_rows in (int(n) for n in args.rows.split(",")):
+            path = os.path.join(directory, f"input-{n_rows}.parquet")
+            write_input(path, n_rows, args.accounts)
+            for workers in worker_counts:
+                row = run(path, os.path.join(directory, "out"), workers)
+                print(f"{row['rows']:>10}{workers:>9}{row['rows_per_s']:>10.0f}{row['rows_per_s'] * 60:>12.0f}"
+                      f"{row['seconds']:>10.1f}{row['peak_rss_mb']:>13.1f}")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
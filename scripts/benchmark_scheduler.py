@@ -0,0 +1,81 @@
+import os, sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import argparse
+import time
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from rtf_digi_payments.fraud_engine import FraudDetectionEngine
+from rtf_digi_payments.scheduler import StageScheduler
+from rtf_digi_payments.models.transaction import Transaction, BiometricData
+
+def make_transaction(i):
+    return Transaction(
+        transaction_id=f"SCHED_{i}",
+        sender_id=f"USER_{i % 500}",
+        receiver_id=f"USER_{(i * 7 + 1) % 500}",
+        amount=float(np.random.uniform(100, 50000)),
+        timestamp=datetime.now(),
+        device_id=f"DEV_{i % 50}",
+        ip_address=f"192.168.{i % 255}.{(i + 1) % 255}",
+        biometric=BiometricData(
+            typing_speed=float(np.random.uniform(30, 80)),
+            swipe_velocity=float(np.random.uniform(80, 150))
+        )
+    )
+
+def run(engine, concurrency, n_requests):
+    transactions = [make_transaction(i) for i in range(n_requests)]
+    end_to_end = []
+    reported = []
+
+    def call(txn):
+        start = time.perf_counter()
+        result = engine.analyze_transaction(txn)
+        end_to_end.append((time.perf_counter() - start) * 1000)
+        reported.append(result.latency_ms)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as callers:
+        list(callers.map(call, transactions))
+    wall = time.perf_counter() - start
+
+    return {
+        'throughput': n_requests / wall,
+        'e2e_p50': np.percentile(end_to_end, 50),
+        'e2e_p99': np.percentile(end_to_end, 99),
+        'reported_p99': np.percentile(reported, 99)
+    }
+
+def benchmark(n_requests=2000, levels=(1, 10, 100), pool_size=8):
+    configs = {
+        # Equivalent of the old per-engine ThreadPoolExecutor(max_workers=3)
+        'fifo-3': lambda: StageScheduler(max_workers=3, priorities={}, inline_threshold_ms=0),
+        f'shared-{pool_size}': lambda: StageScheduler(max_workers=pool_size)
+    }
+
+    print(f"Scheduler benchmark: {n_requests} requests per level\n")
+    print(f"{'config':<12}{'callers':>8}{'TPS':>10}{'e2e p50':>10}{'e2e p99':>10}{'rep p99':>10}")
+    for name, factory in configs.items():
+        for concurrency in levels:
+            scheduler = factory()
+            engine = FraudDetectionEngine(scheduler=scheduler)
+            run(engine, concurrency, 200)  # warm up EWMAs and the model
+            stats = run(engine, concurrency, n_requests)
+            print(f"{name:<12}{concurrency:>8}{stats['throughput']:>10.0f}"
+                  f"{stats['e2e_p50']:>10.2f}{stats['e2e_p99']:>10.2f}{stats['reported_p99']:>10.2f}")
+
+            stages = scheduler.get_metrics()['stages']
+            waits = ", ".join(f"{stage} wait {s['avg_wait_ms']:.2f}ms/{s['inline_runs']} inline"
+                              for stage, s in sorted(stages.items()))
+            print(f"{'':<12}  {waits}")
+            engine.close()
+            scheduler.shutdown()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare stage scheduling at 1/10/100 concurrent callers")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--pool-size", type=int, default=8)
+    args = parser.parse_args()
+    benchmark(args.requests, pool_size=args.pool_size)
@@ -0,0 +1,92 @@
+"""Snapshot, restore and checkpoint cost as the account population grows.
+
+For each size:
+- time a full snapshot and record the file size
+- restore it into a fresh engine from a memory map and from a plain read
+- touch 1% of accounts and time the incremental delta
+- score transactions while a background full checkpoint runs, to see how
+  long scoring waits on a stripe
+
+Building 1M accounts takes several minutes per engine, so it is not in the
+default sizes. Pass it with ``--sizes``.
+"""
+import os, sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import argparse
+import tempfile
+import threading
+import time
+import numpy as np
+from datetime import datetime
+from benchmark_memory import populate
+from rtf_digi_payments.fraud_engine import FraudDetectionEngine
+from rtf_digi_payments.models.transaction import Transaction, BiometricData
+
+
+def score_latencies(engine, n, prefix, stop=None):
+    latencies = []
+    for i in range(n):
+        if stop is not None and stop.is_set():
+            break
+        start = time.perf_counter()
+        engine.analyze_transaction(Transaction(
+            transaction_id=f"{prefix}_{i}", sender_id=f"ACC_{i * 7919 % 1000}", receiver_id=f"ACC_{i % 997}",
+            amount=250.0, timestamp=datetime.now(), device_id="DEV_1", ip_address="10.0.0.1",
+            biometric=BiometricData(typing_speed=52.0)
+        ))
+        latencies.append((time.perf_counter() - start) * 1000)
+    return np.array(latencies)
+
+
+def benchmark(n_accounts, directory):
+    engine = FraudDetectionEngine(checkpoint=True, checkpoint_dir=os.path.join(directory, f"ckpt-{n_accounts}"))
+    populate(engine, n_accounts)
+    path = os.path.join(directory, f"full-{n_accounts}.snap")
+
+    info = engine.snapshot(path)
+    row = {'accounts': n_accounts, 'snapshot_s': info['duration_ms'] / 1000, 'mb': info['bytes'] / 1e6}
+    for label, use_mmap in (('restore_mmap_s', True), ('restore_read_s', False)):
+        fresh = FraudDetectionEngine()
+        start = time.perf_counter()
+        fresh.restore(path, use_mmap=use_mmap)
+        row[label] = time.perf_counter() - start
+        del fresh
+
+    engine.checkpointer.checkpoint(full=True)
+    touched = max(n_accounts // 100, 1)
+    for i in range(touched):
+        engine.biometric_analyzer.update_profile(f"ACC_{i * 97 % n_accounts}", {'typing_speed': 50.0})
+    delta = engine.checkpointer.checkpoint()
+    row['delta_s'] = delta['duration_ms'] / 1000
+    row['delta_mb'] = delta['bytes'] / 1e6
+
+    baseline = score_latencies(engine, 2000, "BASE")
+    stop = threading.Event()
+    during = []
+    scorer = threading.Thread(target=lambda: during.append(score_latencies(engine, 10 ** 9, "CKPT", stop)))
+    scorer.start()
+    engine.checkpointer.checkpoint(full=True)
+    stop.set()
+    scorer.join()
+    row['p99_ms'] = float(np.percentile(baseline, 99))
+    row['p99_during_ms'] = float(np.percentile(during[0], 99)) if len(during[0]) else float('nan')
+    row['max_during_ms'] = float(during[0].max()) if len(during[0]) else float('nan')
+    engine.checkpointer.close(final=False)
+    return row
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Engine snapshot/restore and checkpoint cost")
+    parser.add_argument("--sizes", default="10000,100000")
+    parser.add_argument("--dir", help="where to write snapshots (default: a temporary directory)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(dir=args.dir) as directory:
+        print(f"{'accounts':>10}{'snapshot s':>12}{'MB':>9}{'restore mmap s':>16}{'restore read s':>16}"
+              f"{'1% delta s':>12}{'delta MB':>10}{'p99 ms':>9}{'p99 during':>12}{'max during':>12}")
+        for n in [int(n) for n in args.sizes.split(',')]:
+            r = benchmark(n, directory)
+            print(f"{r['accounts']:>10}{r['snapshot_s']:>12.2f}{r['mb']:>9.1f}{r['restore_mmap_s']:>16.2f}"
+                  f"{r['restore_read_s']:>16.2f}{r['delta_s']:>12.3f}{r['delta_mb']:>10.2f}{r['p99_ms']:>9.2f}"
+                  f"{r['p99_during_ms']:>12.2f}{r['max_during_ms']:>12.2f}")
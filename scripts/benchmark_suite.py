@@ -0,0 +1,365 @@
+"""Component benchmark suite.
+
+Times each part of the scoring pipeline on its own, so a change shows up
+against the component it touched. The end-to-end numbers come from the
+same run. Each result is a named metric with a unit and a direction. The
+whole run is written as JSON. ``--baseline`` compares the run against an
+earlier file and exits non-zero if any metric got worse by more than
+``--threshold``.
+
+    python scripts/benchmark_suite.py --preset quick --output bench.json
+    python scripts/benchmark_suite.py --baseline benchmarks/baseline.json
+    python scripts/benchmark_suite.py --current bench.json --baseline benchmarks/baseline.json
+
+The ``full`` preset builds a 10M-edge graph. That needs well over 8GB of RAM.
+"""
+import os, sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import argparse
+import gc
+import json
+import platform
+import subprocess
+import time
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+PRESETS = {
+    'quick': {
+        'graph_edges': [10_000, 100_000],
+        'biometric_users': [100_000],
+        'cache_ops': 20_000,
+        'batch_sizes': [1, 16, 256, 4096],
+        'concurrency': [1, 4, 16],
+        'e2e_transactions': 2_000
+    },
+    'standard': {
+        'graph_edges': [10_000, 1_000_000],
+        'biometric_users': [1_000_000],
+        'cache_ops': 100_000,
+        'batch_sizes': [1, 4, 16, 64, 256, 1024, 4096],
+        'concurrency': [1, 4, 16, 64],
+        'e2e_transactions': 5_000
+    },
+    'full': {
+        'graph_edges': [10_000, 1_000_000, 10_000_000],
+        'biometric_users': [1_000_000],
+        'cache_ops': 100_000,
+        'batch_sizes': [1, 4, 16, 64, 256, 1024, 4096],
+        'concurrency': [1, 4, 16, 64],
+        'e2e_transactions': 20_000
+    }
+}
+COMPONENTS = ('graph', 'biometric', 'cache', 'ml', 'e2e')
+DETECT_SAMPLES = 2_000
+SCORE_SAMPLES = 10_000
+
+
+class Results:
+    def __init__(self, preset: str):
+        self.metrics: Dict[str, Dict] = {}
+        self.skipped: Dict[str, str] = {}
+        self.meta = {
+            'preset': preset,
+            'started_at': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'commit': git_commit()
+        }
+
+    def add(self, name: str, value: float, unit: str, better: str, **params):
+        self.metrics[name] = {'value': round(value, 4), 'unit': unit, 'better': better, **params}
+        print(f"  {name:<44}{value:>14.3f} {unit}")
+
+    def skip(self, component: str, reason: str):
+        self.skipped[component] = reason
+        print(f"  {component}: skipped ({reason})")
+
+    def to_dict(self) -> Dict:
+        return {'meta': self.meta, 'metrics': self.metrics, 'skipped': self.skipped}
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), timeout=5).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def per_op_us(fn: Callable[[], None], n_ops: int, repeat: int = 3) -> float:
+    """Median over ``repeat`` runs of ``fn``, in microseconds per operation."""
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        runs.append((time.perf_counter() - start) / n_ops * 1e6)
+    return float(np.median(runs))
+
+
+def bench_graph(results: Results, sizes: List[int], rng: np.random.Generator):
+    from rtf_digi_payments.graph_detector import GraphFraudDetector
+
+    for n_edges in sizes:
+        # ~8 transfers per account, all inside the window so nothing is evicted
+        n_accounts = max(n_edges // 8, 100)
+        accounts = [f"ACC_{i}" for i in range(n_accounts)]
+        senders = rng.integers(0, n_accounts, n_edges)
+        receivers = (senders + rng.integers(1, n_accounts, n_edges)) % n_accounts
+        amounts = rng.uniform(10, 5000, n_edges)
+        now = datetime.now()
+
+        detector = GraphFraudDetector(window_hours=24 * 365, cleanup_interval_seconds=3600)
+        add = detector.add_transaction
+        start = time.perf_counter()
+        for s, r, a in zip(senders.tolist(), receivers.tolist(), amounts.tolist()):
+            add(accounts[s], accounts[r], a, now)
+        add_us = (time.perf_counter() - start) / n_edges * 1e6
+        results.add(f"graph.add[edges={n_edges}]", add_us, 'us/op', 'lower', edges=n_edges)
+
+        picks = rng.integers(0, n_edges, DETECT_SAMPLES)
+        pairs = [(accounts[senders[i]], accounts[receivers[i]]) for i in picks]
+
+        def detect():
+            for sender, receiver in pairs:
+                detector.detect_fraud_ring(sender, receiver)
+        results.add(f"graph.detect[edges={n_edges}]", per_op_us(detect, len(pairs)), 'us/op', 'lower',
+                    edges=n_edges)
+        del detector, accounts
+        gc.collect()
+
+
+def bench_biometric(results: Results, sizes: List[int], rng: np.random.Generator):
+    from rtf_digi_payments.biometric_analyzer import BiometricAnalyzer
+
+    for n_users in sizes:
+        analyzer = BiometricAnalyzer()
+        users = [f"USER_{i}" for i in range(n_users)]
+        samples = [{'typing_speed': t, 'swipe_velocity': s}
+                   for t, s in zip(rng.normal(55, 8, 1000).tolist(), rng.normal(110, 15, 1000).tolist())]
+
+        update = analyzer.update_profile
+        start = time.perf_counter()
+        for i, user in enumerate(users):
+            update(user, samples[i % 1000])
+        update_us = (time.perf_counter() - start) / n_users * 1e6
+        results.add(f"biometric.update[users={n_users}]", update_us, 'us/op', 'lower', users=n_users)
+
+        # Scoring needs five samples of history, so top up a random subset
+        scored = [users[i] for i in rng.choice(n_users, min(SCORE_SAMPLES, n_users), replace=False)]
+        for round_ in range(5):
+            for i, user in enumerate(scored):
+                update(user, samples[(i + round_) % 1000])
+        requests = [(user, samples[i % 1000]) for i, user in enumerate(scored)]
+
+        def score():
+            for user, biometric in requests:
+                analyzer.calculate_anomaly_score(user, biometric)
+        results.add(f"biometric.score[users={n_users}]", per_op_us(score, len(requests)), 'us/op', 'lower',
+                    users=n_users)
+        results.add(f"biometric.score_batch[users={n_users}]",
+                    per_op_us(lambda: analyzer.calculate_anomaly_scores(requests), len(requests)),
+                    'us/op', 'lower', users=n_users)
+        del analyzer, users
+        gc.collect()
+
+
+def bench_cache(results: Results, n_ops: int, redis_host: str, redis_port: int):
+    from rtf_digi_payments.utils.cache_manager import CacheManager
+
+    backends = {
+        # Nothing listens on port 1, so the breaker opens and the dict is used
+        'memory': CacheManager('localhost', 1),
+        'redis': CacheManager(redis_host, redis_port, socket_timeout_ms=500)
+    }
+    if not backends['redis'].use_redis:
+        results.skip('cache.redis', f"no Redis at {redis_host}:{redis_port}")
+        del backends['redis']
+
+    users = [f"BENCHCACHE_{i}" for i in range(1000)]
+    transaction = {'amount': 125.0, 'timestamp': datetime.now(), 'device_id': 'DEV_1', 'ip_address': '10.0.0.1'}
+    for name, cache in backends.items():
+        def update():
+            for i in range(n_ops):
+                cache.update_user_history(users[i % 1000], transaction)
+
+        def get():
+            for i in range(n_ops):
+                cache.get_user_history(users[i % 1000])
+
+        def increment():
+            for i in range(n_ops):
+                cache.increment_transaction_count(users[i % 1000])
+
+        for op, fn in (('update_history', update), ('get_history', get), ('increment_count', increment)):
+            results.add(f"cache.{name}.{op}", per_op_us(fn, n_ops), 'us/op', 'lower')
+
+        if name == 'redis':
+            keys = list(cache.redis_client.scan_iter(match="user:BENCHCACHE_*"))
+            if keys:
+                cache.redis_client.delete(*keys)
+
+
+def bench_ml(results: Results, batch_sizes: List[int], rng: np.random.Generator):
+    from rtf_digi_payments.ml_scorer import MLFraudScorer
+
+    # The default model is unfitted; train one so inference runs real trees
+    scorer = MLFraudScorer()
+    n_train = 20_000
+    X = np.column_stack([
+        rng.lognormal(6, 1.5, n_train), rng.integers(0, 24, n_train), rng.integers(0, 7, n_train),
+        np.zeros(n_train), rng.poisson(5, n_train), rng.poisson(5, n_train),
+        rng.lognormal(7, 1, n_train), rng.integers(0, 2, n_train), rng.integers(0, 2, n_train)
+    ]).astype(float)
+    X[:, 3] = np.log1p(X[:, 0])
+    y = ((X[:, 0] > 20000) | ((X[:, 7] == 1) & (X[:, 8] == 1) & (rng.random(n_train) < 0.5))).astype(int)
+    scorer.train(X, y)
+
+    now = datetime.now()
+    for batch in batch_sizes:
+        transactions = [{'amount': float(a), 'timestamp': now - timedelta(minutes=i)}
+                        for i, a in enumerate(rng.lognormal(6, 1.5, batch))]
+        histories = [{'sender_txn_count': i % 7, 'receiver_txn_count': i % 5, 'amount_velocity': 900.0,
+                      'device_changed': i % 11 == 0, 'ip_changed': i % 13 == 0} for i in range(batch)]
+        features = scorer.extract_features_batch(transactions, histories)
+        # Enough calls that small batches are not dominated by timer noise
+        calls = max(1, 4096 // batch)
+
+        def extract():
+            for _ in range(calls):
+                scorer.extract_features_batch(transactions, histories)
+
+        def predict():
+            for _ in range(calls):
+                scorer.predict_fraud_probability_batch(features)
+
+        results.add(f"features.extract[batch={batch}]", per_op_us(extract, calls * batch), 'us/row', 'lower',
+                    batch=batch)
+        results.add(f"ml.predict[batch={batch}]", per_op_us(predict, calls * batch), 'us/row', 'lower',
+                    batch=batch)
+
+
+def bench_e2e(results: Results, levels: List[int], n_transactions: int, rng: np.random.Generator):
+    from rtf_digi_payments.fraud_engine import FraudDetectionEngine
+    from rtf_digi_payments.models.transaction import Transaction, BiometricData
+
+    def make_transactions(prefix: str, n: int) -> List[Transaction]:
+        amounts = rng.uniform(100, 50000, n).tolist()
+        accounts = rng.integers(0, 1000, n).tolist()
+        return [Transaction(
+            transaction_id=f"{prefix}_{i}",
+            sender_id=f"USER_{accounts[i]}",
+            receiver_id=f"USER_{(accounts[i] + 1 + i % 7) % 1000}",
+            amount=amounts[i],
+            timestamp=datetime.now(),
+            device_id=f"DEV_{i % 50}",
+            ip_address=f"192.168.{i % 255}.{(i + 1) % 255}",
+            biometric=BiometricData(typing_speed=55 + i % 20, swipe_velocity=100 + i % 40)
+        ) for i in range(n)]
+
+    engine = FraudDetectionEngine()
+    for txn in make_transactions("WARM", 500):
+        engine.analyze_transaction(txn)
+
+    for level in levels:
+        transactions = make_transactions(f"E2E{level}", n_transactions)
+        with ThreadPoolExecutor(max_workers=level) as pool:
+            start = time.perf_counter()
+            scores = list(pool.map(engine.analyze_transaction, transactions))
+            wall = time.perf_counter() - start
+        latencies = np.array([score.latency_ms for score in scores])
+        results.add(f"e2e.throughput[concurrency={level}]", n_transactions / wall, 'tps', 'higher',
+                    concurrency=level)
+        results.add(f"e2e.p99[concurrency={level}]", float(np.percentile(latencies, 99)), 'ms', 'lower',
+                    concurrency=level)
+
+    transactions = make_transactions("E2EBATCH", n_transactions)
+    start = time.perf_counter()
+    for i in range(0, n_transactions, 256):
+        engine.analyze_batch(transactions[i:i + 256])
+    results.add("e2e.batch_throughput[batch=256]", n_transactions / (time.perf_counter() - start), 'tps',
+                'higher', batch=256)
+    engine.close()
+
+
+def compare(baseline: Dict, current: Dict, threshold: float) -> List[Dict]:
+    """One row per metric present in both runs; ``regression`` marks those that
+    moved the wrong way by more than ``threshold`` (a fraction)."""
+    rows = []
+    for name, metric in current['metrics'].items():
+        base = baseline['metrics'].get(name)
+        if base is None or not base['value']:
+            continue
+        change = (metric['value'] - base['value']) / base['value']
+        worse = change if metric['better'] == 'lower' else -change
+        rows.append({'name': name, 'unit': metric['unit'], 'baseline': base['value'],
+                     'current': metric['value'], 'change': change, 'regression': worse > threshold})
+    return rows
+
+
+def print_comparison(rows: List[Dict], baseline: Dict, threshold: float):
+    print(f"\nAgainst baseline from commit {baseline['meta'].get('commit')} "
+          f"({baseline['meta'].get('started_at')}), threshold {threshold:.0%}\n")
+    print(f"{'metric':<44}{'baseline':>12}{'current':>12}{'change':>9}")
+    for row in rows:
+        flag = "  REGRESSION" if row['regression'] else ""
+        print(f"{row['name']:<44}{row['baseline']:>12.3f}{row['current']:>12.3f}{row['change']:>+9.1%}{flag}")
+    regressions = sum(row['regression'] for row in rows)
+    print(f"\n{regressions} regression(s) in {len(rows)} compared metrics")
+
+
+def run(args) -> Dict:
+    sizes = PRESETS[args.preset]
+    components = args.only.split(',') if args.only else COMPONENTS
+    rng = np.random.default_rng(args.seed)
+    results = Results(args.preset)
+    print(f"Benchmark suite, preset '{args.preset}': {', '.join(components)}\n")
+
+    if 'graph' in components:
+        bench_graph(results, sizes['graph_edges'], rng)
+    if 'biometric' in components:
+        bench_biometric(results, sizes['biometric_users'], rng)
+    if 'cache' in components:
+        bench_cache(results, sizes['cache_ops'], args.redis_host, args.redis_port)
+    if 'ml' in components:
+        bench_ml(results, sizes['batch_sizes'], rng)
+    if 'e2e' in components:
+        bench_e2e(results, sizes['concurrency'], sizes['e2e_transactions'], rng)
+    return results.to_dict()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-component benchmarks with baseline comparison")
+    parser.add_argument("--preset", choices=sorted(PRESETS), default='standard')
+    parser.add_argument("--only", help=f"comma-separated subset of {','.join(COMPONENTS)}")
+    parser.add_argument("--output", help="write this run's results to a JSON file")
+    parser.add_argument("--baseline", help="compare against a stored results file")
+    parser.add_argument("--current", help="compare this results file instead of running the suite")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="relative slowdown that counts as a regression")
+    parser.add_argument("--redis-host", default='localhost')
+    parser.add_argument("--redis-port", type=int, default=6379)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    if args.current:
+        with open(args.current) as f:
+            current = json.load(f)
+    else:
+        current = run(args)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(current, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        rows = compare(baseline, current, args.threshold)
+        print_comparison(rows, baseline, args.threshold)
+        sys.exit(1 if any(row['regression'] for row in rows) else 0)
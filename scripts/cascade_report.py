@@ -0,0 +1,91 @@
+import os, sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import argparse
+import json
+import time
+import numpy as np
+from datetime import datetime, timedelta
+from rtf_digi_payments.fraud_engine import FraudDetectionEngine
+from rtf_digi_payments.models.transaction import Transaction, BiometricData
+
+def synthetic_transactions(n, seed=7):
+    rng = np.random.default_rng(seed)
+    start = datetime.now() - timedelta(hours=6)
+    transactions = []
+
+    for i in range(n):
+        timestamp = start + timedelta(seconds=i * 5)
+        kind = rng.random()
+        if kind < 0.05:
+            # Ring members passing money around
+            ring = [f"RING_{(i // 50) % 10}_{k}" for k in range(4)]
+            sender, receiver = ring[i % 4], ring[(i + 1) % 4]
+            amount = float(rng.uniform(20000, 90000))
+            timestamp = timestamp.replace(hour=2)
+        elif kind < 0.10:
+            sender, receiver = f"BURST_{i % 5}", f"USER_{rng.integers(0, 2000)}"
+            amount = float(rng.uniform(40000, 100000))
+        else:
+            sender, receiver = f"USER_{rng.integers(0, 2000)}", f"USER_{rng.integers(0, 2000)}"
+            amount = float(rng.lognormal(7, 1.2))
+
+        transactions.append(Transaction(
+            transaction_id=f"REPLAY_{i}",
+            sender_id=sender,
+            receiver_id=receiver,
+            amount=amount,
+            timestamp=timestamp,
+            device_id=f"DEV_{sender}" if rng.random() > 0.1 else f"DEV_NEW_{i}",
+            ip_address=f"10.{i % 255}.0.1",
+            biometric=BiometricData(
+                typing_speed=float(rng.normal(50, 8)),
+                swipe_velocity=float(rng.normal(110, 15))
+            )
+        ))
+    return transactions
+
+def load_transactions(path):
+    with open(path) as f:
+        return [Transaction(**json.loads(line)) for line in f if line.strip()]
+
+def replay(engine, transactions):
+    start = time.perf_counter()
+    results = [engine.analyze_transaction(txn) for txn in transactions]
+    return results, time.perf_counter() - start
+
+def report(transactions):
+    full_results, full_time = replay(FraudDetectionEngine(cascade=False), transactions)
+    cascade_engine = FraudDetectionEngine(cascade=True)
+    cascade_results, cascade_time = replay(cascade_engine, transactions)
+
+    n = len(transactions)
+    stats = cascade_engine.cascade_stats
+    flips_to_clean = [f.transaction_id for f, c in zip(full_results, cascade_results)
+                      if f.is_fraudulent and not c.is_fraudulent]
+    flips_to_fraud = [f.transaction_id for f, c in zip(full_results, cascade_results)
+                      if c.is_fraudulent and not f.is_fraudulent]
+    diffs = np.array([abs(f.fraud_probability - c.fraud_probability)
+                      for f, c in zip(full_results, cascade_results)])
+
+    print("=== Cascade Replay Report ===\n")
+    print(f"Transactions: {n}")
+    print(f"Full scoring:    {full_time:.2f}s ({n / full_time:.0f} TPS)")
+    print(f"Cascade scoring: {cascade_time:.2f}s ({n / cascade_time:.0f} TPS)")
+    print(f"\nEscalated to full scoring: {stats['escalated']} ({stats['escalated'] / n * 100:.1f}%)")
+    print(f"ML stage skipped:    {stats['ml_skipped']} ({stats['ml_skipped'] / n * 100:.1f}%)")
+    print(f"Graph stage skipped: {stats['graph_skipped']} ({stats['graph_skipped'] / n * 100:.1f}%)")
+    print(f"\nFlagged (full):    {sum(r.is_fraudulent for r in full_results)}")
+    print(f"Flagged (cascade): {sum(r.is_fraudulent for r in cascade_results)}")
+    print(f"Decision differences: {len(flips_to_clean) + len(flips_to_fraud)}")
+    print(f"  fraud -> clean: {len(flips_to_clean)} {flips_to_clean[:10]}")
+    print(f"  clean -> fraud: {len(flips_to_fraud)} {flips_to_fraud[:10]}")
+    print(f"\nProbability difference: mean {diffs.mean():.4f}, p99 {np.percentile(diffs, 99):.4f}, max {diffs.max():.4f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare cascade scoring against full scoring on a replay")
+    parser.add_argument("--input", help="JSONL file of transactions (default: synthetic workload)")
+    parser.add_argument("--n", type=int, default=5000, help="Synthetic transactions to generate")
+    args = parser.parse_args()
+
+    report(load_transactions(args.input) if args.input else synthetic_transactions(args.n))
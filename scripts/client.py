@@ -2,8 +2,15 @@ import os, sys
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
 import requests
-from typing import Dict, Optional
+from typing import Dict, Iterable, Iterator, Optional
 from datetime import datetime
+try:
+    import grpc
+    from rtf_digi_payments.grpc_server import transaction_to_proto, score_from_proto
+    from rtf_digi_payments.models.transaction import Transaction
+    from rtf_digi_payments.proto import fraud_pb2_grpc
+except ImportError:
+    grpc = None
 
 class FraudDetectionClient:
     def __init__(self, base_url: str = "http://localhost:8000"):
@@ -49,6 +56,32 @@ class FraudDetectionClient:
         response.raise_for_status()
         return response.json()
 
+class FraudDetectionStreamClient:
+    """gRPC client: one long-lived bidirectional stream per analyze_stream call.
+    
+    Results come back in the order transactions were written. The stream
+    writes lazily from the iterable, so a generator is consumed only as fast
+    as the server's flow control allows."""
+    def __init__(self, target: str = "localhost:50051"):
+        if grpc is None:
+            raise RuntimeError("grpcio is not installed")
+        self.channel = grpc.insecure_channel(target)
+        self.stub = fraud_pb2_grpc.FraudDetectionStub(self.channel)
+    
+    def analyze_stream(self, transactions: Iterable[Dict]) -> Iterator[Dict]:
+        """Each transaction is a dict shaped like the REST payload. Yields a
+        FraudScore dict per transaction, or {"transaction_id", "error"} when
+        the server rejected it."""
+        requests_iter = (transaction_to_proto(Transaction(**txn)) for txn in transactions)
+        for result in self.stub.Analyze(requests_iter):
+            if result.error:
+                yield {"transaction_id": result.transaction_id, "error": result.error}
+            else:
+                yield score_from_proto(result.score)
+    
+    def close(self):
+        self.channel.close()
+
 # Example usage
 if __name__ == "__main__":
     client = FraudDetectionClient()
@@ -66,3 +99,15 @@ if __name__ == "__main__":
     print(f"Fraud Probability: {result['fraud_probability']}")
     print(f"Is Fraudulent: {result['is_fraudulent']}")
     print(f"Latency: {result['latency_ms']}ms")
+    
+    if grpc is not None:
+        stream_client = FraudDetectionStreamClient()
+        transactions = [
+            {"transaction_id": f"CLIENT_STREAM_{i}", "sender_id": "USER_A", "receiver_id": "USER_B",
+             "amount": 100.0 * (i + 1), "timestamp": datetime.now(), "device_id": "DEVICE_001",
+             "ip_address": "192.168.1.1"}
+            for i in range(5)
+        ]
+        for score in stream_client.analyze_stream(transactions):
+            print(f"{score['transaction_id']}: {score.get('fraud_probability', score.get('error'))}")
+        stream_client.close()
@@ -0,0 +1,300 @@
+"""Open-loop load generator for the REST API.
+
+Requests are scheduled at a target arrival rate and sent on schedule,
+whether or not earlier ones have answered. Each latency is measured from
+the request's *intended* send time. A closed-loop client only sends when a
+connection frees up, so it measures from then and never sees the queue
+that built up while it waited. That is coordinated omission, and it hides
+the tail exactly when the service is saturated.
+
+The run is a list of load steps:
+- ``constant``: one step.
+- ``ramp``: the rate rises linearly across ``--steps`` steps.
+- ``step``: flat rates stepping from ``--rate`` to ``--to-rate``.
+- ``burst``: ``--burst-rate`` for ``--burst-duration`` every ``--burst-every`` seconds.
+
+Each step reports offered vs achieved rate, errors and a percentile curve
+from an HDR histogram. A service-time histogram, timed from the actual
+send, is reported next to it so the two can be compared.
+
+    python scripts/load_generator.py --profile step --rate 100 --to-rate 800 --steps 8 --duration 80
+    python scripts/load_generator.py --generate 50000 --payloads txns.jsonl
+    python scripts/load_generator.py --payloads txns.jsonl --rate 500 --duration 30 --output run.json
+"""
+import os, sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import argparse
+import asyncio
+import aiohttp
+import itertools
+import json
+import math
+import time
+import numpy as np
+from typing import Dict, Iterator, List, Optional, Tuple
+from load_test import make_payload
+from rtf_digi_payments.utils.histogram import LatencyHistogram
+
+BASE_URL = 'http://localhost:8000'
+CURVE_PERCENTILES = (50, 75, 90, 95, 99, 99.9, 99.99, 100)
+
+# (duration_s, rate at start, rate at end) — the rate is linear within a step
+Step = Tuple[float, float, float]
+
+
+def build_steps(profile: str, rate: float, duration: float, to_rate: Optional[float] = None,
+                steps: int = 5, burst_rate: Optional[float] = None, burst_every: float = 10.0,
+                burst_duration: float = 1.0) -> List[Step]:
+    if profile == 'constant':
+        return [(duration, rate, rate)]
+    if profile in ('ramp', 'step'):
+        to_rate = rate if to_rate is None else to_rate
+        edges = np.linspace(rate, to_rate, steps + 1 if profile == 'ramp' else steps).tolist()
+        if profile == 'ramp':
+            return [(duration / steps, edges[i], edges[i + 1]) for i in range(steps)]
+        return [(duration / steps, r, r) for r in edges]
+    if profile == 'burst':
+        burst_rate = burst_rate or rate * 5
+        result = []
+        elapsed = 0.0
+        while elapsed < duration:
+            quiet = min(burst_every - burst_duration, duration - elapsed)
+            if quiet > 0:
+                result.append((quiet, rate, rate))
+                elapsed += quiet
+            burst = min(burst_duration, duration - elapsed)
+            if burst > 0:
+                result.append((burst, burst_rate, burst_rate))
+                elapsed += burst
+        return result
+    raise ValueError(f"Unknown profile: {profile}")
+
+
+def arrival_offsets(step: Step, poisson: bool = False, rng: Optional[np.random.Generator] = None) -> List[float]:
+    """Intended send times (seconds from the start of the step).
+
+    Deterministic arrivals put the i-th request where the integrated rate
+    reaches i; Poisson arrivals use exponential gaps at the current rate."""
+    duration, r0, r1 = step
+    slope = (r1 - r0) / duration if duration else 0.0
+    offsets = []
+    if poisson:
+        rng = rng or np.random.default_rng()
+        t = 0.0
+        while True:
+            current = r0 + slope * t
+            if current <= 0:
+                break
+            t += rng.exponential(1 / current)
+            if t >= duration:
+                break
+            offsets.append(t)
+        return offsets
+
+    total = r0 * duration + slope * duration ** 2 / 2
+    for i in range(int(total)):
+        # Solve r0*t + slope*t^2/2 = i for t
+        if abs(slope) < 1e-12:
+            offsets.append(i / r0)
+        else:
+            offsets.append((-r0 + math.sqrt(r0 * r0 + 2 * slope * i)) / slope)
+    return offsets
+
+
+def load_payloads(path: str) -> List[Dict]:
+    with open(path) as f:
+        text = f.read().strip()
+    if text.startswith('['):
+        return json.loads(text)
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+
+def payload_stream(payloads: Optional[List[Dict]]) -> Iterator[Dict]:
+    if not payloads:
+        for i in itertools.count():
+            yield make_payload(i)
+    # A recorded file is replayed in a loop; repeats get fresh ids so the
+    # idempotency store scores them instead of returning cached results
+    for cycle in itertools.count():
+        for payload in payloads:
+            if cycle:
+                payload = dict(payload, transaction_id=f"{payload['transaction_id']}-r{cycle}")
+            yield payload
+
+
+class StepStats:
+    def __init__(self, index: int, step: Step):
+        self.index = index
+        self.duration, self.rate_start, self.rate_end = step
+        self.latency = LatencyHistogram()
+        self.service = LatencyHistogram()
+        self.send_lag = LatencyHistogram()
+        self.scheduled = 0
+        self.ok = 0
+        self.degraded = 0
+        self.statuses: Dict[str, int] = {}
+        self.first_intended = None
+        self.last_completion = None
+
+    def record(self, intended: float, sent: float, done: float, status: str, degraded: bool):
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        self.send_lag.record((sent - intended) * 1000)
+        if status == '200':
+            self.ok += 1
+            self.degraded += degraded
+            self.latency.record((done - intended) * 1000)
+            self.service.record((done - sent) * 1000)
+        if self.last_completion is None or done > self.last_completion:
+            self.last_completion = done
+
+    def report(self) -> Dict:
+        completed = sum(self.statuses.values())
+        # Throughput over the step's own window, stretched by any late answers
+        window = max(self.duration, (self.last_completion or 0) - (self.first_intended or 0))
+        return {
+            'step': self.index,
+            'duration_s': round(self.duration, 3),
+            'offered_rps': round((self.rate_start + self.rate_end) / 2, 1),
+            'scheduled': self.scheduled,
+            'completed': completed,
+            'achieved_rps': round(self.ok / window, 1) if window else 0.0,
+            'error_rate': round(1 - self.ok / self.scheduled, 4) if self.scheduled else 0.0,
+            'statuses': self.statuses,
+            'degraded': self.degraded,
+            'latency_ms': percentile_curve(self.latency),
+            'service_time_ms': percentile_curve(self.service),
+            'send_lag_p99_ms': round(self.send_lag.percentile(99), 3)
+        }
+
+
+def percentile_curve(histogram: LatencyHistogram) -> Dict[str, float]:
+    return {f"p{q:g}": round(histogram.percentile(q), 3) for q in CURVE_PERCENTILES}
+
+
+async def send(session: aiohttp.ClientSession, url: str, payload: Dict, intended: float, stats: StepStats):
+    sent = time.perf_counter()
+    degraded = False
+    try:
+        async with session.post(url, json=payload) as response:
+            body = await response.read()
+            status = str(response.status)
+            if response.status == 200:
+                degraded = json.loads(body).get('degraded', False)
+    except asyncio.TimeoutError:
+        status = 'timeout'
+    except aiohttp.ClientError as e:
+        status = type(e).__name__
+    stats.record(intended, sent, time.perf_counter(), status, degraded)
+
+
+async def run_load(steps: List[Step], payloads: Optional[List[Dict]], url: str, timeout_s: float,
+                   poisson: bool, seed: int) -> List[StepStats]:
+    rng = np.random.default_rng(seed)
+    source = payload_stream(payloads)
+    all_stats = [StepStats(i, step) for i, step in enumerate(steps)]
+    pending = set()
+
+    connector = aiohttp.TCPConnector(limit=0)
+    async with aiohttp.ClientSession(connector=connector,
+                                     timeout=aiohttp.ClientTimeout(total=timeout_s)) as session:
+        # Build payloads up front so JSON preparation doesn't delay the schedule
+        schedule = []
+        step_start = 0.0
+        for step, stats in zip(steps, all_stats):
+            offsets = arrival_offsets(step, poisson, rng)
+            schedule += [(step_start + offset, next(source), stats) for offset in offsets]
+            stats.scheduled = len(offsets)
+            step_start += step[0]
+
+        origin = time.perf_counter() + 0.05
+        for offset, payload, stats in schedule:
+            intended = origin + offset
+            if stats.first_intended is None:
+                stats.first_intended = intended
+            delay = intended - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            task = asyncio.ensure_future(send(session, url, payload, intended, stats))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+        if pending:
+            await asyncio.wait(pending)
+    return all_stats
+
+
+def print_report(reports: List[Dict], overall: Dict):
+    print(f"{'step':>4}{'offered/s':>11}{'achieved/s':>12}{'errors':>9}"
+          f"{'p50':>10}{'p90':>10}{'p99':>10}{'p99.9':>10}{'max':>10}  (ms from intended send)")
+    for r in reports:
+        curve = r['latency_ms']
+        print(f"{r['step']:>4}{r['offered_rps']:>11.1f}{r['achieved_rps']:>12.1f}{r['error_rate']:>9.2%}"
+              f"{curve['p50']:>10.2f}{curve['p90']:>10.2f}{curve['p99']:>10.2f}{curve['p99.9']:>10.2f}"
+              f"{curve['p100']:>10.2f}")
+        others = {status: n for status, n in r['statuses'].items() if status != '200'}
+        if others:
+            print(f"{'':>4}  non-200: {others}")
+        if r['send_lag_p99_ms'] > 10:
+            print(f"{'':>4}  generator fell behind schedule (send lag p99 {r['send_lag_p99_ms']:.1f}ms)")
+
+    print(f"\nWhole run: {overall['scheduled']} scheduled, {overall['ok']} OK")
+    print(f"{'percentile':>12}{'from intended':>16}{'service time':>16}")
+    for key in overall['latency_ms']:
+        print(f"{key:>12}{overall['latency_ms'][key]:>16.2f}{overall['service_time_ms'][key]:>16.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Open-loop constant-arrival-rate load generator")
+    parser.add_argument("--profile", choices=["constant", "ramp", "step", "burst"], default="constant")
+    parser.add_argument("--rate", type=float, default=100, help="Requests/s (start rate for ramp/step)")
+    parser.add_argument("--to-rate", type=float, help="Final rate for ramp/step")
+    parser.add_argument("--duration", type=float, default=30, help="Total seconds of load")
+    parser.add_argument("--steps", type=int, default=5, help="Report steps for ramp/step")
+    parser.add_argument("--burst-rate", type=float, help="Rate during bursts (default 5x --rate)")
+    parser.add_argument("--burst-every", type=float, default=10.0)
+    parser.add_argument("--burst-duration", type=float, default=1.0)
+    parser.add_argument("--poisson", action="store_true", help="Exponential inter-arrival gaps")
+    parser.add_argument("--payloads", help="JSON lines (or a JSON array) of transactions to send")
+    parser.add_argument("--generate", type=int, metavar="N",
+                        help="Write N synthetic transactions to --payloads and exit")
+    parser.add_argument("--timeout", type=float, default=10.0, help="Per-request timeout in seconds")
+    parser.add_argument("--output", help="Write per-step reports as JSON")
+    parser.add_argument("--seed", type=int, default=11)
+    parser.add_argument("--url", default=BASE_URL)
+    args = parser.parse_args()
+
+    if args.generate:
+        if not args.payloads:
+            parser.error("--generate needs --payloads")
+        with open(args.payloads, 'w') as f:
+            for i in range(args.generate):
+                f.write(json.dumps(make_payload(i)) + "\n")
+        print(f"Wrote {args.generate} transactions to {args.payloads}")
+        sys.exit(0)
+
+    steps = build_steps(args.profile, args.rate, args.duration, args.to_rate, args.steps,
+                        args.burst_rate, args.burst_every, args.burst_duration)
+    payloads = load_payloads(args.payloads) if args.payloads else None
+    print(f"Open-loop {args.profile} load against {args.url}: {len(steps)} step(s), "
+          f"{sum(d * (a + b) / 2 for d, a, b in steps):.0f} requests over {args.duration:.0f}s\n")
+
+    stats = asyncio.run(run_load(steps, payloads, f"{args.url}/api/v1/analyze", args.timeout,
+                                 args.poisson, args.seed))
+    reports = [s.report() for s in stats]
+
+    latency, service = LatencyHistogram(), LatencyHistogram()
+    for s in stats:
+        latency.merge(s.latency)
+        service.merge(s.service)
+    overall = {
+        'scheduled': sum(s.scheduled for s in stats),
+        'ok': sum(s.ok for s in stats),
+        'latency_ms': percentile_curve(latency),
+        'service_time_ms': percentile_curve(service)
+    }
+    print_report(reports, overall)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'args': vars(args), 'steps': reports, 'overall': overall}, f, indent=2)
+        print(f"\nReport written to {args.output}")
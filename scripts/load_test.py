@@ -1,14 +1,18 @@
 import os, sys
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
+import argparse
 import asyncio
 import aiohttp
+import json
 import time
 from datetime import datetime
 import numpy as np
 
-async def send_transaction(session, transaction_id):
-    payload = {
+BASE_URL = 'http://localhost:8000'
+
+def make_payload(transaction_id):
+    return {
         "transaction_id": f"LOAD_{transaction_id}",
         "sender_id": f"USER_{transaction_id % 1000}",
         "receiver_id": f"USER_{(transaction_id + 1) % 1000}",
@@ -21,28 +25,51 @@ async def send_transaction(session, transaction_id):
             "swipe_velocity": float(np.random.uniform(80, 150))
         }
     }
+
+async def send_transaction(session, transaction_id, intended=None):
+    payload = make_payload(transaction_id)
     
-    start = time.time()
+    # Paced runs time from the scheduled send, so queueing delay is included
+    start = intended or time.time()
     try:
-        async with session.post('http://localhost:8000/api/v1/analyze', json=payload) as response:
+        async with session.post(f'{BASE_URL}/api/v1/analyze', json=payload) as response:
             result = await response.json()
             latency = (time.time() - start) * 1000
-            return {'success': True, 'latency': latency}
+            return {'success': response.status == 200, 'status': response.status, 'latency': latency,
+                    'degraded': response.status == 200 and result.get('degraded', False)}
     except Exception as e:
-        return {'success': False, 'error': str(e)}
+        return {'success': False, 'status': None, 'error': str(e)}
 
-async def load_test(n_requests=1000, concurrency=50):
-    print(f"Starting load test: {n_requests} requests with {concurrency} concurrent connections\n")
-    
-    connector = aiohttp.TCPConnector(limit=concurrency)
+async def paced(session, transaction_id, start_time, delay):
+    await asyncio.sleep(start_time + delay - time.time())
+    return await send_transaction(session, transaction_id, intended=start_time + delay)
+
+async def load_test(n_requests=1000, concurrency=50, rate=None):
+    if rate:
+        # Open loop: requests go out on schedule whether or not earlier ones
+        # have finished, so offered load can exceed capacity
+        print(f"Starting load test: {n_requests} requests offered at {rate:.0f} req/s\n")
+        connector = aiohttp.TCPConnector(limit=0)
+    else:
+        print(f"Starting load test: {n_requests} requests with {concurrency} concurrent connections\n")
+        connector = aiohttp.TCPConnector(limit=concurrency)
     async with aiohttp.ClientSession(connector=connector) as session:
         start_time = time.time()
         
-        tasks = [send_transaction(session, i) for i in range(n_requests)]
+        if rate:
+            tasks = [paced(session, i, start_time, i / rate) for i in range(n_requests)]
+        else:
+            tasks = [send_transaction(session, i) for i in range(n_requests)]
         results = await asyncio.gather(*tasks)
         
         total_time = time.time() - start_time
     
+    statuses = {}
+    for r in results:
+        statuses[r['status']] = statuses.get(r['status'], 0) + 1
+    degraded = [r for r in results if r['success'] and r['degraded']]
+    shed = [r for r in results if r['status'] == 503]
+    
     successful = [r for r in results if r['success']]
     failed = [r for r in results if not r['success']]
     latencies = [r['latency'] for r in successful]
@@ -52,8 +79,13 @@ async def load_test(n_requests=1000, concurrency=50):
     print(f"Successful: {len(successful)}")
     print(f"Failed: {len(failed)}")
     print(f"Success Rate: {len(successful)/n_requests*100:.2f}%")
+    print(f"Status codes: {statuses}")
+    print(f"Degraded (heuristic-only) scores: {len(degraded)}")
+    print(f"Shed with 503: {len(shed)}")
+    if shed:
+        print(f"  503 p99 latency: {np.percentile([r['latency'] for r in shed], 99):.2f}ms")
     print(f"\nTotal Time: {total_time:.2f}s")
-    print(f"Throughput: {n_requests/total_time:.2f} TPS")
+    print(f"Throughput: {len(successful)/total_time:.2f} TPS")
     
     if latencies:
         print(f"\nLatency Statistics:")
@@ -63,5 +95,97 @@ async def load_test(n_requests=1000, concurrency=50):
         print(f"  99th Percentile: {np.percentile(latencies, 99):.2f}ms")
         print(f"  Max: {np.max(latencies):.2f}ms")
 
+async def send_batch(session, first_id, batch_size):
+    payload = [make_payload(i) for i in range(first_id, first_id + batch_size)]
+    
+    start = time.time()
+    try:
+        async with session.post(f'{BASE_URL}/api/v1/analyze/batch', json=payload) as response:
+            results = await response.json()
+            return {'success': response.status == 200, 'latency': (time.time() - start) * 1000,
+                    'scored': len(results) if response.status == 200 else 0}
+    except Exception as e:
+        return {'success': False, 'error': str(e), 'scored': 0}
+
+async def batch_load_test(n_transactions=100000, batch_size=1000, concurrency=4):
+    print(f"Starting batch load test: {n_transactions} transactions in batches of {batch_size}, "
+          f"{concurrency} concurrent requests\n")
+    
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        start_time = time.time()
+        
+        tasks = [send_batch(session, first_id, min(batch_size, n_transactions - first_id))
+                 for first_id in range(0, n_transactions, batch_size)]
+        results = await asyncio.gather(*tasks)
+        
+        total_time = time.time() - start_time
+    
+    scored = sum(r['scored'] for r in results)
+    latencies = [r['latency'] for r in results if r['success']]
+    
+    print("=== Batch Load Test Results ===\n")
+    print(f"Batches: {len(results)} ({sum(not r['success'] for r in results)} failed)")
+    print(f"Transactions scored: {scored}")
+    print(f"\nTotal Time: {total_time:.2f}s")
+    print(f"Throughput: {scored/total_time:.2f} TPS")
+    if latencies:
+        print(f"Batch latency p50/p99: {np.median(latencies):.2f}ms / {np.percentile(latencies, 99):.2f}ms")
+
+async def stream_load_test(n_transactions=100000, streams=1):
+    print(f"Starting NDJSON stream load test: {n_transactions} transactions over {streams} streams\n")
+    
+    async def body(ids):
+        for i in ids:
+            yield (json.dumps(make_payload(i)) + "\n").encode()
+    
+    async def run_stream(session, ids):
+        first_result = None
+        scored = errors = 0
+        start = time.time()
+        async with session.post(f'{BASE_URL}/api/v1/analyze/stream', data=body(ids),
+                                headers={'Content-Type': 'application/x-ndjson'}) as response:
+            async for line in response.content:
+                if not line.strip():
+                    continue
+                if first_result is None:
+                    first_result = (time.time() - start) * 1000
+                if 'error' in json.loads(line):
+                    errors += 1
+                else:
+                    scored += 1
+        return scored, errors, first_result
+    
+    async with aiohttp.ClientSession() as session:
+        start_time = time.time()
+        results = await asyncio.gather(*[run_stream(session, range(s, n_transactions, streams))
+                                         for s in range(streams)])
+        total_time = time.time() - start_time
+    
+    scored = sum(r[0] for r in results)
+    print("=== Stream Load Test Results ===\n")
+    print(f"Transactions scored: {scored}")
+    print(f"Error lines: {sum(r[1] for r in results)}")
+    print(f"Time to first result: {min(r[2] for r in results if r[2] is not None):.2f}ms")
+    print(f"\nTotal Time: {total_time:.2f}s")
+    print(f"Throughput: {scored/total_time:.2f} TPS")
+
 if __name__ == "__main__":
-    asyncio.run(load_test(n_requests=1000, concurrency=50))
+    parser = argparse.ArgumentParser(description="Load test the fraud detection API")
+    parser.add_argument("--mode", choices=["single", "batch", "stream"], default="single")
+    parser.add_argument("--requests", type=int, default=1000, help="Transactions to send")
+    parser.add_argument("--concurrency", type=int, default=50, help="Concurrent requests (single/batch)")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--streams", type=int, default=1)
+    parser.add_argument("--rate", type=float, help="Open-loop offered load in requests/s (single mode); "
+                        "scripts/load_generator.py adds load profiles and per-step reports")
+    parser.add_argument("--url", default=BASE_URL)
+    args = parser.parse_args()
+    BASE_URL = args.url
+    
+    if args.mode == "batch":
+        asyncio.run(batch_load_test(args.requests, args.batch_size, args.concurrency))
+    elif args.mode == "stream":
+        asyncio.run(stream_load_test(args.requests, args.streams))
+    else:
+        asyncio.run(load_test(n_requests=args.requests, concurrency=args.concurrency, rate=args.rate))
@@ -1,11 +1,12 @@
 import os, sys
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, Response, render_template, request, jsonify
 from flask_cors import CORS
 from datetime import datetime
 from rtf_digi_payments.fraud_engine import FraudDetectionEngine
 from rtf_digi_payments.models.transaction import Transaction, BiometricData
+from rtf_digi_payments.utils.histogram import render_prometheus
 
 app = Flask(__name__, 
             template_folder='web/templates',
@@ -64,6 +65,10 @@ def analyze():
 def health():
     return jsonify({'status': 'healthy', 'service': 'fraud-detection-web'})
 
+@app.route('/metrics')
+def metrics():
+    return Response(render_prometheus(engine.latency.snapshot()), mimetype='text/plain; version=0.0.4')
+
 if __name__ == '__main__':
     print("\n" + "="*60)
     print("  RTF FRAUD DETECTION - WEB INTERFACE")
@@ -1,3 +1,7 @@
-"""RTF Digi Payments package (in `src/` layout)."""
+"""RTF Digi Payments package (in `src/` layout).
 
-__all__ = []
+The names below are imported from their submodule on first access. So
+``import rtf_digi_payments`` stays cheap, and each subsystem's
+dependencies load only when that subsystem is used.
+"""
+from ._exports import __all__, __dir__, __getattr__
@@ -0,0 +1,31 @@
+"""The package's public names, imported from their submodule on first access.
+
+Kept out of ``__init__`` so the top-level development shim can re-export
+them as well; both bind them into the ``rtf_digi_payments`` package.
+"""
+import sys
+from importlib import import_module
+
+_PACKAGE = __name__.rpartition('.')[0]
+
+_LAZY_EXPORTS = {
+    'FraudDetectionEngine': 'fraud_engine',
+    'Transaction': 'models.transaction',
+    'BiometricData': 'models.transaction',
+    'FraudScore': 'models.transaction',
+}
+
+__all__ = sorted(_LAZY_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _LAZY_EXPORTS:
+        raise AttributeError(f"module {_PACKAGE!r} has no attribute {name!r}")
+    value = getattr(import_module(f"{_PACKAGE}.{_LAZY_EXPORTS[name]}"), name)
+    # Cached on the package, so later lookups skip __getattr__
+    setattr(sys.modules[_PACKAGE], name, value)
+    return value
+
+
+def __dir__():
+    return sorted(set(vars(sys.modules[_PACKAGE])) | set(_LAZY_EXPORTS))
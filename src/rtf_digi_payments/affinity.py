@@ -0,0 +1,406 @@
+"""Account-affinity routing across worker processes.
+
+A single acceptor consistent-hashes each transaction's ``sender_id`` onto a
+pool of worker processes, each owning a private ``FraudDetectionEngine``.
+An account's graph edges, biometric profile and local history therefore
+live in exactly one process, and workers never coordinate with each other.
+
+Requests travel over per-worker multiprocessing queues (pipes over Unix
+sockets on Linux). Each worker handles its queue in order, so a rebalance
+can be sequenced behind the requests already queued: when the worker count
+changes, only the accounts whose owner moved on the ring are exported from
+their old worker and imported into the new one before routing resumes.
+
+The collector thread also watches the worker processes. When one dies, its
+outstanding requests fail with ``WorkerDied`` and a replacement is started
+under the same node id, so the ring is unchanged and the replacement
+restores that node's checkpoint. ``analyze_async`` waits at most
+``AFFINITY_REQUEST_TIMEOUT_MS``. A worker being stopped that does not exit
+within ``AFFINITY_STOP_TIMEOUT_S`` is terminated.
+
+Exports copy account state rather than removing it, so a rebalance can
+be abandoned safely: an export or import that hits a dead worker is
+retried against its replacement, and if that keeps failing the new
+workers are stopped, the old ring stays in place and ``RebalanceFailed``
+is raised.
+
+Only the sender's worker scores a transaction, so the engine state it
+updates on the receiver's behalf lives there too: graph edges (ring
+detection only sees cycles whose senders share a worker) and the
+receiver's history. With Redis reachable, histories and counters live in
+Redis and are shared by every worker. Without it, the local fallback copy
+of a receiver's history is kept by each sender's worker, so receiver-side
+counts only cover that worker's senders until Redis is back and the
+pending updates are reconciled.
+"""
+import asyncio
+import bisect
+import hashlib
+import itertools
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .models.transaction import Transaction, FraudScore
+from .utils.idempotency import DuplicateInProgress
+from .utils.histogram import LatencyHistogram, merge_snapshots
+from config.settings import (
+    AFFINITY_WORKERS, AFFINITY_RING_REPLICAS, AFFINITY_REQUEST_TIMEOUT_MS, AFFINITY_HEALTH_CHECK_S,
+    AFFINITY_STOP_TIMEOUT_S, AFFINITY_REBALANCE_ATTEMPTS, CHECKPOINT_DIR
+)
+
+
+class WorkerDied(RuntimeError):
+    pass
+
+
+class RebalanceFailed(RuntimeError):
+    pass
+
+
+class HashRing:
+    def __init__(self, nodes: Iterable[int] = (), replicas: int = AFFINITY_RING_REPLICAS):
+        self.replicas = replicas
+        self.nodes = set()
+        self._points = []  # sorted (hash, node)
+        for node in nodes:
+            self.add_node(node)
+
+    @staticmethod
+    def _hash(key: str) -> int:
+        return int.from_bytes(hashlib.md5(key.encode()).digest()[:8], 'big')
+
+    def add_node(self, node: int):
+        if node in self.nodes:
+            return
+        self.nodes.add(node)
+        for replica in range(self.replicas):
+            bisect.insort(self._points, (self._hash(f"{node}#{replica}"), node))
+
+    def remove_node(self, node: int):
+        self.nodes.discard(node)
+        self._points = [point for point in self._points if point[1] != node]
+
+    def node_for(self, key: str) -> int:
+        if not self._points:
+            raise LookupError("hash ring has no nodes")
+        index = bisect.bisect(self._points, (self._hash(key), float('inf')))
+        return self._points[index % len(self._points)][1]
+
+
+def _worker_main(node: int, requests, responses, replicas: int):
+    # Imported here so only worker processes build an engine
+    from .fraud_engine import FraudDetectionEngine
+
+    # Checkpoints are per node, so a restarted worker gets back the accounts it owned
+    engine = FraudDetectionEngine(checkpoint_dir=os.path.join(CHECKPOINT_DIR, f"worker-{node}"))
+    while True:
+        op, request_id, payload = requests.get()
+        try:
+            if op == 'analyze':
+                transaction, degraded = payload
+                result = engine.analyze_transaction(Transaction(**transaction), degraded=degraded).model_dump()
+            elif op == 'export':
+                # payload: nodes of the new ring; give away what they now own
+                ring = HashRing(payload, replicas)
+                moved = [account for account in engine.known_accounts()
+                         if ring.node_for(account) != node]
+                result = {}
+                for account, state in engine.export_accounts(moved).items():
+                    result.setdefault(ring.node_for(account), {})[account] = state
+            elif op == 'import':
+                engine.import_accounts(payload)
+                result = len(payload)
+            elif op == 'history':
+                result = engine.cache_manager.get_user_history(payload)
+            elif op == 'metrics':
+                result = engine.get_metrics()
+            elif op == 'latency':
+                result = engine.latency.snapshot()
+            elif op == 'memory':
+                result = engine.memory_report(payload) if payload else engine.memory_report()
+            elif op == 'account_memory':
+                result = engine.account_memory(payload)
+            elif op == 'warmup':
+                result = engine.warmup(payload)
+            elif op == 'stop':
+                engine.close()
+                responses.put((request_id, True, None))
+                return
+            else:
+                raise ValueError(f"unknown operation {op!r}")
+            responses.put((request_id, True, result))
+        except DuplicateInProgress as exc:
+            responses.put((request_id, False, exc))
+        except Exception as exc:
+            responses.put((request_id, False, f"{type(exc).__name__}: {exc}"))
+
+
+class AffinityDispatcher:
+    def __init__(self, n_workers: int = AFFINITY_WORKERS,
+                 replicas: int = AFFINITY_RING_REPLICAS, start_method: str = 'spawn'):
+        self.replicas = replicas
+        self.ring = HashRing(replicas=replicas)
+        self.stats = {
+            'requests': 0,
+            'errors': 0,
+            'rebalances': 0,
+            'accounts_moved': 0,
+            'worker_restarts': 0,
+            'per_worker': {}
+        }
+        self._context = multiprocessing.get_context(start_method)
+        self._responses = self._context.Queue()
+        self._workers: Dict[int, tuple] = {}  # node -> (process, request queue)
+        self._stopping = set()
+        # Orders the health check's restarts against stopping a worker, so a
+        # worker being stopped is never replaced behind the stopper's back
+        self._lifecycle_lock = threading.Lock()
+        self._pending: Dict[int, Tuple[Future, int]] = {}  # request id -> (future, node)
+        self._ids = itertools.count()
+        self._next_node = 0
+        # Held while routing, and for the whole of a rebalance
+        self._route_lock = threading.Lock()
+        self._pending_lock = threading.Lock()
+        self._closed = threading.Event()
+        self._collector = threading.Thread(target=self._collect, name='affinity-collector', daemon=True)
+        self._collector.start()
+
+        for _ in range(n_workers):
+            self.ring.add_node(self._start_worker())
+
+    def submit(self, transaction: Transaction, degraded: bool = False) -> Future:
+        with self._route_lock:
+            node = self.ring.node_for(transaction.sender_id)
+            self.stats['requests'] += 1
+            self.stats['per_worker'][node] = self.stats['per_worker'].get(node, 0) + 1
+            return self._send(node, 'analyze', (transaction.model_dump(), degraded))
+
+    def analyze(self, transaction: Transaction, timeout: Optional[float] = None,
+                degraded: bool = False) -> FraudScore:
+        return FraudScore(**self.submit(transaction, degraded).result(timeout=timeout))
+
+    async def analyze_async(self, transaction: Transaction, degraded: bool = False,
+                            timeout: Optional[float] = AFFINITY_REQUEST_TIMEOUT_MS / 1000) -> FraudScore:
+        # Raises asyncio.TimeoutError past the timeout; a late reply is discarded
+        future = asyncio.wrap_future(self.submit(transaction, degraded))
+        return FraudScore(**await asyncio.wait_for(future, timeout))
+
+    def get_user_history(self, user_id: str, timeout: Optional[float] = None) -> Dict:
+        with self._route_lock:
+            future = self._send(self.ring.node_for(user_id), 'history', user_id)
+        return future.result(timeout=timeout)
+
+    def resize(self, n_workers: int):
+        """Change the worker count, migrating only the accounts that move."""
+        if n_workers < 1:
+            raise ValueError("n_workers must be at least 1")
+
+        with self._route_lock:
+            nodes = sorted(self._workers)
+            added = [self._start_worker() for _ in range(n_workers - len(nodes))]
+            removed = nodes[n_workers:] if n_workers < len(nodes) else []
+            new_nodes = sorted(set(nodes) - set(removed)) + added
+
+            try:
+                # Queued behind every request already routed to each old worker
+                moves = {}
+                for state_by_node in self._call_all({node: ('export', new_nodes) for node in nodes}).values():
+                    for node, state in state_by_node.items():
+                        moves.setdefault(node, {}).update(state)
+                self._call_all({node: ('import', state) for node, state in moves.items()})
+            except Exception as exc:
+                # The old workers still hold every account, so the old ring stands
+                for node in added:
+                    self._stop_worker(node)
+                raise RebalanceFailed(f"rebalance to {n_workers} workers failed: {exc}") from exc
+
+            self.stats['accounts_moved'] += sum(len(state) for state in moves.values())
+            for node in removed:
+                self._stop_worker(node)
+            self.ring = HashRing(new_nodes, self.replicas)
+            self.stats['rebalances'] += 1
+
+    def _call_all(self, calls: Dict[int, tuple]) -> Dict[int, object]:
+        """Send ``{node: (op, payload)}`` and wait for every reply. A call
+        whose worker died, before answering or before the rebalance using
+        the answer is over, is sent again to its replacement."""
+        results = {}
+        for _ in range(AFFINITY_REBALANCE_ATTEMPTS):
+            sent = {node: (self._workers[node][0], self._send(node, op, payload))
+                    for node, (op, payload) in calls.items()}
+            retry = {}
+            for node, (process, future) in sent.items():
+                try:
+                    results[node] = future.result()
+                except WorkerDied:
+                    retry[node] = calls[node]
+                    continue
+                # An import is lost if the worker died after applying it
+                if not process.is_alive():
+                    retry[node] = calls[node]
+            if not retry:
+                return results
+            calls = retry
+        raise WorkerDied(f"workers {sorted(calls)} kept dying")
+
+    def get_stats(self) -> Dict:
+        with self._pending_lock:
+            in_flight = len(self._pending)
+        return {
+            **self.stats,
+            'per_worker': dict(self.stats['per_worker']),
+            'workers': len(self._workers),
+            'in_flight': in_flight
+        }
+
+    def get_worker_metrics(self, timeout: Optional[float] = None) -> Dict[int, Dict]:
+        with self._route_lock:
+            futures = {node: self._send(node, 'metrics', None) for node in self._workers}
+        return {node: future.result(timeout=timeout) for node, future in futures.items()}
+
+    def get_latency_snapshot(self, timeout: Optional[float] = None) -> Dict[str, LatencyHistogram]:
+        # Histograms add up, so the per-worker ones merge into exact fleet-wide quantiles
+        with self._route_lock:
+            futures = [self._send(node, 'latency', None) for node in self._workers]
+        return merge_snapshots(future.result(timeout=timeout) for future in futures)
+
+    def get_memory_reports(self, sample_size: Optional[int] = None,
+                           timeout: Optional[float] = None) -> Dict[int, Dict]:
+        with self._route_lock:
+            futures = {node: self._send(node, 'memory', sample_size) for node in self._workers}
+        return {node: future.result(timeout=timeout) for node, future in futures.items()}
+
+    def get_account_memory(self, account_id: str, timeout: Optional[float] = None) -> Dict[str, int]:
+        # Only the owning worker holds state for the account
+        with self._route_lock:
+            future = self._send(self.ring.node_for(account_id), 'account_memory', account_id)
+        return future.result(timeout=timeout)
+
+    def warmup(self, n_transactions: int, timeout: Optional[float] = None) -> Dict[int, Dict]:
+        # Warmup accounts are the worker's own and removed after, so no routing
+        with self._route_lock:
+            futures = {node: self._send(node, 'warmup', n_transactions) for node in self._workers}
+        return {node: future.result(timeout=timeout) for node, future in futures.items()}
+
+    def close(self):
+        with self._route_lock:
+            for node in list(self._workers):
+                self._stop_worker(node)
+            self.ring = HashRing(replicas=self.replicas)
+        # Not a sentinel on the response queue: a worker killed mid-put can
+        # leave that queue's shared write lock held for good
+        self._closed.set()
+        self._collector.join()
+
+    def _start_worker(self) -> int:
+        node = self._next_node
+        self._next_node += 1
+        self._workers[node] = self._spawn(node)
+        return node
+
+    def _spawn(self, node: int) -> tuple:
+        requests = self._context.Queue()
+        process = self._context.Process(
+            target=_worker_main, args=(node, requests, self._responses, self.replicas),
+            name=f'fraud-worker-{node}', daemon=True
+        )
+        process.start()
+        return process, requests
+
+    def _stop_worker(self, node: int):
+        # The health check skips stopping workers, so a dead one is handled here
+        with self._lifecycle_lock:
+            process, _ = self._workers[node]
+            self._stopping.add(node)
+        try:
+            stopped = self._send(node, 'stop', None)
+            deadline = time.monotonic() + AFFINITY_STOP_TIMEOUT_S
+            while process.is_alive() and time.monotonic() < deadline:
+                try:
+                    stopped.result(timeout=AFFINITY_HEALTH_CHECK_S)
+                    break
+                except FutureTimeout:
+                    continue
+                except Exception:
+                    break
+            process.join(max(deadline - time.monotonic(), 0))
+            if process.is_alive():
+                process.terminate()
+                process.join(AFFINITY_STOP_TIMEOUT_S)
+            if process.is_alive():
+                process.kill()
+                process.join()
+            self._retire_worker(node, WorkerDied(f"worker {node} stopped with code {process.exitcode}"))
+        finally:
+            self._stopping.discard(node)
+
+    def _send(self, node: int, op: str, payload) -> Future:
+        future = Future()
+        request_id = next(self._ids)
+        # Under the lock, so a request either reaches a live worker's queue
+        # or is failed along with the rest of a dead worker's requests
+        with self._pending_lock:
+            self._pending[request_id] = (future, node)
+            self._workers[node][1].put((op, request_id, payload))
+        return future
+
+    def _collect(self):
+        next_check = time.monotonic() + AFFINITY_HEALTH_CHECK_S
+        while not self._closed.is_set():
+            try:
+                message = self._responses.get(timeout=AFFINITY_HEALTH_CHECK_S)
+            except queue.Empty:
+                message = ()
+            if time.monotonic() >= next_check:
+                self._check_workers()
+                next_check = time.monotonic() + AFFINITY_HEALTH_CHECK_S
+            if not message:
+                continue
+            request_id, ok, result = message
+            with self._pending_lock:
+                future, _ = self._pending.pop(request_id, (None, None))
+            # Gone, or cancelled by a caller that stopped waiting
+            if future is None or future.done():
+                continue
+            if ok:
+                future.set_result(result)
+            elif isinstance(result, DuplicateInProgress):
+                future.set_exception(result)
+            else:
+                self.stats['errors'] += 1
+                future.set_exception(RuntimeError(result))
+
+    def _check_workers(self):
+        with self._lifecycle_lock:
+            for node, (process, _) in list(self._workers.items()):
+                if node not in self._stopping and not process.is_alive():
+                    self._restart_worker(node, process.exitcode)
+
+    def _restart_worker(self, node: int, exitcode: Optional[int]):
+        self.stats['worker_restarts'] += 1
+        self._retire_worker(node, WorkerDied(f"worker {node} exited with code {exitcode}"), self._spawn(node))
+
+    def _retire_worker(self, node: int, error: Exception, replacement: Optional[tuple] = None):
+        # Swapping the worker and collecting its requests under one lock means
+        # a request sent meanwhile reaches the replacement and is not failed
+        with self._pending_lock:
+            _, requests = self._workers[node]
+            if replacement is None:
+                del self._workers[node]
+            else:
+                self._workers[node] = replacement
+            lost = [request_id for request_id, (_, owner) in self._pending.items() if owner == node]
+            futures = [self._pending.pop(request_id)[0] for request_id in lost]
+        # Nothing reads the old queue any more; its unsent requests (a large
+        # import, say) must not hold up interpreter exit
+        requests.cancel_join_thread()
+        requests.close()
+        self.stats['errors'] += len(futures)
+        for future in futures:
+            if not future.done():
+                future.set_exception(error)
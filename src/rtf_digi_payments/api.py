@@ -1,23 +1,351 @@
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import JSONResponse
+import asyncio
+import gc
+import json
+import math
+import os
+import time
+import tracemalloc
+from typing import List, Optional
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import ValidationError
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import ClientDisconnect
+try:
+    import orjson
+except ImportError:
+    orjson = None
 from .fraud_engine import FraudDetectionEngine
+from .prefork import engine_options
 from .models.transaction import Transaction, FraudScore
-import uvicorn
+from .utils.admission import AdmissionController, Overloaded, DEGRADED
+from .utils.histogram import render_prometheus
+from .utils.idempotency import DuplicateInProgress
+from config.settings import (
+    MICRO_BATCHING_ENABLED, AFFINITY_ROUTING_ENABLED, API_FAST_PATH,
+    ADMISSION_ENABLED, ADMISSION_SOFT_LIMIT, ADMISSION_HARD_LIMIT,
+    ADMISSION_LATENCY_TARGET_MS, ADMISSION_RETRY_AFTER_S,
+    BATCH_MAX_TRANSACTIONS, STREAM_CHUNK_SIZE, STREAM_MAX_PENDING_CHUNKS, STREAM_MAX_LINE_BYTES,
+    MEMORY_SAMPLE_SIZE, MEMORY_TRACEMALLOC_FRAMES, WARMUP_TRANSACTIONS
+)
 
-app = FastAPI(title="Real-Time Fraud Detection API")
-engine = FraudDetectionEngine()
+class FastJSONResponse(JSONResponse):
+    # orjson when available; the stdlib encoder otherwise
+    def render(self, content) -> bytes:
+        if orjson is not None:
+            return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+        return super().render(content)
+
+def score_response(result):
+    # FraudScores come from the engine already typed, so the fast path skips
+    # FastAPI's response_model validation and jsonable_encoder pass
+    if not API_FAST_PATH:
+        return result
+    if isinstance(result, list):
+        return FastJSONResponse([score.model_dump() for score in result])
+    return FastJSONResponse(result.model_dump())
+
+app = FastAPI(title="Real-Time Fraud Detection API", default_response_class=FastJSONResponse)
+# Under the prefork server, built around the model the master preloaded
+engine = FraudDetectionEngine(**engine_options())
+# Batching and affinity routing are imported only when they are switched on
+batcher = None
+if MICRO_BATCHING_ENABLED:
+    from .batching import MicroBatcher
+    batcher = MicroBatcher(engine)
+admission = AdmissionController(
+    ADMISSION_SOFT_LIMIT, ADMISSION_HARD_LIMIT,
+    ADMISSION_LATENCY_TARGET_MS, ADMISSION_RETRY_AFTER_S
+) if ADMISSION_ENABLED else None
+# Started with the app rather than at import: spawned workers re-import this module
+dispatcher = None
+# Set when the startup warmup finishes; /ready answers 503 until then
+warmup_result = None
+_warmup_task = None
+
+@app.on_event("startup")
+async def start_dispatcher():
+    global dispatcher
+    if AFFINITY_ROUTING_ENABLED:
+        from .affinity import AffinityDispatcher
+        dispatcher = AffinityDispatcher()
+
+@app.on_event("startup")
+async def start_warmup():
+    global _warmup_task
+    # In the background, so /health answers while the engine warms up
+    _warmup_task = asyncio.create_task(warm_up())
+
+async def warm_up():
+    global warmup_result
+    try:
+        if dispatcher:
+            result = await run_in_threadpool(dispatcher.warmup, WARMUP_TRANSACTIONS)
+        else:
+            result = await run_in_threadpool(engine.warmup, WARMUP_TRANSACTIONS)
+    except Exception as e:
+        # A failed warmup only means colder first requests; still serve
+        result = {"error": f"{type(e).__name__}: {e}"}
+    warmup_result = result
+
+@app.on_event("startup")
+async def start_tracemalloc():
+    if MEMORY_TRACEMALLOC_FRAMES and not tracemalloc.is_tracing():
+        tracemalloc.start(MEMORY_TRACEMALLOC_FRAMES)
+
+@app.on_event("shutdown")
+async def stop_dispatcher():
+    if dispatcher:
+        dispatcher.close()
 
 @app.post("/api/v1/analyze", response_model=FraudScore)
 async def analyze_transaction(transaction: Transaction):
+    mode = None
+    if admission:
+        try:
+            mode = admission.admit()
+        except Overloaded as e:
+            return overloaded_response(e)
+    started_at = time.perf_counter()
     try:
-        result = engine.analyze_transaction(transaction)
-        return result
+        degraded = mode == DEGRADED
+        if dispatcher:
+            return score_response(await dispatcher.analyze_async(transaction, degraded))
+        if batcher:
+            return score_response(await batcher.analyze_async(transaction, degraded))
+        # In the threadpool, so queued requests count as in flight
+        result = await run_in_threadpool(engine.analyze_transaction, transaction, degraded=degraded)
+        return score_response(result)
+    except DuplicateInProgress as e:
+        return in_progress_response(e)
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="Scoring timed out")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        if admission:
+            admission.release(started_at)
+
+def overloaded_response(error: Overloaded):
+    return FastJSONResponse({"detail": "Service overloaded"}, status_code=503,
+                            headers={"Retry-After": str(math.ceil(error.retry_after_s))})
+
+def in_progress_response(error: DuplicateInProgress):
+    # A retry of a transaction whose original is still being scored
+    return FastJSONResponse({"detail": "Transaction is still being scored",
+                             "transaction_ids": error.transaction_ids},
+                            status_code=409, headers={"Retry-After": "1"})
+
+def chunk_results(transactions: List[Transaction], results: list) -> List[FraudScore]:
+    # Per-transaction outcomes, folded into the engine's batch shape: the
+    # chunk's results, None where the original is still in progress
+    for result in results:
+        if isinstance(result, Exception) and not isinstance(result, DuplicateInProgress):
+            raise result
+    if any(isinstance(result, DuplicateInProgress) for result in results):
+        raise DuplicateInProgress(
+            [txn.transaction_id for txn, result in zip(transactions, results) if isinstance(result, Exception)],
+            [None if isinstance(result, Exception) else result for result in results])
+    return results
+
+def score_degraded(transactions: List[Transaction]) -> list:
+    results = []
+    for txn in transactions:
+        try:
+            results.append(engine.analyze_transaction(txn, degraded=True))
+        except DuplicateInProgress as e:
+            results.append(e)
+    return results
+
+async def score_chunk(transactions: List[Transaction], degraded: bool = False) -> List[FraudScore]:
+    if dispatcher:
+        results = await asyncio.gather(*(dispatcher.analyze_async(txn, degraded) for txn in transactions),
+                                       return_exceptions=True)
+        return chunk_results(transactions, results)
+    if degraded:
+        # Shedding load: the cheap path has no batched form
+        return chunk_results(transactions, await run_in_threadpool(score_degraded, transactions))
+    # Vectorised path, off the event loop
+    return await run_in_threadpool(engine.analyze_batch, transactions)
+
+async def score_admitted(transactions: List[Transaction]) -> List[FraudScore]:
+    # One admission slot per chunk while it is scored, so a long batch or
+    # stream neither holds a slot throughout nor skews the latency average.
+    # Raises Overloaded past the hard limit
+    mode = admission.admit() if admission else None
+    started_at = time.perf_counter()
+    try:
+        return await score_chunk(transactions, degraded=mode == DEGRADED)
+    finally:
+        if admission:
+            admission.release(started_at)
+
+@app.post("/api/v1/analyze/batch", response_model=List[FraudScore])
+async def analyze_batch(transactions: List[Transaction]):
+    if len(transactions) > BATCH_MAX_TRANSACTIONS:
+        raise HTTPException(status_code=413, detail=f"At most {BATCH_MAX_TRANSACTIONS} transactions per batch")
+    try:
+        results = []
+        for start in range(0, len(transactions), STREAM_CHUNK_SIZE):
+            results.extend(await score_admitted(transactions[start:start + STREAM_CHUNK_SIZE]))
+        return score_response(results)
+    except Overloaded as e:
+        # Chunks already scored are stored, so a retry returns them as they were
+        return overloaded_response(e)
+    except DuplicateInProgress as e:
+        # Everything else was scored and stored, so a retry returns it as is
+        return in_progress_response(e)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+class NDJSONStreamingResponse(StreamingResponse):
+    media_type = "application/x-ndjson"
+    
+    async def __call__(self, scope, receive, send):
+        # The endpoint keeps reading the request body while it responds, so skip
+        # StreamingResponse's disconnect listener: it would consume that body
+        try:
+            await self.stream_response(send)
+        except OSError:
+            raise ClientDisconnect()
+
+async def read_ndjson_chunks(request: Request, chunks: asyncio.Queue):
+    # Parses the body as it arrives; put() blocks once STREAM_MAX_PENDING_CHUNKS
+    # are waiting, which stops reading and lets TCP push back on the client.
+    # The unparsed remainder is capped at STREAM_MAX_LINE_BYTES: a longer line
+    # is reported and dropped as it arrives, up to its newline
+    chunk, errors, buffer, line_number = [], [], b"", 0
+    skipping = False
+    
+    def too_long(number: int):
+        errors.append({"line": number, "error": f"line longer than {STREAM_MAX_LINE_BYTES} bytes"})
+    
+    def parse(line: bytes):
+        if skipping:
+            return
+        if len(line) > STREAM_MAX_LINE_BYTES:
+            too_long(line_number)
+            return
+        if not line.strip():
+            return
+        try:
+            chunk.append(Transaction.model_validate_json(line))
+        except ValidationError as e:
+            errors.append({"line": line_number, "error": e.errors(include_url=False, include_context=False)})
+    
+    try:
+        async for data in request.stream():
+            buffer += data
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                line_number += 1
+                parse(line)
+                # The newline that ends an overlong line
+                skipping = False
+                if len(chunk) + len(errors) >= STREAM_CHUNK_SIZE:
+                    await chunks.put((chunk, errors))
+                    chunk, errors = [], []
+            if len(buffer) > STREAM_MAX_LINE_BYTES:
+                if not skipping:
+                    too_long(line_number + 1)
+                    skipping = True
+                buffer = b""
+        line_number += 1
+        parse(buffer)
+        if chunk or errors:
+            await chunks.put((chunk, errors))
+    finally:
+        await chunks.put(None)
+
+@app.post("/api/v1/analyze/stream")
+async def analyze_stream(request: Request):
+    chunks = asyncio.Queue(maxsize=STREAM_MAX_PENDING_CHUNKS)
+    
+    async def score_lines():
+        reader = asyncio.create_task(read_ndjson_chunks(request, chunks))
+        try:
+            while True:
+                item = await chunks.get()
+                if item is None:
+                    break
+                transactions, errors = item
+                for error in errors:
+                    yield json.dumps(error, default=str) + "\n"
+                if transactions:
+                    error = "still being scored"
+                    try:
+                        results = await score_admitted(transactions)
+                    except DuplicateInProgress as e:
+                        results = e.results
+                    except Overloaded as e:
+                        # Shed this chunk; the stream carries on
+                        results = [None] * len(transactions)
+                        error = f"overloaded, retry after {math.ceil(e.retry_after_s)}s"
+                    for transaction, result in zip(transactions, results):
+                        if result is None:
+                            yield json.dumps({"transaction_id": transaction.transaction_id,
+                                              "error": error}) + "\n"
+                        else:
+                            yield result.model_dump_json() + "\n"
+            await reader
+        finally:
+            reader.cancel()
+    
+    return NDJSONStreamingResponse(score_lines())
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy", "service": "fraud-detection"}
+    redis_state = engine.cache_manager.breaker.state
+    return {
+        "status": "healthy" if redis_state == "closed" else "degraded",
+        "service": "fraud-detection",
+        "redis": redis_state
+    }
+
+@app.get("/ready")
+async def readiness():
+    if warmup_result is None:
+        return FastJSONResponse({"status": "warming_up"}, status_code=503)
+    return {
+        "status": "ready",
+        "pid": os.getpid(),
+        "warmup": warmup_result,
+        "gc_frozen_objects": gc.get_freeze_count()
+    }
+
+@app.get("/api/v1/stats")
+async def engine_stats():
+    metrics = engine.get_metrics()
+    if batcher:
+        metrics['micro_batching'] = batcher.get_stats()
+    if dispatcher:
+        metrics['affinity'] = dispatcher.get_stats()
+    if admission:
+        metrics['admission'] = admission.get_stats()
+    return metrics
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    if dispatcher:
+        snapshot = await run_in_threadpool(dispatcher.get_latency_snapshot)
+    else:
+        snapshot = engine.latency.snapshot()
+    return PlainTextResponse(render_prometheus(snapshot), media_type="text/plain; version=0.0.4")
+
+@app.get("/admin/memory")
+async def memory_footprint(account: Optional[str] = None, sample: int = MEMORY_SAMPLE_SIZE):
+    # Walks the per-account stores, so keep it off the event loop
+    if account:
+        usage = await run_in_threadpool(dispatcher.get_account_memory if dispatcher else engine.account_memory,
+                                        account)
+        return {"account": account, "bytes": usage}
+    if dispatcher:
+        return {"workers": await run_in_threadpool(dispatcher.get_memory_reports, max(sample, 1))}
+    return await run_in_threadpool(engine.memory_report, max(sample, 1))
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8000, workers=4)
+    # A single process; python -m rtf_digi_payments.prefork forks several
+    # around one preloaded model (affinity routing brings its own workers)
+    import uvicorn
+
+    uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -1,27 +1,55 @@
 import numpy as np
-from typing import Dict
+from typing import Dict, List, Optional, Tuple
 from collections import defaultdict
 
+from .utils.locks import StripedLock
+
+BIOMETRIC_FEATURES = ['typing_speed', 'swipe_velocity', 'pressure_pattern', 'device_angle']
+
 class BiometricAnalyzer:
-    def __init__(self):
+    def __init__(self, lock_stripes: int = 64):
+        self.locks = StripedLock(lock_stripes)
         self.user_profiles = defaultdict(lambda: {
             'typing_speed': [],
             'swipe_velocity': [],
             'pressure_pattern': [],
             'device_angle': []
         })
+        # Set by the engine when checkpointing: users whose profile changed
+        self.dirty = None
     
     def update_profile(self, user_id: str, biometric_data: Dict):
-        profile = self.user_profiles[user_id]
-        
-        for key in ['typing_speed', 'swipe_velocity', 'pressure_pattern', 'device_angle']:
-            if key in biometric_data and biometric_data[key] is not None:
-                profile[key].append(biometric_data[key])
-                # Keep only last 100 samples
-                if len(profile[key]) > 100:
-                    profile[key] = profile[key][-100:]
+        with self.locks.hold(user_id):
+            profile = self.user_profiles[user_id]
+            
+            for key in ['typing_speed', 'swipe_velocity', 'pressure_pattern', 'device_angle']:
+                if key in biometric_data and biometric_data[key] is not None:
+                    profile[key].append(biometric_data[key])
+                    # Keep only last 100 samples
+                    if len(profile[key]) > 100:
+                        profile[key] = profile[key][-100:]
+            if self.dirty is not None:
+                self.dirty.mark(user_id)
+    
+    def export_profile(self, user_id: str) -> Optional[Dict]:
+        with self.locks.hold(user_id):
+            if self.dirty is not None:
+                self.dirty.mark(user_id)
+            return self.user_profiles.pop(user_id, None)
+    
+    def import_profile(self, user_id: str, profile: Dict):
+        with self.locks.hold(user_id):
+            current = self.user_profiles[user_id]
+            for key in BIOMETRIC_FEATURES:
+                current[key] = (profile.get(key, []) + current[key])[-100:]
+            if self.dirty is not None:
+                self.dirty.mark(user_id)
     
     def calculate_anomaly_score(self, user_id: str, current_biometric: Dict) -> float:
+        with self.locks.hold(user_id):
+            return self._calculate_anomaly_score(user_id, current_biometric)
+    
+    def _calculate_anomaly_score(self, user_id: str, current_biometric: Dict) -> float:
         if user_id not in self.user_profiles:
             return 0.5  # Unknown user, moderate risk
         
@@ -42,6 +70,41 @@ class BiometricAnalyzer:
         
         return np.mean(anomaly_scores)
     
+    def calculate_anomaly_scores(self, requests: List[Tuple[str, Optional[Dict]]]) -> np.ndarray:
+        # Batched calculate_anomaly_score; rows without biometrics score 0.5
+        n = len(requests)
+        current = np.full((n, len(BIOMETRIC_FEATURES)), np.nan)
+        means = np.zeros_like(current)
+        stds = np.zeros_like(current)
+        
+        for row, (user_id, biometric) in enumerate(requests):
+            if not biometric or user_id not in self.user_profiles:
+                continue
+            with self.locks.hold(user_id):
+                profile = self.user_profiles[user_id]
+                for col, key in enumerate(BIOMETRIC_FEATURES):
+                    value = biometric.get(key)
+                    if value is not None and len(profile[key]) >= 5:
+                        history = np.asarray(profile[key], dtype=float)
+                        current[row, col] = value
+                        means[row, col] = history.mean()
+                        stds[row, col] = history.std()
+        
+        valid = ~np.isnan(current)
+        deviation = np.abs(current - means)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            z_score = np.where(stds > 0, deviation / np.where(stds > 0, stds, 1), 0.0)
+        
+        scores = np.select(
+            [stds == 0, z_score > 3, z_score > 2, z_score > 1],
+            [np.where(deviation < 0.01, 0.0, 1.0), 0.95, 0.75, 0.4],
+            default=0.1
+        )
+        
+        counts = valid.sum(axis=1)
+        totals = np.where(valid, scores, 0.0).sum(axis=1)
+        return np.where(counts > 0, totals / np.maximum(counts, 1), 0.5)
+    
     def _calculate_deviation(self, current_value: float, historical_values: list) -> float:
         if not historical_values:
             return 0.5
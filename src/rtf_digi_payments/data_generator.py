@@ -1,8 +1,9 @@
 import numpy as np
-import pandas as pd
 from datetime import datetime
 
 def generate_training_data(n_samples=10000, fraud_ratio=0.02):
+    import pandas as pd
+
     np.random.seed(42)
     n_fraud = int(n_samples * fraud_ratio)
     n_normal = n_samples - n_fraud
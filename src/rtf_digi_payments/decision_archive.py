@@ -0,0 +1,429 @@
+"""Append-only columnar archive of scoring decisions.
+
+Every decision (transaction, FraudScore, model version and ML features) is
+handed to a background writer, so the scoring thread only enqueues a tuple.
+The writer appends Arrow record batches to an IPC file segment and seals
+the segment once it reaches ``segment_max_rows`` or ``segment_max_bytes``,
+or on ``flush()``. Sealing writes the file footer and renames the file to
+``segment-<seq>-<min_ts>-<max_ts>.arrow``, where the timestamps are
+transaction times in epoch microseconds. Readers only ever see complete,
+immutable files.
+
+This is an audit record, so decisions are never silently dropped. When the
+queue is full the producer blocks, and the wait is counted (the same policy
+as StateWriter). When a write fails, the open segment may end in a partial
+record batch, so it is never published: it is closed and left as
+``.arrow.tmp`` for inspection. The batches it already held (kept in memory
+until their segment is sealed, so at most ``segment_max_bytes``) are
+written again with the failed batch to a fresh segment, up to
+``write_attempts`` times. Whatever still cannot be written, or cannot be
+converted to Arrow at all, is appended as JSON lines to
+``dead-letter.jsonl`` in the archive directory and counted. A segment that
+cannot even be sealed is also left as ``.arrow.tmp``.
+
+``DecisionArchiveReader`` memory-maps sealed segments and prunes them by the
+time range in their names. Queries touch only the pages of the columns they
+read.
+"""
+import json
+import os
+import queue
+import re
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+except ImportError:
+    pa = pc = None
+
+from .models.transaction import TransactionRecord, FraudScore
+from config.settings import (
+    DECISION_ARCHIVE_QUEUE_SIZE, DECISION_ARCHIVE_BATCH_SIZE, DECISION_ARCHIVE_FLUSH_INTERVAL_MS,
+    DECISION_ARCHIVE_SEGMENT_ROWS, DECISION_ARCHIVE_SEGMENT_BYTES, DECISION_ARCHIVE_WRITE_ATTEMPTS
+)
+
+_STOP = object()
+_FLUSH = object()
+DEAD_LETTER = 'dead-letter.jsonl'
+_SEGMENT_NAME = re.compile(r'^segment-(\d+)-(\d+)-(\d+)\.arrow$')
+_BIOMETRIC_FIELDS = ('typing_speed', 'swipe_velocity', 'pressure_pattern', 'device_angle')
+N_FEATURES = 9
+
+
+def decision_schema():
+    return pa.schema([
+        ('transaction_id', pa.string()),
+        ('sender_id', pa.string()),
+        ('receiver_id', pa.string()),
+        ('amount', pa.float64()),
+        ('timestamp', pa.timestamp('us')),
+        ('device_id', pa.string()),
+        ('ip_address', pa.string()),
+        *[(f'biometric_{name}', pa.float64()) for name in _BIOMETRIC_FIELDS],
+        ('fraud_probability', pa.float64()),
+        ('ml_score', pa.float64()),
+        ('graph_score', pa.float64()),
+        ('biometric_score', pa.float64()),
+        ('is_fraudulent', pa.bool_()),
+        ('latency_ms', pa.float64()),
+        ('reason', pa.string()),
+        ('degraded_stages', pa.list_(pa.string())),
+        ('skipped_stages', pa.list_(pa.string())),
+        ('degraded', pa.bool_()),
+        ('model_version', pa.int64()),
+        ('features', pa.list_(pa.float64(), N_FEATURES)),
+        ('decided_at', pa.timestamp('us'))
+    ])
+
+
+def _epoch_us(value: datetime) -> int:
+    # Naive timestamps are stored as-is (Arrow treats them as wall time)
+    return int(pa.scalar(value, pa.timestamp('us')).value)
+
+
+class DecisionArchive:
+    def __init__(self, directory: str,
+                 max_queue_size: int = DECISION_ARCHIVE_QUEUE_SIZE,
+                 batch_size: int = DECISION_ARCHIVE_BATCH_SIZE,
+                 flush_interval_ms: float = DECISION_ARCHIVE_FLUSH_INTERVAL_MS,
+                 segment_max_rows: int = DECISION_ARCHIVE_SEGMENT_ROWS,
+                 segment_max_bytes: int = DECISION_ARCHIVE_SEGMENT_BYTES,
+                 write_attempts: int = DECISION_ARCHIVE_WRITE_ATTEMPTS):
+        if pa is None:
+            raise RuntimeError("the decision archive requires pyarrow")
+        self.directory = directory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000
+        self.segment_max_rows = segment_max_rows
+        self.segment_max_bytes = segment_max_bytes
+        self.write_attempts = max(write_attempts, 1)
+        self.schema = decision_schema()
+        self.queue = queue.Queue(maxsize=max_queue_size)
+        self.stats = {
+            'appended': 0,
+            'written': 0,
+            'batches': 0,
+            'segments_sealed': 0,
+            'bytes_written': 0,
+            'write_errors': 0,
+            'write_retries': 0,
+            'segments_abandoned': 0,
+            'dead_lettered': 0,
+            'backpressure_waits': 0,
+            'backpressure_wait_ms': 0.0
+        }
+        self._stats_lock = threading.Lock()
+
+        os.makedirs(directory, exist_ok=True)
+        existing = [int(m.group(1)) for m in map(_SEGMENT_NAME.match, os.listdir(directory)) if m]
+        self._next_seq = max(existing, default=-1) + 1
+        self._sink = None
+        self._writer = None
+        self._segment_rows = 0
+        self._segment_ts = None
+        self._segment_batches = []
+        self._thread = threading.Thread(target=self._run, name='decision-archive', daemon=True)
+        self._thread.start()
+
+    def append(self, transaction: TransactionRecord, score: FraudScore,
+               features=None, model_version: int = 0):
+        item = (transaction, score, features, model_version, datetime.now())
+        try:
+            self.queue.put_nowait(item)
+        except queue.Full:
+            # Audit records are never dropped: wait for the writer instead
+            start = time.perf_counter()
+            self.queue.put(item)
+            with self._stats_lock:
+                self.stats['backpressure_waits'] += 1
+                self.stats['backpressure_wait_ms'] += (time.perf_counter() - start) * 1000
+        with self._stats_lock:
+            self.stats['appended'] += 1
+
+    def flush(self):
+        """Write everything appended so far and seal the open segment."""
+        self.queue.put(_FLUSH)
+        self.queue.join()
+
+    def close(self):
+        if self._thread.is_alive():
+            self.queue.put(_STOP)
+            self._thread.join()
+
+    def get_stats(self) -> Dict:
+        with self._stats_lock:
+            return {**self.stats, 'queue_depth': self.queue.qsize()}
+
+    def reader(self) -> 'DecisionArchiveReader':
+        return DecisionArchiveReader(self.directory)
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            batch, control = [], None
+            if item is _STOP or item is _FLUSH:
+                control = item
+            else:
+                batch.append(item)
+                deadline = time.monotonic() + self.flush_interval
+                while len(batch) < self.batch_size:
+                    remaining = deadline - time.monotonic()
+                    try:
+                        item = self.queue.get(timeout=remaining) if remaining > 0 else self.queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is _STOP or item is _FLUSH:
+                        control = item
+                        break
+                    batch.append(item)
+
+            if batch:
+                self._write_batch(batch)
+            if control is not None:
+                self._seal()
+            for _ in range(len(batch) + (control is not None)):
+                self.queue.task_done()
+            if control is _STOP:
+                return
+
+    def _write_batch(self, batch: List[Tuple]):
+        try:
+            record_batch = self._to_record_batch(batch)
+        except Exception:
+            with self._stats_lock:
+                self.stats['write_errors'] += 1
+            self._dead_letter(batch)
+            return
+
+        # Batches to write, oldest first: after a failure, those the abandoned
+        # segment held come ahead of the one that failed
+        pending = [record_batch]
+        for attempt in range(self.write_attempts):
+            if attempt:
+                time.sleep(min(0.05 * 2 ** attempt, 1.0))
+                with self._stats_lock:
+                    self.stats['write_retries'] += 1
+            try:
+                while pending:
+                    written = self._append(pending[0])
+                    pending.pop(0)
+                break
+            except Exception:
+                with self._stats_lock:
+                    self.stats['write_errors'] += 1
+                pending = self._abandon() + pending
+        else:
+            # The batch being written is always the last one pending
+            self._dead_letter_rows(pending[:-1])
+            self._dead_letter(batch)
+            return
+
+        with self._stats_lock:
+            self.stats['written'] += len(batch)
+            self.stats['batches'] += 1
+        if self._segment_rows >= self.segment_max_rows or written >= self.segment_max_bytes:
+            self._seal()
+
+    def _append(self, record_batch) -> int:
+        if self._writer is None:
+            self._open_segment()
+        self._writer.write_batch(record_batch)
+        timestamps = pc.min_max(record_batch.column('timestamp'))
+        low, high = timestamps['min'].value, timestamps['max'].value
+        self._segment_ts = (low, high) if self._segment_ts is None else (
+            min(self._segment_ts[0], low), max(self._segment_ts[1], high))
+        self._segment_rows += record_batch.num_rows
+        self._segment_batches.append(record_batch)
+        return self._sink.tell()
+
+    def _dead_letter(self, batch: List[Tuple]):
+        # Last resort for decisions the archive cannot write
+        with open(os.path.join(self.directory, DEAD_LETTER), 'a') as f:
+            for transaction, score, features, model_version, decided_at in batch:
+                f.write(json.dumps({
+                    'transaction': {name: getattr(transaction, name) for name in transaction.__slots__},
+                    'score': score.model_dump(),
+                    'features': None if features is None else [float(v) for v in features],
+                    'model_version': model_version,
+                    'decided_at': decided_at
+                }, default=str) + "\n")
+        with self._stats_lock:
+            self.stats['dead_lettered'] += len(batch)
+
+    def _dead_letter_rows(self, record_batches: List):
+        # Rows of an abandoned segment that could not be written again; they
+        # were counted as written, so they move over to dead_lettered
+        rows = 0
+        with open(os.path.join(self.directory, DEAD_LETTER), 'a') as f:
+            for record_batch in record_batches:
+                for row in record_batch.to_pylist():
+                    f.write(json.dumps({'decision': row}, default=str) + "\n")
+                rows += record_batch.num_rows
+        with self._stats_lock:
+            self.stats['written'] -= rows
+            self.stats['dead_lettered'] += rows
+
+    def _to_record_batch(self, batch: List[Tuple]):
+        columns = {name: [] for name in self.schema.names}
+        for transaction, score, features, model_version, decided_at in batch:
+            columns['transaction_id'].append(transaction.transaction_id)
+            columns['sender_id'].append(transaction.sender_id)
+            columns['receiver_id'].append(transaction.receiver_id)
+            columns['amount'].append(transaction.amount)
+            columns['timestamp'].append(transaction.timestamp)
+            columns['device_id'].append(transaction.device_id)
+            columns['ip_address'].append(transaction.ip_address)
+            biometric = transaction.biometric or {}
+            for name in _BIOMETRIC_FIELDS:
+                columns[f'biometric_{name}'].append(biometric.get(name))
+            columns['fraud_probability'].append(score.fraud_probability)
+            columns['ml_score'].append(score.ml_score)
+            columns['graph_score'].append(score.graph_score)
+            columns['biometric_score'].append(score.biometric_score)
+            columns['is_fraudulent'].append(score.is_fraudulent)
+            columns['latency_ms'].append(score.latency_ms)
+            columns['reason'].append(score.reason)
+            columns['degraded_stages'].append(score.degraded_stages)
+            columns['skipped_stages'].append(score.skipped_stages)
+            columns['degraded'].append(score.degraded)
+            columns['model_version'].append(model_version)
+            columns['features'].append(None if features is None else [float(v) for v in features])
+            columns['decided_at'].append(decided_at)
+        return pa.RecordBatch.from_pydict(columns, schema=self.schema)
+
+    def _open_segment(self):
+        self._tmp_path = os.path.join(self.directory, f'segment-{self._next_seq:06d}.arrow.tmp')
+        self._sink = pa.OSFile(self._tmp_path, 'wb')
+        self._writer = pa.ipc.new_file(self._sink, self.schema)
+        self._segment_rows = 0
+        self._segment_ts = None
+        self._segment_batches = []
+
+    def _abandon(self) -> List:
+        """Close the open segment without publishing it, after a failed write.
+        Returns the batches it held, to be written again."""
+        batches, self._segment_batches = self._segment_batches, []
+        if self._writer is None:
+            return batches
+        for close in (self._writer.close, self._sink.close):
+            try:
+                close()
+            except Exception:
+                pass
+        self._writer = self._sink = None
+        if not batches:
+            # Opened for the write that failed: nothing to inspect
+            try:
+                os.remove(self._tmp_path)
+            except OSError:
+                pass
+        # Its .tmp file is kept and its sequence number not reused
+        self._next_seq += 1
+        with self._stats_lock:
+            self.stats['segments_abandoned'] += 1
+        return batches
+
+    def _seal(self):
+        if self._writer is None:
+            return
+        try:
+            self._writer.close()
+            size = self._sink.tell()
+            self._sink.close()
+            if not self._segment_rows:
+                # Opened for a write that failed: nothing to keep
+                os.remove(self._tmp_path)
+                return
+            low, high = self._segment_ts
+            os.replace(self._tmp_path, os.path.join(
+                self.directory, f'segment-{self._next_seq:06d}-{low}-{high}.arrow'))
+        except Exception:
+            with self._stats_lock:
+                self.stats['write_errors'] += 1
+            return
+        finally:
+            self._writer = self._sink = None
+            self._segment_batches = []
+            # Also past an unsealable segment, so its .tmp file is never reused
+            self._next_seq += 1
+        with self._stats_lock:
+            self.stats['segments_sealed'] += 1
+            self.stats['bytes_written'] += size
+
+
+class DecisionArchiveReader:
+    def __init__(self, directory: str):
+        if pa is None:
+            raise RuntimeError("the decision archive requires pyarrow")
+        self.directory = directory
+
+    def segments(self, start: Optional[datetime] = None, end: Optional[datetime] = None) -> List[str]:
+        """Sealed segments whose transaction-time range overlaps [start, end)."""
+        low = _epoch_us(start) if start is not None else None
+        high = _epoch_us(end) if end is not None else None
+        paths = []
+        for name in sorted(os.listdir(self.directory)):
+            match = _SEGMENT_NAME.match(name)
+            if not match:
+                continue
+            seg_low, seg_high = int(match.group(2)), int(match.group(3))
+            if (low is not None and seg_high < low) or (high is not None and seg_low >= high):
+                continue
+            paths.append(os.path.join(self.directory, name))
+        return paths
+
+    def query(self, start: Optional[datetime] = None, end: Optional[datetime] = None,
+              account: Optional[str] = None, flagged: Optional[bool] = None,
+              columns: Optional[Iterable[str]] = None):
+        """Decisions with start <= timestamp < end, optionally for one account
+        (as sender or receiver) and/or only flagged ones, as a pyarrow Table."""
+        columns = list(columns) if columns is not None else None
+        tables = []
+        for path in self.segments(start, end):
+            # Zero-copy view of the file; only the columns touched get paged in
+            table = pa.ipc.open_file(pa.memory_map(path, 'r')).read_all()
+            mask = None
+            if start is not None:
+                mask = self._and(mask, pc.greater_equal(table['timestamp'], pa.scalar(start, pa.timestamp('us'))))
+            if end is not None:
+                mask = self._and(mask, pc.less(table['timestamp'], pa.scalar(end, pa.timestamp('us'))))
+            if account is not None:
+                mask = self._and(mask, pc.or_(pc.equal(table['sender_id'], account),
+                                              pc.equal(table['receiver_id'], account)))
+            if flagged is not None:
+                mask = self._and(mask, table['is_fraudulent'] if flagged else pc.invert(table['is_fraudulent']))
+            if mask is not None:
+                table = table.filter(mask)
+            tables.append(table.select(columns) if columns else table)
+
+        if not tables:
+            schema = decision_schema()
+            if columns:
+                schema = pa.schema([schema.field(name) for name in columns])
+            return schema.empty_table()
+        return pa.concat_tables(tables)
+
+    def score_distribution_by_hour(self, start: Optional[datetime] = None,
+                                   end: Optional[datetime] = None):
+        """Per transaction-hour: decisions, flagged, mean and p50/p95 fraud_probability."""
+        table = self.query(start, end, columns=['timestamp', 'fraud_probability', 'is_fraudulent'])
+        table = table.append_column('hour', pc.floor_temporal(table['timestamp'], unit='hour'))
+        result = table.group_by('hour').aggregate([
+            ('fraud_probability', 'count'),
+            ('is_fraudulent', 'sum'),
+            ('fraud_probability', 'mean'),
+            ('fraud_probability', 'tdigest', pc.TDigestOptions(q=[0.5, 0.95]))
+        ])
+        # Output column order varies across pyarrow versions; select by name
+        result = result.select(['hour', 'fraud_probability_count', 'is_fraudulent_sum',
+                                'fraud_probability_mean', 'fraud_probability_tdigest'])
+        return result.rename_columns(['hour', 'decisions', 'flagged', 'mean_probability',
+                                      'probability_p50_p95']).sort_by('hour')
+
+    @staticmethod
+    def _and(mask, condition):
+        return condition if mask is None else pc.and_(mask, condition)
@@ -1,47 +1,406 @@
+import copy
+import itertools
+import os
+import threading
 import time
-from typing import Dict
-from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+from concurrent.futures import TimeoutError
 
 from .graph_detector import GraphFraudDetector
 from .ml_scorer import MLFraudScorer
 from .biometric_analyzer import BiometricAnalyzer
+from .scheduler import StageScheduler, get_shared_scheduler
 from .utils.cache_manager import CacheManager
-from .models.transaction import Transaction, FraudScore
+from .utils.clock import EventClock, WallClock
+from .utils.deadline import Deadline, DeadlineExceeded
+from .utils.idempotency import DuplicateInProgress, IdempotencyStore
+from .utils.state_writer import StateWriter
+from .utils.monitor import FraudMonitor
+from .utils.histogram import StageLatencies
+from .utils.memory import (
+    estimate_store, entry_sizeof, graph_node_sizeof, process_rss_bytes, tracemalloc_summary
+)
+from .models.transaction import Transaction, TransactionRecord, FraudScore, BiometricData
 from config.settings import *
 
+STAGE_BUDGETS_MS = {
+    'ml': ML_SCORING_TIMEOUT_MS,
+    'graph': GRAPH_ANALYSIS_TIMEOUT_MS,
+    'biometric': BIOMETRIC_TIMEOUT_MS
+}
+# Score used when a stage is skipped or runs out of budget
+STAGE_DEFAULT_SCORES = {'ml': 0.5, 'graph': 0.0, 'biometric': 0.5}
+# Stages with a latency histogram: detector run time, time queued for a
+# scheduler worker, history/count writes, and end to end
+LATENCY_STAGES = ('ml', 'graph', 'biometric', 'state_io', 'queue_wait', 'total')
 
 class FraudDetectionEngine:
-    def __init__(self):
-        self.graph_detector = GraphFraudDetector(GRAPH_WINDOW_HOURS, MIN_FRAUD_RING_SIZE)
-        self.ml_scorer = MLFraudScorer()
-        self.biometric_analyzer = BiometricAnalyzer()
-        self.cache_manager = CacheManager(REDIS_HOST, REDIS_PORT, REDIS_TTL)
-        self.executor = ThreadPoolExecutor(max_workers=3)
-    
-    def analyze_transaction(self, transaction: Transaction) -> FraudScore:
-        start_time = time.time()
-        
-        # Parallel execution of detection modules
-        ml_future = self.executor.submit(self._ml_analysis, transaction)
-        graph_future = self.executor.submit(self._graph_analysis, transaction)
-        biometric_future = self.executor.submit(self._biometric_analysis, transaction)
-        
-        # Collect results with timeout
-        try:
-            ml_score = ml_future.result(timeout=ML_SCORING_TIMEOUT_MS / 1000)
-        except TimeoutError:
-            ml_score = 0.5
+    def __init__(self, write_behind: bool = WRITE_BEHIND_ENABLED,
+                 scheduler: Optional[StageScheduler] = None,
+                 cascade: bool = CASCADE_ENABLED,
+                 idempotency: bool = IDEMPOTENCY_ENABLED,
+                 process_pool_workers: int = PROCESS_POOL_WORKERS,
+                 decision_log: bool = DECISION_LOG_ENABLED,
+                 decision_archive: bool = DECISION_ARCHIVE_ENABLED,
+                 checkpoint: bool = CHECKPOINT_ENABLED,
+                 checkpoint_dir: str = CHECKPOINT_DIR,
+                 ml_scorer: Optional[MLFraudScorer] = None,
+                 redis_host: Optional[str] = REDIS_HOST,
+                 clock=None):
+        # One clock for every window, TTL and expiry; advanced by each
+        # transaction's timestamp as it is scored
+        if clock is None:
+            clock = WallClock() if CLOCK == 'wall' else EventClock(EVENT_CLOCK_ALLOWED_LATENESS_S,
+                                                                   EVENT_CLOCK_MAX_AHEAD_S)
+        self.clock = clock
+        self.graph_detector = GraphFraudDetector(
+            GRAPH_WINDOW_HOURS, MIN_FRAUD_RING_SIZE,
+            lock_stripes=LOCK_STRIPES,
+            cleanup_interval_seconds=GRAPH_CLEANUP_INTERVAL_S,
+            clock=clock
+        )
+        # A scorer passed in is shared, e.g. one preloaded before forking workers
+        self.ml_scorer = ml_scorer or MLFraudScorer(MODEL_PATH)
+        self.biometric_analyzer = BiometricAnalyzer(lock_stripes=LOCK_STRIPES)
+        # None keeps account history in-process only (offline replay)
+        self.cache_manager = CacheManager(
+            redis_host, REDIS_PORT, REDIS_TTL,
+            socket_timeout_ms=REDIS_SOCKET_TIMEOUT_MS,
+            failure_threshold=REDIS_BREAKER_FAILURE_THRESHOLD,
+            reset_timeout_s=REDIS_BREAKER_RESET_TIMEOUT_S,
+            lock_stripes=LOCK_STRIPES,
+            clock=clock,
+            sweep_interval_s=CACHE_EXPIRY_SWEEP_INTERVAL_S
+        )
+        self.scheduler = scheduler or get_shared_scheduler()
+        self.cascade = cascade
         
+        self.idempotency = None
+        if idempotency:
+            self.idempotency = IdempotencyStore(
+                IDEMPOTENCY_WINDOW_S,
+                IDEMPOTENCY_BUCKETS,
+                IDEMPOTENCY_MAX_ENTRIES,
+                cache_manager=self.cache_manager if IDEMPOTENCY_REDIS_BACKED else None,
+                clock=clock.time
+            )
+        # CPU-bound batch stages in worker processes; None means in-process
+        self.process_pool = None
+        if process_pool_workers:
+            # Imported here so multiprocessing and shared memory are only
+            # loaded when the pool is on
+            from .process_pool import ProcessPoolScorer
+            self.process_pool = ProcessPoolScorer(process_pool_workers)
+        # Decision log written by a background thread; None means no logging
+        self.monitor = FraudMonitor(DECISION_LOG_FILE) if decision_log else None
+        # Columnar record of every decision with its features; None means off
+        self.archive = None
+        if decision_archive:
+            # Imported here so pyarrow is only loaded when archiving is on
+            from .decision_archive import DecisionArchive
+            self.archive = DecisionArchive(DECISION_ARCHIVE_DIR)
+        self.latency = StageLatencies(LATENCY_STAGES)
+        # Attach per-stage timings to 1 in stage_timings_every scores (0: never)
+        self.stage_timings_every = STAGE_TIMINGS_SAMPLE_EVERY
+        self._timing_samples = itertools.count(1)
+        # Guards degraded_count and cascade_stats, which concurrent requests update
+        self._stats_lock = threading.Lock()
+        self.degraded_count = 0
+        self.cascade_stats = {'evaluated': 0, 'escalated': 0, 'ml_skipped': 0, 'graph_skipped': 0}
+        
+        # Background writer for state mutations; None means apply inline
+        self.state_writer = None
+        if write_behind:
+            self.state_writer = StateWriter(
+                {
+                    'history': self.cache_manager.apply_history_updates,
+                    'txn_count': self._apply_txn_counts,
+                    'graph_edge': self._apply_graph_edges,
+                    'biometric': self._apply_biometric_updates
+                },
+                max_queue_size=WRITE_BEHIND_QUEUE_SIZE,
+                batch_size=WRITE_BEHIND_BATCH_SIZE,
+                flush_interval_ms=WRITE_BEHIND_FLUSH_INTERVAL_MS
+            )
+        
+        # Periodic snapshots of per-account state; None means state dies with the process
+        self.checkpointer = None
+        if checkpoint:
+            from .snapshot import Checkpointer, DirtyAccounts, MANIFEST
+            if CHECKPOINT_RESTORE_ON_START and os.path.exists(os.path.join(checkpoint_dir, MANIFEST)):
+                self.restore(checkpoint_dir)
+            dirty = DirtyAccounts()
+            for component in (self.graph_detector, self.biometric_analyzer, self.cache_manager):
+                component.dirty = dirty
+            self.checkpointer = Checkpointer(self, checkpoint_dir, dirty,
+                                             CHECKPOINT_INTERVAL_S, CHECKPOINT_FULL_EVERY)
+    
+    def analyze_transaction(self, transaction: Transaction, deadline: Optional[Deadline] = None,
+                            degraded: bool = False) -> FraudScore:
+        start_time = time.perf_counter()
+        transaction = TransactionRecord.from_transaction(transaction)
+        self.clock.observe(transaction.timestamp)
+        if deadline is None:
+            deadline = Deadline(MAX_LATENCY_MS - DEADLINE_RESERVE_MS)
+        
+        if not self.idempotency:
+            return self._log_decision(self._score_transaction(transaction, deadline, start_time, degraded))
+        
+        # Retries return the original result without touching state
+        stored, owner = self.idempotency.begin(transaction.transaction_id, wait_timeout=deadline.remaining())
+        if stored is not None:
+            return stored
         try:
-            graph_score = graph_future.result(timeout=GRAPH_ANALYSIS_TIMEOUT_MS / 1000)
-        except TimeoutError:
-            graph_score = 0.0
+            result = self._score_transaction(transaction, deadline, start_time, degraded)
+        except Exception:
+            self.idempotency.abort(transaction.transaction_id)
+            raise
+        self.idempotency.complete(transaction.transaction_id, result)
+        return self._log_decision(result)
+    
+    def _score_transaction(self, transaction: TransactionRecord, deadline: Deadline, start_time: float,
+                           degraded: bool = False) -> FraudScore:
+        timings = {}
+        captured = {}
+        if degraded:
+            score = self._analyze_degraded(transaction, start_time, timings, captured)
+        elif self.cascade:
+            score = self._analyze_cascade(transaction, deadline, start_time, timings, captured)
+        else:
+            scores, degraded_stages = self._run_stages(transaction, deadline, {
+                'ml': lambda txn, stage_deadline: self._ml_analysis(txn, stage_deadline, captured),
+                'graph': self._graph_analysis,
+                'biometric': self._biometric_analysis
+            }, timings)
+            
+            # Update historical data (enqueued only, in write-behind mode)
+            timings['state_io'] = self._update_history(transaction)
+            
+            score = self._build_score(transaction, scores['ml'], scores['graph'], scores['biometric'],
+                                      start_time, degraded_stages)
+        
+        if self.stage_timings_every and next(self._timing_samples) % self.stage_timings_every == 0:
+            score.stage_timings = {stage: round(ms, 3) for stage, ms in timings.items()}
+            score.stage_timings['total'] = score.latency_ms
+        if self.archive:
+            self.archive.append(transaction, score, captured.get('features'), self.ml_scorer.model_version)
+        return score
+    
+    def _timed_stage(self, name: str, stage: Callable, timings: Dict[str, float]) -> Callable:
+        submitted_at = time.perf_counter()
+        
+        def run(transaction: TransactionRecord, deadline: Deadline):
+            started = time.perf_counter()
+            try:
+                return stage(transaction, deadline)
+            finally:
+                wait_ms = (started - submitted_at) * 1000
+                run_ms = (time.perf_counter() - started) * 1000
+                self.latency.record('queue_wait', wait_ms)
+                self.latency.record(name, run_ms)
+                timings[name] = run_ms
+                timings['queue_wait'] = max(timings.get('queue_wait', 0.0), wait_ms)
+        return run
+    
+    def _run_stages(self, transaction: TransactionRecord, deadline: Deadline,
+                    stage_fns: Dict[str, Callable],
+                    timings: Optional[Dict[str, float]] = None) -> Tuple[Dict[str, float], List[str]]:
+        # Parallel execution of detection modules, each bounded by the request deadline
+        stages = {
+            name: (stage_fns[name], deadline.limit(STAGE_BUDGETS_MS[name]), STAGE_DEFAULT_SCORES[name])
+            for name in stage_fns
+        }
+        # Queue pooled stages before running inline ones so they overlap
+        timings = {} if timings is None else timings
+        futures = {}
+        for name in sorted(stages, key=self.scheduler.is_inline):
+            stage, stage_deadline, _ = stages[name]
+            futures[name] = self.scheduler.submit(name, self._timed_stage(name, stage, timings),
+                                                  transaction, stage_deadline)
+        
+        # Collect results; a stage that runs out of budget falls back to its default
+        scores = {}
+        degraded_stages = []
+        for name, (_, stage_deadline, default) in stages.items():
+            future = futures[name]
+            try:
+                scores[name] = future.result(timeout=stage_deadline.remaining())
+            except (TimeoutError, DeadlineExceeded):
+                scores[name] = default
+                degraded_stages.append(name)
+                if future.cancel():
+                    self._record_skipped_stage_state(name, transaction)
+        
+        return scores, degraded_stages
+    
+    def _analyze_cascade(self, transaction: TransactionRecord, deadline: Deadline, start_time: float,
+                         timings: Dict[str, float], captured: Dict) -> FraudScore:
+        # Cheap stages first: heuristic on cached history, then biometrics
+        features = self._ml_features(transaction, deadline)
+        captured['features'] = features[0]
+        heuristic_score = self.ml_scorer.heuristic_score(features)
+        scores, degraded_stages = self._run_stages(transaction, deadline, {'biometric': self._biometric_analysis},
+                                                   timings)
+        
+        partial_probability = ML_SCORE_WEIGHT * heuristic_score + BIOMETRIC_WEIGHT * scores['biometric']
+        # Expensive stages only when the partial score is near the threshold
+        escalate = abs(partial_probability - FRAUD_THRESHOLD) <= CASCADE_UNCERTAINTY_BAND
+        with self._stats_lock:
+            self.cascade_stats['evaluated'] += 1
+            for stat in (('escalated',) if escalate else ('ml_skipped', 'graph_skipped')):
+                self.cascade_stats[stat] += 1
+        
+        skipped_stages = []
+        if escalate:
+            more_scores, more_degraded = self._run_stages(transaction, deadline, {
+                'ml': lambda txn, stage_deadline: self.ml_scorer.predict_fraud_probability(features),
+                'graph': self._graph_analysis
+            }, timings)
+            scores.update(more_scores)
+            degraded_stages += more_degraded
+        else:
+            scores['ml'] = heuristic_score
+            scores['graph'] = STAGE_DEFAULT_SCORES['graph']
+            skipped_stages = ['ml', 'graph']
+            # Skipping the ring search must not skip the graph update
+            self._record_graph_edge(transaction)
+        
+        timings['state_io'] = self._update_history(transaction)
+        
+        score = self._build_score(transaction, scores['ml'], scores['graph'], scores['biometric'],
+                                  start_time, degraded_stages)
+        score.skipped_stages = skipped_stages
+        return score
+    
+    def _analyze_degraded(self, transaction: TransactionRecord, start_time: float,
+                          timings: Dict[str, float], captured: Dict) -> FraudScore:
+        # Load-shedding mode: model-free heuristic on cached history only. The
+        # graph, biometric and history updates are still recorded so later
+        # full-mode scores see this transaction.
+        features = self._ml_features(transaction)
+        captured['features'] = features[0]
+        ml_score = self.ml_scorer.heuristic_score(features)
+        self._record_graph_edge(transaction)
+        if transaction.biometric:
+            self._record_biometric(transaction.sender_id, transaction.biometric)
+        timings['state_io'] = self._update_history(transaction)
+        with self._stats_lock:
+            self.degraded_count += 1
+        
+        score = self._build_score(transaction, ml_score, STAGE_DEFAULT_SCORES['graph'],
+                                  STAGE_DEFAULT_SCORES['biometric'], start_time, [])
+        score.skipped_stages = ['graph', 'biometric']
+        score.degraded = True
+        return score
+    
+    def analyze_batch(self, transactions: List[Transaction]) -> List[FraudScore]:
+        transactions = [TransactionRecord.from_transaction(txn) for txn in transactions]
+        if not self.idempotency:
+            return self._score_batch(transactions)
+        
+        results = [None] * len(transactions)
+        first_seen = {}
+        to_score = []
+        repeats = []
+        in_progress = []
+        # One wait budget for the whole batch, however many originals are in flight
+        deadline = Deadline(MAX_LATENCY_MS - DEADLINE_RESERVE_MS)
+        for i, txn in enumerate(transactions):
+            if txn.transaction_id in first_seen:
+                repeats.append(i)
+                self.idempotency.record_duplicate()
+                continue
+            try:
+                stored, owner = self.idempotency.begin(txn.transaction_id, wait_timeout=deadline.remaining())
+            except DuplicateInProgress:
+                in_progress.append(i)
+                continue
+            if stored is not None:
+                results[i] = stored
+                continue
+            first_seen[txn.transaction_id] = i
+            to_score.append(i)
         
         try:
-            biometric_score = biometric_future.result(timeout=0.1)
-        except TimeoutError:
-            biometric_score = 0.5
+            scored = self._score_batch([transactions[i] for i in to_score])
+        except Exception:
+            for i in to_score:
+                self.idempotency.abort(transactions[i].transaction_id)
+            raise
+        
+        for i, result in zip(to_score, scored):
+            self.idempotency.complete(transactions[i].transaction_id, result)
+            results[i] = result
+        for i in repeats:
+            results[i] = results[first_seen[transactions[i].transaction_id]].model_copy()
+        if in_progress:
+            # The rest of the batch is scored and stored; only these are left out
+            raise DuplicateInProgress([transactions[i].transaction_id for i in in_progress], results)
+        
+        return results
+    
+    def _score_batch(self, transactions: List[TransactionRecord]) -> List[FraudScore]:
+        start_time = time.perf_counter()
+        results = [None] * len(transactions)
+        
+        ml_scores = [0.0] * len(transactions)
+        biometric_scores = [0.0] * len(transactions)
+        features = [None] * len(transactions) if self.archive else None
+        
+        # Graph state is shared across accounts, so it advances in arrival order
+        if self.process_pool and not self.state_writer:
+            # Edges go in here; the cycle searches run in the pool meanwhile
+            ring_search, graph_scores = self._graph_analysis_pooled(transactions)
+        else:
+            ring_search, graph_scores = None, []
+            for txn in transactions:
+                # Time moves on row by row, as if they had been scored singly
+                self.clock.observe(txn.timestamp)
+                graph_scores.append(self._graph_analysis(txn))
         
+        # History and biometric profiles are per account: rows in one wave
+        # touch disjoint accounts and can be scored as a single vector
+        for wave in self._account_waves(transactions):
+            wave_txns = [transactions[i] for i in wave]
+            wave_features = [] if self.archive else None
+            wave_ml = self._ml_analysis_batch(wave_txns, wave_features)
+            wave_biometric = self._biometric_analysis_batch(wave_txns)
+            if wave_features is not None:
+                for i, row in zip(wave, wave_features):
+                    features[i] = row
+            
+            for i, txn, ml_score, biometric_score in zip(wave, wave_txns, wave_ml, wave_biometric):
+                self._update_history(txn)
+                ml_scores[i] = float(ml_score)
+                biometric_scores[i] = float(biometric_score)
+        
+        if ring_search is not None:
+            graph_scores = [0.9 if ring else score for ring, score in zip(ring_search.result(), graph_scores)]
+        
+        for i, txn in enumerate(transactions):
+            results[i] = self._log_decision(self._build_score(txn, ml_scores[i], graph_scores[i],
+                                                              biometric_scores[i], start_time, []))
+            if self.archive:
+                self.archive.append(txn, results[i], features[i], self.ml_scorer.model_version)
+        return results
+    
+    @staticmethod
+    def _account_waves(transactions: List[TransactionRecord]) -> List[List[int]]:
+        waves = []
+        last_wave = {}
+        for i, txn in enumerate(transactions):
+            accounts = (txn.sender_id, txn.receiver_id)
+            wave = max((last_wave.get(account, -1) for account in accounts), default=-1) + 1
+            if wave == len(waves):
+                waves.append([])
+            waves[wave].append(i)
+            for account in accounts:
+                last_wave[account] = wave
+        return waves
+    
+    def _build_score(self, transaction: TransactionRecord, ml_score: float, graph_score: float,
+                     biometric_score: float, start_time: float, degraded_stages: List[str]) -> FraudScore:
         # Weighted ensemble scoring
         fraud_probability = (
             ML_SCORE_WEIGHT * ml_score +
@@ -50,11 +409,8 @@ class FraudDetectionEngine:
         )
         
         is_fraudulent = fraud_probability >= FRAUD_THRESHOLD
-        latency_ms = (time.time() - start_time) * 1000
-        
-        # Update historical data
-        self._update_history(transaction)
-        
+        latency_ms = (time.perf_counter() - start_time) * 1000
+        self.latency.record('total', latency_ms)
         reason = self._generate_reason(ml_score, graph_score, biometric_score) if is_fraudulent else None
         
         return FraudScore(
@@ -65,12 +421,24 @@ class FraudDetectionEngine:
             biometric_score=round(biometric_score, 4),
             is_fraudulent=is_fraudulent,
             latency_ms=round(latency_ms, 2),
-            reason=reason
+            reason=reason,
+            degraded_stages=degraded_stages
         )
     
-    def _ml_analysis(self, transaction: Transaction) -> float:
-        sender_history = self.cache_manager.get_user_history(transaction.sender_id)
-        receiver_history = self.cache_manager.get_user_history(transaction.receiver_id)
+    def _ml_analysis(self, transaction: TransactionRecord, deadline: Optional[Deadline] = None,
+                     captured: Optional[Dict] = None) -> float:
+        features = self._ml_features(transaction, deadline)
+        if captured is not None:
+            captured['features'] = features[0]
+        
+        if deadline is not None:
+            deadline.check()
+        
+        return self.ml_scorer.predict_fraud_probability(features)
+    
+    def _ml_features(self, transaction: TransactionRecord, deadline: Optional[Deadline] = None):
+        sender_history = self.cache_manager.get_user_history(transaction.sender_id, deadline)
+        receiver_history = self.cache_manager.get_user_history(transaction.receiver_id, deadline)
         
         historical_data = {
             'sender_txn_count': sender_history['txn_count'],
@@ -85,48 +453,347 @@ class FraudDetectionEngine:
             'timestamp': transaction.timestamp
         }
         
-        features = self.ml_scorer.extract_features(txn_dict, historical_data)
-        return self.ml_scorer.predict_fraud_probability(features)
+        return self.ml_scorer.extract_features(txn_dict, historical_data)
     
-    def _graph_analysis(self, transaction: Transaction) -> float:
-        self.graph_detector.add_transaction(
-            transaction.sender_id,
-            transaction.receiver_id,
-            transaction.amount,
-            transaction.timestamp
+    def _ml_analysis_batch(self, transactions: List[TransactionRecord],
+                           captured: Optional[List] = None) -> List[float]:
+        histories = self.cache_manager.get_user_histories(
+            [txn.sender_id for txn in transactions] + [txn.receiver_id for txn in transactions]
         )
+        sender_histories, receiver_histories = histories[:len(transactions)], histories[len(transactions):]
+        
+        historical_data = [
+            {
+                'sender_txn_count': sender_history['txn_count'],
+                'receiver_txn_count': receiver_history['txn_count'],
+                'amount_velocity': sender_history.get('amount_velocity', 0),
+                'device_changed': sender_history.get('device_changed', False),
+                'ip_changed': sender_history.get('ip_changed', False)
+            }
+            for sender_history, receiver_history in zip(sender_histories, receiver_histories)
+        ]
+        txn_dicts = [{'amount': txn.amount, 'timestamp': txn.timestamp} for txn in transactions]
+        
+        features = self.ml_scorer.extract_features_batch(txn_dicts, historical_data)
+        if captured is not None:
+            captured.extend(features)
+        if self.process_pool:
+            return self.process_pool.predict(self.ml_scorer, features)
+        return self.ml_scorer.predict_fraud_probability_batch(features)
+    
+    def _graph_analysis(self, transaction: TransactionRecord, deadline: Optional[Deadline] = None) -> float:
+        if not self.state_writer:
+            self._record_graph_edge(transaction)
         
         score, fraud_ring = self.graph_detector.detect_fraud_ring(
             transaction.sender_id,
-            transaction.receiver_id
+            transaction.receiver_id,
+            include_edge=self.state_writer is not None,
+            deadline=deadline
         )
         
+        if self.state_writer:
+            self._record_graph_edge(transaction)
+        
         return score
     
-    def _biometric_analysis(self, transaction: Transaction) -> float:
+    def _graph_analysis_pooled(self, transactions: List[TransactionRecord]):
+        # Returns the pending ring search and each step's velocity/mule score
+        index, fallback_scores = self.graph_detector.add_transactions_indexed(
+            [(txn.sender_id, txn.receiver_id, txn.amount, txn.timestamp) for txn in transactions]
+        )
+        return self.process_pool.search_rings(index, self.graph_detector.min_ring_size), fallback_scores
+    
+    def _biometric_analysis(self, transaction: TransactionRecord, deadline: Optional[Deadline] = None) -> float:
         if not transaction.biometric:
             return 0.5
         
-        biometric_dict = transaction.biometric.dict()
+        biometric_dict = transaction.biometric
         anomaly_score = self.biometric_analyzer.calculate_anomaly_score(
             transaction.sender_id,
             biometric_dict
         )
         
-        self.biometric_analyzer.update_profile(transaction.sender_id, biometric_dict)
+        self._record_biometric(transaction.sender_id, biometric_dict)
         
         return anomaly_score
     
-    def _update_history(self, transaction: Transaction):
+    def _biometric_analysis_batch(self, transactions: List[TransactionRecord]) -> List[float]:
+        biometric_dicts = [txn.biometric for txn in transactions]
+        scores = self.biometric_analyzer.calculate_anomaly_scores(
+            [(txn.sender_id, biometric_dict) for txn, biometric_dict in zip(transactions, biometric_dicts)]
+        )
+        
+        for txn, biometric_dict in zip(transactions, biometric_dicts):
+            if biometric_dict is not None:
+                self._record_biometric(txn.sender_id, biometric_dict)
+        
+        return scores
+    
+    def _record_graph_edge(self, transaction: TransactionRecord):
+        edge = (transaction.sender_id, transaction.receiver_id, transaction.amount, transaction.timestamp)
+        if self.state_writer:
+            self.state_writer.submit(transaction.sender_id, 'graph_edge', edge)
+        else:
+            self.graph_detector.add_transaction(*edge)
+    
+    def _record_biometric(self, user_id: str, biometric_dict: Dict):
+        if self.state_writer:
+            self.state_writer.submit(user_id, 'biometric', biometric_dict)
+        else:
+            self.biometric_analyzer.update_profile(user_id, biometric_dict)
+    
+    def _record_skipped_stage_state(self, stage: str, transaction: TransactionRecord):
+        # A stage cancelled before it started still owes its state update
+        if stage == 'graph':
+            self._record_graph_edge(transaction)
+        elif stage == 'biometric' and transaction.biometric:
+            self._record_biometric(transaction.sender_id, transaction.biometric)
+    
+    def _update_history(self, transaction: TransactionRecord) -> float:
+        # Returns the milliseconds spent, which is also recorded as state I/O
+        started = time.perf_counter()
         txn_dict = {
             'device_id': transaction.device_id,
             'ip_address': transaction.ip_address,
             'timestamp': transaction.timestamp
         }
         
-        self.cache_manager.update_user_history(transaction.sender_id, txn_dict)
-        self.cache_manager.update_user_history(transaction.receiver_id, txn_dict)
-        self.cache_manager.increment_transaction_count(transaction.sender_id)
+        if self.state_writer:
+            self.state_writer.submit(transaction.sender_id, 'history', txn_dict)
+            self.state_writer.submit(transaction.receiver_id, 'history', txn_dict)
+            self.state_writer.submit(transaction.sender_id, 'txn_count', 1)
+        else:
+            self.cache_manager.update_user_history(transaction.sender_id, txn_dict)
+            self.cache_manager.update_user_history(transaction.receiver_id, txn_dict)
+            self.cache_manager.increment_transaction_count(transaction.sender_id)
+        
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self.latency.record('state_io', elapsed_ms)
+        return elapsed_ms
+    
+    def _apply_txn_counts(self, user_id: str, counts: List[int]):
+        self.cache_manager.increment_transaction_count(user_id, count=sum(counts))
+    
+    def _apply_graph_edges(self, sender_id: str, edges: List[Tuple]):
+        self.graph_detector.add_transactions(edges)
+    
+    def _apply_biometric_updates(self, user_id: str, samples: List[Dict]):
+        for biometric_dict in samples:
+            self.biometric_analyzer.update_profile(user_id, biometric_dict)
+    
+    def known_accounts(self) -> List[str]:
+        accounts = set(self.graph_detector.transaction_times)
+        accounts.update(self.biometric_analyzer.user_profiles)
+        accounts.update(key[len('user:'):].rsplit(':', 1)[0]
+                        for key in list(self.cache_manager.cache) if key.startswith('user:'))
+        return sorted(accounts)
+    
+    def export_accounts(self, account_ids: List[str]) -> Dict[str, Dict]:
+        # Hand per-account state over to another engine (affinity rebalancing)
+        self.flush()
+        return {
+            account: {
+                'graph': self.graph_detector.export_account(account),
+                'biometric': self.biometric_analyzer.export_profile(account),
+                'cache': self.cache_manager.export_user_state(account)
+            }
+            for account in account_ids
+        }
+    
+    def import_accounts(self, state: Dict[str, Dict]):
+        for account, account_state in state.items():
+            self.graph_detector.import_account(account, account_state['graph'])
+            if account_state['biometric'] is not None:
+                self.biometric_analyzer.import_profile(account, account_state['biometric'])
+            self.cache_manager.import_user_state(account, account_state['cache'])
+    
+    def _log_decision(self, result: FraudScore) -> FraudScore:
+        # Only enqueues; formatting and file I/O happen on the monitor's thread
+        if self.monitor:
+            self.monitor.log_transaction(result.transaction_id, result)
+            self.monitor.alert_high_latency(result.transaction_id, result.latency_ms, MAX_LATENCY_MS)
+        return result
+    
+    def get_metrics(self) -> Dict:
+        metrics = {
+            'cache': self.cache_manager.get_metrics(),
+            'scheduler': self.scheduler.get_metrics()
+        }
+        if self.cascade:
+            with self._stats_lock:
+                metrics['cascade'] = dict(self.cascade_stats)
+        if self.idempotency:
+            metrics['idempotency'] = self.idempotency.get_stats()
+        if self.state_writer:
+            metrics['state_writer'] = self.state_writer.get_stats()
+        if self.process_pool:
+            metrics['process_pool'] = self.process_pool.get_stats()
+        if self.monitor:
+            metrics['decision_log'] = self.monitor.get_stats()
+        if self.archive:
+            metrics['decision_archive'] = self.archive.get_stats()
+        if self.checkpointer:
+            metrics['checkpoint'] = self.checkpointer.get_stats()
+        metrics['latency'] = {stage: histogram.summary() for stage, histogram in self.latency.snapshot().items()}
+        metrics['degraded_scores'] = self.degraded_count
+        return metrics
+    
+    def memory_report(self, sample_size: int = MEMORY_SAMPLE_SIZE) -> Dict:
+        # Estimated live size of each per-account store, scaled from a sample
+        graph = self.graph_detector.graph
+        stores = {
+            'graph': estimate_store(graph._succ, sample_size,
+                                    lambda node, _: graph_node_sizeof(graph, node),
+                                    containers=(graph._succ, graph._pred, graph._node)),
+            'transaction_times': estimate_store(self.graph_detector.transaction_times, sample_size),
+            'biometric_profiles': estimate_store(self.biometric_analyzer.user_profiles, sample_size),
+            'cache': estimate_store(self.cache_manager.cache, sample_size)
+        }
+        stores['graph']['edges'] = graph.number_of_edges()
+        
+        accounts = self._count_active_accounts()
+        total = sum(store['bytes'] for store in stores.values())
+        report = {
+            'rss_bytes': process_rss_bytes(),
+            'estimated_bytes': total,
+            'active_accounts': accounts,
+            'bytes_per_account': {name: round(store['bytes'] / accounts, 1) if accounts else 0.0
+                                  for name, store in stores.items()},
+            'stores': stores
+        }
+        report['bytes_per_account']['total'] = round(total / accounts, 1) if accounts else 0.0
+        traced = tracemalloc_summary()
+        if traced:
+            report['tracemalloc'] = traced
+        return report
+    
+    def _count_active_accounts(self) -> int:
+        # Counts without building a union set, which would itself be large
+        graph = self.graph_detector.graph
+        profiles = self.biometric_analyzer.user_profiles
+        count = graph.number_of_nodes()
+        count += sum(1 for account in list(profiles) if account not in graph)
+        counted = set()
+        for key in list(self.cache_manager.cache):
+            if key.startswith('user:'):
+                account = key[len('user:'):].rsplit(':', 1)[0]
+                if account not in graph and account not in profiles:
+                    counted.add(account)
+        return count + len(counted)
+    
+    def account_memory(self, account_id: str) -> Dict[str, int]:
+        # Exact bytes held for one account in each store (0 when absent)
+        graph = self.graph_detector.graph
+        usage = {'graph': graph_node_sizeof(graph, account_id)[0] if account_id in graph else 0}
+        times = self.graph_detector.transaction_times.get(account_id)
+        usage['transaction_times'] = entry_sizeof(account_id, times)[0] if times is not None else 0
+        profile = self.biometric_analyzer.user_profiles.get(account_id)
+        usage['biometric_profiles'] = entry_sizeof(account_id, profile)[0] if profile is not None else 0
+        usage['cache'] = 0
+        for key in (f"user:{account_id}:history", f"user:{account_id}:txn_window"):
+            value = self.cache_manager.cache.get(key)
+            if value is not None:
+                usage['cache'] += entry_sizeof(key, value)[0]
+        usage['total'] = sum(usage.values())
+        return usage
+    
+    def warmup(self, n_transactions: int = WARMUP_TRANSACTIONS) -> Dict:
+        """Score synthetic transactions through the single, batch and degraded
+        paths, so the first real requests don't pay for cold code paths, the
+        scheduler threads or the Redis connection. The synthetic accounts'
+        state is dropped afterwards. The engine's own latencies, counters and
+        idempotency store, the decision log and the archive never see warmup;
+        the shared cache manager, scheduler and state writer do count its
+        work in their stats."""
+        start = time.perf_counter()
+        run = f"{WARMUP_ACCOUNT_PREFIX}{os.getpid()}_{time.time_ns()}_"
+        accounts = [f"{run}{i}" for i in range(WARMUP_ACCOUNTS)]
+        # At an event clock's current time, so warmup never moves it on; one
+        # that has seen no traffic yet still reads its 1970 start, so then
+        # (and on a wall clock) at the system time
+        if isinstance(self.clock, EventClock) and self.clock.latest is not None:
+            now = self.clock.now()
+        else:
+            now = datetime.now()
+        transactions = [
+            Transaction(
+                transaction_id=f"{run}txn_{i}",
+                sender_id=accounts[i % len(accounts)],
+                receiver_id=accounts[(i * 7 + 1) % len(accounts)],
+                amount=10.0 + (i * 37) % 5000,
+                timestamp=now,
+                device_id=f"{run}device_{i % 3}",
+                ip_address="10.255.0.1",
+                biometric=BiometricData(typing_speed=45.0 + i % 20, swipe_velocity=100.0 + i % 30)
+            )
+            for i in range(n_transactions)
+        ]
+        
+        # Real requests may already be scoring, so warmup runs on a shallow
+        # copy: the same detectors, caches and scheduler, but its own
+        # latencies, counters and idempotency store, and no decision log or
+        # archive
+        shadow = copy.copy(self)
+        shadow.monitor = shadow.archive = None
+        shadow.latency = StageLatencies(LATENCY_STAGES)
+        shadow.cascade_stats = dict.fromkeys(self.cascade_stats, 0)
+        shadow.degraded_count = 0
+        shadow._timing_samples = itertools.count(1)
+        if self.idempotency is not None:
+            shadow.idempotency = IdempotencyStore(IDEMPOTENCY_WINDOW_S, IDEMPOTENCY_BUCKETS,
+                                                  IDEMPOTENCY_MAX_ENTRIES)
+        half = len(transactions) // 2
+        for transaction in transactions[:half]:
+            shadow.analyze_transaction(transaction)
+        if transactions:
+            degraded = transactions[0].model_copy(update={'transaction_id': f"{run}degraded"})
+            shadow.analyze_transaction(degraded, degraded=True)
+        for chunk_start in range(half, len(transactions), STREAM_CHUNK_SIZE):
+            shadow.analyze_batch(transactions[chunk_start:chunk_start + STREAM_CHUNK_SIZE])
+        
+        self.export_accounts(accounts)
+        # Receivers exported before their senders only become isolated nodes afterwards
+        for account in accounts:
+            self.graph_detector.export_account(account)
+        self.cache_manager.delete_users(accounts)
+        return {'transactions': n_transactions, 'duration_ms': round((time.perf_counter() - start) * 1000, 1)}
+    
+    def snapshot(self, path: str) -> Dict:
+        # Full snapshot of graph, velocity buffers, profiles and local cache
+        if self.state_writer:
+            self.state_writer.flush()
+        from .snapshot import snapshot_engine
+        return snapshot_engine(self, path)
+    
+    def restore(self, path: str, use_mmap: bool = True) -> Dict:
+        # A snapshot file, or a checkpoint directory (full snapshot + deltas)
+        from .snapshot import restore_engine
+        return restore_engine(self, path, use_mmap)
+    
+    def flush(self):
+        if self.state_writer:
+            self.state_writer.flush()
+        if self.monitor:
+            self.monitor.flush()
+        if self.archive:
+            self.archive.flush()
+    
+    def close(self):
+        try:
+            # Raises a state update error the writer hit since the last flush,
+            # after the rest has been shut down
+            if self.state_writer:
+                self.state_writer.close()
+        finally:
+            if self.checkpointer:
+                self.checkpointer.close()
+            if self.monitor:
+                self.monitor.close()
+            if self.archive:
+                self.archive.close()
+            if self.process_pool:
+                self.process_pool.shutdown()
     
     def _generate_reason(self, ml_score: float, graph_score: float, biometric_score: float) -> str:
         reasons = []
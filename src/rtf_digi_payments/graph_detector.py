@@ -1,16 +1,48 @@
 import networkx as nx
+import numpy as np
 from collections import defaultdict
 from datetime import datetime, timedelta
-from typing import Tuple, Set
+from typing import Dict, Iterable, List, Optional, Tuple, Set
+
+from .utils.clock import EventClock
+from .utils.deadline import Deadline, DeadlineExceeded
+from .utils.locks import StripedLock
 
 class GraphFraudDetector:
-    def __init__(self, window_hours: int = 24, min_ring_size: int = 3):
+    def __init__(self, window_hours: int = 24, min_ring_size: int = 3,
+                 lock_stripes: int = 64, cleanup_interval_seconds: float = 60, clock=None):
         self.window_hours = window_hours
         self.min_ring_size = min_ring_size
         self.graph = nx.DiGraph()
         self.transaction_times = defaultdict(list)
+        # Per-account stripes: an edge update holds its sender's and receiver's
+        self.locks = StripedLock(lock_stripes)
+        self.cleanup_interval = timedelta(seconds=cleanup_interval_seconds)
+        self._last_cleanup = None
+        # The velocity window and edge expiry measure against this clock;
+        # on its own the detector runs on the event time of its edges
+        self.clock = clock or EventClock()
+        # Set by the engine when checkpointing: sending accounts whose state changed
+        self.dirty = None
         
     def add_transaction(self, sender: str, receiver: str, amount: float, timestamp: datetime):
+        with self.locks.hold(sender, receiver):
+            self._add_edge(sender, receiver, amount, timestamp)
+        self._maybe_cleanup(self.clock.now())
+    
+    def add_transactions(self, transactions: Iterable[Tuple[str, str, float, datetime]]):
+        # Batched insert with a single cleanup pass at the end
+        added = False
+        for sender, receiver, amount, timestamp in transactions:
+            with self.locks.hold(sender, receiver):
+                self._add_edge(sender, receiver, amount, timestamp)
+            added = True
+        
+        if added:
+            self._maybe_cleanup(self.clock.now())
+    
+    def _add_edge(self, sender: str, receiver: str, amount: float, timestamp: datetime):
+        self.clock.observe(timestamp)
         if self.graph.has_edge(sender, receiver):
             self.graph[sender][receiver]['weight'] += 1
             self.graph[sender][receiver]['total_amount'] += amount
@@ -18,58 +50,178 @@ class GraphFraudDetector:
             self.graph.add_edge(sender, receiver, weight=1, total_amount=amount)
         
         self.transaction_times[sender].append(timestamp)
-        self._cleanup_old_edges(timestamp)
+        if self.dirty is not None:
+            self.dirty.mark(sender)
+    
+    def add_transactions_indexed(self, transactions: List[Tuple[str, str, float, datetime]]) -> Tuple[Dict[str, np.ndarray], List[float]]:
+        """Add edges in order and return a ring-search index plus the velocity/mule
+        score of each step. The index lets ``search_ring_index`` run the cycle
+        searches elsewhere (e.g. in other processes) as of each step's graph."""
+        neighbourhoods = []
+        fallback_scores = []
+        born = {}
+        for step, (sender, receiver, amount, timestamp) in enumerate(transactions):
+            with self.locks.hold(sender, receiver):
+                if not self.graph.has_edge(sender, receiver):
+                    born[(sender, receiver)] = step
+                self._add_edge(sender, receiver, amount, timestamp)
+                nodes = {sender, receiver}
+                nodes.update(self.graph.successors(sender))
+                nodes.update(self.graph.predecessors(receiver))
+                neighbourhoods.append(nodes)
+                fallback_scores.append(max(self._calculate_velocity_score(sender),
+                                           self._detect_mule_pattern(receiver)))
+        if transactions:
+            self._maybe_cleanup(self.clock.now())
+        
+        # CSR adjacency over the union of the neighbourhoods; edges added by
+        # this batch carry the step they appeared at
+        node_ids = {}
+        for nodes in neighbourhoods:
+            for node in nodes:
+                node_ids.setdefault(node, len(node_ids))
+        indptr = [0]
+        indices = []
+        edge_born = []
+        for node in node_ids:
+            with self.locks.hold(node):
+                successors = list(self.graph.successors(node)) if node in self.graph else []
+            for successor in successors:
+                if successor in node_ids:
+                    indices.append(node_ids[successor])
+                    edge_born.append(born.get((node, successor), -1))
+            indptr.append(len(indices))
+        
+        members = [node_ids[node] for nodes in neighbourhoods for node in nodes]
+        member_ptr = np.cumsum([0] + [len(nodes) for nodes in neighbourhoods])
+        index = {
+            'indptr': np.asarray(indptr, dtype=np.int64),
+            'indices': np.asarray(indices, dtype=np.int64),
+            'born': np.asarray(edge_born, dtype=np.int64),
+            'members': np.asarray(members, dtype=np.int64),
+            'member_ptr': member_ptr.astype(np.int64)
+        }
+        return index, fallback_scores
+    
+    def export_account(self, account: str) -> Dict:
+        # Remove and return the state owned by a sending account: its outgoing
+        # edges and transaction times. Incoming edges belong to their senders.
+        with self.locks.hold(account):
+            if account not in self.graph:
+                return {'edges': [], 'times': self.transaction_times.pop(account, [])}
+            edges = [(receiver, data['weight'], data['total_amount'])
+                     for receiver, data in self.graph[account].items()]
+            self.graph.remove_edges_from([(account, receiver) for receiver, _, _ in edges])
+            if self.graph.degree(account) == 0:
+                self.graph.remove_node(account)
+            if self.dirty is not None:
+                self.dirty.mark(account)
+            return {'edges': edges, 'times': self.transaction_times.pop(account, [])}
+    
+    def import_account(self, account: str, state: Dict):
+        for receiver, weight, total_amount in state['edges']:
+            with self.locks.hold(account, receiver):
+                if self.graph.has_edge(account, receiver):
+                    self.graph[account][receiver]['weight'] += weight
+                    self.graph[account][receiver]['total_amount'] += total_amount
+                else:
+                    self.graph.add_edge(account, receiver, weight=weight, total_amount=total_amount)
+        with self.locks.hold(account):
+            times = self.transaction_times[account]
+            times.extend(state['times'])
+            times.sort()
+            if self.dirty is not None:
+                self.dirty.mark(account)
+    
+    def _maybe_cleanup(self, current_time: datetime):
+        # The window scan touches every account, so it takes all stripes and
+        # runs at most once per cleanup interval rather than on every edge
+        if self._last_cleanup is not None and current_time - self._last_cleanup < self.cleanup_interval:
+            return
+        with self.locks.hold_all():
+            if self._last_cleanup is None or current_time - self._last_cleanup >= self.cleanup_interval:
+                self._cleanup_old_edges(current_time)
+                self._last_cleanup = current_time
     
     def _cleanup_old_edges(self, current_time: datetime):
         cutoff = current_time - timedelta(hours=self.window_hours)
         nodes_to_remove = [node for node, times in self.transaction_times.items() 
                           if times and max(times) < cutoff]
+        if self.dirty is not None:
+            # Removing a node also drops its senders' edges into it
+            for node in nodes_to_remove:
+                self.dirty.mark(node)
+                if node in self.graph:
+                    self.dirty.mark_many(self.graph.predecessors(node))
         self.graph.remove_nodes_from(nodes_to_remove)
         for node in nodes_to_remove:
             del self.transaction_times[node]
     
-    def detect_fraud_ring(self, sender: str, receiver: str) -> Tuple[float, Set[str]]:
-        if sender not in self.graph or receiver not in self.graph:
-            return 0.0, set()
+    def detect_fraud_ring(self, sender: str, receiver: str, include_edge: bool = False,
+                          deadline: Optional[Deadline] = None) -> Tuple[float, Set[str]]:
+        # include_edge scores the transfer as if its edge were already in the
+        # graph, for callers that defer add_transaction (write-behind mode)
+        with self.locks.hold(sender, receiver):
+            new_edge = include_edge and not self.graph.has_edge(sender, receiver)
+            if not include_edge and (sender not in self.graph or receiver not in self.graph):
+                return 0.0, set()
+            
+            nodes = {sender, receiver}
+            if sender in self.graph:
+                nodes.update(self.graph.successors(sender))
+            if receiver in self.graph:
+                nodes.update(self.graph.predecessors(receiver))
         
         # Check for circular patterns
         try:
+            # Search a private copy of the neighbourhood, outside the locks
+            with self.locks.hold(*nodes):
+                subgraph = self.graph.subgraph(nodes).copy()
+            if new_edge:
+                subgraph.add_edge(sender, receiver)
+            
             cycle_nodes = set()
-            for cycle in nx.simple_cycles(self.graph.subgraph([sender, receiver] + 
-                                         list(self.graph.successors(sender)) + 
-                                         list(self.graph.predecessors(receiver)))):
+            for cycle in nx.simple_cycles(subgraph):
                 if len(cycle) >= self.min_ring_size:
                     cycle_nodes.update(cycle)
+                # Stop expanding the search once the request is out of budget
+                if deadline is not None and deadline.expired():
+                    break
             
             if cycle_nodes:
                 return 0.9, cycle_nodes
         except:
             pass
         
-        # Check transaction velocity
-        velocity_score = self._calculate_velocity_score(sender)
+        if deadline is not None:
+            deadline.check()
         
-        # Check for mule account patterns
-        mule_score = self._detect_mule_pattern(receiver)
+        with self.locks.hold(sender, receiver):
+            # Check transaction velocity
+            velocity_score = self._calculate_velocity_score(sender, pending=1 if include_edge else 0)
+            
+            # Check for mule account patterns
+            mule_score = self._detect_mule_pattern(receiver, pending_in=1 if new_edge else 0)
         
         return max(velocity_score, mule_score), set()
     
-    def _calculate_velocity_score(self, node: str) -> float:
-        if node not in self.transaction_times:
+    def _calculate_velocity_score(self, node: str, pending: int = 0) -> float:
+        if node not in self.transaction_times and not pending:
             return 0.0
         
-        recent_txns = [t for t in self.transaction_times[node] 
-                      if (datetime.now() - t).total_seconds() < 3600]
+        now = self.clock.now()
+        recent_txns = [t for t in self.transaction_times.get(node, []) 
+                      if (now - t).total_seconds() < 3600]
         
-        if len(recent_txns) > 10:
-            return min(len(recent_txns) / 20.0, 1.0)
+        if len(recent_txns) + pending > 10:
+            return min((len(recent_txns) + pending) / 20.0, 1.0)
         return 0.0
     
-    def _detect_mule_pattern(self, node: str) -> float:
+    def _detect_mule_pattern(self, node: str, pending_in: int = 0) -> float:
         if node not in self.graph:
             return 0.0
         
-        in_degree = self.graph.in_degree(node)
+        in_degree = self.graph.in_degree(node) + pending_in
         out_degree = self.graph.out_degree(node)
         
         if in_degree > 5 and out_degree > 5:
@@ -77,3 +229,23 @@ class GraphFraudDetector:
         elif in_degree > 3 and out_degree > 3:
             return 0.6
         return 0.0
+
+
+def search_ring_index(index: Dict[str, np.ndarray], steps: Iterable[int], min_ring_size: int) -> List[bool]:
+    """For each step, whether its neighbourhood (as of that step) contains a
+    cycle of at least ``min_ring_size`` accounts."""
+    indptr, indices, born = index['indptr'], index['indices'], index['born']
+    members, member_ptr = index['members'], index['member_ptr']
+    found = []
+    for step in steps:
+        nodes = set(members[member_ptr[step]:member_ptr[step + 1]].tolist())
+        subgraph = nx.DiGraph()
+        subgraph.add_nodes_from(nodes)
+        for node in nodes:
+            start, end = indptr[node], indptr[node + 1]
+            for successor, edge_step in zip(indices[start:end].tolist(), born[start:end].tolist()):
+                if successor in nodes and edge_step <= step:
+                    subgraph.add_edge(node, successor)
+        # Only the presence of a ring is scored, so stop at the first one
+        found.append(any(len(cycle) >= min_ring_size for cycle in nx.simple_cycles(subgraph)))
+    return found
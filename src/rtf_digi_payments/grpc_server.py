@@ -0,0 +1,198 @@
+"""gRPC streaming front end for FraudDetectionEngine.
+
+``Analyze`` is a bidirectional stream: clients keep one connection open and
+write transactions, and get back one ``AnalyzeResult`` per message, in order.
+Within a stream, messages are pulled into a bounded queue and scored with
+``analyze_batch`` in whatever chunk has arrived (up to ``STREAM_CHUNK_SIZE``).
+So a busy stream gets batch throughput without a linger timer. Once
+``STREAM_MAX_PENDING_CHUNKS`` chunks are waiting, the reader stops pulling
+messages, and HTTP/2 flow control pushes back on the client. Responses are
+written as their chunk is scored, so a slow reader holds back scoring the
+same way. A message whose chunk could not be scored (or a retry of a
+transaction still being scored) gets a result with ``error`` set, and the
+stream carries on.
+
+Run with ``python -m rtf_digi_payments.grpc_server``.
+"""
+import argparse
+import asyncio
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+import grpc
+from pydantic import ValidationError
+
+from .models.transaction import Transaction, BiometricData, FraudScore
+from .proto import fraud_pb2, fraud_pb2_grpc
+from .utils.idempotency import DuplicateInProgress
+from config.settings import GRPC_PORT, GRPC_MAX_CONCURRENT_STREAMS, STREAM_CHUNK_SIZE, STREAM_MAX_PENDING_CHUNKS
+
+if TYPE_CHECKING:
+    # Clients only need the proto converters, not the engine and its dependencies
+    from .fraud_engine import FraudDetectionEngine
+
+_BIOMETRIC_FIELDS = ('typing_speed', 'swipe_velocity', 'pressure_pattern', 'device_angle')
+
+
+def transaction_from_proto(message: fraud_pb2.Transaction) -> Transaction:
+    # Timestamps carry no zone on the wire; naive datetimes round-trip unchanged
+    biometric = None
+    if message.HasField('biometric'):
+        biometric = BiometricData(**{
+            name: getattr(message.biometric, name)
+            for name in _BIOMETRIC_FIELDS if message.biometric.HasField(name)
+        })
+    return Transaction(
+        transaction_id=message.transaction_id,
+        sender_id=message.sender_id,
+        receiver_id=message.receiver_id,
+        amount=message.amount,
+        timestamp=message.timestamp.ToDatetime(),
+        device_id=message.device_id,
+        ip_address=message.ip_address,
+        biometric=biometric,
+        metadata=dict(message.metadata) or None
+    )
+
+
+def transaction_to_proto(transaction: Transaction) -> fraud_pb2.Transaction:
+    message = fraud_pb2.Transaction(
+        transaction_id=transaction.transaction_id,
+        sender_id=transaction.sender_id,
+        receiver_id=transaction.receiver_id,
+        amount=transaction.amount,
+        device_id=transaction.device_id,
+        ip_address=transaction.ip_address,
+        metadata={str(k): str(v) for k, v in (transaction.metadata or {}).items()}
+    )
+    message.timestamp.FromDatetime(transaction.timestamp)
+    if transaction.biometric is not None:
+        message.biometric.CopyFrom(fraud_pb2.BiometricData(**transaction.biometric.model_dump(exclude_none=True)))
+    return message
+
+
+def score_to_proto(score: FraudScore) -> fraud_pb2.FraudScore:
+    return fraud_pb2.FraudScore(**score.model_dump(exclude_none=True))
+
+
+def score_from_proto(message: fraud_pb2.FraudScore) -> Dict:
+    return {
+        'transaction_id': message.transaction_id,
+        'fraud_probability': message.fraud_probability,
+        'ml_score': message.ml_score,
+        'graph_score': message.graph_score,
+        'biometric_score': message.biometric_score,
+        'is_fraudulent': message.is_fraudulent,
+        'latency_ms': message.latency_ms,
+        'reason': message.reason if message.HasField('reason') else None,
+        'degraded_stages': list(message.degraded_stages),
+        'skipped_stages': list(message.skipped_stages),
+        'degraded': message.degraded,
+        'stage_timings': dict(message.stage_timings) or None
+    }
+
+
+class FraudDetectionServicer(fraud_pb2_grpc.FraudDetectionServicer):
+    def __init__(self, engine: 'FraudDetectionEngine', chunk_size: int = STREAM_CHUNK_SIZE,
+                 max_pending_chunks: int = STREAM_MAX_PENDING_CHUNKS):
+        self.engine = engine
+        self.chunk_size = chunk_size
+        self.max_pending = chunk_size * max_pending_chunks
+        self.stats = {'streams': 0, 'active_streams': 0, 'messages': 0, 'chunks': 0, 'errors': 0}
+
+    async def Analyze(self, request_iterator, context):
+        pending = asyncio.Queue(maxsize=self.max_pending)
+        reader = asyncio.create_task(self._read(request_iterator, pending))
+        self.stats['streams'] += 1
+        self.stats['active_streams'] += 1
+        try:
+            done = False
+            while not done:
+                chunk = [await pending.get()]
+                # Take whatever else has already arrived, up to a chunk
+                while len(chunk) < self.chunk_size and not pending.empty():
+                    chunk.append(pending.get_nowait())
+                if chunk[-1] is None:
+                    chunk.pop()
+                    done = True
+                if chunk:
+                    for result in await self._score(chunk):
+                        yield result
+            await reader
+        finally:
+            reader.cancel()
+            self.stats['active_streams'] -= 1
+
+    async def _read(self, request_iterator, pending: asyncio.Queue):
+        try:
+            async for message in request_iterator:
+                await pending.put(message)
+        finally:
+            await pending.put(None)
+
+    async def _score(self, messages: List[fraud_pb2.Transaction]) -> List[fraud_pb2.AnalyzeResult]:
+        results: List[Optional[fraud_pb2.AnalyzeResult]] = [None] * len(messages)
+        transactions, positions = [], []
+        for i, message in enumerate(messages):
+            try:
+                transactions.append(transaction_from_proto(message))
+                positions.append(i)
+            except ValidationError as e:
+                self.stats['errors'] += 1
+                results[i] = fraud_pb2.AnalyzeResult(
+                    transaction_id=message.transaction_id,
+                    error=str(e.errors(include_url=False, include_context=False))
+                )
+
+        if transactions:
+            loop = asyncio.get_running_loop()
+            try:
+                scores = await loop.run_in_executor(None, self.engine.analyze_batch, transactions)
+            except DuplicateInProgress as e:
+                # The rest of the chunk was scored; only the retries are left out
+                scores = e.results or [None] * len(transactions)
+            except Exception as e:
+                # One failed chunk fails its messages, not the stream
+                scores = [f"{type(e).__name__}: {e}"] * len(transactions)
+            for i, transaction, score in zip(positions, transactions, scores):
+                if isinstance(score, FraudScore):
+                    results[i] = fraud_pb2.AnalyzeResult(transaction_id=score.transaction_id,
+                                                         score=score_to_proto(score))
+                    continue
+                self.stats['errors'] += 1
+                results[i] = fraud_pb2.AnalyzeResult(transaction_id=transaction.transaction_id,
+                                                     error=score or "still being scored")
+
+        self.stats['messages'] += len(messages)
+        self.stats['chunks'] += 1
+        return results
+
+    def get_stats(self) -> Dict:
+        return dict(self.stats)
+
+
+def create_server(engine: 'FraudDetectionEngine', port: int = GRPC_PORT,
+                  host: str = '[::]') -> Tuple[grpc.aio.Server, FraudDetectionServicer, int]:
+    """Build an unstarted server; port 0 binds a free port, which is returned."""
+    server = grpc.aio.server(options=[('grpc.max_concurrent_streams', GRPC_MAX_CONCURRENT_STREAMS)])
+    servicer = FraudDetectionServicer(engine)
+    fraud_pb2_grpc.add_FraudDetectionServicer_to_server(servicer, server)
+    bound_port = server.add_insecure_port(f'{host}:{port}')
+    return server, servicer, bound_port
+
+
+async def serve(port: int = GRPC_PORT):
+    from .fraud_engine import FraudDetectionEngine
+
+    engine = FraudDetectionEngine()
+    server, _, _ = create_server(engine, port)
+    await server.start()
+    try:
+        await server.wait_for_termination()
+    finally:
+        engine.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="gRPC streaming fraud scoring server")
+    parser.add_argument("--port", type=int, default=GRPC_PORT)
+    asyncio.run(serve(parser.parse_args().port))
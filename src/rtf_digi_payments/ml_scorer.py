@@ -1,12 +1,34 @@
 import numpy as np
-import lightgbm as lgb
 import pickle
 from pathlib import Path
-from typing import Dict
+from typing import Dict, List
+
+class DefaultModel:
+    """Stand-in for the untrained default LightGBM classifier.
+
+    It has no ``predict_proba``, so scoring falls back to the heuristic, as
+    the unfitted classifier did. ``train`` swaps in the real model, so
+    lightgbm (and the sklearn/scipy it pulls in) is only imported once
+    there is something to fit."""
+    # Lightweight LightGBM for sub-200ms inference
+    params = dict(
+        n_estimators=50,
+        max_depth=6,
+        num_leaves=31,
+        learning_rate=0.1,
+        n_jobs=1,
+        verbose=-1
+    )
+    
+    def build(self):
+        import lightgbm as lgb
+        return lgb.LGBMClassifier(**self.params)
 
 class MLFraudScorer:
     def __init__(self, model_path: str = None):
         self.model = None
+        # Bumped whenever the model changes, so copies elsewhere can refresh
+        self.model_version = 0
         self.feature_names = [
             'amount', 'hour', 'day_of_week', 'amount_log',
             'sender_txn_count', 'receiver_txn_count',
@@ -19,15 +41,7 @@ class MLFraudScorer:
             self._init_default_model()
     
     def _init_default_model(self):
-        # Lightweight LightGBM for sub-200ms inference
-        self.model = lgb.LGBMClassifier(
-            n_estimators=50,
-            max_depth=6,
-            num_leaves=31,
-            learning_rate=0.1,
-            n_jobs=1,
-            verbose=-1
-        )
+        self.model = DefaultModel()
     
     def extract_features(self, transaction: Dict, historical_data: Dict) -> np.ndarray:
         amount = transaction['amount']
@@ -47,6 +61,21 @@ class MLFraudScorer:
         
         return np.array(features).reshape(1, -1)
     
+    def extract_features_batch(self, transactions: List[Dict], historical_data: List[Dict]) -> np.ndarray:
+        amounts = np.array([t['amount'] for t in transactions], dtype=float)
+        
+        return np.column_stack([
+            amounts,
+            [t['timestamp'].hour for t in transactions],
+            [t['timestamp'].weekday() for t in transactions],
+            np.log1p(amounts),
+            [h.get('sender_txn_count', 0) for h in historical_data],
+            [h.get('receiver_txn_count', 0) for h in historical_data],
+            [h.get('amount_velocity', 0) for h in historical_data],
+            [1 if h.get('device_changed', False) else 0 for h in historical_data],
+            [1 if h.get('ip_changed', False) else 0 for h in historical_data]
+        ]).astype(float)
+    
     def predict_fraud_probability(self, features: np.ndarray) -> float:
         if self.model is None:
             return 0.5
@@ -61,6 +90,31 @@ class MLFraudScorer:
         except:
             return self._heuristic_score(features[0])
     
+    def predict_fraud_probability_batch(self, features: np.ndarray) -> np.ndarray:
+        if self.model is None:
+            return np.full(len(features), 0.5)
+        
+        try:
+            if hasattr(self.model, 'predict_proba'):
+                return self.model.predict_proba(features)[:, 1].astype(float)
+            return self._heuristic_score_batch(features)
+        except:
+            return self._heuristic_score_batch(features)
+    
+    def heuristic_score(self, features: np.ndarray) -> float:
+        # Model-free score used as the cheap first stage of cascade scoring
+        return self._heuristic_score(features[0])
+    
+    def _heuristic_score_batch(self, features: np.ndarray) -> np.ndarray:
+        # Vectorised _heuristic_score over a feature matrix
+        score = (
+            0.3 * (features[:, 0] > 50000) +
+            0.2 * (features[:, 1] < 5) +
+            0.3 * (features[:, 6] > 5) +
+            0.2 * ((features[:, 7] != 0) | (features[:, 8] != 0))
+        )
+        return np.minimum(score, 1.0)
+    
     def _heuristic_score(self, features: np.ndarray) -> float:
         score = 0.0
         
@@ -88,7 +142,10 @@ class MLFraudScorer:
             fraud_ratio = np.sum(y) / len(y)
             sample_weight = np.where(y == 1, 1.0 / fraud_ratio, 1.0)
         
+        if isinstance(self.model, DefaultModel):
+            self.model = self.model.build()
         self.model.fit(X, y, sample_weight=sample_weight)
+        self.model_version += 1
     
     def save_model(self, path: str):
         with open(path, 'wb') as f:
@@ -97,3 +154,4 @@ class MLFraudScorer:
     def load_model(self, path: str):
         with open(path, 'rb') as f:
             self.model = pickle.load(f)
+        self.model_version += 1
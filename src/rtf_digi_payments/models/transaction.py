@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional, Dict
+from typing import Optional, Dict, List
 from datetime import datetime
 
 class BiometricData(BaseModel):
@@ -28,3 +28,46 @@ class FraudScore(BaseModel):
     is_fraudulent: bool
     latency_ms: float
     reason: Optional[str] = None
+    degraded_stages: List[str] = Field(default_factory=list)
+    skipped_stages: List[str] = Field(default_factory=list)
+    degraded: bool = False
+    # Per-stage milliseconds, attached to sampled requests only
+    stage_timings: Optional[Dict[str, float]] = None
+
+
+class TransactionRecord:
+    """Slotted copy of a validated Transaction that flows through the engine.
+    Biometrics are converted to a plain dict once, here, instead of in every
+    stage that reads or records them."""
+    __slots__ = ('transaction_id', 'sender_id', 'receiver_id', 'amount', 'timestamp',
+                 'device_id', 'ip_address', 'biometric', 'metadata')
+    
+    def __init__(self, transaction_id: str, sender_id: str, receiver_id: str, amount: float,
+                 timestamp: datetime, device_id: str, ip_address: str,
+                 biometric: Optional[Dict] = None, metadata: Optional[Dict] = None):
+        self.transaction_id = transaction_id
+        self.sender_id = sender_id
+        self.receiver_id = receiver_id
+        self.amount = amount
+        self.timestamp = timestamp
+        self.device_id = device_id
+        self.ip_address = ip_address
+        self.biometric = biometric
+        self.metadata = metadata
+    
+    @classmethod
+    def from_transaction(cls, transaction) -> 'TransactionRecord':
+        if isinstance(transaction, cls):
+            return transaction
+        biometric = transaction.biometric
+        return cls(
+            transaction.transaction_id,
+            transaction.sender_id,
+            transaction.receiver_id,
+            transaction.amount,
+            transaction.timestamp,
+            transaction.device_id,
+            transaction.ip_address,
+            biometric.model_dump() if biometric is not None else None,
+            transaction.metadata
+        )
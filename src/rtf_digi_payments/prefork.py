@@ -0,0 +1,187 @@
+"""Preload-and-fork serving for the REST API.
+
+``uvicorn.run(app, workers=N)`` cannot fork workers from an app object, and
+workers started separately would each import the whole stack and load the
+model themselves. Here a master process does that once, before forking:
+- it imports the serving modules (FastAPI and the pydantic schemas,
+  networkx, numpy, the engine)
+- it loads the model from ``MODEL_PATH``
+- it runs ``gc.freeze()`` on everything allocated so far, so the workers'
+  collector never writes to those objects' headers and the pages stay
+  shared copy-on-write
+- it binds the listening socket and forks ``PREFORK_WORKERS`` workers
+
+Each worker imports ``api``, which builds the worker's engine around the
+shared scorer, and serves the inherited socket. ``/ready`` answers 503
+until the engine's warmup pass is done. The master starts no threads before
+forking, since threads do not survive ``fork``. The scheduler, Redis
+reconnect and write-behind threads all start in the workers. The master
+restarts workers that die and passes SIGTERM/SIGINT on to them.
+
+Affinity routing is not supported here: it needs one acceptor that owns
+every account's worker.
+
+Run with ``python -m rtf_digi_payments.prefork``.
+"""
+import argparse
+import gc
+import os
+import signal
+import socket
+import sys
+import time
+import traceback
+from importlib import import_module
+from typing import Dict, Optional
+
+from .ml_scorer import MLFraudScorer
+from config.settings import (
+    AFFINITY_ROUTING_ENABLED, CHECKPOINT_DIR, MODEL_PATH, PREFORK_GC_FREEZE, PREFORK_WORKERS
+)
+
+# Imported by the master, so workers inherit them already loaded
+PRELOAD_MODULES = (
+    'fastapi', 'fastapi.responses', 'starlette.concurrency', 'uvicorn.config', 'uvicorn.server',
+    'rtf_digi_payments.fraud_engine', 'rtf_digi_payments.batching', 'rtf_digi_payments.affinity',
+    'rtf_digi_payments.utils.admission', 'rtf_digi_payments.utils.histogram',
+)
+
+# Set in the master before forking: the shared scorer, and the worker index
+_preloaded: Dict = {}
+
+
+def preload(model_path: str = MODEL_PATH) -> Dict:
+    start = time.perf_counter()
+    for module in PRELOAD_MODULES:
+        import_module(module)
+    _preloaded['ml_scorer'] = MLFraudScorer(model_path)
+    return {'modules': len(sys.modules), 'duration_ms': round((time.perf_counter() - start) * 1000, 1)}
+
+
+def engine_options() -> Dict:
+    """FraudDetectionEngine keyword arguments for this process: the preloaded
+    scorer and, in a worker, a checkpoint directory of its own."""
+    options = {}
+    if 'ml_scorer' in _preloaded:
+        options['ml_scorer'] = _preloaded['ml_scorer']
+    if 'worker' in _preloaded:
+        options['checkpoint_dir'] = os.path.join(CHECKPOINT_DIR, f"prefork-{_preloaded['worker']}")
+    return options
+
+
+class PreforkServer:
+    def __init__(self, workers: int = PREFORK_WORKERS, host: str = '0.0.0.0', port: int = 8000,
+                 gc_freeze: bool = PREFORK_GC_FREEZE, warmup: Optional[int] = None,
+                 log_level: str = 'info'):
+        self.workers = workers
+        self.host = host
+        self.port = port
+        self.gc_freeze = gc_freeze
+        # None keeps WARMUP_TRANSACTIONS
+        self.warmup = warmup
+        self.log_level = log_level
+        self.socket = None
+        self.children: Dict[int, tuple] = {}  # pid -> (worker index, start time)
+        self.stopping = False
+
+    def run(self):
+        if AFFINITY_ROUTING_ENABLED:
+            raise RuntimeError("prefork serving needs AFFINITY_ROUTING_ENABLED = False: "
+                               "affinity routing runs its own workers behind one acceptor")
+        loaded = preload()
+        frozen = 0
+        if self.gc_freeze:
+            gc.collect()
+            gc.freeze()
+            frozen = gc.get_freeze_count()
+        self.socket = self._bind()
+        print(f"prefork master {os.getpid()}: {loaded['modules']} modules preloaded in {loaded['duration_ms']} ms, "
+              f"{frozen} objects frozen, listening on {self.host}:{self.port}", file=sys.stderr)
+
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+        for index in range(self.workers):
+            self._spawn(index)
+        self._supervise()
+        self.socket.close()
+
+    def _bind(self) -> socket.socket:
+        # IPPROTO_TCP explicitly: asyncio only sets TCP_NODELAY on accepted
+        # sockets whose proto says TCP, and without it Nagle's algorithm and
+        # delayed ACKs add ~40 ms to every keep-alive response
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM, socket.IPPROTO_TCP)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((self.host, self.port))
+        sock.listen(2048)
+        sock.set_inheritable(True)
+        return sock
+
+    def _spawn(self, index: int):
+        sys.stdout.flush()
+        sys.stderr.flush()
+        pid = os.fork()
+        if pid == 0:
+            status = 0
+            try:
+                self._serve(index)
+            except BaseException:
+                traceback.print_exc()
+                status = 1
+            finally:
+                os._exit(status)
+        self.children[pid] = (index, time.monotonic())
+
+    def _serve(self, index: int):
+        # uvicorn installs its own handlers for a graceful shutdown
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        _preloaded['worker'] = index
+        import uvicorn
+        from . import api
+
+        if self.warmup is not None:
+            api.WARMUP_TRANSACTIONS = self.warmup
+        uvicorn.Server(uvicorn.Config(api.app, log_level=self.log_level)).run(sockets=[self.socket])
+
+    def _stop(self, signum, frame):
+        self.stopping = True
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def _supervise(self):
+        while self.children:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            if pid not in self.children:
+                continue
+            index, started = self.children.pop(pid)
+            if self.stopping:
+                continue
+            print(f"prefork worker {index} (pid {pid}) exited with status {os.waitstatus_to_exitcode(status)}; "
+                  f"restarting", file=sys.stderr)
+            # Don't spin when a worker dies straight after starting
+            if time.monotonic() - started < 1:
+                time.sleep(1)
+            self._spawn(index)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Preload-and-fork REST API server")
+    parser.add_argument("--workers", type=int, default=PREFORK_WORKERS)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--no-gc-freeze", action="store_true", help="fork without gc.freeze() (for comparison)")
+    parser.add_argument("--warmup", type=int, help="warmup transactions per worker (default: WARMUP_TRANSACTIONS)")
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args()
+    PreforkServer(args.workers, args.host, args.port, not args.no_gc_freeze, args.warmup, args.log_level).run()
+
+
+if __name__ == "__main__":
+    # Through the package module rather than __main__, so api sees the same _preloaded
+    import_module('rtf_digi_payments.prefork').main()
@@ -0,0 +1,178 @@
+"""Process-pool execution of CPU-bound detector stages.
+
+The GIL limits an engine to about one core of Python work, which for this
+pipeline is mostly cycle search and model inference. ``ProcessPoolScorer``
+runs those stages in worker processes for ``analyze_batch``. Workers do not
+receive pickled detector state with each call. Read-mostly data is placed in
+``multiprocessing.shared_memory`` instead, and workers attach to it without
+copying:
+
+- the fitted model, published once per ``MLFraudScorer.model_version``
+- a per-batch CSR ring-search index built by the graph detector
+
+Only small descriptors and row ranges cross the process boundary.
+
+Biometric scoring stays in the engine's process, and the profiles never
+reach a worker. A batch scores biometrics wave by wave, and each wave's
+profile updates feed the next, so a worker would need a fresh snapshot
+of the touched profiles per wave. Scoring a wave is a vectorised mean/std
+over at most 100 samples per feature, which costs less than publishing
+that snapshot would.
+"""
+import multiprocessing
+import pickle
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .graph_detector import search_ring_index
+from .ml_scorer import MLFraudScorer
+from config.settings import PROCESS_POOL_MIN_TASK_ROWS
+
+# name, {key: (offset, dtype, shape)}
+ArrayDescriptor = Tuple[str, Dict[str, Tuple[int, str, Tuple[int, ...]]]]
+
+
+def publish_arrays(arrays: Dict[str, np.ndarray]) -> Tuple[shared_memory.SharedMemory, ArrayDescriptor]:
+    """Copy arrays into one new shared memory block. The caller owns the block
+    and must ``close()`` and ``unlink()`` it once workers are done."""
+    arrays = {key: np.ascontiguousarray(array) for key, array in arrays.items()}
+    layout = {}
+    offset = 0
+    for key, array in arrays.items():
+        offset = -(-offset // 8) * 8
+        layout[key] = (offset, array.dtype.str, array.shape)
+        offset += array.nbytes
+
+    shm = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+    for key, array in arrays.items():
+        start, dtype, shape = layout[key]
+        np.ndarray(shape, dtype, buffer=shm.buf, offset=start)[...] = array
+    return shm, (shm.name, layout)
+
+
+# Worker-side caches: attached blocks and the unpickled model
+_attached = OrderedDict()
+_MAX_ATTACHED = 4
+_model_cache: Dict[str, MLFraudScorer] = {}
+
+
+def attach_arrays(descriptor: ArrayDescriptor) -> Dict[str, np.ndarray]:
+    name, layout = descriptor
+    shm = _attached.get(name)
+    if shm is None:
+        shm = shared_memory.SharedMemory(name=name)
+        _attached[name] = shm
+        while len(_attached) > _MAX_ATTACHED:
+            _attached.popitem(last=False)[1].close()
+    return {
+        key: np.ndarray(shape, dtype, buffer=shm.buf, offset=offset)
+        for key, (offset, dtype, shape) in layout.items()
+    }
+
+
+def _predict_chunk(model_descriptor: ArrayDescriptor, features: np.ndarray) -> np.ndarray:
+    scorer = _model_cache.get(model_descriptor[0])
+    if scorer is None:
+        scorer = MLFraudScorer()
+        scorer.model = pickle.loads(attach_arrays(model_descriptor)['model'])
+        _model_cache.clear()
+        _model_cache[model_descriptor[0]] = scorer
+    return scorer.predict_fraud_probability_batch(features)
+
+
+def _search_chunk(index_descriptor: ArrayDescriptor, start: int, end: int, min_ring_size: int) -> List[bool]:
+    return search_ring_index(attach_arrays(index_descriptor), range(start, end), min_ring_size)
+
+
+class RingSearch:
+    def __init__(self, futures: List[Future], shm: Optional[shared_memory.SharedMemory] = None,
+                 found: Optional[List[bool]] = None):
+        self._futures = futures
+        self._shm = shm
+        self._found = found
+
+    def result(self) -> List[bool]:
+        if self._found is None:
+            try:
+                self._found = [found for future in self._futures for found in future.result()]
+            finally:
+                self._shm.close()
+                self._shm.unlink()
+        return self._found
+
+
+class ProcessPoolScorer:
+    def __init__(self, n_workers: int, min_task_rows: int = PROCESS_POOL_MIN_TASK_ROWS,
+                 start_method: str = 'spawn'):
+        self.n_workers = n_workers
+        self.min_task_rows = min_task_rows
+        self.executor = ProcessPoolExecutor(n_workers, mp_context=multiprocessing.get_context(start_method))
+        self.stats = {
+            'tasks': 0,
+            'inline_runs': 0,
+            'model_publishes': 0,
+            'shared_bytes': 0
+        }
+        self._model_shm = None
+        self._model_descriptor = None
+        self._model_key = None
+
+    def publish_model(self, ml_scorer: MLFraudScorer):
+        key = (id(ml_scorer.model), ml_scorer.model_version)
+        if key == self._model_key:
+            return
+        payload = np.frombuffer(pickle.dumps(ml_scorer.model), dtype=np.uint8)
+        shm, descriptor = publish_arrays({'model': payload})
+        # Workers still holding the old block keep it mapped until they move on
+        self._release_model()
+        self._model_shm, self._model_descriptor, self._model_key = shm, descriptor, key
+        self.stats['model_publishes'] += 1
+
+    def predict(self, ml_scorer: MLFraudScorer, features: np.ndarray) -> np.ndarray:
+        chunks = self._chunks(len(features))
+        if len(chunks) <= 1:
+            self.stats['inline_runs'] += 1
+            return ml_scorer.predict_fraud_probability_batch(features)
+
+        self.publish_model(ml_scorer)
+        futures = [self.executor.submit(_predict_chunk, self._model_descriptor, features[start:end])
+                   for start, end in chunks]
+        self.stats['tasks'] += len(futures)
+        return np.concatenate([future.result() for future in futures])
+
+    def search_rings(self, index: Dict[str, np.ndarray], min_ring_size: int) -> RingSearch:
+        # Returns at once; the caller can score other stages before result()
+        chunks = self._chunks(len(index['member_ptr']) - 1)
+        if len(chunks) <= 1:
+            self.stats['inline_runs'] += 1
+            steps = range(chunks[0][0], chunks[0][1]) if chunks else range(0)
+            return RingSearch([], found=search_ring_index(index, steps, min_ring_size))
+
+        shm, descriptor = publish_arrays(index)
+        self.stats['shared_bytes'] += shm.size
+        futures = [self.executor.submit(_search_chunk, descriptor, start, end, min_ring_size)
+                   for start, end in chunks]
+        self.stats['tasks'] += len(futures)
+        return RingSearch(futures, shm)
+
+    def get_stats(self) -> Dict:
+        return {**self.stats, 'workers': self.n_workers}
+
+    def shutdown(self):
+        self.executor.shutdown()
+        self._release_model()
+
+    def _release_model(self):
+        if self._model_shm is not None:
+            self._model_shm.close()
+            self._model_shm.unlink()
+            self._model_shm = None
+
+    def _chunks(self, n_rows: int) -> List[Tuple[int, int]]:
+        n_chunks = max(1, min(self.n_workers, n_rows // self.min_task_rows))
+        bounds = np.linspace(0, n_rows, n_chunks + 1).astype(int)
+        return [(int(start), int(end)) for start, end in zip(bounds[:-1], bounds[1:]) if end > start]
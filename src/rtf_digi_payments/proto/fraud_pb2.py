@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+# Generated by the protocol buffer compiler.  DO NOT EDIT!
+# NO CHECKED-IN PROTOBUF GENCODE
+# source: rtf_digi_payments/proto/fraud.proto
+# Protobuf Python Version: 7.35.1
+"""Generated protocol buffer code."""
+from google.protobuf import descriptor as _descriptor
+from google.protobuf import descriptor_pool as _descriptor_pool
+from google.protobuf import runtime_version as _runtime_version
+from google.protobuf import symbol_database as _symbol_database
+from google.protobuf.internal import builder as _builder
+_runtime_version.ValidateProtobufRuntimeVersion(
+    _runtime_version.Domain.PUBLIC,
+    7,
+    35,
+    1,
+    '',
+    'rtf_digi_payments/proto/fraud.proto'
+)
+# @@protoc_insertion_point(imports)
+
+_sym_db = _symbol_database.Default()
+
+
+from google.protobuf import timestamp_pb2 as google_dot_protobuf_dot_timestamp__pb2
+
+
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n#rtf_digi_payments/proto/fraud.proto\x12\x11rtf_digi_payments\x1a\x1fgoogle/protobuf/timestamp.proto\"\xcb\x01\n\rBiometricData\x12\x19\n\x0ctyping_speed\x18\x01 \x01(\x01H\x00\x88\x01\x01\x12\x1b\n\x0eswipe_velocity\x18\x02 \x01(\x01H\x01\x88\x01\x01\x12\x1d\n\x10pressure_pattern\x18\x03 \x01(\x01H\x02\x88\x01\x01\x12\x19\n\x0c\x64\x65vice_angle\x18\x04 \x01(\x01H\x03\x88\x01\x01\x42\x0f\n\r_typing_speedB\x11\n\x0f_swipe_velocityB\x13\n\x11_pressure_patternB\x0f\n\r_device_angle\"\xec\x02\n\x0bTransaction\x12\x16\n\x0etransaction_id\x18\x01 \x01(\t\x12\x11\n\tsender_id\x18\x02 \x01(\t\x12\x13\n\x0breceiver_id\x18\x03 \x01(\t\x12\x0e\n\x06\x61mount\x18\x04 \x01(\x01\x12-\n\ttimestamp\x18\x05 \x01(\x0b\x32\x1a.google.protobuf.Timestamp\x12\x11\n\tdevice_id\x18\x06 \x01(\t\x12\x12\n\nip_address\x18\x07 \x01(\t\x12\x38\n\tbiometric\x18\x08 \x01(\x0b\x32 .rtf_digi_payments.BiometricDataH\x00\x88\x01\x01\x12>\n\x08metadata\x18\t \x03(\x0b\x32,.rtf_digi_payments.Transaction.MetadataEntry\x1a/\n\rMetadataEntry\x12\x0b\n\x03key\x18\x01 \x01(\t\x12\r\n\x05value\x18\x02 \x01(\t:\x02\x38\x01\x42\x0c\n\n_biometric\"\x8a\x03\n\nFraudScore\x12\x16\n\x0etransaction_id\x18\x01 \x01(\t\x12\x19\n\x11\x66raud_probability\x18\x02 \x01(\x01\x12\x10\n\x08ml_score\x18\x03 \x01(\x01\x12\x13\n\x0bgraph_score\x18\x04 \x01(\x01\x12\x17\n\x0f\x62iometric_score\x18\x05 \x01(\x01\x12\x15\n\ris_fraudulent\x18\x06 \x01(\x08\x12\x12\n\nlatency_ms\x18\x07 \x01(\x01\x12\x13\n\x06reason\x18\x08 \x01(\tH\x00\x88\x01\x01\x12\x17\n\x0f\x64\x65graded_stages\x18\t \x03(\t\x12\x16\n\x0eskipped_stages\x18\n \x03(\t\x12\x10\n\x08\x64\x65graded\x18\x0b \x01(\x08\x12\x46\n\rstage_timings\x18\x0c \x03(\x0b\x32/.rtf_digi_payments.FraudScore.StageTimingsEntry\x1a\x33\n\x11StageTimingsEntry\x12\x0b\n\x03key\x18\x01 \x01(\t\x12\r\n\x05value\x18\x02 \x01(\x01:\x02\x38\x01\x42\t\n\x07_reason\"d\n\rAnalyzeResult\x12\x16\n\x0etransaction_id\x18\x01 \x01(\t\x12,\n\x05score\x18\x02 \x01(\x0b\x32\x1d.rtf_digi_payments.FraudScore\x12\r\n\x05\x65rror\x18\x03 \x01(\t2a\n\x0e\x46raudDetection\x12O\n\x07\x41nalyze\x12\x1e.rtf_digi_payments.Transaction\x1a .rtf_digi_payments.AnalyzeResult(\x01\x30\x01\x62\x06proto3')
+
+_globals = globals()
+_builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
+_builder.BuildTopDescriptorsAndMessages(DESCRIPTOR, 'rtf_digi_payments.proto.fraud_pb2', _globals)
+if not _descriptor._USE_C_DESCRIPTORS:
+  DESCRIPTOR._loaded_options = None
+  _globals['_TRANSACTION_METADATAENTRY']._loaded_options = None
+  _globals['_TRANSACTION_METADATAENTRY']._serialized_options = b'8\001'
+  _globals['_FRAUDSCORE_STAGETIMINGSENTRY']._loaded_options = None
+  _globals['_FRAUDSCORE_STAGETIMINGSENTRY']._serialized_options = b'8\001'
+  _globals['_BIOMETRICDATA']._serialized_start=92
+  _globals['_BIOMETRICDATA']._serialized_end=295
+  _globals['_TRANSACTION']._serialized_start=298
+  _globals['_TRANSACTION']._serialized_end=662
+  _globals['_TRANSACTION_METADATAENTRY']._serialized_start=601
+  _globals['_TRANSACTION_METADATAENTRY']._serialized_end=648
+  _globals['_FRAUDSCORE']._serialized_start=665
+  _globals['_FRAUDSCORE']._serialized_end=1059
+  _globals['_FRAUDSCORE_STAGETIMINGSENTRY']._serialized_start=997
+  _globals['_FRAUDSCORE_STAGETIMINGSENTRY']._serialized_end=1048
+  _globals['_ANALYZERESULT']._serialized_start=1061
+  _globals['_ANALYZERESULT']._serialized_end=1161
+  _globals['_FRAUDDETECTION']._serialized_start=1163
+  _globals['_FRAUDDETECTION']._serialized_end=1260
+# @@protoc_insertion_point(module_scope)
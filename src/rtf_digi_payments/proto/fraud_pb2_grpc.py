@@ -0,0 +1,97 @@
+# Generated by the gRPC Python protocol compiler plugin. DO NOT EDIT!
+"""Client and server classes corresponding to protobuf-defined services."""
+import grpc
+import warnings
+
+from rtf_digi_payments.proto import fraud_pb2 as rtf__digi__payments_dot_proto_dot_fraud__pb2
+
+GRPC_GENERATED_VERSION = '1.84.0'
+GRPC_VERSION = grpc.__version__
+_version_not_supported = False
+
+try:
+    from grpc._utilities import first_version_is_lower
+    _version_not_supported = first_version_is_lower(GRPC_VERSION, GRPC_GENERATED_VERSION)
+except ImportError:
+    _version_not_supported = True
+
+if _version_not_supported:
+    raise RuntimeError(
+        f'The grpc package installed is at version {GRPC_VERSION},'
+        + ' but the generated code in rtf_digi_payments/proto/fraud_pb2_grpc.py depends on'
+        + f' grpcio>={GRPC_GENERATED_VERSION}.'
+        + f' Please upgrade your grpc module to grpcio>={GRPC_GENERATED_VERSION}'
+        + f' or downgrade your generated code using grpcio-tools<={GRPC_VERSION}.'
+    )
+
+
+class FraudDetectionStub:
+    """Missing associated documentation comment in .proto file."""
+
+    def __init__(self, channel):
+        """Constructor.
+
+        Args:
+            channel: A grpc.Channel.
+        """
+        self.Analyze = channel.stream_stream(
+                '/rtf_digi_payments.FraudDetection/Analyze',
+                request_serializer=rtf__digi__payments_dot_proto_dot_fraud__pb2.Transaction.SerializeToString,
+                response_deserializer=rtf__digi__payments_dot_proto_dot_fraud__pb2.AnalyzeResult.FromString,
+                _registered_method=True)
+
+
+class FraudDetectionServicer:
+    """Missing associated documentation comment in .proto file."""
+
+    def Analyze(self, request_iterator, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+
+def add_FraudDetectionServicer_to_server(servicer, server):
+    rpc_method_handlers = {
+            'Analyze': grpc.stream_stream_rpc_method_handler(
+                    servicer.Analyze,
+                    request_deserializer=rtf__digi__payments_dot_proto_dot_fraud__pb2.Transaction.FromString,
+                    response_serializer=rtf__digi__payments_dot_proto_dot_fraud__pb2.AnalyzeResult.SerializeToString,
+            ),
+    }
+    generic_handler = grpc.method_handlers_generic_handler(
+            'rtf_digi_payments.FraudDetection', rpc_method_handlers)
+    server.add_generic_rpc_handlers((generic_handler,))
+    server.add_registered_method_handlers('rtf_digi_payments.FraudDetection', rpc_method_handlers)
+
+
+ # This class is part of an EXPERIMENTAL API.
+class FraudDetection:
+    """Missing associated documentation comment in .proto file."""
+
+    @staticmethod
+    def Analyze(request_iterator,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.stream_stream(
+            request_iterator,
+            target,
+            '/rtf_digi_payments.FraudDetection/Analyze',
+            rtf__digi__payments_dot_proto_dot_fraud__pb2.Transaction.SerializeToString,
+            rtf__digi__payments_dot_proto_dot_fraud__pb2.AnalyzeResult.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
@@ -0,0 +1,477 @@
+"""Offline replay and bulk re-scoring of historical transactions.
+
+Transactions are read ``REPLAY_CHUNK_SIZE`` rows at a time from any of:
+- JSON lines
+- CSV
+- Parquet
+- Arrow IPC files, including decision-archive segments or a whole archive
+  directory
+
+Each chunk is scored by a replay engine, which keeps all state in-process:
+no Redis, write-behind, idempotency store, decision log, archive or
+checkpoints. Chunks go through ``analyze_batch`` in input order, so input
+is expected in transaction-time order, as logs and archives already are.
+Replay engines run on an event clock. Velocity windows and expiry follow
+the replayed timestamps rather than the system time, so a run goes as fast
+as the engine scores and repeats exactly.
+
+With more than one worker, rows are partitioned by sender over the same
+consistent-hash ring as affinity routing, and each worker process owns the
+engine state of its partition. The reader blocks while a worker's queue
+holds ``REPLAY_QUEUE_CHUNKS`` chunks, so memory does not grow with the size
+of the input. Cross-partition state, such as a ring whose accounts hash to
+different workers, is seen the way affinity-routed serving sees it.
+``--workers 1`` reproduces a single engine exactly.
+
+Each worker writes its decisions to Parquet (or Arrow IPC) part files of at
+most ``REPLAY_FILE_ROWS`` rows, with one row group per chunk. Files are
+written under a temporary name and renamed once complete. When the input
+carries earlier decisions (``fraud_probability``/``is_fraudulent``, as
+archive segments do), they are kept as ``baseline_*`` columns, and the run
+summary counts the decisions that changed.
+
+Run with ``python -m rtf_digi_payments.replay``.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import queue
+import time
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List
+
+import numpy as np
+import pyarrow as pa
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+from .affinity import HashRing
+from .decision_archive import DecisionArchiveReader, decision_schema
+from .models.transaction import FraudScore, TransactionRecord
+from .utils.clock import EventClock
+from config.settings import (
+    AFFINITY_RING_REPLICAS, EVENT_CLOCK_ALLOWED_LATENESS_S, FRAUD_THRESHOLD, REPLAY_CHUNK_SIZE,
+    REPLAY_FILE_ROWS, REPLAY_QUEUE_CHUNKS, REPLAY_WORKERS
+)
+
+_BIOMETRIC_FIELDS = ('typing_speed', 'swipe_velocity', 'pressure_pattern', 'device_angle')
+# Identifiers stay strings even when a CSV column looks numeric
+_CSV_STRING_COLUMNS = ('transaction_id', 'sender_id', 'receiver_id', 'device_id', 'ip_address')
+_DELTA_BINS = 20
+
+
+# Replay output: the archive's decision columns that re-scoring reproduces
+_REPLAY_COLUMNS = ('transaction_id', 'sender_id', 'receiver_id', 'amount', 'timestamp',
+                   'fraud_probability', 'ml_score', 'graph_score', 'biometric_score',
+                   'is_fraudulent', 'reason', 'degraded')
+
+
+def replay_schema() -> pa.Schema:
+    archive = decision_schema()
+    return pa.schema([archive.field(name) for name in _REPLAY_COLUMNS] + [
+        # The input's own decision, null when it had none
+        pa.field('baseline_fraud_probability', archive.field('fraud_probability').type),
+        pa.field('baseline_is_fraudulent', archive.field('is_fraudulent').type)
+    ])
+
+
+def read_chunks(path: str, chunk_size: int = REPLAY_CHUNK_SIZE) -> Iterator[pa.RecordBatch]:
+    """Record batches of at most ``chunk_size`` rows, in file order."""
+    if os.path.isdir(path):
+        # A decision archive: its sealed segments in sequence order
+        for segment in DecisionArchiveReader(path).segments():
+            yield from read_chunks(segment, chunk_size)
+        return
+
+    suffix = os.path.splitext(path)[1].lower()
+    if suffix == '.parquet':
+        import pyarrow.parquet as pq
+        yield from pq.ParquetFile(path).iter_batches(batch_size=chunk_size)
+    elif suffix == '.csv':
+        import pyarrow.csv as pcsv
+        options = pcsv.ConvertOptions(column_types={name: pa.string() for name in _CSV_STRING_COLUMNS})
+        for batch in pcsv.open_csv(path, convert_options=options):
+            yield from _slices(batch, chunk_size)
+    elif suffix in ('.arrow', '.ipc', '.feather'):
+        reader = pa.ipc.open_file(pa.memory_map(path))
+        for i in range(reader.num_record_batches):
+            yield from _slices(reader.get_batch(i), chunk_size)
+    elif suffix in ('.jsonl', '.ndjson', '.json'):
+        yield from _read_json_lines(path, chunk_size)
+    else:
+        raise ValueError(f"unsupported input format: {path}")
+
+
+def _slices(batch: pa.RecordBatch, chunk_size: int) -> Iterator[pa.RecordBatch]:
+    for offset in range(0, batch.num_rows, chunk_size):
+        yield batch.slice(offset, chunk_size)
+
+
+def _read_json_lines(path: str, chunk_size: int) -> Iterator[pa.RecordBatch]:
+    loads = orjson.loads if orjson is not None else json.loads
+    rows = []
+    with open(path, 'rb') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            rows.append(loads(line))
+            if len(rows) == chunk_size:
+                yield _rows_batch(rows)
+                rows = []
+    if rows:
+        yield _rows_batch(rows)
+
+
+def _rows_batch(rows: List[Dict]) -> pa.RecordBatch:
+    # Columns from every row's keys; from_pylist would only use the first row's
+    names = dict.fromkeys(name for row in rows for name in row)
+    return pa.RecordBatch.from_pydict({name: [row.get(name) for row in rows] for name in names})
+
+
+def to_records(batch: pa.RecordBatch) -> List[TransactionRecord]:
+    """Engine records straight from the columns, without per-row validation:
+    replayed transactions were validated when they were first scored."""
+    columns = dict(zip(batch.schema.names, batch.columns))
+    n = batch.num_rows
+
+    def values(name):
+        column = columns.get(name)
+        return column.to_pylist() if column is not None else [None] * n
+
+    timestamps = values('timestamp')
+    if n and isinstance(timestamps[0], str):
+        timestamps = [datetime.fromisoformat(value) for value in timestamps]
+
+    # Nested (JSON, API payloads) or flat biometric_* columns (archive segments)
+    biometric = columns.get('biometric')
+    if biometric is not None and pa.types.is_struct(biometric.type):
+        flattened = dict(zip([field.name for field in biometric.type], biometric.flatten()))
+        biometric_values = [flattened[name].to_pylist() if name in flattened else [None] * n
+                            for name in _BIOMETRIC_FIELDS]
+    else:
+        biometric_values = [values(f'biometric_{name}') for name in _BIOMETRIC_FIELDS]
+    biometrics = [dict(zip(_BIOMETRIC_FIELDS, row)) if any(v is not None for v in row) else None
+                  for row in zip(*biometric_values)]
+
+    return [
+        TransactionRecord(transaction_id, sender_id, receiver_id, amount, timestamp,
+                          device_id, ip_address, biometric_row)
+        for transaction_id, sender_id, receiver_id, amount, timestamp, device_id, ip_address, biometric_row
+        in zip(values('transaction_id'), values('sender_id'), values('receiver_id'), values('amount'),
+               timestamps, values('device_id'), values('ip_address'), biometrics)
+    ]
+
+
+def decisions_batch(batch: pa.RecordBatch, records: List[TransactionRecord],
+                    scores: List[FraudScore]) -> pa.RecordBatch:
+    def baseline(name, type_):
+        if name in batch.schema.names:
+            return batch.column(name).cast(type_)
+        return pa.nulls(batch.num_rows, type_)
+
+    return pa.RecordBatch.from_arrays([
+        pa.array([record.transaction_id for record in records], pa.string()),
+        pa.array([record.sender_id for record in records], pa.string()),
+        pa.array([record.receiver_id for record in records], pa.string()),
+        pa.array([record.amount for record in records], pa.float64()),
+        pa.array([record.timestamp for record in records], pa.timestamp('us')),
+        pa.array([score.fraud_probability for score in scores], pa.float64()),
+        pa.array([score.ml_score for score in scores], pa.float64()),
+        pa.array([score.graph_score for score in scores], pa.float64()),
+        pa.array([score.biometric_score for score in scores], pa.float64()),
+        pa.array([score.is_fraudulent for score in scores], pa.bool_()),
+        pa.array([score.reason for score in scores], pa.string()),
+        pa.array([score.degraded for score in scores], pa.bool_()),
+        baseline('fraud_probability', pa.float64()),
+        baseline('is_fraudulent', pa.bool_())
+    ], schema=replay_schema())
+
+
+class ReplaySummary:
+    """Decision counts and score changes, mergeable across workers."""
+
+    def __init__(self):
+        self.rows = 0
+        self.flagged = 0
+        # Rows with a baseline decision to compare against
+        self.compared = 0
+        self.flagged_before = 0
+        self.newly_flagged = 0
+        self.cleared = 0
+        self.delta_sum = 0.0
+        self.abs_delta_sum = 0.0
+        self.max_abs_delta = 0.0
+        # New minus baseline probability, in equal bins over [-1, 1]
+        self.delta_histogram = np.zeros(_DELTA_BINS, dtype=np.int64)
+
+    def add(self, decisions: pa.RecordBatch):
+        flagged = np.asarray(decisions.column('is_fraudulent').to_pylist(), dtype=bool)
+        self.rows += len(flagged)
+        self.flagged += int(flagged.sum())
+
+        baseline = decisions.column('baseline_fraud_probability')
+        if baseline.null_count == len(baseline):
+            return
+        compared = np.asarray(baseline.is_valid().to_pylist(), dtype=bool)
+        before = np.asarray(baseline.fill_null(0.0).to_numpy(zero_copy_only=False))[compared]
+        after = decisions.column('fraud_probability').to_numpy(zero_copy_only=False)[compared]
+        # Without a recorded flag, the baseline probability is held to today's threshold
+        flags = decisions.column('baseline_is_fraudulent').to_pylist()
+        was_flagged = np.asarray([flag for flag, valid in zip(flags, compared) if valid], dtype=object)
+        missing = np.asarray([flag is None for flag in was_flagged], dtype=bool)
+        was_flagged[missing] = before[missing] >= FRAUD_THRESHOLD
+        was_flagged = was_flagged.astype(bool)
+        now_flagged = flagged[compared]
+
+        delta = after - before
+        self.compared += int(compared.sum())
+        self.flagged_before += int(was_flagged.sum())
+        self.newly_flagged += int((now_flagged & ~was_flagged).sum())
+        self.cleared += int((was_flagged & ~now_flagged).sum())
+        self.delta_sum += float(delta.sum())
+        self.abs_delta_sum += float(np.abs(delta).sum())
+        if len(delta):
+            self.max_abs_delta = max(self.max_abs_delta, float(np.abs(delta).max()))
+        self.delta_histogram += np.histogram(delta, bins=_DELTA_BINS, range=(-1.0, 1.0))[0]
+
+    def merge(self, other: 'ReplaySummary'):
+        for name in ('rows', 'flagged', 'compared', 'flagged_before', 'newly_flagged', 'cleared',
+                     'delta_sum', 'abs_delta_sum'):
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+        self.max_abs_delta = max(self.max_abs_delta, other.max_abs_delta)
+        self.delta_histogram += other.delta_histogram
+
+    def to_dict(self) -> Dict:
+        summary = {'rows': self.rows, 'flagged': self.flagged}
+        if self.compared:
+            edges = np.linspace(-1.0, 1.0, _DELTA_BINS + 1)
+            summary.update({
+                'compared': self.compared,
+                'flagged_before': self.flagged_before,
+                'newly_flagged': self.newly_flagged,
+                'cleared': self.cleared,
+                'mean_delta': round(self.delta_sum / self.compared, 6),
+                'mean_abs_delta': round(self.abs_delta_sum / self.compared, 6),
+                'max_abs_delta': round(self.max_abs_delta, 6),
+                'delta_histogram': [[round(float(edges[i]), 2), int(count)]
+                                    for i, count in enumerate(self.delta_histogram) if count]
+            })
+        return summary
+
+
+class PartWriter:
+    """One worker's decision files, rotated every ``max_rows`` rows."""
+
+    def __init__(self, directory: str, worker: int, file_format: str = 'parquet',
+                 max_rows: int = REPLAY_FILE_ROWS):
+        if file_format not in ('parquet', 'arrow'):
+            raise ValueError(f"unknown output format {file_format!r}")
+        self.directory = directory
+        self.worker = worker
+        self.file_format = file_format
+        self.max_rows = max_rows
+        self.files: List[str] = []
+        self._writer = None
+        self._sink = None
+        self._path = None
+        self._rows = 0
+
+    def write(self, batch: pa.RecordBatch):
+        if self._writer is not None and self._rows + batch.num_rows > self.max_rows:
+            self._seal()
+        if self._writer is None:
+            self._open(batch.schema)
+        self._writer.write_batch(batch)
+        self._rows += batch.num_rows
+
+    def _open(self, schema: pa.Schema):
+        self._path = os.path.join(self.directory, f'part-{self.worker:03d}-{len(self.files):05d}.{self.file_format}')
+        if self.file_format == 'parquet':
+            import pyarrow.parquet as pq
+            self._writer = pq.ParquetWriter(self._path + '.tmp', schema)
+        else:
+            self._sink = pa.OSFile(self._path + '.tmp', 'wb')
+            self._writer = pa.ipc.new_file(self._sink, schema)
+        self._rows = 0
+
+    def _seal(self):
+        self._writer.close()
+        if self._sink is not None:
+            self._sink.close()
+            self._sink = None
+        os.replace(self._path + '.tmp', self._path)
+        self.files.append(self._path)
+        self._writer = None
+
+    def close(self):
+        if self._writer is not None:
+            self._seal()
+
+
+def replay_engine(**options):
+    """An engine that keeps all state in-process and scores inline, on event
+    time that is never capped by the system time."""
+    from .fraud_engine import FraudDetectionEngine
+
+    return FraudDetectionEngine(**{
+        'write_behind': False, 'idempotency': False, 'process_pool_workers': 0, 'decision_log': False,
+        'decision_archive': False, 'checkpoint': False, 'redis_host': None,
+        'clock': EventClock(EVENT_CLOCK_ALLOWED_LATENESS_S), **options
+    })
+
+
+class _Partition:
+    def __init__(self, output_dir: str, worker: int, file_format: str, max_rows: int):
+        self.engine = replay_engine()
+        self.writer = PartWriter(output_dir, worker, file_format, max_rows)
+        self.summary = ReplaySummary()
+
+    def score(self, batch: pa.RecordBatch):
+        records = to_records(batch)
+        decisions = decisions_batch(batch, records, self.engine.analyze_batch(records))
+        self.writer.write(decisions)
+        self.summary.add(decisions)
+
+    def close(self):
+        self.writer.close()
+        self.engine.close()
+
+
+def _worker_main(worker: int, chunks, results, output_dir: str, file_format: str, max_rows: int):
+    try:
+        partition = _Partition(output_dir, worker, file_format, max_rows)
+        while True:
+            batch = chunks.get()
+            if batch is None:
+                break
+            partition.score(batch)
+        partition.close()
+        results.put((worker, True, (partition.summary, partition.writer.files)))
+    except Exception as exc:
+        results.put((worker, False, f"{type(exc).__name__}: {exc}"))
+
+
+def _put(chunks, process, item):
+    # A bounded queue blocks the reader; stop waiting if its worker has died
+    while True:
+        try:
+            chunks.put(item, timeout=1)
+            return
+        except queue.Full:
+            if not process.is_alive():
+                raise RuntimeError(f"replay worker {process.name} exited with status {process.exitcode}")
+
+
+def _results(results, processes) -> Iterator[tuple]:
+    # One report per worker. A worker killed before reporting (OOM killer,
+    # a crash in native code) never will, so fail the run naming it
+    pending = set(range(len(processes)))
+    while pending:
+        try:
+            message = results.get(timeout=1)
+        except queue.Empty:
+            dead = [worker for worker in sorted(pending) if not processes[worker].is_alive()]
+            if not dead:
+                continue
+            try:
+                # A report sent just before the worker exited
+                message = results.get(timeout=1)
+            except queue.Empty:
+                process = processes[dead[0]]
+                raise RuntimeError(f"replay worker {process.name} exited with status "
+                                   f"{process.exitcode} without reporting")
+        pending.discard(message[0])
+        yield message
+
+
+def replay(inputs: Iterable[str], output_dir: str, workers: int = REPLAY_WORKERS,
+           chunk_size: int = REPLAY_CHUNK_SIZE, file_format: str = 'parquet',
+           max_rows: int = REPLAY_FILE_ROWS, start_method: str = 'spawn') -> Dict:
+    """Re-score every transaction in ``inputs`` and write the decisions to
+    ``output_dir``. Returns the run summary, also written as summary.json."""
+    os.makedirs(output_dir, exist_ok=True)
+    workers = workers or os.cpu_count() or 1
+    start = time.perf_counter()
+    chunks = (batch for path in inputs for batch in read_chunks(path, chunk_size))
+    summary = ReplaySummary()
+    files = []
+
+    if workers == 1:
+        partition = _Partition(output_dir, 0, file_format, max_rows)
+        for batch in chunks:
+            partition.score(batch)
+        partition.close()
+        summary, files = partition.summary, partition.writer.files
+    else:
+        context = multiprocessing.get_context(start_method)
+        results = context.Queue()
+        queues = [context.Queue(REPLAY_QUEUE_CHUNKS) for _ in range(workers)]
+        processes = [context.Process(target=_worker_main, name=f'replay-{worker}', daemon=True,
+                                     args=(worker, queues[worker], results, output_dir, file_format, max_rows))
+                     for worker in range(workers)]
+        for process in processes:
+            process.start()
+        ring = HashRing(range(workers), AFFINITY_RING_REPLICAS)
+        try:
+            for batch in chunks:
+                owners = np.fromiter((ring.node_for(sender) for sender in batch.column('sender_id').to_pylist()),
+                                     dtype=np.int64, count=batch.num_rows)
+                for worker in range(workers):
+                    rows = np.flatnonzero(owners == worker)
+                    if len(rows):
+                        _put(queues[worker], processes[worker], batch.take(pa.array(rows)))
+            for worker in range(workers):
+                _put(queues[worker], processes[worker], None)
+
+            errors = []
+            for worker, ok, payload in _results(results, processes):
+                if not ok:
+                    errors.append(f"worker {worker}: {payload}")
+                    continue
+                worker_summary, worker_files = payload
+                summary.merge(worker_summary)
+                files.extend(worker_files)
+            if errors:
+                raise RuntimeError("replay failed: " + "; ".join(errors))
+        finally:
+            for chunk_queue in queues:
+                # Don't block exit flushing chunks to a worker that is gone
+                chunk_queue.cancel_join_thread()
+            for process in processes:
+                process.join(timeout=5)
+                if process.is_alive():
+                    process.terminate()
+
+    seconds = time.perf_counter() - start
+    result = {
+        'workers': workers,
+        'seconds': round(seconds, 3),
+        'rows_per_s': round(summary.rows / seconds, 1) if seconds else 0.0,
+        'files': sorted(files),
+        'decisions': summary.to_dict()
+    }
+    with open(os.path.join(output_dir, 'summary.json'), 'w') as f:
+        json.dump(result, f, indent=2)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay historical transactions through the engine")
+    parser.add_argument("inputs", nargs="+",
+                        help="JSON lines, CSV, Parquet or Arrow files, or decision-archive directories")
+    parser.add_argument("--output", required=True, help="directory for decision part files and summary.json")
+    parser.add_argument("--workers", type=int, default=REPLAY_WORKERS, help="worker processes (0: one per CPU)")
+    parser.add_argument("--chunk-size", type=int, default=REPLAY_CHUNK_SIZE)
+    parser.add_argument("--format", choices=("parquet", "arrow"), default="parquet")
+    parser.add_argument("--file-rows", type=int, default=REPLAY_FILE_ROWS, help="rows per output part file")
+    args = parser.parse_args()
+    result = replay(args.inputs, args.output, args.workers, args.chunk_size, args.format, args.file_rows)
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""Shared scheduler for detector stage work.
+
+One pool serves every FraudDetectionEngine in the process. Queued work is
+ordered by stage priority (lower runs first) so cheap stages don't wait
+behind slow ones, cancelled work is dropped without occupying a thread, and
+stages whose observed run time is below ``inline_threshold_ms`` run directly
+on the caller's thread instead of paying for a thread hop.
+"""
+import heapq
+import itertools
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, Optional
+
+from config.settings import SCORING_POOL_SIZE, STAGE_PRIORITIES, INLINE_STAGE_THRESHOLD_MS
+
+_STOP = object()
+
+
+class StageScheduler:
+    def __init__(self, max_workers: int = SCORING_POOL_SIZE,
+                 priorities: Optional[Dict[str, int]] = None,
+                 inline_threshold_ms: float = INLINE_STAGE_THRESHOLD_MS,
+                 min_samples: int = 20):
+        self.max_workers = max_workers
+        self.priorities = dict(STAGE_PRIORITIES if priorities is None else priorities)
+        self.inline_threshold_ms = inline_threshold_ms
+        self.min_samples = min_samples
+
+        self._heap = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._stage_stats = {}
+        self._max_queue_depth = 0
+        self._shutdown = False
+        self._threads = [
+            threading.Thread(target=self._worker, name=f"stage-worker-{i}", daemon=True)
+            for i in range(max_workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def is_inline(self, stage: str) -> bool:
+        stats = self._stage_stats.get(stage)
+        if not stats or stats['runs'] < self.min_samples:
+            return False
+        return stats['run_ewma_ms'] < self.inline_threshold_ms
+
+    def submit(self, stage: str, fn: Callable, *args, **kwargs) -> Future:
+        future = Future()
+        if self.is_inline(stage):
+            future.set_running_or_notify_cancel()
+            self._run(stage, future, fn, args, kwargs, wait_ms=0.0, inline=True)
+            return future
+
+        priority = self.priorities.get(stage, len(self.priorities))
+        with self._cond:
+            if self._shutdown:
+                raise RuntimeError("scheduler has been shut down")
+            heapq.heappush(self._heap, (priority, next(self._seq), time.perf_counter(),
+                                        stage, future, fn, args, kwargs))
+            self._max_queue_depth = max(self._max_queue_depth, len(self._heap))
+            self._cond.notify()
+        return future
+
+    def get_metrics(self) -> Dict:
+        with self._cond:
+            stages = {}
+            for stage, stats in self._stage_stats.items():
+                queued = stats['queued_runs']
+                stages[stage] = {
+                    'runs': stats['runs'],
+                    'inline_runs': stats['inline_runs'],
+                    'cancelled': stats['cancelled'],
+                    'avg_wait_ms': round(stats['wait_ms'] / queued, 3) if queued else 0.0,
+                    'max_wait_ms': round(stats['max_wait_ms'], 3),
+                    'avg_run_ms': round(stats['run_ewma_ms'], 3)
+                }
+            return {
+                'workers': self.max_workers,
+                'queue_depth': len(self._heap),
+                'max_queue_depth': self._max_queue_depth,
+                'stages': stages
+            }
+
+    def shutdown(self):
+        with self._cond:
+            self._shutdown = True
+            for _ in self._threads:
+                heapq.heappush(self._heap, (float('inf'), next(self._seq), 0.0, None, _STOP, None, (), {}))
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join()
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                while not self._heap:
+                    self._cond.wait()
+                _, _, enqueued_at, stage, future, fn, args, kwargs = heapq.heappop(self._heap)
+            if future is _STOP:
+                return
+            if not future.set_running_or_notify_cancel():
+                # Cancelled while queued: never occupies a worker
+                with self._cond:
+                    self._stats_for(stage)['cancelled'] += 1
+                continue
+            wait_ms = (time.perf_counter() - enqueued_at) * 1000
+            self._run(stage, future, fn, args, kwargs, wait_ms=wait_ms, inline=False)
+
+    def _run(self, stage, future, fn, args, kwargs, wait_ms: float, inline: bool):
+        start = time.perf_counter()
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as exc:
+            future.set_exception(exc)
+        else:
+            future.set_result(result)
+        run_ms = (time.perf_counter() - start) * 1000
+
+        with self._cond:
+            stats = self._stats_for(stage)
+            stats['runs'] += 1
+            stats['run_ewma_ms'] = run_ms if stats['runs'] == 1 else 0.9 * stats['run_ewma_ms'] + 0.1 * run_ms
+            if inline:
+                stats['inline_runs'] += 1
+            else:
+                stats['queued_runs'] += 1
+                stats['wait_ms'] += wait_ms
+                stats['max_wait_ms'] = max(stats['max_wait_ms'], wait_ms)
+
+    def _stats_for(self, stage: str) -> Dict:
+        if stage not in self._stage_stats:
+            self._stage_stats[stage] = {
+                'runs': 0,
+                'inline_runs': 0,
+                'queued_runs': 0,
+                'cancelled': 0,
+                'wait_ms': 0.0,
+                'max_wait_ms': 0.0,
+                'run_ewma_ms': 0.0
+            }
+        return self._stage_stats[stage]
+
+
+_shared_scheduler = None
+_shared_lock = threading.Lock()
+
+
+def get_shared_scheduler() -> StageScheduler:
+    global _shared_scheduler
+    with _shared_lock:
+        if _shared_scheduler is None:
+            _shared_scheduler = StageScheduler()
+        return _shared_scheduler
@@ -0,0 +1,492 @@
+"""Engine state snapshots and incremental checkpoints.
+
+A snapshot holds the per-account state a restart would otherwise lose:
+- graph edges
+- transaction-time (velocity) buffers
+- biometric profiles
+- the local history/counter cache
+
+It is stored as flat numpy arrays, with every account id, device, IP
+and timestamp string referenced by index into one interned string table.
+
+File layout (little-endian)::
+
+    magic "RTFSNAP\\0" | uint32 format version | uint32 header length
+    header JSON: {"meta": {...}, "arrays": {name: [offset, dtype, shape]}}
+    array data, each array 64-byte aligned, offsets from the start of the file
+
+Restore memory-maps the file and builds the engine's Python structures
+straight from array views, so nothing is parsed row by row.
+
+A ``full`` snapshot replaces all state. A ``delta`` lists the accounts that
+changed since the previous checkpoint and replaces exactly those: their
+outgoing edges, times, profile and cache entries. Components mark changed
+accounts in a ``DirtyAccounts`` set, which each checkpoint drains.
+Snapshots are taken stripe by stripe under the components' striped locks,
+so scoring only ever waits on one stripe briefly. The result is
+consistent per account, not a single point in time. Anything changed
+mid-snapshot is marked again and lands in the next delta.
+
+Redis-side state is not included. Neither are the cache's pending
+reconciliation counters, because Redis outlives the worker. Restored cache
+entries get a full TTL. The engine clock's time is stored in the header,
+and restoring it lets an event clock carry on from there.
+"""
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+from .biometric_analyzer import BIOMETRIC_FEATURES
+
+MAGIC = b"RTFSNAP\0"
+FORMAT_VERSION = 1
+MANIFEST = "MANIFEST.json"
+_PREAMBLE = struct.Struct("<8sII")
+_ALIGN = 64
+_HISTORY_PREFIX = "user:"
+_HISTORY_SUFFIX = ":history"
+_COUNT_SUFFIX = ":txn_window"
+
+
+class SnapshotFormatError(ValueError):
+    pass
+
+
+class DirtyAccounts:
+    """Accounts whose state changed since the last drain."""
+    def __init__(self):
+        self._accounts: Set[str] = set()
+        self._lock = threading.Lock()
+
+    def mark(self, account: str):
+        with self._lock:
+            self._accounts.add(account)
+
+    def mark_many(self, accounts: Iterable[str]):
+        with self._lock:
+            self._accounts.update(accounts)
+
+    def drain(self) -> Set[str]:
+        with self._lock:
+            accounts, self._accounts = self._accounts, set()
+        return accounts
+
+    def __len__(self) -> int:
+        return len(self._accounts)
+
+
+class StringTable:
+    def __init__(self):
+        self.index: Dict[str, int] = {}
+        self.strings: List[str] = []
+
+    def add(self, value: Optional[str]) -> int:
+        if value is None:
+            return -1
+        i = self.index.get(value)
+        if i is None:
+            i = self.index[value] = len(self.strings)
+            self.strings.append(value)
+        return i
+
+    def arrays(self) -> Dict[str, np.ndarray]:
+        encoded = [s.encode() for s in self.strings]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(b) for b in encoded], out=offsets[1:])
+        return {'strings_offsets': offsets, 'strings_data': np.frombuffer(b"".join(encoded), dtype=np.uint8)}
+
+
+def decode_strings(offsets: np.ndarray, data: np.ndarray) -> List[str]:
+    raw = data.tobytes()
+    bounds = offsets.tolist()
+    if raw.isascii():
+        # Byte offsets are character offsets: decode once, then slice
+        text = raw.decode('ascii')
+        return [text[start:end] for start, end in zip(bounds, bounds[1:])]
+    return [raw[start:end].decode() for start, end in zip(bounds, bounds[1:])]
+
+
+def _by_stripe(locks, accounts: Iterable[str]) -> Dict[int, List[str]]:
+    groups: Dict[int, List[str]] = {}
+    for account in accounts:
+        groups.setdefault(locks.stripe(account), []).append(account)
+    return groups
+
+
+def _csr(rows: List[List]) -> Tuple[np.ndarray, List]:
+    offsets = np.zeros(len(rows) + 1, dtype=np.int64)
+    np.cumsum([len(row) for row in rows], out=offsets[1:])
+    return offsets, [value for row in rows for value in row]
+
+
+def _split(values: List, offsets: np.ndarray) -> List[List]:
+    bounds = offsets.tolist()
+    return [values[start:end] for start, end in zip(bounds, bounds[1:])]
+
+
+def collect_state(engine, accounts: Optional[Set[str]] = None) -> Tuple[Dict[str, np.ndarray], Dict]:
+    """Flat arrays for every account (``accounts=None``) or only the given ones."""
+    graph_detector = engine.graph_detector
+    profiles = engine.biometric_analyzer.user_profiles
+    cache_manager = engine.cache_manager
+    graph = graph_detector.graph
+    strings = StringTable()
+
+    # Edges and transaction times belong to the sending account
+    src, dst, weights, amounts = [], [], [], []
+    times_accounts, times_rows = [], []
+    graph_accounts = set(graph._succ).union(graph_detector.transaction_times) if accounts is None else accounts
+    for stripe, group in _by_stripe(graph_detector.locks, graph_accounts).items():
+        with graph_detector.locks.hold_stripe(stripe):
+            for account in group:
+                for receiver, data in list(graph._succ.get(account, {}).items()):
+                    src.append(strings.add(account))
+                    dst.append(strings.add(receiver))
+                    weights.append(data['weight'])
+                    amounts.append(data['total_amount'])
+                times = graph_detector.transaction_times.get(account)
+                if times:
+                    times_accounts.append(strings.add(account))
+                    times_rows.append(list(times))
+
+    bio_accounts, bio_rows = [], []
+    bio_locks = engine.biometric_analyzer.locks
+    for stripe, group in _by_stripe(bio_locks, list(profiles) if accounts is None else accounts).items():
+        with bio_locks.hold_stripe(stripe):
+            for account in group:
+                profile = profiles.get(account)
+                if profile is not None:
+                    bio_accounts.append(strings.add(account))
+                    bio_rows.append({key: list(profile[key]) for key in BIOMETRIC_FEATURES})
+
+    if accounts is None:
+        cache_accounts = {key[len(_HISTORY_PREFIX):].rsplit(':', 1)[0]
+                          for key in list(cache_manager.cache) if key.startswith(_HISTORY_PREFIX)}
+    else:
+        cache_accounts = accounts
+    histories, counts = [], []
+    for stripe, group in _by_stripe(cache_manager.locks, cache_accounts).items():
+        with cache_manager.locks.hold_stripe(stripe):
+            for account in group:
+                history = cache_manager.cache.get(f"{_HISTORY_PREFIX}{account}{_HISTORY_SUFFIX}")
+                if history is not None:
+                    histories.append((account, dict(history)))
+                count = cache_manager.cache.get(f"{_HISTORY_PREFIX}{account}{_COUNT_SUFFIX}")
+                if count is not None:
+                    counts.append((strings.add(account), count))
+
+    arrays = {
+        'edge_src': np.array(src, dtype=np.int32),
+        'edge_dst': np.array(dst, dtype=np.int32),
+        'edge_weight': np.array(weights, dtype=np.int64),
+        'edge_amount': np.array(amounts, dtype=np.float64),
+        'times_account': np.array(times_accounts, dtype=np.int32)
+    }
+    arrays['times_offsets'], values = _csr(times_rows)
+    arrays['times_values'] = np.array(values, dtype='datetime64[us]')
+    arrays['bio_account'] = np.array(bio_accounts, dtype=np.int32)
+    for key in BIOMETRIC_FEATURES:
+        arrays[f'bio_{key}_offsets'], values = _csr([row[key] for row in bio_rows])
+        arrays[f'bio_{key}_values'] = np.array(values, dtype=np.float64)
+
+    def flag(history, key):
+        return -1 if key not in history else int(bool(history[key]))
+
+    arrays.update({
+        'hist_account': np.array([strings.add(a) for a, _ in histories], dtype=np.int32),
+        'hist_txn_count': np.array([h['txn_count'] for _, h in histories], dtype=np.int64),
+        'hist_amount_velocity': np.array([h.get('amount_velocity', 0) for _, h in histories], dtype=np.int64),
+        'hist_last_device': np.array([strings.add(h.get('last_device')) for _, h in histories], dtype=np.int32),
+        'hist_last_ip': np.array([strings.add(h.get('last_ip')) for _, h in histories], dtype=np.int32),
+        'hist_last_txn_time': np.array([strings.add(h.get('last_txn_time')) for _, h in histories],
+                                       dtype=np.int32),
+        'hist_device_changed': np.array([flag(h, 'device_changed') for _, h in histories], dtype=np.int8),
+        'hist_ip_changed': np.array([flag(h, 'ip_changed') for _, h in histories], dtype=np.int8),
+        'count_account': np.array([a for a, _ in counts], dtype=np.int32),
+        'count_value': np.array([c for _, c in counts], dtype=np.int64),
+        'accounts': np.array([strings.add(a) for a in sorted(accounts)] if accounts is not None else [],
+                             dtype=np.int32)
+    })
+    arrays.update(strings.arrays())
+    summary = {'edges': len(src), 'times_accounts': len(times_accounts), 'profiles': len(bio_accounts),
+               'histories': len(histories), 'counters': len(counts), 'strings': len(strings.strings)}
+    return arrays, summary
+
+
+def write_snapshot(path: str, arrays: Dict[str, np.ndarray], meta: Dict) -> int:
+    """Write atomically (temp file + rename); returns the file size."""
+    layout = {}
+    offset = 0
+    for name, array in arrays.items():
+        offset = -(-offset // _ALIGN) * _ALIGN
+        layout[name] = [offset, array.dtype.str, list(array.shape)]
+        offset += array.nbytes
+    header = json.dumps({'meta': meta, 'arrays': layout}).encode()
+    data_start = -(-(_PREAMBLE.size + len(header)) // _ALIGN) * _ALIGN
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(_PREAMBLE.pack(MAGIC, FORMAT_VERSION, len(header)))
+        f.write(header)
+        for name, array in arrays.items():
+            f.seek(data_start + layout[name][0])
+            f.write(np.ascontiguousarray(array).tobytes())
+        f.truncate(data_start + offset)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return data_start + offset
+
+
+class Snapshot:
+    """A snapshot file opened for reading; arrays are views into a memory map."""
+    def __init__(self, path: str, use_mmap: bool = True):
+        with open(path, 'rb') as f:
+            magic, version, header_length = _PREAMBLE.unpack(f.read(_PREAMBLE.size))
+            if magic != MAGIC:
+                raise SnapshotFormatError(f"{path} is not an engine snapshot")
+            if version > FORMAT_VERSION:
+                raise SnapshotFormatError(f"{path} has format version {version}; "
+                                          f"this build reads up to {FORMAT_VERSION}")
+            header = json.loads(f.read(header_length))
+            if use_mmap:
+                self._buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            else:
+                f.seek(0)
+                self._buffer = f.read()
+
+        self.meta = header['meta']
+        data_start = -(-(_PREAMBLE.size + header_length) // _ALIGN) * _ALIGN
+        self.arrays = {}
+        for name, (offset, dtype, shape) in header['arrays'].items():
+            end = data_start + offset + int(np.prod(shape)) * np.dtype(dtype).itemsize
+            if end > len(self._buffer):
+                raise SnapshotFormatError(f"{path} is truncated (array {name})")
+            self.arrays[name] = np.ndarray(shape, dtype, buffer=self._buffer, offset=data_start + offset)
+
+    def close(self):
+        self.arrays = {}
+        if isinstance(self._buffer, mmap.mmap):
+            try:
+                self._buffer.close()
+            except BufferError:
+                # A caller still holds a view; the map goes when it does
+                pass
+
+    def __enter__(self) -> 'Snapshot':
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def apply_snapshot(engine, snapshot: Snapshot):
+    """Load a full snapshot, or replace the accounts listed in a delta."""
+    arrays = snapshot.arrays
+    strings = decode_strings(arrays['strings_offsets'], arrays['strings_data'])
+
+    def names(key: str) -> List[str]:
+        return [strings[i] for i in arrays[key].tolist()]
+
+    def optional(key: str) -> List[Optional[str]]:
+        return [strings[i] if i >= 0 else None for i in arrays[key].tolist()]
+
+    graph_detector = engine.graph_detector
+    graph = graph_detector.graph
+    profiles = engine.biometric_analyzer.user_profiles
+    cache_manager = engine.cache_manager
+    replaced = names('accounts')
+    # An event clock resumes from where the snapshot left off
+    if 'clock' in snapshot.meta:
+        engine.clock.observe(datetime.fromisoformat(snapshot.meta['clock']))
+
+    with graph_detector.locks.hold_all(), engine.biometric_analyzer.locks.hold_all(), \
+            cache_manager.locks.hold_all():
+        if snapshot.meta['kind'] == 'full':
+            graph.clear()
+            graph_detector.transaction_times.clear()
+            profiles.clear()
+            cache_manager.clear_local()
+        else:
+            for account in replaced:
+                if account in graph:
+                    graph.remove_edges_from(list(graph.out_edges(account)))
+                graph_detector.transaction_times.pop(account, None)
+                profiles.pop(account, None)
+                cache_manager.discard_local(account)
+
+        graph.add_edges_from(
+            (s, d, {'weight': w, 'total_amount': a})
+            for s, d, w, a in zip(names('edge_src'), names('edge_dst'),
+                                  arrays['edge_weight'].tolist(), arrays['edge_amount'].tolist())
+        )
+        # Accounts whose last edge went away since the base snapshot
+        graph.remove_nodes_from([a for a in replaced if a in graph and graph.degree(a) == 0])
+
+        times = _split(arrays['times_values'].tolist(), arrays['times_offsets'])
+        graph_detector.transaction_times.update(zip(names('times_account'), times))
+
+        columns = {key: _split(arrays[f'bio_{key}_values'].tolist(), arrays[f'bio_{key}_offsets'])
+                   for key in BIOMETRIC_FEATURES}
+        for i, account in enumerate(names('bio_account')):
+            profiles[account] = {key: columns[key][i] for key in BIOMETRIC_FEATURES}
+
+        rows = zip(names('hist_account'), arrays['hist_txn_count'].tolist(),
+                   arrays['hist_amount_velocity'].tolist(), optional('hist_last_device'),
+                   optional('hist_last_ip'), optional('hist_last_txn_time'),
+                   arrays['hist_device_changed'].tolist(), arrays['hist_ip_changed'].tolist())
+        for account, txn_count, velocity, device, ip, last_time, device_changed, ip_changed in rows:
+            history = {'txn_count': txn_count, 'last_device': device, 'last_ip': ip,
+                       'amount_velocity': velocity, 'last_txn_time': last_time}
+            if device_changed >= 0:
+                history['device_changed'] = bool(device_changed)
+            if ip_changed >= 0:
+                history['ip_changed'] = bool(ip_changed)
+            cache_manager.cache[f"{_HISTORY_PREFIX}{account}{_HISTORY_SUFFIX}"] = history
+        count_accounts = names('count_account')
+        for account, count in zip(count_accounts, arrays['count_value'].tolist()):
+            cache_manager.cache[f"{_HISTORY_PREFIX}{account}{_COUNT_SUFFIX}"] = count
+        # The expiry index is rebuilt from the restored entries
+        for account in set(names('hist_account')).union(count_accounts):
+            cache_manager.refresh_expiry(account)
+
+
+def snapshot_engine(engine, path: str, accounts: Optional[Set[str]] = None, **meta) -> Dict:
+    start = time.perf_counter()
+    arrays, summary = collect_state(engine, accounts)
+    meta = {'kind': 'full' if accounts is None else 'delta',
+            'created_at': datetime.now().isoformat(), 'clock': engine.clock.now().isoformat(),
+            **meta, **summary}
+    if accounts is not None:
+        meta['replaced_accounts'] = len(accounts)
+    size = write_snapshot(path, arrays, meta)
+    return {**meta, 'bytes': size, 'duration_ms': round((time.perf_counter() - start) * 1000, 1)}
+
+
+def read_manifest(directory: str) -> Optional[Dict]:
+    try:
+        with open(os.path.join(directory, MANIFEST)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _write_manifest(directory: str, manifest: Dict):
+    path = os.path.join(directory, MANIFEST)
+    with open(f"{path}.tmp", 'w') as f:
+        json.dump(manifest, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(f"{path}.tmp", path)
+
+
+def restore_engine(engine, path: str, use_mmap: bool = True) -> Dict:
+    """Restore from one snapshot file, or from a checkpoint directory's chain
+    of a full snapshot and the deltas after it."""
+    start = time.perf_counter()
+    if os.path.isdir(path):
+        manifest = read_manifest(path)
+        if manifest is None:
+            raise FileNotFoundError(f"No {MANIFEST} in {path}")
+        files = [os.path.join(path, name) for name in [manifest['base']] + manifest['deltas']]
+    else:
+        files = [path]
+
+    for file in files:
+        snapshot = Snapshot(file, use_mmap)
+        try:
+            apply_snapshot(engine, snapshot)
+        finally:
+            snapshot.close()
+    return {'files': len(files), 'duration_ms': round((time.perf_counter() - start) * 1000, 1)}
+
+
+class Checkpointer:
+    """Background checkpoints: a delta of the dirty accounts every interval,
+    and a fresh full snapshot every ``full_every`` deltas."""
+    def __init__(self, engine, directory: str, dirty: DirtyAccounts,
+                 interval_s: float = 300, full_every: int = 12):
+        self.engine = engine
+        self.directory = directory
+        self.dirty = dirty
+        self.interval_s = interval_s
+        self.full_every = full_every
+        os.makedirs(directory, exist_ok=True)
+        self.manifest = read_manifest(directory)
+        self.stats = {
+            'full': 0,
+            'delta': 0,
+            'errors': 0,
+            'last_kind': None,
+            'last_bytes': 0,
+            'last_duration_ms': 0.0,
+            'last_replaced_accounts': None,
+            'last_completed_at': None
+        }
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='checkpointer', daemon=True)
+        self._thread.start()
+
+    def checkpoint(self, full: bool = False) -> Dict:
+        with self._lock:
+            manifest = self.manifest
+            seq = manifest['seq'] + 1 if manifest else 1
+            # Either way the marks are drained first: marks made while the
+            # snapshot is read go to the next delta
+            accounts = self.dirty.drain()
+            try:
+                if full or manifest is None or len(manifest['deltas']) >= self.full_every:
+                    name = f"full-{seq:06d}.snap"
+                    result = snapshot_engine(self.engine, os.path.join(self.directory, name), seq=seq)
+                    new_manifest = {'format_version': FORMAT_VERSION, 'base': name, 'deltas': [], 'seq': seq}
+                else:
+                    name = f"delta-{seq:06d}.snap"
+                    result = snapshot_engine(self.engine, os.path.join(self.directory, name), accounts, seq=seq)
+                    new_manifest = dict(manifest, deltas=manifest['deltas'] + [name], seq=seq)
+                _write_manifest(self.directory, new_manifest)
+            except Exception:
+                # The previous manifest still stands, so the next delta must
+                # cover everything changed since it
+                self.dirty.mark_many(accounts)
+                raise
+            self.manifest = new_manifest
+            if result['kind'] == 'full':
+                self._remove_unreferenced()
+            self.stats[result['kind']] += 1
+            self.stats.update(last_kind=result['kind'], last_bytes=result['bytes'],
+                              last_duration_ms=result['duration_ms'],
+                              last_replaced_accounts=result.get('replaced_accounts'),
+                              last_completed_at=result['created_at'])
+            return result
+
+    def _remove_unreferenced(self):
+        keep = {self.manifest['base'], *self.manifest['deltas'], MANIFEST}
+        for name in os.listdir(self.directory):
+            if name.endswith('.snap') and name not in keep:
+                os.remove(os.path.join(self.directory, name))
+
+    def _run(self):
+        while not self._stop.wait(self.interval_s):
+            try:
+                self.checkpoint()
+            except Exception:
+                self.stats['errors'] += 1
+
+    def get_stats(self) -> Dict:
+        return {**self.stats, 'dirty_accounts': len(self.dirty),
+                'chain': 1 + len(self.manifest['deltas']) if self.manifest else 0}
+
+    def close(self, final: bool = True):
+        # A last delta on shutdown makes the next start a warm one
+        self._stop.set()
+        self._thread.join()
+        if final:
+            self.checkpoint()
@@ -0,0 +1,68 @@
+"""Admission control for scoring requests.
+
+Tracks in-flight requests and an EWMA of recent request latency:
+
+full     -> normal scoring
+degraded -> in-flight work reached ``soft_limit`` or recent latency is over
+            ``latency_target_ms``: cheap heuristic scoring, state still
+            recorded
+rejected -> in-flight work reached ``hard_limit``: ``Overloaded`` is raised
+            so the caller can answer 503 + Retry-After immediately
+"""
+import threading
+import time
+from typing import Callable, Dict
+
+FULL = 'full'
+DEGRADED = 'degraded'
+
+
+class Overloaded(Exception):
+    def __init__(self, retry_after_s: float):
+        super().__init__(f"overloaded, retry after {retry_after_s}s")
+        self.retry_after_s = retry_after_s
+
+
+class AdmissionController:
+    def __init__(self, soft_limit: int = 64, hard_limit: int = 256,
+                 latency_target_ms: float = 250, retry_after_s: float = 1,
+                 ewma_alpha: float = 0.1, clock: Callable[[], float] = time.perf_counter):
+        self.soft_limit = soft_limit
+        self.hard_limit = hard_limit
+        self.latency_target_ms = latency_target_ms
+        self.retry_after_s = retry_after_s
+        self.ewma_alpha = ewma_alpha
+        self.clock = clock
+        self.in_flight = 0
+        self.latency_ewma_ms = 0.0
+        self.stats = {'admitted': 0, 'degraded': 0, 'rejected': 0}
+        self._lock = threading.Lock()
+
+    def admit(self) -> str:
+        """Reserve a slot and return the scoring mode; pair with ``release``."""
+        with self._lock:
+            if self.in_flight >= self.hard_limit:
+                self.stats['rejected'] += 1
+                raise Overloaded(self.retry_after_s)
+            self.in_flight += 1
+            if self.in_flight > self.soft_limit or self.latency_ewma_ms > self.latency_target_ms:
+                self.stats['degraded'] += 1
+                return DEGRADED
+            self.stats['admitted'] += 1
+            return FULL
+
+    def release(self, started_at: float):
+        latency_ms = (self.clock() - started_at) * 1000
+        with self._lock:
+            self.in_flight -= 1
+            self.latency_ewma_ms += self.ewma_alpha * (latency_ms - self.latency_ewma_ms)
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return {
+                **self.stats,
+                'in_flight': self.in_flight,
+                'latency_ewma_ms': round(self.latency_ewma_ms, 2),
+                'soft_limit': self.soft_limit,
+                'hard_limit': self.hard_limit
+            }
@@ -1,30 +1,122 @@
 import redis
 import json
-from typing import Dict
-from datetime import datetime
+import threading
+import time
+from redis.backoff import NoBackoff
+from redis.retry import Retry
+from typing import Dict, List, Optional
+from datetime import datetime, timedelta
+
+from .circuit_breaker import CircuitBreaker, OPEN
+from .clock import WallClock
+from .deadline import Deadline
+from .locks import StripedLock
 
 class CacheManager:
-    def __init__(self, host: str = 'localhost', port: int = 6379, ttl: int = 3600):
+    def __init__(self, host: Optional[str] = 'localhost', port: int = 6379, ttl: int = 3600,
+                 socket_timeout_ms: float = 20, failure_threshold: int = 3,
+                 reset_timeout_s: float = 5.0, lock_stripes: int = 64,
+                 clock=None, sweep_interval_s: float = 60):
+        self.ttl = ttl
+        self.socket_timeout = socket_timeout_ms / 1000
+        self.cache = {}
+        # Local entries expire like their Redis keys would, but on this clock
+        # (event time in replay): key -> (expires_at, user_id). Expired keys
+        # read as absent and are removed a bucket of sweep_interval_s at a time.
+        # Each key sits in at most one bucket, so the index grows with the
+        # live keys rather than with writes
+        self.clock = clock or WallClock()
+        self.sweep_interval_s = sweep_interval_s
+        self._expires = {}
+        self._expiry_buckets: Dict[int, List[str]] = {}
+        self._scheduled = set()
+        self._swept_bucket = None
+        # Serialises read-modify-write of one account's history/counters
+        self.locks = StripedLock(lock_stripes)
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout_s)
+        self.breaker.add_listener(self._on_breaker_transition)
+        self.stats = {
+            'redis_errors': 0,
+            'local_fallbacks': 0,
+            'reconciliations': 0,
+            'reconciled_keys': 0,
+            'deadline_skips': 0
+        }
+        
+        # Updates applied locally while Redis is unreachable, replayed on recovery
+        self._pending_counts = {}
+        self._pending_history = {}
+        self._lock = threading.Lock()
+        self._reconnect_event = threading.Event()
+        self._reconnect_thread = None
+        # Set by the engine when checkpointing: users whose local state changed
+        self.dirty = None
+        
+        # No host: local state only, e.g. for offline replay
+        self.redis_client = None
+        if host is None:
+            return
+        # Tight timeouts and no client-side retries: the breaker decides
+        self.redis_client = redis.Redis(
+            host=host,
+            port=port,
+            decode_responses=True,
+            socket_connect_timeout=socket_timeout_ms / 1000,
+            socket_timeout=socket_timeout_ms / 1000,
+            retry=Retry(NoBackoff(), 0)
+        )
         try:
-            self.redis_client = redis.Redis(host=host, port=port, decode_responses=True, socket_connect_timeout=1)
             self.redis_client.ping()
-            self.use_redis = True
-        except:
-            self.use_redis = False
-            self.cache = {}
-        self.ttl = ttl
+        except Exception:
+            self.breaker.trip()
+    
+    @property
+    def use_redis(self) -> bool:
+        return self.redis_client is not None and self.breaker.allow_request()
+    
+    def _redis_usable(self, deadline: Optional[Deadline] = None) -> bool:
+        # Don't start a Redis call the request has no budget left to wait for
+        if deadline is not None and deadline.remaining() < self.socket_timeout:
+            with self._lock:
+                self.stats['deadline_skips'] += 1
+            return False
+        return self.use_redis
     
-    def get_user_history(self, user_id: str) -> Dict:
+    def get_user_history(self, user_id: str, deadline: Optional[Deadline] = None) -> Dict:
         key = f"user:{user_id}:history"
         
+        if self._redis_usable(deadline):
+            try:
+                data = self.redis_client.get(key)
+                self.breaker.record_success()
+                if data:
+                    return json.loads(data)
+                return self._empty_history()
+            except redis.RedisError:
+                self._record_redis_error()
+        
+        history = self._local_get(key)
+        if history is not None:
+            return dict(history)
+        return self._empty_history()
+    
+    def get_user_histories(self, user_ids: List[str]) -> List[Dict]:
+        # Batched get_user_history: one MGET round trip for the whole batch
+        keys = [f"user:{user_id}:history" for user_id in user_ids]
+        
         if self.use_redis:
-            data = self.redis_client.get(key)
-            if data:
-                return json.loads(data)
-        else:
-            if key in self.cache:
-                return self.cache[key]
+            try:
+                values = self.redis_client.mget(keys)
+                self.breaker.record_success()
+                return [json.loads(data) if data else self._empty_history() for data in values]
+            except redis.RedisError:
+                self._record_redis_error()
         
+        histories = [self._local_get(key) for key in keys]
+        return [dict(history) if history is not None else self._empty_history() for history in histories]
+    
+    @staticmethod
+    def _empty_history() -> Dict:
         return {
             'txn_count': 0,
             'last_device': None,
@@ -34,8 +126,40 @@ class CacheManager:
         }
     
     def update_user_history(self, user_id: str, transaction: Dict):
+        return self.apply_history_updates(user_id, [transaction])
+    
+    def apply_history_updates(self, user_id: str, transactions: List[Dict]) -> Dict:
+        with self.locks.hold(user_id):
+            history = self._apply_history_updates(user_id, transactions)
+        self._maybe_sweep()
+        return history
+    
+    def _apply_history_updates(self, user_id: str, transactions: List[Dict]) -> Dict:
+        # One read and one write for any number of queued updates
         history = self.get_user_history(user_id)
         
+        for transaction in transactions:
+            self._apply_history_update(history, transaction)
+        
+        key = f"user:{user_id}:history"
+        if self.use_redis:
+            try:
+                self.redis_client.setex(key, self.ttl, json.dumps(history))
+                self.breaker.record_success()
+                return history
+            except redis.RedisError:
+                self._record_redis_error()
+        
+        self.cache[key] = history
+        self._expire_later(key, user_id, self.ttl)
+        self._mark_dirty(user_id)
+        if self.redis_client is not None:
+            with self._lock:
+                self._pending_history[user_id] = self._pending_history.get(user_id, 0) + len(transactions)
+        return history
+    
+    @staticmethod
+    def _apply_history_update(history: Dict, transaction: Dict):
         history['txn_count'] += 1
         history['device_changed'] = (history['last_device'] != transaction['device_id'])
         history['ip_changed'] = (history['last_ip'] != transaction['ip_address'])
@@ -52,29 +176,292 @@ class CacheManager:
                 history['amount_velocity'] = 0
         
         history['last_txn_time'] = transaction['timestamp'].isoformat()
-        
-        key = f"user:{user_id}:history"
-        if self.use_redis:
-            self.redis_client.setex(key, self.ttl, json.dumps(history))
-        else:
-            self.cache[key] = history
-        
-        return history
     
     def get_transaction_count(self, user_id: str, window_minutes: int = 60) -> int:
         key = f"user:{user_id}:txn_window"
         if self.use_redis:
-            count = self.redis_client.get(key)
-            return int(count) if count else 0
-        else:
-            return self.cache.get(key, 0)
+            try:
+                count = self.redis_client.get(key)
+                self.breaker.record_success()
+                return int(count) if count else 0
+            except redis.RedisError:
+                self._record_redis_error()
+        return self._local_get(key, 0)
     
-    def increment_transaction_count(self, user_id: str, window_minutes: int = 60):
+    def increment_transaction_count(self, user_id: str, window_minutes: int = 60, count: int = 1):
         key = f"user:{user_id}:txn_window"
         if self.use_redis:
-            pipe = self.redis_client.pipeline()
-            pipe.incr(key)
-            pipe.expire(key, window_minutes * 60)
-            pipe.execute()
-        else:
-            self.cache[key] = self.cache.get(key, 0) + 1
+            try:
+                self._redis_incr(key, count, window_minutes)
+                self.breaker.record_success()
+                return
+            except redis.RedisError:
+                self._record_redis_error()
+        
+        with self.locks.hold(user_id):
+            self.cache[key] = self._local_get(key, 0) + count
+            self._expire_later(key, user_id, window_minutes * 60)
+        self._mark_dirty(user_id)
+        self._maybe_sweep()
+        if self.redis_client is None:
+            return
+        with self._lock:
+            pending = self._pending_counts.get(key, (0, window_minutes))[0]
+            self._pending_counts[key] = (pending + count, window_minutes)
+    
+    def export_user_state(self, user_id: str) -> Dict:
+        # Locally held history and counters for a user, removed from this
+        # instance. State already in Redis is shared and stays where it is.
+        history_key = f"user:{user_id}:history"
+        count_key = f"user:{user_id}:txn_window"
+        with self.locks.hold(user_id):
+            history = self._local_get(history_key)
+            count = self._local_get(count_key)
+            self.discard_local(user_id)
+        self._mark_dirty(user_id)
+        with self._lock:
+            pending_history = self._pending_history.pop(user_id, None)
+            pending_count = self._pending_counts.pop(count_key, None)
+        return {
+            'history': history,
+            'txn_count': count,
+            'pending_history': pending_history,
+            'pending_count': pending_count
+        }
+    
+    def delete_users(self, user_ids: List[str]):
+        # Drops users' Redis-held history and counters; local state is
+        # removed with export_user_state
+        if not user_ids or not self.use_redis:
+            return
+        keys = [key for user_id in user_ids
+                for key in (f"user:{user_id}:history", f"user:{user_id}:txn_window")]
+        try:
+            self.redis_client.delete(*keys)
+            self.breaker.record_success()
+        except redis.RedisError:
+            self._record_redis_error()
+    
+    def import_user_state(self, user_id: str, state: Dict):
+        history_key = f"user:{user_id}:history"
+        count_key = f"user:{user_id}:txn_window"
+        with self.locks.hold(user_id):
+            incoming = state['history']
+            if incoming is not None:
+                current = self.cache.get(history_key)
+                if current is None:
+                    self.cache[history_key] = dict(incoming)
+                else:
+                    # Keep the most recent device/IP/time; counts add up
+                    merged = dict(max(current, incoming, key=lambda h: h['last_txn_time'] or ''))
+                    merged['txn_count'] = current['txn_count'] + incoming['txn_count']
+                    self.cache[history_key] = merged
+            if state['txn_count'] is not None:
+                self.cache[count_key] = self._local_get(count_key, 0) + state['txn_count']
+            self.refresh_expiry(user_id)
+        self._mark_dirty(user_id)
+        with self._lock:
+            if state['pending_history'] is not None:
+                self._pending_history[user_id] = self._pending_history.get(user_id, 0) + state['pending_history']
+            if state['pending_count'] is not None:
+                count, window_minutes = state['pending_count']
+                pending = self._pending_counts.get(count_key, (0, window_minutes))[0]
+                self._pending_counts[count_key] = (pending + count, window_minutes)
+    
+    def refresh_expiry(self, user_id: str):
+        # For entries arriving from elsewhere (a snapshot, another worker),
+        # whose original expiry is unknown: a full TTL from now
+        for key in (f"user:{user_id}:history", f"user:{user_id}:txn_window"):
+            if key in self.cache:
+                self._expire_later(key, user_id, self.ttl)
+    
+    def _local_get(self, key: str, default=None):
+        entry = self._expires.get(key)
+        if entry is not None and entry[0] <= self.clock.now():
+            return default
+        return self.cache.get(key, default)
+    
+    def _expire_later(self, key: str, user_id: str, seconds: float):
+        # Called with the account's lock held. A key already in a bucket
+        # stays there; the sweep moves it on if its expiry has moved on
+        expires_at = self.clock.now() + timedelta(seconds=seconds)
+        self._expires[key] = (expires_at, user_id)
+        if key not in self._scheduled:
+            self._scheduled.add(key)
+            self._schedule(key, expires_at)
+    
+    def discard_local(self, user_id: str):
+        # Called with the account's lock held: its local history and counter go
+        for key in (f"user:{user_id}:history", f"user:{user_id}:txn_window"):
+            self._drop_local(key)
+
+    def clear_local(self):
+        # Called with every account lock held (a full snapshot restore): all
+        # local entries go, and the expiry index with them
+        self.cache.clear()
+        self._expires.clear()
+        with self._lock:
+            self._expiry_buckets.clear()
+            self._scheduled.clear()
+            self._swept_bucket = None
+
+    def _drop_local(self, key: str):
+        # Called with the account's lock held. The key stays in its expiry
+        # bucket (and _scheduled) until the sweep finds no expiry for it, so
+        # a write before then is not scheduled twice
+        self.cache.pop(key, None)
+        self._expires.pop(key, None)
+
+    def _schedule(self, key: str, expires_at: datetime):
+        bucket = int(expires_at.timestamp() // self.sweep_interval_s)
+        with self._lock:
+            self._expiry_buckets.setdefault(bucket, []).append(key)
+    
+    def _maybe_sweep(self):
+        # Called with no account lock held. Buckets before the current one
+        # are wholly in the past; a key listed there may since have been
+        # written again, so its current expiry decides
+        now = self.clock.now()
+        current = int(now.timestamp() // self.sweep_interval_s)
+        if current == self._swept_bucket:
+            return
+        with self._lock:
+            self._swept_bucket = current
+            due = [bucket for bucket in self._expiry_buckets if bucket < current]
+            keys = [key for bucket in due for key in self._expiry_buckets.pop(bucket)]
+        later = []
+        for key in keys:
+            user_id = key[len('user:'):].rsplit(':', 1)[0]
+            with self.locks.hold(user_id):
+                entry = self._expires.get(key)
+                if entry is not None and entry[0] > now:
+                    later.append((key, entry[0]))
+                    continue
+                self._scheduled.discard(key)
+                if entry is not None:
+                    del self._expires[key]
+                    self.cache.pop(key, None)
+                    self._mark_dirty(user_id)
+        for key, expires_at in later:
+            self._schedule(key, expires_at)
+    
+    def _mark_dirty(self, user_id: str):
+        if self.dirty is not None:
+            self.dirty.mark(user_id)
+    
+    def get_json(self, key: str) -> Optional[Dict]:
+        if self.use_redis:
+            try:
+                data = self.redis_client.get(key)
+                self.breaker.record_success()
+                return json.loads(data) if data else None
+            except redis.RedisError:
+                self._record_redis_error()
+        return None
+    
+    def set_json(self, key: str, value: Dict, ttl: int, only_if_absent: bool = False):
+        # Shared (cross-worker) values only: nothing is kept locally when degraded
+        if self.use_redis:
+            try:
+                self.redis_client.set(key, json.dumps(value), ex=ttl, nx=only_if_absent)
+                self.breaker.record_success()
+            except redis.RedisError:
+                self._record_redis_error()
+    
+    def _redis_incr(self, key: str, count: int, window_minutes: int):
+        pipe = self.redis_client.pipeline()
+        pipe.incrby(key, count)
+        pipe.expire(key, window_minutes * 60)
+        pipe.execute()
+    
+    def get_metrics(self) -> Dict:
+        with self._lock:
+            pending = len(self._pending_counts) + len(self._pending_history)
+        return {
+            'redis': self.breaker.get_metrics(),
+            **self.stats,
+            'pending_reconciliation_keys': pending
+        }
+    
+    def _record_redis_error(self):
+        with self._lock:
+            self.stats['redis_errors'] += 1
+            self.stats['local_fallbacks'] += 1
+        self.breaker.record_failure()
+    
+    def _on_breaker_transition(self, old_state: str, new_state: str):
+        if new_state == OPEN:
+            self._start_reconnector()
+            self._reconnect_event.set()
+    
+    def _start_reconnector(self):
+        if self._reconnect_thread is None or not self._reconnect_thread.is_alive():
+            self._reconnect_thread = threading.Thread(
+                target=self._reconnect_loop, name='redis-reconnect', daemon=True
+            )
+            self._reconnect_thread.start()
+    
+    def _reconnect_loop(self):
+        while True:
+            self._reconnect_event.wait()
+            self._reconnect_event.clear()
+            while self.breaker.state == OPEN:
+                time.sleep(min(self.breaker.reset_timeout_s, 1.0))
+                if not self.breaker.attempt_reset():
+                    continue
+                try:
+                    self.redis_client.ping()
+                    self._reconcile()
+                    self.breaker.record_success()
+                    # Drain anything written locally while half-open
+                    self._reconcile()
+                except Exception:
+                    self.breaker.record_failure()
+    
+    def _reconcile(self):
+        # Replay counters and history accumulated locally while degraded
+        with self._lock:
+            counts, self._pending_counts = self._pending_counts, {}
+            histories, self._pending_history = self._pending_history, {}
+        
+        reconciled = len(counts) + len(histories)
+        try:
+            # Each key leaves the put-back set, and its local copy the cache,
+            # only once its Redis write has gone through
+            for key, (count, window_minutes) in list(counts.items()):
+                user_id = key[len('user:'):].rsplit(':', 1)[0]
+                self._redis_incr(key, count, window_minutes)
+                del counts[key]
+                with self.locks.hold(user_id):
+                    self._drop_local(key)
+                self._mark_dirty(user_id)
+            
+            for user_id, applied in list(histories.items()):
+                key = f"user:{user_id}:history"
+                with self.locks.hold(user_id):
+                    local = self.cache.get(key)
+                    if local is not None:
+                        merged = local
+                        data = self.redis_client.get(key)
+                        if data:
+                            # Local history started from whatever was cached here, so
+                            # only the updates applied while degraded are added on top
+                            remote = json.loads(data)
+                            merged = dict(local, txn_count=remote.get('txn_count', 0) + applied)
+                        self.redis_client.setex(key, self.ttl, json.dumps(merged))
+                        self._drop_local(key)
+                        self._mark_dirty(user_id)
+                    del histories[user_id]
+        except redis.RedisError:
+            # Put back what we could not push; it will be retried next recovery
+            with self._lock:
+                for key, (count, window_minutes) in counts.items():
+                    pending = self._pending_counts.get(key, (0, window_minutes))[0]
+                    self._pending_counts[key] = (pending + count, window_minutes)
+                for user_id, applied in histories.items():
+                    self._pending_history[user_id] = self._pending_history.get(user_id, 0) + applied
+            raise
+        
+        with self._lock:
+            self.stats['reconciliations'] += 1
+            self.stats['reconciled_keys'] += reconciled
@@ -0,0 +1,121 @@
+"""Circuit breaker for remote dependencies (Redis).
+
+closed    -> calls go to the remote; consecutive failures open the circuit
+open      -> calls are short-circuited to the local fallback
+half_open -> a single probe (usually from a background reconnector) decides
+             whether to close again or re-open
+
+Listeners are called after the breaker's lock is released, so they may
+call back into the breaker.
+"""
+import threading
+import time
+from typing import Callable, Dict, List
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold: int = 3, reset_timeout_s: float = 5.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout_s = reset_timeout_s
+        self.clock = clock
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = None
+        self._degraded_since = None
+        self._degraded_total = 0.0
+        self._transitions = {}
+        self._short_circuited = 0
+        self._listeners: List[Callable[[str, str], None]] = []
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        return self._state
+
+    def add_listener(self, callback: Callable[[str, str], None]):
+        self._listeners.append(callback)
+
+    def allow_request(self) -> bool:
+        if self._state == CLOSED:
+            return True
+        with self._lock:
+            self._short_circuited += 1
+        return False
+
+    def ready_for_probe(self) -> bool:
+        return self._state == OPEN and self.clock() - self._opened_at >= self.reset_timeout_s
+
+    def attempt_reset(self) -> bool:
+        """Move open -> half_open once the reset timeout has elapsed."""
+        with self._lock:
+            if not self.ready_for_probe():
+                return False
+            old_state = self._transition(HALF_OPEN)
+        self._notify(old_state, HALF_OPEN)
+        return True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            if self._state == CLOSED:
+                return
+            old_state = self._transition(CLOSED)
+        self._notify(old_state, CLOSED)
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if not (self._state == HALF_OPEN or
+                    (self._state == CLOSED and self._failures >= self.failure_threshold)):
+                return
+            old_state = self._transition(OPEN)
+        self._notify(old_state, OPEN)
+
+    def trip(self):
+        with self._lock:
+            if self._state == OPEN:
+                return
+            old_state = self._transition(OPEN)
+        self._notify(old_state, OPEN)
+
+    def get_metrics(self) -> Dict:
+        with self._lock:
+            degraded = self._degraded_total
+            if self._degraded_since is not None:
+                degraded += self.clock() - self._degraded_since
+            return {
+                'state': self._state,
+                'consecutive_failures': self._failures,
+                'short_circuited_calls': self._short_circuited,
+                'transitions': dict(self._transitions),
+                'degraded_seconds': round(degraded, 3)
+            }
+
+    def _transition(self, new_state: str) -> str:
+        # Called with the lock held; returns the state left
+        old_state = self._state
+        now = self.clock()
+        self._state = new_state
+        key = f"{old_state}->{new_state}"
+        self._transitions[key] = self._transitions.get(key, 0) + 1
+
+        if new_state == OPEN:
+            self._opened_at = now
+        if old_state == CLOSED:
+            self._degraded_since = now
+        elif new_state == CLOSED and self._degraded_since is not None:
+            self._degraded_total += now - self._degraded_since
+            self._degraded_since = None
+        return old_state
+
+    def _notify(self, old_state: str, new_state: str):
+        for callback in self._listeners:
+            try:
+                callback(old_state, new_state)
+            except Exception:
+                pass
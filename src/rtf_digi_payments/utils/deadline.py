@@ -0,0 +1,36 @@
+"""Per-request deadline passed down into detector stages.
+
+Stages check it cooperatively (``expired()`` / ``check()``) and size their
+remote calls to ``remaining()`` so that per-stage work never adds up past the
+request's latency budget.
+"""
+import time
+from typing import Callable, Optional
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+class Deadline:
+    def __init__(self, budget_ms: float, clock: Callable[[], float] = time.perf_counter,
+                 expires_at: Optional[float] = None):
+        self.clock = clock
+        self.expires_at = expires_at if expires_at is not None else clock() + budget_ms / 1000
+
+    def remaining(self) -> float:
+        return max(self.expires_at - self.clock(), 0.0)
+
+    def remaining_ms(self) -> float:
+        return self.remaining() * 1000
+
+    def expired(self) -> bool:
+        return self.clock() >= self.expires_at
+
+    def check(self):
+        if self.expired():
+            raise DeadlineExceeded()
+
+    def limit(self, budget_ms: float) -> 'Deadline':
+        """Deadline for a sub-stage: the earlier of ours and now + budget_ms."""
+        return Deadline(0, self.clock, min(self.expires_at, self.clock() + budget_ms / 1000))
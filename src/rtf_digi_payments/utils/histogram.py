@@ -0,0 +1,194 @@
+"""Mergeable latency histograms.
+
+Values are recorded in microseconds into HDR-style log-linear buckets. Below
+128 us every microsecond has its own bucket. Above that, each power of two
+is split into 64 buckets. This keeps relative error under 1% with a fixed
+2048-slot count array, so histograms from threads, engines or worker
+processes merge by adding counts, and any quantile can be read afterwards.
+Averages are not mergeable that way and hide the tail.
+
+``ShardedHistogram`` gives every recording thread its own shard, so the hot
+path only does an unlocked ``counts[i] += 1`` on memory no other thread
+writes. Shards of threads that have exited are folded into one retired
+histogram, so their number follows the live threads. Readers merge the
+shards into a ``LatencyHistogram`` snapshot.
+"""
+import math
+import threading
+from typing import Dict, Iterable, List, Tuple
+
+_SUB_BITS = 7
+_SUB_COUNT = 1 << _SUB_BITS          # exact buckets below this many microseconds
+_HALF = _SUB_COUNT >> 1              # buckets per power of two above it
+_MAX_US = (1 << 37) - 1              # ~38 hours; larger values are clamped
+N_BUCKETS = (_MAX_US.bit_length() - _SUB_BITS) * _HALF + _SUB_COUNT
+
+# Prometheus bucket boundaries (seconds) for the exported histograms
+PROMETHEUS_BUCKETS_S = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+                        0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+PROMETHEUS_QUANTILES = (0.5, 0.9, 0.99, 0.999)
+
+
+def bucket_index(value_us: int) -> int:
+    if value_us < _SUB_COUNT:
+        return max(value_us, 0)
+    value_us = min(value_us, _MAX_US)
+    shift = value_us.bit_length() - _SUB_BITS
+    return shift * _HALF + (value_us >> shift)
+
+
+def bucket_bounds(index: int) -> Tuple[int, int]:
+    """Inclusive [low, high] microseconds covered by a bucket."""
+    if index < _SUB_COUNT:
+        return index, index
+    shift = index // _HALF - 1
+    low = (index - shift * _HALF) << shift
+    return low, low + (1 << shift) - 1
+
+
+class LatencyHistogram:
+    def __init__(self):
+        self.counts = [0] * N_BUCKETS
+        self.count = 0
+        self.sum_us = 0
+        self.max_us = 0
+
+    def record(self, latency_ms: float):
+        value_us = int(latency_ms * 1000)
+        self.counts[bucket_index(value_us)] += 1
+        self.count += 1
+        self.sum_us += value_us
+        if value_us > self.max_us:
+            self.max_us = value_us
+
+    def merge(self, other: 'LatencyHistogram') -> 'LatencyHistogram':
+        counts = self.counts
+        for i, n in enumerate(other.counts):
+            if n:
+                counts[i] += n
+        self.count += other.count
+        self.sum_us += other.sum_us
+        self.max_us = max(self.max_us, other.max_us)
+        return self
+
+    def percentile(self, q: float) -> float:
+        """q in [0, 100]; milliseconds, at the midpoint of the bucket holding it."""
+        if not self.count:
+            return 0.0
+        target = max(1, math.ceil(self.count * q / 100))
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= target:
+                low, high = bucket_bounds(i)
+                return min((low + high) / 2, self.max_us) / 1000
+        return self.max_us / 1000
+
+    def mean(self) -> float:
+        return self.sum_us / self.count / 1000 if self.count else 0.0
+
+    def cumulative_counts(self, bounds_ms: Iterable[float]) -> List[int]:
+        """Counts at or below each bound (within bucket precision)."""
+        running = []
+        total = 0
+        start = 0
+        for bound in bounds_ms:
+            end = bucket_index(int(bound * 1000)) + 1
+            total += sum(self.counts[start:end])
+            start = max(start, end)
+            running.append(total)
+        return running
+
+    def summary(self) -> Dict:
+        return {
+            'count': self.count,
+            'mean_ms': round(self.mean(), 3),
+            'p50_ms': round(self.percentile(50), 3),
+            'p95_ms': round(self.percentile(95), 3),
+            'p99_ms': round(self.percentile(99), 3),
+            'p999_ms': round(self.percentile(99.9), 3),
+            'max_ms': round(self.max_us / 1000, 3)
+        }
+
+
+class ShardedHistogram:
+    def __init__(self):
+        self._local = threading.local()
+        self._shards: List[Tuple[threading.Thread, LatencyHistogram]] = []
+        # Counts from the shards of threads that have exited
+        self._retired = LatencyHistogram()
+        self._lock = threading.Lock()
+
+    def record(self, latency_ms: float):
+        try:
+            shard = self._local.shard
+        except AttributeError:
+            shard = self._local.shard = LatencyHistogram()
+            with self._lock:
+                self._prune()
+                self._shards.append((threading.current_thread(), shard))
+        shard.record(latency_ms)
+
+    def snapshot(self) -> LatencyHistogram:
+        merged = LatencyHistogram()
+        with self._lock:
+            self._prune()
+            merged.merge(self._retired)
+            shards = [shard for _, shard in self._shards]
+        for shard in shards:
+            merged.merge(shard)
+        return merged
+
+    def _prune(self):
+        # Thread-per-request servers and thread pools keep replacing their
+        # threads; fold each exited thread's shard into the retired total
+        live = []
+        for thread, shard in self._shards:
+            if thread.is_alive():
+                live.append((thread, shard))
+            else:
+                self._retired.merge(shard)
+        self._shards = live
+
+
+class StageLatencies:
+    """One sharded histogram per pipeline stage."""
+    def __init__(self, stages: Iterable[str]):
+        self.histograms = {stage: ShardedHistogram() for stage in stages}
+
+    def record(self, stage: str, latency_ms: float):
+        self.histograms[stage].record(latency_ms)
+
+    def snapshot(self) -> Dict[str, LatencyHistogram]:
+        return {stage: histogram.snapshot() for stage, histogram in self.histograms.items()}
+
+
+def merge_snapshots(snapshots: Iterable[Dict[str, LatencyHistogram]]) -> Dict[str, LatencyHistogram]:
+    merged = {}
+    for snapshot in snapshots:
+        for stage, histogram in snapshot.items():
+            merged.setdefault(stage, LatencyHistogram()).merge(histogram)
+    return merged
+
+
+def render_prometheus(snapshot: Dict[str, LatencyHistogram],
+                      name: str = 'fraud_stage_latency_seconds',
+                      help_text: str = 'Fraud scoring latency by pipeline stage') -> str:
+    """Prometheus text format: a histogram per stage plus quantile gauges."""
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+    for stage, histogram in snapshot.items():
+        cumulative = histogram.cumulative_counts(b * 1000 for b in PROMETHEUS_BUCKETS_S)
+        for bound, count in zip(PROMETHEUS_BUCKETS_S, cumulative):
+            lines.append(f'{name}_bucket{{stage="{stage}",le="{bound}"}} {count}')
+        lines.append(f'{name}_bucket{{stage="{stage}",le="+Inf"}} {histogram.count}')
+        lines.append(f'{name}_sum{{stage="{stage}"}} {histogram.sum_us / 1e6}')
+        lines.append(f'{name}_count{{stage="{stage}"}} {histogram.count}')
+
+    quantile_name = name.replace('_seconds', '_quantile_seconds')
+    lines += [f"# HELP {quantile_name} {help_text}, quantiles over the process lifetime",
+              f"# TYPE {quantile_name} gauge"]
+    for stage, histogram in snapshot.items():
+        for q in PROMETHEUS_QUANTILES:
+            lines.append(f'{quantile_name}{{stage="{stage}",quantile="{q}"}} '
+                         f'{histogram.percentile(q * 100) / 1000}')
+    return "\n".join(lines) + "\n"
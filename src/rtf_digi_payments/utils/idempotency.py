@@ -0,0 +1,158 @@
+"""Idempotency store for scored transactions.
+
+Results are kept for ``window_seconds`` in a ring of time buckets, so expiry
+is a matter of dropping whole buckets rather than tracking per-key TTLs.
+Concurrent duplicates of a transaction that is still being scored wait for
+the first one instead of scoring (and mutating state) again; if the first
+one is still running when the wait times out, ``DuplicateInProgress`` is
+raised rather than scoring the duplicate a second time. With a
+``cache_manager`` the results are also shared through Redis for cross-worker
+deduplication.
+"""
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, List, Optional, Tuple
+
+from ..models.transaction import FraudScore
+
+
+class DuplicateInProgress(Exception):
+    def __init__(self, transaction_ids: List[str], results: Optional[List[Optional[FraudScore]]] = None):
+        super().__init__(f"still being scored: {', '.join(transaction_ids)}")
+        self.transaction_ids = transaction_ids
+        # From analyze_batch: the batch's results, None where still in progress
+        self.results = results
+
+    def __reduce__(self):
+        # Picklable, so affinity workers can send it back as is
+        return type(self), (self.transaction_ids, self.results)
+
+
+class IdempotencyStore:
+    def __init__(self, window_seconds: float = 900, n_buckets: int = 15,
+                 max_entries: int = 200000, cache_manager=None,
+                 clock: Callable[[], float] = time.time):
+        self.window_seconds = window_seconds
+        self.bucket_seconds = window_seconds / n_buckets
+        self.max_entries = max_entries
+        self.cache_manager = cache_manager
+        self.clock = clock
+        self.stats = {
+            'lookups': 0,
+            'duplicates': 0,
+            'remote_duplicates': 0,
+            'in_flight_waits': 0,
+            'in_flight_timeouts': 0,
+            'evicted': 0
+        }
+        self._buckets = deque()  # (bucket_start, {transaction_id: FraudScore})
+        self._size = 0
+        self._in_flight: Dict[str, threading.Event] = {}
+        self._lock = threading.Lock()
+
+    def begin(self, transaction_id: str, wait_timeout: Optional[float] = None) -> Tuple[Optional[FraudScore], bool]:
+        """Return (stored result, False) for a duplicate, or (None, True) when the
+        caller owns scoring and must call ``complete`` or ``abort``. Raises
+        ``DuplicateInProgress`` when the original is still being scored after
+        ``wait_timeout`` seconds."""
+        with self._lock:
+            self.stats['lookups'] += 1
+            result = self._lookup(transaction_id)
+            if result is not None:
+                self.stats['duplicates'] += 1
+                return result.model_copy(), False
+            event = self._in_flight.get(transaction_id)
+            if event is None:
+                self._in_flight[transaction_id] = threading.Event()
+
+        if event is not None:
+            # A retry racing the original request: wait for its result
+            event.wait(wait_timeout)
+            with self._lock:
+                self.stats['in_flight_waits'] += 1
+                result = self._lookup(transaction_id)
+                if result is not None:
+                    self.stats['duplicates'] += 1
+                    return result.model_copy(), False
+                if transaction_id in self._in_flight:
+                    self.stats['in_flight_timeouts'] += 1
+                    raise DuplicateInProgress([transaction_id])
+                # The original was aborted: score it here
+                self._in_flight[transaction_id] = threading.Event()
+            return None, True
+
+        remote = self._remote_lookup(transaction_id)
+        if remote is not None:
+            self.complete(transaction_id, remote, publish=False)
+            with self._lock:
+                self.stats['remote_duplicates'] += 1
+                self.stats['duplicates'] += 1
+            return remote, False
+
+        return None, True
+
+    def complete(self, transaction_id: str, result: FraudScore, publish: bool = True):
+        with self._lock:
+            self._rotate()
+            self._buckets[-1][1][transaction_id] = result.model_copy()
+            self._size += 1
+            while self._size > self.max_entries and len(self._buckets) > 1:
+                self._drop_oldest()
+            event = self._in_flight.pop(transaction_id, None)
+        if event is not None:
+            event.set()
+        if publish and self.cache_manager is not None:
+            self.cache_manager.set_json(self._remote_key(transaction_id), result.model_dump(),
+                                        int(self.window_seconds), only_if_absent=True)
+
+    def record_duplicate(self):
+        # Duplicate detected by the caller itself, e.g. twice in one batch
+        with self._lock:
+            self.stats['lookups'] += 1
+            self.stats['duplicates'] += 1
+
+    def abort(self, transaction_id: str):
+        with self._lock:
+            event = self._in_flight.pop(transaction_id, None)
+        if event is not None:
+            event.set()
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            lookups = self.stats['lookups']
+            return {
+                **self.stats,
+                'entries': self._size,
+                'in_flight': len(self._in_flight),
+                'duplicate_rate': round(self.stats['duplicates'] / lookups, 4) if lookups else 0.0
+            }
+
+    def _lookup(self, transaction_id: str) -> Optional[FraudScore]:
+        self._rotate()
+        for _, entries in reversed(self._buckets):
+            if transaction_id in entries:
+                return entries[transaction_id]
+        return None
+
+    def _rotate(self):
+        now = self.clock()
+        bucket_start = now - now % self.bucket_seconds
+        if not self._buckets or self._buckets[-1][0] < bucket_start:
+            self._buckets.append((bucket_start, {}))
+        while self._buckets and self._buckets[0][0] + self.bucket_seconds <= now - self.window_seconds:
+            self._drop_oldest()
+
+    def _drop_oldest(self):
+        _, entries = self._buckets.popleft()
+        self._size -= len(entries)
+        self.stats['evicted'] += len(entries)
+
+    def _remote_key(self, transaction_id: str) -> str:
+        return f"idem:{transaction_id}"
+
+    def _remote_lookup(self, transaction_id: str) -> Optional[FraudScore]:
+        if self.cache_manager is None:
+            return None
+        data = self.cache_manager.get_json(self._remote_key(transaction_id))
+        return FraudScore(**data) if data else None
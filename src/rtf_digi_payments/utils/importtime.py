@@ -0,0 +1,69 @@
+"""Import cost of the package's entry points, from ``python -X importtime``.
+
+Each measurement runs a fresh interpreter, because only a cold import says
+what a worker or CLI tool pays at start-up. The interpreter's own start-up
+imports (``python -c pass``) are subtracted, so the total is what the
+``import`` statement itself costs.
+"""
+import os
+import subprocess
+import sys
+from typing import Dict, List, Optional, Tuple
+
+_startup_modules = None
+
+
+def parse_importtime(stderr: str) -> List[Tuple[str, int, int, int]]:
+    """(module, depth, self_us, cumulative_us) per ``-X importtime`` line."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        parts = line[len('import time:'):].split('|')
+        if len(parts) != 3 or not parts[0].strip().isdigit():
+            continue    # the header line
+        raw = parts[2].rstrip()
+        depth = (len(raw) - len(raw.lstrip()) - 1) // 2
+        rows.append((raw.strip(), depth, int(parts[0]), int(parts[1])))
+    return rows
+
+
+def _run(statement: str, env: Optional[Dict] = None) -> str:
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', statement],
+                            capture_output=True, text=True, env=env)
+    if result.returncode != 0:
+        raise RuntimeError(f"{statement!r} failed:\n{result.stderr[-2000:]}")
+    return result.stderr
+
+
+def measure_import(module: str, repeat: int = 1, env: Optional[Dict] = None) -> Dict:
+    """Cold-import ``module`` ``repeat`` times and keep the fastest run.
+
+    Returns the total in ms, each imported module's self/cumulative time in
+    microseconds, and the top-level packages that got loaded."""
+    global _startup_modules
+    if env is None:
+        env = dict(os.environ)
+    if _startup_modules is None:
+        _startup_modules = {name for name, *_ in parse_importtime(_run('pass', env))}
+
+    best = None
+    for _ in range(max(repeat, 1)):
+        rows = [row for row in parse_importtime(_run(f'import {module}', env)) if row[0] not in _startup_modules]
+        total_us = sum(cumulative for _, depth, _, cumulative in rows if depth == 0)
+        if best is None or total_us < best[0]:
+            best = (total_us, rows)
+
+    total_us, rows = best
+    return {
+        'module': module,
+        'total_ms': total_us / 1000,
+        'modules': {name: (self_us, cumulative_us) for name, _, self_us, cumulative_us in rows},
+        'packages': sorted({name.split('.')[0] for name, *_ in rows if not name.startswith('_')})
+    }
+
+
+def slowest(measurement: Dict, top: int = 10) -> List[Tuple[str, int]]:
+    """The ``top`` modules by self time, in microseconds."""
+    ranked = sorted(measurement['modules'].items(), key=lambda item: item[1][0], reverse=True)
+    return [(name, self_us) for name, (self_us, _) in ranked[:top]]
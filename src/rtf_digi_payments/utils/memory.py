@@ -0,0 +1,143 @@
+"""Memory footprint estimation for per-account state.
+
+Walking every object in a store with millions of accounts would take far
+longer than the request asking for it. So each store is sized from an
+evenly strided sample of its entries and scaled up by the entry count.
+``deep_sizeof`` follows containers and plain object ``__dict__``s. An
+object reachable twice in one walk is counted once. Objects with many
+references are not charged to any one entry: interned dict keys, small
+ints and cached constants are shared by every entry.
+
+Python allocator overhead and freed-but-unreturned arenas are not
+visible here. For those, compare against ``process_rss_bytes`` or a
+tracemalloc snapshot.
+"""
+import itertools
+import os
+import sys
+import tracemalloc
+from collections import deque
+from types import FunctionType, ModuleType
+from typing import Callable, Dict, Hashable, List, Mapping, Optional, Set, Tuple
+
+_CONTAINERS = (list, tuple, set, frozenset, deque)
+_OPAQUE = (type, ModuleType, FunctionType)
+# References held by the walk itself (stack, local, getrefcount argument) plus
+# the few an entry's own objects normally have; anything above is shared
+_SHARED_REFS = 16
+
+
+def deep_sizeof(obj, seen: Optional[Set[int]] = None) -> Tuple[int, int]:
+    """(bytes, objects) for ``obj`` and everything it holds."""
+    seen = set() if seen is None else seen
+    size = count = 0
+    stack = [obj]
+    while stack:
+        current = stack.pop()
+        if id(current) in seen or current is None or isinstance(current, (bool, _OPAQUE)):
+            continue
+        if current is not obj and sys.getrefcount(current) > _SHARED_REFS:
+            continue
+        seen.add(id(current))
+        size += sys.getsizeof(current)
+        count += 1
+        if isinstance(current, dict):
+            stack.extend(current.keys())
+            stack.extend(current.values())
+        elif isinstance(current, _CONTAINERS):
+            stack.extend(current)
+        elif hasattr(current, '__dict__'):
+            stack.append(current.__dict__)
+    return size, count
+
+
+def entry_sizeof(key: Hashable, value) -> Tuple[int, int]:
+    seen = set()
+    key_bytes, key_objects = deep_sizeof(key, seen)
+    value_bytes, value_objects = deep_sizeof(value, seen)
+    return key_bytes + value_bytes, key_objects + value_objects
+
+
+def graph_node_sizeof(graph, node: Hashable) -> Tuple[int, int]:
+    """One node of a networkx DiGraph: its name, attributes, successor dict
+    with the edge attribute dicts, and predecessor dict.
+
+    Edge attribute dicts are shared between ``_succ`` and ``_pred``. They
+    are charged to the sender. Neighbour names are charged to the
+    neighbours themselves."""
+    seen = set()
+    size, count = deep_sizeof(node, seen)
+    node_bytes, node_objects = deep_sizeof(graph._node.get(node, {}), seen)
+    size += node_bytes
+    count += node_objects
+    successors = graph._succ.get(node, {})
+    size += sys.getsizeof(successors) + sys.getsizeof(graph._pred.get(node, {}))
+    count += 2
+    for data in list(successors.values()):
+        edge_bytes, edge_objects = deep_sizeof(data, seen)
+        size += edge_bytes
+        count += edge_objects
+    return size, count
+
+
+def sample_keys(mapping: Mapping, sample_size: int) -> List:
+    stride = max(1, len(mapping) // max(sample_size, 1))
+    for _ in range(3):
+        try:
+            return list(itertools.islice(iter(mapping), 0, None, stride))[:sample_size]
+        except RuntimeError:
+            # A writer resized the dict mid-iteration; try again
+            continue
+    return list(mapping)[::stride][:sample_size]
+
+
+def estimate_store(mapping: Mapping, sample_size: int,
+                   entry_size: Callable[[Hashable, object], Tuple[int, int]] = entry_sizeof,
+                   containers: Tuple = ()) -> Dict:
+    """Scale the size of a strided sample of entries up to the whole mapping.
+
+    ``containers`` are the store's own hash tables. They are counted once
+    at their real size."""
+    entries = len(mapping)
+    sampled = sample_bytes = sample_objects = 0
+    for key in sample_keys(mapping, sample_size):
+        # .get, not []: defaultdict stores would grow an entry per miss
+        value = mapping.get(key)
+        if value is None:
+            continue
+        entry_bytes, entry_objects = entry_size(key, value)
+        sample_bytes += entry_bytes
+        sample_objects += entry_objects
+        sampled += 1
+
+    per_entry = sample_bytes / sampled if sampled else 0.0
+    objects_per_entry = sample_objects / sampled if sampled else 0.0
+    table_bytes = sum(sys.getsizeof(container) for container in (containers or (mapping,)))
+    return {
+        'entries': entries,
+        'objects': int(objects_per_entry * entries) + len(containers or (mapping,)),
+        'bytes': int(table_bytes + per_entry * entries),
+        'bytes_per_entry': round(per_entry, 1),
+        'sampled': sampled
+    }
+
+
+def process_rss_bytes() -> Optional[int]:
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def tracemalloc_summary(top: int = 10) -> Optional[Dict]:
+    """Traced totals and the top allocating source lines, when tracing is on."""
+    if not tracemalloc.is_tracing():
+        return None
+    current, peak = tracemalloc.get_traced_memory()
+    stats = tracemalloc.take_snapshot().statistics('lineno')[:top]
+    return {
+        'traced_bytes': current,
+        'peak_bytes': peak,
+        'top': [{'where': str(stat.traceback[0]), 'bytes': stat.size, 'count': stat.count} for stat in stats]
+    }
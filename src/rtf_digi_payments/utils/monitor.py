@@ -1,42 +1,237 @@
-import logging
-from typing import Dict
+"""Decision logging off the request path.
+
+``log_transaction`` only updates counters and enqueues a reference to the
+result. A background thread drains the queue in batches, formats compact
+JSON lines (orjson when installed), writes each batch with one ``write``,
+and rotates the file by size and age.
+
+The queue is bounded and scoring never waits on it:
+- past ``sample_high_water`` of capacity, only 1 in ``sample_every`` routine
+  (non-fraud) records is kept
+- when the queue is full, records are dropped
+
+Both cases are counted in ``get_stats()['log']``.
+"""
 import json
+import os
+import queue
+import threading
+import time
+from typing import Dict, List, Tuple
+try:
+    import orjson
+except ImportError:
+    orjson = None
+from .histogram import LatencyHistogram
+from config.settings import (
+    DECISION_LOG_QUEUE_SIZE, DECISION_LOG_BATCH_SIZE, DECISION_LOG_FLUSH_INTERVAL_MS,
+    DECISION_LOG_MAX_BYTES, DECISION_LOG_ROTATE_INTERVAL_S, DECISION_LOG_BACKUP_COUNT,
+    DECISION_LOG_SAMPLE_HIGH_WATER, DECISION_LOG_SAMPLE_EVERY
+)
+
+_STOP = object()
+# Fields written for routine decisions; fraud hits get the whole result
+_ROUTINE_FIELDS = ('fraud_probability', 'latency_ms')
+
+
+def _encode(record: Dict) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(record, option=orjson.OPT_SERIALIZE_NUMPY) + b"\n"
+    return json.dumps(record, separators=(",", ":"), default=str).encode() + b"\n"
+
+
+def _as_dict(result) -> Dict:
+    return result if isinstance(result, dict) else result.model_dump()
+
 
 class FraudMonitor:
-    def __init__(self, log_file='logs/fraud_detection.log'):
-        self.logger = logging.getLogger('FraudDetection')
-        self.logger.setLevel(logging.INFO)
-        
-        handler = logging.FileHandler(log_file)
-        handler.setFormatter(logging.Formatter(
-            '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-        ))
-        self.logger.addHandler(handler)
-        
+    def __init__(self, log_file: str = 'logs/fraud_detection.log',
+                 max_queue_size: int = DECISION_LOG_QUEUE_SIZE,
+                 batch_size: int = DECISION_LOG_BATCH_SIZE,
+                 flush_interval_ms: float = DECISION_LOG_FLUSH_INTERVAL_MS,
+                 max_bytes: int = DECISION_LOG_MAX_BYTES,
+                 rotate_interval_s: float = DECISION_LOG_ROTATE_INTERVAL_S,
+                 backup_count: int = DECISION_LOG_BACKUP_COUNT,
+                 sample_high_water: float = DECISION_LOG_SAMPLE_HIGH_WATER,
+                 sample_every: int = DECISION_LOG_SAMPLE_EVERY):
+        self.log_file = log_file
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000
+        self.max_bytes = max_bytes
+        self.rotate_interval_s = rotate_interval_s
+        self.backup_count = backup_count
+        self.sample_threshold = int(max_queue_size * sample_high_water)
+        self.sample_every = max(1, sample_every)
+        self.queue = queue.Queue(maxsize=max_queue_size)
+
         self.stats = {
             'total_transactions': 0,
             'fraud_detected': 0,
             'avg_latency': 0,
             'total_latency': 0
         }
-    
-    def log_transaction(self, transaction_id: str, result: Dict):
-        self.stats['total_transactions'] += 1
-        self.stats['total_latency'] += result['latency_ms']
-        self.stats['avg_latency'] = self.stats['total_latency'] / self.stats['total_transactions']
-        
-        if result['is_fraudulent']:
-            self.stats['fraud_detected'] += 1
-            self.logger.warning(f"FRAUD DETECTED - {transaction_id}: {json.dumps(result)}")
-        else:
-            self.logger.info(f"Transaction {transaction_id} processed - Latency: {result['latency_ms']}ms")
-    
-    def get_stats(self) -> Dict:
-        return {
-            **self.stats,
-            'fraud_rate': self.stats['fraud_detected'] / max(self.stats['total_transactions'], 1)
+        self.log_stats = {
+            'enqueued': 0,
+            'written': 0,
+            'sampled_out': 0,
+            'dropped': 0,
+            'dropped_alerts': 0,
+            'batches': 0,
+            'bytes_written': 0,
+            'rotations': 0,
+            'write_errors': 0
         }
-    
+        # avg_latency alone hides the tail; percentiles come from this
+        self.latency = LatencyHistogram()
+        self._routine_seen = 0
+        self._stats_lock = threading.Lock()
+
+        self._file = None
+        self._file_bytes = 0
+        self._file_opened_at = 0.0
+        self._thread = threading.Thread(target=self._run, name='decision-log', daemon=True)
+        self._thread.start()
+
+    def log_transaction(self, transaction_id: str, result):
+        """``result`` is a FraudScore or its dict form; it is formatted later,
+        on the writer thread, so it must not be mutated afterwards."""
+        latency_ms = result['latency_ms'] if isinstance(result, dict) else result.latency_ms
+        is_fraudulent = result['is_fraudulent'] if isinstance(result, dict) else result.is_fraudulent
+        with self._stats_lock:
+            self.stats['total_transactions'] += 1
+            self.stats['total_latency'] += latency_ms
+            self.stats['avg_latency'] = self.stats['total_latency'] / self.stats['total_transactions']
+            self.latency.record(latency_ms)
+            if is_fraudulent:
+                self.stats['fraud_detected'] += 1
+            else:
+                # Under backpressure keep 1 in sample_every routine records
+                self._routine_seen += 1
+                if (self.queue.qsize() >= self.sample_threshold
+                        and self._routine_seen % self.sample_every):
+                    self.log_stats['sampled_out'] += 1
+                    return
+        self._enqueue(('fraud' if is_fraudulent else 'txn', time.time(), transaction_id, result),
+                      alert=is_fraudulent)
+
     def alert_high_latency(self, transaction_id: str, latency_ms: float, threshold: float = 500):
         if latency_ms > threshold:
-            self.logger.error(f"HIGH LATENCY ALERT - {transaction_id}: {latency_ms}ms (threshold: {threshold}ms)")
+            self._enqueue(('high_latency', time.time(), transaction_id, (latency_ms, threshold)), alert=True)
+
+    def get_stats(self) -> Dict:
+        with self._stats_lock:
+            return {
+                **self.stats,
+                'fraud_rate': self.stats['fraud_detected'] / max(self.stats['total_transactions'], 1),
+                'latency': self.latency.summary(),
+                'log': {**self.log_stats, 'queue_depth': self.queue.qsize()}
+            }
+
+    def flush(self):
+        """Block until everything enqueued so far is written."""
+        self.queue.join()
+
+    def close(self):
+        if self._thread.is_alive():
+            self.queue.put(_STOP)
+            self._thread.join()
+
+    def _enqueue(self, record: Tuple, alert: bool = False):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._stats_lock:
+                self.log_stats['dropped'] += 1
+                if alert:
+                    self.log_stats['dropped_alerts'] += 1
+            return
+        with self._stats_lock:
+            self.log_stats['enqueued'] += 1
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            if item is _STOP:
+                self.queue.task_done()
+                break
+
+            batch = [item]
+            deadline = time.monotonic() + self.flush_interval
+            stop = False
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    item = self.queue.get(timeout=remaining) if remaining > 0 else self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop = True
+                    break
+                batch.append(item)
+
+            self._write_batch(batch)
+            for _ in range(len(batch) + (1 if stop else 0)):
+                self.queue.task_done()
+            if stop:
+                break
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _format(self, record: Tuple) -> bytes:
+        kind, ts, transaction_id, payload = record
+        line = {'ts': round(ts, 6), 'event': kind, 'txn': transaction_id}
+        if kind == 'fraud':
+            line.update(_as_dict(payload))
+            line.pop('transaction_id', None)
+        elif kind == 'txn':
+            for field in _ROUTINE_FIELDS:
+                line[field] = payload[field] if isinstance(payload, dict) else getattr(payload, field)
+        else:
+            line['latency_ms'], line['threshold_ms'] = payload
+        return _encode(line)
+
+    def _write_batch(self, batch: List[Tuple]):
+        try:
+            data = b"".join(self._format(record) for record in batch)
+            self._maybe_rotate(len(data))
+            self._file.write(data)
+            self._file.flush()
+            self._file_bytes += len(data)
+        except Exception:
+            with self._stats_lock:
+                self.log_stats['write_errors'] += 1
+            return
+        with self._stats_lock:
+            self.log_stats['written'] += len(batch)
+            self.log_stats['batches'] += 1
+            self.log_stats['bytes_written'] += len(data)
+
+    def _maybe_rotate(self, incoming: int):
+        if self._file is None:
+            self._open()
+        too_big = self._file_bytes + incoming > self.max_bytes
+        too_old = self.rotate_interval_s and time.time() - self._file_opened_at >= self.rotate_interval_s
+        if not self._file_bytes or not (too_big or too_old):
+            return
+        self._file.close()
+        # log -> log.1 -> log.2 ... ; the oldest beyond backup_count is removed
+        for i in range(self.backup_count - 1, 0, -1):
+            src = f"{self.log_file}.{i}"
+            if os.path.exists(src):
+                os.replace(src, f"{self.log_file}.{i + 1}")
+        if self.backup_count:
+            os.replace(self.log_file, f"{self.log_file}.1")
+        else:
+            os.remove(self.log_file)
+        self._open(truncate=True)
+        with self._stats_lock:
+            self.log_stats['rotations'] += 1
+
+    def _open(self, truncate: bool = False):
+        directory = os.path.dirname(self.log_file)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(self.log_file, 'wb' if truncate else 'ab')
+        self._file_bytes = self._file.tell()
+        self._file_opened_at = time.time()
@@ -0,0 +1,152 @@
+"""Write-behind queue for detector state mutations.
+
+Updates are enqueued from the request path and applied by a single background
+thread. Each drained batch is grouped by account, and consecutive updates of
+the same kind for an account are handed to their handler together so it can
+coalesce them (one Redis round trip instead of N). A single writer thread
+keeps updates for an account in submission order.
+
+A handler that raises does not stop the writer: the error is logged, and
+the first one since the last ``flush()`` is re-raised from the next
+``flush()`` or ``close()``.
+"""
+import logging
+import queue
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class StateWriter:
+    def __init__(self,
+                 handlers: Dict[str, Callable[[str, List[Any]], None]],
+                 max_queue_size: int = 10000,
+                 batch_size: int = 256,
+                 flush_interval_ms: float = 5):
+        self.handlers = handlers
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000
+        self.queue = queue.Queue(maxsize=max_queue_size)
+        self.stats = {
+            'enqueued': 0,
+            'applied': 0,
+            'handler_calls': 0,
+            'batches': 0,
+            'errors': 0,
+            'backpressure_waits': 0,
+            'backpressure_wait_ms': 0.0
+        }
+        self._stats_lock = threading.Lock()
+        # First handler error not yet raised to a caller; guarded by _stats_lock
+        self._error = None
+        self._thread = threading.Thread(target=self._run, name='state-writer', daemon=True)
+        self._thread.start()
+
+    def submit(self, account_id: str, kind: str, payload: Any):
+        if kind not in self.handlers:
+            raise ValueError(f"Unknown state update kind: {kind}")
+
+        item = (account_id, kind, payload)
+        try:
+            self.queue.put_nowait(item)
+        except queue.Full:
+            # Backpressure: block the producer until the writer catches up
+            start = time.perf_counter()
+            self.queue.put(item)
+            with self._stats_lock:
+                self.stats['backpressure_waits'] += 1
+                self.stats['backpressure_wait_ms'] += (time.perf_counter() - start) * 1000
+
+        with self._stats_lock:
+            self.stats['enqueued'] += 1
+
+    def flush(self):
+        """Block until everything submitted so far has been applied.
+
+        Raises the first handler error since the last flush, if any."""
+        self.queue.join()
+        self._raise_error()
+
+    def close(self):
+        if self._thread.is_alive():
+            self.queue.put(_STOP)
+            self._thread.join()
+        self._raise_error()
+
+    def _raise_error(self):
+        with self._stats_lock:
+            error, self._error = self._error, None
+        if error is not None:
+            raise error
+
+    def get_stats(self) -> Dict:
+        with self._stats_lock:
+            return {**self.stats, 'queue_depth': self.queue.qsize()}
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            if item is _STOP:
+                self.queue.task_done()
+                return
+
+            batch = [item]
+            deadline = time.monotonic() + self.flush_interval
+            stop = False
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    item = self.queue.get(timeout=remaining) if remaining > 0 else self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop = True
+                    break
+                batch.append(item)
+
+            self._apply_batch(batch)
+            for _ in range(len(batch) + (1 if stop else 0)):
+                self.queue.task_done()
+            if stop:
+                return
+
+    def _apply_batch(self, batch: List[Tuple[str, str, Any]]):
+        by_account = OrderedDict()
+        for account_id, kind, payload in batch:
+            by_account.setdefault(account_id, []).append((kind, payload))
+
+        calls = 0
+        errors = 0
+        for account_id, updates in by_account.items():
+            # Coalesce runs of the same kind, keeping per-account order
+            run_kind, run = updates[0][0], []
+            for kind, payload in updates:
+                if kind != run_kind:
+                    errors += self._call(run_kind, account_id, run)
+                    calls += 1
+                    run_kind, run = kind, []
+                run.append(payload)
+            errors += self._call(run_kind, account_id, run)
+            calls += 1
+
+        with self._stats_lock:
+            self.stats['applied'] += len(batch)
+            self.stats['handler_calls'] += calls
+            self.stats['batches'] += 1
+            self.stats['errors'] += errors
+
+    def _call(self, kind: str, account_id: str, payloads: List[Any]) -> int:
+        try:
+            self.handlers[kind](account_id, payloads)
+            return 0
+        except Exception as e:
+            logger.exception("%s update for %s failed (%d payloads dropped)", kind, account_id, len(payloads))
+            with self._stats_lock:
+                if self._error is None:
+                    self._error = e
+            return 1
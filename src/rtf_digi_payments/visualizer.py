@@ -1,9 +1,9 @@
-import matplotlib.pyplot as plt
-import networkx as nx
-
 class FraudVisualizer:
     @staticmethod
     def plot_transaction_graph(graph_detector, output_path='fraud_network.png'):
+        import matplotlib.pyplot as plt
+        import networkx as nx
+
         plt.figure(figsize=(12, 8))
         G = graph_detector.graph
         
@@ -35,16 +35,32 @@ class FraudVisualizer:
         print(f"Graph saved to {output_path}")
     
     @staticmethod
-    def plot_fraud_scores(results, output_path='fraud_scores.png'):
+    def _score_columns(results, start=None, end=None):
+        # FraudScore lists, or the decision archive: a directory, reader,
+        # DecisionArchive or an Arrow table already queried from one
+        columns = ['fraud_probability', 'ml_score', 'graph_score', 'biometric_score']
+        if isinstance(results, (list, tuple)):
+            return [[getattr(r, column) for r in results] for column in columns]
+        
+        from .decision_archive import DecisionArchive, DecisionArchiveReader
+        if isinstance(results, str):
+            results = DecisionArchiveReader(results)
+        elif isinstance(results, DecisionArchive):
+            results = results.reader()
+        if isinstance(results, DecisionArchiveReader):
+            results = results.query(start, end, columns=columns)
+        return [results.column(column).to_numpy() for column in columns]
+    
+    @staticmethod
+    def plot_fraud_scores(results, output_path='fraud_scores.png', start=None, end=None):
+        """``results``: FraudScores or a decision archive (see ``_score_columns``);
+        ``start``/``end`` bound the archive query by transaction time."""
         import numpy as np
         import matplotlib.pyplot as plt
 
         fig, axes = plt.subplots(2, 2, figsize=(12, 10))
         
-        fraud_probs = [r.fraud_probability for r in results]
-        ml_scores = [r.ml_score for r in results]
-        graph_scores = [r.graph_score for r in results]
-        biometric_scores = [r.biometric_score for r in results]
+        fraud_probs, ml_scores, graph_scores, biometric_scores = FraudVisualizer._score_columns(results, start, end)
         
         axes[0, 0].hist(fraud_probs, bins=30, color='red', alpha=0.7)
         axes[0, 0].set_title('Fraud Probability Distribution')
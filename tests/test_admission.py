@@ -0,0 +1,130 @@
+import json
+from datetime import datetime
+from fastapi.testclient import TestClient
+from rtf_digi_payments import api
+from rtf_digi_payments.batching import MicroBatcher
+from rtf_digi_payments.fraud_engine import FraudDetectionEngine
+from rtf_digi_payments.models.transaction import Transaction, BiometricData
+from rtf_digi_payments.utils.admission import AdmissionController, Overloaded, FULL, DEGRADED
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+    
+    def __call__(self):
+        return self.now
+
+def test_modes_follow_in_flight_limits():
+    controller = AdmissionController(soft_limit=2, hard_limit=3)
+    
+    assert [controller.admit() for _ in range(3)] == [FULL, FULL, DEGRADED]
+    try:
+        controller.admit()
+        assert False, "expected Overloaded"
+    except Overloaded as e:
+        assert e.retry_after_s == 1
+    
+    controller.release(controller.clock())
+    assert controller.admit() == DEGRADED
+    stats = controller.get_stats()
+    assert (stats['admitted'], stats['degraded'], stats['rejected'], stats['in_flight']) == (2, 2, 1, 3)
+
+def test_slow_requests_degrade_until_latency_recovers():
+    clock = FakeClock()
+    controller = AdmissionController(soft_limit=100, hard_limit=200, latency_target_ms=100,
+                                     ewma_alpha=0.5, clock=clock)
+    
+    for _ in range(3):
+        controller.admit()
+        clock.now += 0.4
+        controller.release(clock.now - 0.4)
+    assert controller.admit() == DEGRADED
+    controller.release(clock.now)
+    
+    # Fast (degraded) requests pull the average back under target
+    for _ in range(4):
+        controller.admit()
+        controller.release(clock.now)
+    assert controller.admit() == FULL
+
+def test_degraded_scoring_flags_result_and_records_state():
+    engine = FraudDetectionEngine()
+    txn = Transaction(
+        transaction_id="SHED_1", sender_id="SHED_A", receiver_id="SHED_B", amount=75000.0,
+        timestamp=datetime(2024, 1, 15, 3, 0), device_id="DEV_1", ip_address="10.0.0.1",
+        biometric=BiometricData(typing_speed=50.0)
+    )
+    
+    result = engine.analyze_transaction(txn, degraded=True)
+    
+    assert result.degraded
+    assert result.skipped_stages == ['graph', 'biometric']
+    assert result.ml_score == 0.5  # heuristic: high amount + night
+    assert engine.graph_detector.graph.has_edge("SHED_A", "SHED_B")
+    assert engine.biometric_analyzer.user_profiles["SHED_A"]['typing_speed'] == [50.0]
+    assert engine.cache_manager.get_user_history("SHED_A")['txn_count'] == 1
+    assert engine.get_metrics()['degraded_scores'] == 1
+
+def test_api_sheds_with_503_past_hard_limit(monkeypatch):
+    controller = AdmissionController(soft_limit=0, hard_limit=1)
+    monkeypatch.setattr(api, "admission", controller)
+    client = TestClient(api.app)
+    payload = {
+        "transaction_id": "SHED_HTTP", "sender_id": "A", "receiver_id": "B", "amount": 10.0,
+        "timestamp": "2024-01-15T12:00:00", "device_id": "D", "ip_address": "1.1.1.1"
+    }
+    
+    response = client.post("/api/v1/analyze", json=payload)
+    assert response.status_code == 200
+    assert response.json()["degraded"] is True
+    
+    controller.admit()  # hold the only slot
+    response = client.post("/api/v1/analyze", json=payload)
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+
+def test_api_degrades_through_the_micro_batcher(monkeypatch):
+    engine = FraudDetectionEngine()
+    batcher = MicroBatcher(engine)
+    monkeypatch.setattr(api, "admission", AdmissionController(soft_limit=0, hard_limit=10))
+    monkeypatch.setattr(api, "batcher", batcher)
+    client = TestClient(api.app)
+    payload = {
+        "transaction_id": "SHED_BATCHED", "sender_id": "A", "receiver_id": "B", "amount": 10.0,
+        "timestamp": "2024-01-15T12:00:00", "device_id": "D", "ip_address": "1.1.1.1"
+    }
+    
+    response = client.post("/api/v1/analyze", json=payload)
+    batcher.close()
+    
+    assert response.status_code == 200
+    assert response.json()["degraded"] is True
+    assert engine.get_metrics()['degraded_scores'] == 1
+    assert batcher.get_stats()['requests'] == 1
+
+def test_batch_and_stream_endpoints_are_admitted(monkeypatch):
+    controller = AdmissionController(soft_limit=0, hard_limit=1)
+    monkeypatch.setattr(api, "admission", controller)
+    client = TestClient(api.app)
+    payloads = [{
+        "transaction_id": f"SHED_BULK_{i}", "sender_id": "A", "receiver_id": "B", "amount": 10.0,
+        "timestamp": "2024-01-15T12:00:00", "device_id": "D", "ip_address": "1.1.1.1"
+    } for i in range(3)]
+
+    response = client.post("/api/v1/analyze/batch", json=payloads)
+    assert response.status_code == 200
+    assert all(score["degraded"] for score in response.json())
+    assert controller.get_stats()['in_flight'] == 0
+
+    controller.admit()  # hold the only slot
+    response = client.post("/api/v1/analyze/batch", json=payloads)
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+
+    body = "\n".join(json.dumps(payload) for payload in payloads)
+    response = client.post("/api/v1/analyze/stream", content=body)
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line["transaction_id"] for line in lines] == [p["transaction_id"] for p in payloads]
+    assert all(line["error"].startswith("overloaded") for line in lines)
+    assert controller.get_stats()['in_flight'] == 1
@@ -0,0 +1,164 @@
+import asyncio
+import os
+import signal
+import time
+import pytest
+from collections import Counter
+from datetime import datetime, timedelta
+from rtf_digi_payments import affinity
+from rtf_digi_payments.affinity import HashRing, AffinityDispatcher, WorkerDied
+from rtf_digi_payments.fraud_engine import FraudDetectionEngine
+from rtf_digi_payments.models.transaction import Transaction, BiometricData
+
+
+def make_transaction(i, sender, receiver):
+    return Transaction(
+        transaction_id=f"AFF_{i}",
+        sender_id=sender,
+        receiver_id=receiver,
+        amount=500.0 + i,
+        timestamp=datetime(2024, 1, 15, 12, 0) + timedelta(seconds=i),
+        device_id="DEV_1",
+        ip_address="10.0.0.1",
+        biometric=BiometricData(typing_speed=50.0 + i % 5)
+    )
+
+def test_hash_ring_moves_only_reassigned_keys():
+    keys = [f"USER_{i}" for i in range(5000)]
+    ring = HashRing(range(4))
+    before = {key: ring.node_for(key) for key in keys}
+
+    counts = Counter(before.values())
+    assert set(counts) == {0, 1, 2, 3}
+    assert min(counts.values()) > 5000 / 4 * 0.7
+
+    ring.add_node(4)
+    after = {key: ring.node_for(key) for key in keys}
+    moved = [key for key in keys if before[key] != after[key]]
+    # Roughly 1/5 of the keys move, and all of them to the new node
+    assert all(after[key] == 4 for key in moved)
+    assert 5000 * 0.1 < len(moved) < 5000 * 0.3
+
+def test_engine_account_export_import_roundtrip():
+    source = FraudDetectionEngine(idempotency=False)
+    for i in range(8):
+        source.analyze_transaction(make_transaction(i, "MOVER", f"DEST_{i % 3}"))
+    history = source.cache_manager.get_user_history("MOVER")
+
+    target = FraudDetectionEngine(idempotency=False)
+    target.import_accounts(source.export_accounts(["MOVER"]))
+
+    assert "MOVER" not in source.graph_detector.transaction_times
+    assert not source.graph_detector.graph.has_edge("MOVER", "DEST_0")
+    assert target.graph_detector.graph["MOVER"]["DEST_0"]["weight"] == 3
+    assert len(target.graph_detector.transaction_times["MOVER"]) == 8
+    assert len(target.biometric_analyzer.user_profiles["MOVER"]["typing_speed"]) == 8
+    assert target.cache_manager.get_user_history("MOVER") == history
+    assert target.cache_manager.get_transaction_count("MOVER") == 8
+
+def test_dispatcher_keeps_account_state_across_resize():
+    dispatcher = AffinityDispatcher(n_workers=2, replicas=32)
+    try:
+        senders = [f"ACC_{i}" for i in range(12)]
+        for i in range(48):
+            dispatcher.analyze(make_transaction(i, senders[i % 12], f"MERCHANT_{i % 4}"), timeout=60)
+        assert sum(dispatcher.get_stats()['per_worker'].values()) == 48
+
+        dispatcher.resize(3)
+        assert dispatcher.get_stats()['workers'] == 3
+        assert dispatcher.get_stats()['accounts_moved'] > 0
+        for i in range(48, 60):
+            # Degraded (shed) scoring still records the account's state
+            result = dispatcher.analyze(make_transaction(i, senders[i % 12], f"MERCHANT_{i % 4}"),
+                                        timeout=60, degraded=i >= 54)
+            assert result.degraded == (i >= 54)
+
+        # Every sender's history lives, complete, with its current owner
+        for sender in senders:
+            assert dispatcher.get_user_history(sender, timeout=60)['txn_count'] == 5
+
+        dispatcher.resize(1)
+        for sender in senders:
+            assert dispatcher.get_user_history(sender, timeout=60)['txn_count'] == 5
+    finally:
+        dispatcher.close()
+
+def test_dead_worker_fails_its_requests_and_is_replaced():
+    dispatcher = AffinityDispatcher(n_workers=1, replicas=8)
+    try:
+        # Killed while still starting up, before it reads its queue
+        pending = dispatcher.submit(make_transaction(0, "ACC_DEAD", "MERCHANT_0"))
+        process, _ = dispatcher._workers[0]
+        process.kill()
+        with pytest.raises(WorkerDied):
+            pending.result(timeout=30)
+
+        result = dispatcher.analyze(make_transaction(1, "ACC_DEAD", "MERCHANT_0"), timeout=60)
+        assert result.transaction_id == "AFF_1"
+        assert dispatcher.get_stats()['worker_restarts'] == 1
+        assert dispatcher.get_stats()['in_flight'] == 0
+    finally:
+        dispatcher.close()
+
+def test_analyze_async_gives_up_at_its_timeout():
+    dispatcher = AffinityDispatcher(n_workers=1, replicas=8)
+    try:
+        # The worker is still importing, so nothing can answer this fast
+        with pytest.raises(asyncio.TimeoutError):
+            asyncio.run(dispatcher.analyze_async(make_transaction(2, "ACC_SLOW", "MERCHANT_0"), timeout=0.01))
+        # Its late reply is discarded once the worker is up
+        dispatcher.analyze(make_transaction(3, "ACC_SLOW", "MERCHANT_0"), timeout=60)
+        assert dispatcher.get_stats()['in_flight'] == 0
+    finally:
+        dispatcher.close()
+
+def test_resize_reimports_into_a_replaced_worker():
+    dispatcher = AffinityDispatcher(n_workers=1, replicas=32)
+    try:
+        senders = [f"ACC_{i}" for i in range(12)]
+        for i in range(24):
+            dispatcher.analyze(make_transaction(i, senders[i % 12], "MERCHANT_0"), timeout=60)
+
+        send = dispatcher._send
+        killed = []
+
+        def send_killing_first_import(node, op, payload):
+            # The new worker dies just as its accounts are handed to it
+            if op == 'import' and not killed:
+                process, _ = dispatcher._workers[node]
+                process.kill()
+                process.join()
+                killed.append(node)
+            return send(node, op, payload)
+
+        dispatcher._send = send_killing_first_import
+        dispatcher.resize(2)
+
+        assert killed and dispatcher.get_stats()['worker_restarts'] == 1
+        for sender in senders:
+            assert dispatcher.get_user_history(sender, timeout=60)['txn_count'] == 2
+    finally:
+        dispatcher.close()
+
+def test_close_does_not_wait_on_dead_or_hung_workers(monkeypatch):
+    monkeypatch.setattr(affinity, 'AFFINITY_STOP_TIMEOUT_S', 1.0)
+    dispatcher = AffinityDispatcher(n_workers=2, replicas=8)
+    for node in (0, 1):
+        dispatcher.analyze(make_transaction(node, f"ACC_{node}", "MERCHANT_0"), timeout=60)
+    dead, _ = dispatcher._workers[0]
+    hung, _ = dispatcher._workers[1]
+    dead.kill()
+    dead.join()
+    os.kill(hung.pid, signal.SIGSTOP)
+
+    try:
+        started = time.monotonic()
+        dispatcher.close()
+
+        assert time.monotonic() - started < 10
+        assert not dead.is_alive() and not hung.is_alive()
+        assert dispatcher.get_stats()['workers'] == 0
+    finally:
+        # A stopped process left behind would block interpreter exit
+        if hung.is_alive():
+            hung.kill()
@@ -0,0 +1,110 @@
+import json
+from datetime import datetime, timedelta
+from fastapi.testclient import TestClient
+from rtf_digi_payments import api
+
+
+def make_payload(i):
+    return {
+        "transaction_id": f"HTTP_{i}",
+        "sender_id": f"USER_{i % 9}",
+        "receiver_id": f"USER_{(i * 2 + 1) % 9}",
+        "amount": 1500.0 + i,
+        "timestamp": (datetime(2024, 1, 15, 12, 0) + timedelta(seconds=i)).isoformat(),
+        "device_id": "DEV_1",
+        "ip_address": "10.0.0.1",
+        "biometric": {"typing_speed": 50.0}
+    }
+
+def test_batch_endpoint_scores_in_order():
+    client = TestClient(api.app)
+    payloads = [make_payload(i) for i in range(40)]
+    
+    response = client.post("/api/v1/analyze/batch", json=payloads)
+    
+    assert response.status_code == 200
+    assert [r["transaction_id"] for r in response.json()] == [p["transaction_id"] for p in payloads]
+
+def test_batch_endpoint_rejects_oversized_batches(monkeypatch):
+    monkeypatch.setattr(api, "BATCH_MAX_TRANSACTIONS", 3)
+    client = TestClient(api.app)
+    
+    response = client.post("/api/v1/analyze/batch", json=[make_payload(i) for i in range(4)])
+    
+    assert response.status_code == 413
+
+def test_stream_endpoint_emits_one_line_per_input(monkeypatch):
+    monkeypatch.setattr(api, "STREAM_CHUNK_SIZE", 7)
+    client = TestClient(api.app)
+    lines = [json.dumps(make_payload(i + 100)) for i in range(30)]
+    lines.insert(12, '{"transaction_id": "BROKEN"}')
+    
+    def body():
+        # Chunk boundaries that split lines
+        data = ("\n".join(lines) + "\n").encode()
+        for start in range(0, len(data), 100):
+            yield data[start:start + 100]
+    
+    with client.stream("POST", "/api/v1/analyze/stream", content=body()) as response:
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        results = [json.loads(line) for line in response.iter_lines() if line]
+    
+    errors = [r for r in results if "error" in r]
+    scores = [r for r in results if "transaction_id" in r]
+    assert [e["line"] for e in errors] == [13]
+    assert [s["transaction_id"] for s in scores] == [f"HTTP_{i + 100}" for i in range(30)]
+
+def test_fast_path_matches_validated_response(monkeypatch):
+    client = TestClient(api.app)
+    
+    monkeypatch.setattr(api, "API_FAST_PATH", False)
+    validated = client.post("/api/v1/analyze", json=make_payload(500)).json()
+    monkeypatch.setattr(api, "API_FAST_PATH", True)
+    fast = client.post("/api/v1/analyze", json=make_payload(501)).json()
+    
+    assert set(fast) == set(validated)
+    for key, value in validated.items():
+        assert type(fast[key]) is type(value)
+
+def test_metrics_endpoint_exports_stage_histograms():
+    client = TestClient(api.app)
+    client.post("/api/v1/analyze", json=make_payload(600))
+    
+    response = client.get("/metrics")
+    
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    counts = {line.split()[0]: float(line.split()[1]) for line in response.text.splitlines()
+              if line.startswith("fraud_stage_latency_seconds_count")}
+    assert set(counts) == {f'fraud_stage_latency_seconds_count{{stage="{stage}"}}'
+                           for stage in ("ml", "graph", "biometric", "state_io", "queue_wait", "total")}
+    assert counts['fraud_stage_latency_seconds_count{stage="total"}'] >= 1
+
+def test_admin_memory_reports_stores_and_accounts():
+    client = TestClient(api.app)
+    client.post("/api/v1/analyze", json=make_payload(700))
+    
+    report = client.get("/admin/memory").json()
+    assert set(report['stores']) == {'graph', 'transaction_times', 'biometric_profiles', 'cache'}
+    assert report['active_accounts'] >= 2 and report['bytes_per_account']['total'] > 0
+    
+    account = client.get("/admin/memory", params={"account": "USER_7"}).json()
+    assert account['account'] == "USER_7" and account['bytes']['total'] > 0
+
+def test_stream_endpoint_caps_line_length(monkeypatch):
+    monkeypatch.setattr(api, "STREAM_MAX_LINE_BYTES", 1024)
+    client = TestClient(api.app)
+    
+    def body():
+        yield (json.dumps(make_payload(200)) + "\n").encode()
+        # A line that never fits: reported once, then skipped up to its newline
+        for _ in range(50):
+            yield b"x" * 500
+        yield b"\n" + json.dumps(make_payload(201)).encode() + b"\n"
+    
+    with client.stream("POST", "/api/v1/analyze/stream", content=body()) as response:
+        results = [json.loads(line) for line in response.iter_lines() if line]
+    
+    errors = [r for r in results if "error" in r]
+    assert errors == [{"line": 2, "error": "line longer than 1024 bytes"}]
+    assert [r["transaction_id"] for r in results if "transaction_id" in r] == ["HTTP_200", "HTTP_201"]
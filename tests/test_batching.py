@@ -0,0 +1,74 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from rtf_digi_payments import fraud_engine
+from rtf_digi_payments.fraud_engine import FraudDetectionEngine
+from rtf_digi_payments.batching import MicroBatcher
+from rtf_digi_payments.models.transaction import Transaction, BiometricData
+
+
+def make_transactions(n):
+    base = datetime(2024, 1, 15, 3, 0)
+    return [
+        Transaction(
+            transaction_id=f"BATCH_{i}",
+            sender_id=f"USER_{i % 7}",
+            receiver_id=f"USER_{(i * 3 + 1) % 7}",
+            amount=1000.0 + 7000 * (i % 9),
+            timestamp=base + timedelta(minutes=i),
+            device_id=f"DEV_{i % 4}",
+            ip_address=f"10.0.0.{i % 5}",
+            biometric=BiometricData(typing_speed=50.0 + (i % 6) * 10, swipe_velocity=100.0) if i % 3 else None
+        )
+        for i in range(n)
+    ]
+
+def test_analyze_batch_matches_sequential_scoring():
+    transactions = make_transactions(60)
+    
+    sequential = FraudDetectionEngine()
+    expected = [sequential.analyze_transaction(txn) for txn in transactions]
+    
+    batched = FraudDetectionEngine()
+    actual = batched.analyze_batch(transactions)
+    
+    fields = ['transaction_id', 'fraud_probability', 'ml_score', 'graph_score', 'biometric_score', 'is_fraudulent']
+    for exp, act in zip(expected, actual):
+        assert [getattr(exp, f) for f in fields] == [getattr(act, f) for f in fields]
+    assert batched.cache_manager.get_user_history("USER_0") == sequential.cache_manager.get_user_history("USER_0")
+
+def test_micro_batcher_fans_results_back_out():
+    engine = FraudDetectionEngine()
+    batcher = MicroBatcher(engine, max_batch_size=16, max_wait_ms=20)
+    transactions = make_transactions(64)
+    
+    with ThreadPoolExecutor(max_workers=32) as callers:
+        results = list(callers.map(batcher.analyze, transactions))
+    stats = batcher.get_stats()
+    batcher.close()
+    
+    assert [r.transaction_id for r in results] == [t.transaction_id for t in transactions]
+    assert stats['requests'] == 64
+    assert stats['batches'] < 64
+    assert engine.cache_manager.get_transaction_count("USER_0") == 10
+
+def test_micro_batcher_leaves_logged_results_untouched(tmp_path, monkeypatch):
+    monkeypatch.setattr(fraud_engine, 'DECISION_LOG_FILE', str(tmp_path / "decisions.log"))
+    engine = FraudDetectionEngine(decision_log=True)
+    logged = []
+    log_transaction = engine.monitor.log_transaction
+
+    def capture(transaction_id, result):
+        logged.append((result, result.latency_ms))
+        log_transaction(transaction_id, result)
+
+    monkeypatch.setattr(engine.monitor, 'log_transaction', capture)
+    batcher = MicroBatcher(engine, max_batch_size=16, max_wait_ms=20)
+
+    result = batcher.analyze(make_transactions(1)[0])
+    batcher.close()
+
+    # The monitor formats its record later; the caller's batch-wait latency
+    # goes on a copy, not on the object the monitor is holding
+    (seen, latency_at_log), = logged
+    assert seen is not result
+    assert seen.latency_ms == latency_at_log <= result.latency_ms
@@ -0,0 +1,173 @@
+import time
+import redis
+from datetime import datetime
+from rtf_digi_payments.utils.cache_manager import CacheManager
+from rtf_digi_payments.utils.circuit_breaker import CircuitBreaker
+
+
+class FakeRedis:
+    def __init__(self):
+        self.data = {}
+        self.down = False
+    
+    def _check(self):
+        if self.down:
+            raise redis.ConnectionError("down")
+    
+    def ping(self):
+        self._check()
+        return True
+    
+    def get(self, key):
+        self._check()
+        return self.data.get(key)
+    
+    def setex(self, key, ttl, value):
+        self._check()
+        self.data[key] = value
+    
+    def pipeline(self):
+        client = self
+        
+        class Pipe:
+            def __init__(self):
+                self.ops = []
+            
+            def incrby(self, key, count):
+                self.ops.append((key, count))
+            
+            def expire(self, key, ttl):
+                pass
+            
+            def execute(self):
+                client._check()
+                for key, count in self.ops:
+                    client.data[key] = str(int(client.data.get(key, 0)) + count)
+        
+        return Pipe()
+
+
+def wait_for(predicate, timeout=3.0):
+    end = time.time() + timeout
+    while time.time() < end:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_breaker_state_transitions():
+    now = [0.0]
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout_s=5, clock=lambda: now[0])
+    
+    breaker.record_failure()
+    assert breaker.state == "closed"
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow_request()
+    assert not breaker.attempt_reset()
+    
+    now[0] = 6.0
+    assert breaker.attempt_reset()
+    assert breaker.state == "half_open"
+    breaker.record_failure()
+    assert breaker.state == "open"
+    
+    now[0] = 12.0
+    breaker.attempt_reset()
+    breaker.record_success()
+    metrics = breaker.get_metrics()
+    assert metrics['state'] == "closed"
+    assert metrics['transitions']["closed->open"] == 1
+    assert metrics['degraded_seconds'] == 12.0
+
+def test_breaker_listeners_may_call_back_into_the_breaker():
+    breaker = CircuitBreaker(failure_threshold=1)
+    seen = []
+    # Listeners run after the breaker's lock is released
+    breaker.add_listener(lambda old, new: seen.append((new, breaker.get_metrics()['state'])))
+
+    breaker.record_failure()
+    breaker.record_success()
+
+    assert seen == [("open", "open"), ("closed", "closed")]
+
+def test_falls_back_and_reconciles_after_recovery():
+    cache = CacheManager(port=1, reset_timeout_s=0.05)
+    assert cache.breaker.state == "open"
+    
+    fake = FakeRedis()
+    fake.down = True
+    fake.data["user:U1:history"] = '{"txn_count": 5, "last_device": "D0", "last_ip": "IP0", "amount_velocity": 0, "last_txn_time": null}'
+    cache.redis_client = fake
+    
+    txn = {'device_id': 'D1', 'ip_address': 'IP1', 'timestamp': datetime.now()}
+    cache.update_user_history("U1", txn)
+    cache.increment_transaction_count("U1")
+    cache.increment_transaction_count("U1")
+    assert cache.get_transaction_count("U1") == 2
+    
+    fake.down = False
+    assert wait_for(lambda: cache.breaker.state == "closed")
+    
+    assert cache.get_transaction_count("U1") == 2
+    assert cache.get_user_history("U1")['txn_count'] == 6
+    assert cache.get_metrics()['reconciliations'] >= 1
+    # The reconciled local copies leave the expiry index with the cache
+    assert not cache.cache and not cache._expires
+
+def test_slow_redis_opens_circuit():
+    cache = CacheManager(port=1, failure_threshold=2, reset_timeout_s=60)
+    fake = FakeRedis()
+    cache.redis_client = fake
+    cache.breaker.attempt_reset = lambda: False
+    cache.breaker.record_success()
+    assert cache.use_redis
+    
+    fake.down = True
+    cache.get_user_history("U2")
+    cache.get_user_history("U2")
+    assert cache.breaker.state == "open"
+    assert cache.get_metrics()['redis_errors'] == 2
+
+
+def test_no_host_keeps_state_local_without_reconciliation():
+    cache = CacheManager(None)
+    cache.update_user_history("LOCAL_1", {'device_id': "DEV_1", 'ip_address': "10.0.0.1",
+                                          'timestamp': datetime(2024, 1, 1)})
+    cache.increment_transaction_count("LOCAL_1")
+
+    assert cache.redis_client is None and not cache.use_redis
+    assert cache.get_user_history("LOCAL_1")['txn_count'] == 1
+    assert cache.get_transaction_count("LOCAL_1") == 1
+    assert cache._pending_history == {} and cache._pending_counts == {}
+    assert cache.stats['redis_errors'] == 0
+
+
+def test_partial_reconcile_only_retries_what_was_not_written():
+    cache = CacheManager(port=1, reset_timeout_s=60)
+    fake = FakeRedis()
+    fake.data["user:U3:history"] = '{"txn_count": 5, "last_device": "D0", "last_ip": "IP0", "amount_velocity": 0, "last_txn_time": null}'
+    cache.redis_client = fake
+    
+    cache.update_user_history("U3", {'device_id': 'D1', 'ip_address': 'IP1', 'timestamp': datetime.now()})
+    cache.increment_transaction_count("U3", count=2)
+    
+    # Counters reach Redis, then the history write fails
+    def failing_setex(key, ttl, value):
+        raise redis.ConnectionError("down")
+    fake.setex = failing_setex
+    try:
+        cache._reconcile()
+    except redis.RedisError:
+        pass
+    
+    assert cache._pending_counts == {}
+    assert cache._pending_history == {"U3": 1}
+    assert cache.get_user_history("U3")['last_device'] == 'D1'
+    
+    del fake.setex
+    cache._reconcile()
+    assert fake.data["user:U3:txn_window"] == "2"
+    assert '"txn_count": 6' in fake.data["user:U3:history"]
+    assert cache.get_metrics()['reconciliations'] == 1
@@ -0,0 +1,89 @@
+from datetime import datetime, timedelta
+from rtf_digi_payments.fraud_engine import FraudDetectionEngine
+from rtf_digi_payments.graph_detector import GraphFraudDetector
+from rtf_digi_payments.models.transaction import Transaction
+from rtf_digi_payments.utils.cache_manager import CacheManager
+from rtf_digi_payments.utils.clock import EventClock, WallClock
+
+BASE = datetime(2023, 6, 1, 9, 0)
+
+
+def test_event_clock_only_moves_forward():
+    clock = EventClock(allowed_lateness_s=30)
+    clock.observe(BASE)
+    clock.observe(BASE - timedelta(hours=1))
+    assert clock.now() == BASE - timedelta(seconds=30)
+
+    capped = EventClock(max_ahead_s=60)
+    capped.observe(datetime.now() + timedelta(days=365))
+    assert capped.now() < datetime.now() + timedelta(seconds=120)
+
+
+def test_velocity_counts_the_last_hour_of_event_time():
+    graph = GraphFraudDetector(clock=EventClock())
+    for i in range(12):
+        graph.add_transaction("FAST", f"R{i}", 10.0, BASE + timedelta(minutes=i))
+    assert graph._calculate_velocity_score("FAST") == 0.6
+
+    # An hour of event time later the burst is outside the window
+    graph.add_transaction("OTHER", "R0", 10.0, BASE + timedelta(minutes=75))
+    assert graph._calculate_velocity_score("FAST") == 0.0
+
+
+def test_cache_entries_expire_on_event_time():
+    clock = EventClock()
+    cache = CacheManager(None, ttl=600, clock=clock, sweep_interval_s=60)
+    clock.observe(BASE)
+    cache.update_user_history("U1", {'device_id': "D1", 'ip_address': "10.0.0.1", 'timestamp': BASE})
+    cache.increment_transaction_count("U1", window_minutes=5)
+
+    clock.observe(BASE + timedelta(minutes=6))
+    assert cache.get_transaction_count("U1") == 0
+    assert cache.get_user_history("U1")['txn_count'] == 1
+
+    clock.observe(BASE + timedelta(minutes=12))
+    cache.update_user_history("U2", {'device_id': "D2", 'ip_address': "10.0.0.2", 'timestamp': clock.now()})
+    assert cache.get_user_history("U1")['txn_count'] == 0
+    # The sweep dropped U1's entries rather than just hiding them
+    assert set(cache.cache) == {"user:U2:history"}
+
+
+def test_event_time_replay_is_deterministic_and_independent_of_wall_time():
+    transactions = [
+        Transaction(transaction_id=f"EVT_{i}", sender_id=f"U{i % 2}", receiver_id=f"U{(i + 1) % 5}",
+                    amount=40.0 + i, timestamp=BASE + timedelta(minutes=2 * i), device_id="D1",
+                    ip_address="10.0.0.1")
+        for i in range(60)
+    ]
+
+    def run():
+        engine = FraudDetectionEngine(write_behind=False, idempotency=False, redis_host=None, clock=EventClock())
+        return [(s.ml_score, s.graph_score) for s in engine.analyze_batch(transactions)]
+
+    first = run()
+    assert run() == first
+    assert max(graph for _, graph in first) > 0
+    # Years later on the wall clock, none of these is recent enough to count
+    wall = FraudDetectionEngine(write_behind=False, idempotency=False, redis_host=None, clock=WallClock())
+    assert max(s.graph_score for s in wall.analyze_batch(transactions)) == 0
+
+
+def test_expiry_index_grows_with_live_keys_not_writes():
+    clock = EventClock()
+    cache = CacheManager(None, ttl=3600, clock=clock, sweep_interval_s=60)
+    for i in range(20000):
+        timestamp = BASE + timedelta(seconds=i)
+        clock.observe(timestamp)
+        user_id = f"HOT_{i % 10}"
+        cache.update_user_history(user_id, {'device_id': "DEV", 'ip_address': "10.0.0.1", 'timestamp': timestamp})
+        cache.increment_transaction_count(user_id)
+
+    assert len(cache._expires) == 20
+    assert sum(len(keys) for keys in cache._expiry_buckets.values()) == 20
+    assert cache.get_transaction_count("HOT_0") == 2000
+
+    # A quiet TTL later every key has gone, index included
+    clock.observe(BASE + timedelta(seconds=20000 + 3600 + 120))
+    cache.increment_transaction_count("LATE")
+    assert set(cache._expires) == {"user:LATE:txn_window"}
+    assert sum(len(keys) for keys in cache._expiry_buckets.values()) == 1
@@ -0,0 +1,71 @@
+import random
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from rtf_digi_payments.fraud_engine import FraudDetectionEngine
+from rtf_digi_payments.models.transaction import Transaction, BiometricData
+
+N_THREADS = 16
+TXNS_PER_THREAD = 150
+N_ACCOUNTS = 400
+
+
+def test_concurrent_scoring_keeps_state_consistent():
+    engine = FraudDetectionEngine()
+    errors = []
+    sent = Counter()
+    touched = Counter()
+    edges = Counter()
+    biometric_samples = Counter()
+    tally_lock = threading.Lock()
+    
+    def worker(worker_id):
+        rng = random.Random(worker_id)
+        for i in range(TXNS_PER_THREAD):
+            sender = f"ACC_{rng.randrange(N_ACCOUNTS)}"
+            receiver = f"ACC_{rng.randrange(N_ACCOUNTS)}"
+            if receiver == sender:
+                receiver = f"ACC_{(int(sender[4:]) + 1) % N_ACCOUNTS}"
+            txn = Transaction(
+                transaction_id=f"STRESS_{worker_id}_{i}",
+                sender_id=sender,
+                receiver_id=receiver,
+                amount=float(rng.uniform(100, 5000)),
+                timestamp=datetime.now(),
+                device_id=f"DEV_{worker_id}",
+                ip_address="10.0.0.1",
+                biometric=BiometricData(typing_speed=50.0)
+            )
+            try:
+                engine.analyze_transaction(txn)
+            except Exception as exc:
+                errors.append(exc)
+                continue
+            with tally_lock:
+                sent[sender] += 1
+                touched[sender] += 1
+                touched[receiver] += 1
+                edges[(sender, receiver)] += 1
+                biometric_samples[sender] += 1
+    
+    threads = [threading.Thread(target=worker, args=(t,)) for t in range(N_THREADS)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    total = N_THREADS * TXNS_PER_THREAD
+    print(f"\n{total} transactions from {N_THREADS} threads in {elapsed:.2f}s ({total / elapsed:.0f} TPS)")
+    
+    assert errors == []
+    graph = engine.graph_detector.graph
+    for (sender, receiver), count in edges.items():
+        assert graph[sender][receiver]['weight'] == count
+    for account, count in touched.items():
+        assert engine.cache_manager.get_user_history(account)['txn_count'] == count
+    for account, count in sent.items():
+        assert engine.cache_manager.get_transaction_count(account) == count
+        assert len(engine.graph_detector.transaction_times[account]) == count
+        assert len(engine.biometric_analyzer.user_profiles[account]['typing_speed']) == min(biometric_samples[account], 100)
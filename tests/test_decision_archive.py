@@ -0,0 +1,144 @@
+import json
+import os
+from datetime import datetime, timedelta
+from rtf_digi_payments import fraud_engine
+from rtf_digi_payments.fraud_engine import FraudDetectionEngine
+from rtf_digi_payments.decision_archive import DEAD_LETTER, DecisionArchive, DecisionArchiveReader
+from rtf_digi_payments.models.transaction import Transaction, TransactionRecord, BiometricData, FraudScore
+
+BASE = datetime(2024, 3, 4, 0, 0)
+
+
+def make_transaction(i, hours_apart=1.0):
+    return Transaction(
+        transaction_id=f"ARC_{i}",
+        sender_id=f"USER_{i % 6}",
+        receiver_id=f"USER_{(i + 1) % 6}",
+        amount=100.0 + i,
+        timestamp=BASE + timedelta(hours=i * hours_apart),
+        device_id="DEV_1",
+        ip_address="10.0.0.1",
+        biometric=BiometricData(typing_speed=50.0) if i % 2 else None
+    )
+
+def make_score(i):
+    return FraudScore(
+        transaction_id=f"ARC_{i}", fraud_probability=(i % 10) / 10, ml_score=0.5, graph_score=0.0,
+        biometric_score=0.5, is_fraudulent=i % 10 >= 8, latency_ms=1.0
+    )
+
+def test_engine_archives_single_and_batch_decisions(tmp_path, monkeypatch):
+    monkeypatch.setattr(fraud_engine, 'DECISION_ARCHIVE_DIR', str(tmp_path))
+    engine = FraudDetectionEngine(decision_archive=True)
+    transactions = [make_transaction(i) for i in range(30)]
+    results = [engine.analyze_transaction(txn) for txn in transactions[:10]]
+    results += engine.analyze_batch(transactions[10:])
+    engine.flush()
+
+    table = DecisionArchiveReader(str(tmp_path)).query()
+    assert table.column('transaction_id').to_pylist() == [t.transaction_id for t in transactions]
+    assert table.column('fraud_probability').to_pylist() == [r.fraud_probability for r in results]
+    assert table.column('biometric_typing_speed').to_pylist()[:2] == [None, 50.0]
+    assert all(len(row) == 9 for row in table.column('features').to_pylist())
+    assert set(table.column('model_version').to_pylist()) == {engine.ml_scorer.model_version}
+    assert engine.get_metrics()['decision_archive']['written'] == 30
+    engine.close()
+
+def test_segments_rotate_and_queries_prune_by_time(tmp_path):
+    archive = DecisionArchive(str(tmp_path), batch_size=10, segment_max_rows=40)
+    for i in range(200):
+        archive.append(TransactionRecord.from_transaction(make_transaction(i)), make_score(i), None, 3)
+    archive.close()
+    assert not [name for name in os.listdir(tmp_path) if name.endswith('.tmp')]
+
+    reader = DecisionArchiveReader(str(tmp_path))
+    assert len(reader.segments()) == 5
+    # A day of data lives in one or two of the five segments
+    start, end = BASE + timedelta(days=2), BASE + timedelta(days=3)
+    assert len(reader.segments(start, end)) <= 2
+
+    flagged = reader.query(start, end, account="USER_2", flagged=True)
+    expected = [f"ARC_{i}" for i in range(48, 72)
+                if i % 10 >= 8 and "USER_2" in (f"USER_{i % 6}", f"USER_{(i + 1) % 6}")]
+    assert flagged.column('transaction_id').to_pylist() == expected
+
+def test_failed_write_is_retried_on_a_fresh_segment(tmp_path):
+    archive = DecisionArchive(str(tmp_path), batch_size=10, flush_interval_ms=1000)
+    append, calls = archive._append, []
+
+    def flaky_append(record_batch):
+        calls.append(record_batch.num_rows)
+        if len(calls) == 2:
+            raise OSError("disk hiccup")
+        return append(record_batch)
+    archive._append = flaky_append
+
+    for i in range(30):
+        archive.append(TransactionRecord.from_transaction(make_transaction(i)), make_score(i))
+    archive.close()
+
+    stats = archive.get_stats()
+    assert (stats['written'], stats['write_errors'], stats['write_retries'], stats['dead_lettered']) == (30, 1, 1, 0)
+    # The segment the write failed on is set aside unpublished, and the batch
+    # it held is written again, ahead of the retried one
+    assert stats['segments_abandoned'] == 1
+    assert len([name for name in os.listdir(tmp_path) if name.endswith('.arrow.tmp')]) == 1
+    reader = DecisionArchiveReader(str(tmp_path))
+    assert len(reader.segments()) == 1
+    assert reader.query().column('transaction_id').to_pylist() == [f"ARC_{i}" for i in range(30)]
+
+def test_unwritable_batch_goes_to_dead_letter_file(tmp_path):
+    archive = DecisionArchive(str(tmp_path), batch_size=10, write_attempts=2)
+
+    def failing_append(record_batch):
+        raise OSError("disk full")
+    archive._append = failing_append
+
+    for i in range(5):
+        archive.append(TransactionRecord.from_transaction(make_transaction(i)), make_score(i))
+    archive.close()
+
+    with open(tmp_path / DEAD_LETTER) as f:
+        lines = [json.loads(line) for line in f]
+    assert [line['transaction']['transaction_id'] for line in lines] == [f"ARC_{i}" for i in range(5)]
+    assert lines[0]['score']['fraud_probability'] == 0.0
+    assert archive.get_stats()['dead_lettered'] == 5
+    assert not [name for name in os.listdir(tmp_path) if 'segment' in name]
+
+def test_score_distribution_by_hour(tmp_path):
+    archive = DecisionArchive(str(tmp_path))
+    for i in range(40):
+        # Four decisions per hour
+        archive.append(TransactionRecord.from_transaction(make_transaction(i, hours_apart=0.25)), make_score(i))
+    archive.flush()
+
+    by_hour = archive.reader().score_distribution_by_hour().to_pylist()
+    archive.close()
+    assert [row['hour'] for row in by_hour] == [BASE + timedelta(hours=h) for h in range(10)]
+    assert all(row['decisions'] == 4 for row in by_hour)
+    assert sum(row['flagged'] for row in by_hour) == 8
+    assert by_hour[0]['mean_probability'] == (0.0 + 0.1 + 0.2 + 0.3) / 4
+
+def test_rows_of_an_abandoned_segment_are_dead_lettered_if_rewrite_fails(tmp_path):
+    archive = DecisionArchive(str(tmp_path), batch_size=10, flush_interval_ms=1000, write_attempts=2)
+    append, calls = archive._append, []
+
+    def failing_after_first(record_batch):
+        calls.append(record_batch.num_rows)
+        if len(calls) > 1:
+            raise OSError("disk gone")
+        return append(record_batch)
+    archive._append = failing_after_first
+
+    for i in range(20):
+        archive.append(TransactionRecord.from_transaction(make_transaction(i)), make_score(i))
+    archive.close()
+
+    stats = archive.get_stats()
+    assert (stats['written'], stats['dead_lettered']) == (0, 20)
+    assert DecisionArchiveReader(str(tmp_path)).segments() == []
+    with open(tmp_path / DEAD_LETTER) as f:
+        lines = [json.loads(line) for line in f]
+    ids = [line['decision']['transaction_id'] if 'decision' in line else line['transaction']['transaction_id']
+           for line in lines]
+    assert ids == [f"ARC_{i}" for i in range(20)]
@@ -1,3 +1,4 @@
+import time
 import pytest
 from datetime import datetime
 from rtf_digi_payments.fraud_engine import FraudDetectionEngine
@@ -121,3 +122,93 @@ def test_latency_constraint(engine):
     
     result = engine.analyze_transaction(txn)
     assert result.latency_ms < 500, f"Latency {result.latency_ms}ms exceeds 500ms threshold"
+
+def test_write_behind_state_updates():
+    engine = FraudDetectionEngine(write_behind=True)
+    
+    for i in range(3):
+        txn = Transaction(
+            transaction_id=f"TXN_WB_{i}",
+            sender_id="USER_WB",
+            receiver_id=f"USER_WB_RECV_{i}",
+            amount=1000.0,
+            timestamp=datetime.now(),
+            device_id="DEV_WB",
+            ip_address="192.168.1.60",
+            biometric=BiometricData(typing_speed=50.0)
+        )
+        result = engine.analyze_transaction(txn)
+        assert result.latency_ms < 500
+    
+    engine.flush()
+    
+    assert engine.cache_manager.get_user_history("USER_WB")['txn_count'] == 3
+    assert engine.graph_detector.graph.out_degree("USER_WB") == 3
+    assert len(engine.biometric_analyzer.user_profiles["USER_WB"]['typing_speed']) == 3
+    engine.close()
+
+def test_slow_stage_is_degraded_within_deadline(engine):
+    from rtf_digi_payments.utils.deadline import Deadline
+    
+    def slow_detect(sender, receiver, include_edge=False, deadline=None):
+        while not deadline.expired():
+            time.sleep(0.005)
+        deadline.check()
+    
+    engine.graph_detector.detect_fraud_ring = slow_detect
+    txn = Transaction(
+        transaction_id="TXN_DEADLINE",
+        sender_id="USER_DL",
+        receiver_id="USER_DL_RECV",
+        amount=1000.0,
+        timestamp=datetime.now(),
+        device_id="DEV_DL",
+        ip_address="192.168.1.70"
+    )
+    
+    result = engine.analyze_transaction(txn, deadline=Deadline(80))
+    
+    assert result.degraded_stages == ["graph"]
+    assert result.graph_score == 0.0
+    assert result.latency_ms < 150
+    assert engine.graph_detector.graph.has_edge("USER_DL", "USER_DL_RECV")
+
+def test_cascade_skips_expensive_stages_for_clear_cases():
+    engine = FraudDetectionEngine(cascade=True)
+    txn = Transaction(
+        transaction_id="TXN_CASCADE",
+        sender_id="USER_CASCADE",
+        receiver_id="USER_CASCADE_RECV",
+        amount=200.0,
+        timestamp=datetime.now().replace(hour=14),
+        device_id="DEV_CASCADE",
+        ip_address="192.168.1.80"
+    )
+    
+    result = engine.analyze_transaction(txn)
+    
+    assert result.skipped_stages == ["ml", "graph"]
+    assert not result.is_fraudulent
+    assert engine.cascade_stats['graph_skipped'] == 1
+    assert engine.graph_detector.graph.has_edge("USER_CASCADE", "USER_CASCADE_RECV")
+
+def test_retried_transaction_returns_original_score(engine):
+    txn = Transaction(
+        transaction_id="TXN_RETRY",
+        sender_id="USER_RETRY",
+        receiver_id="USER_RETRY_RECV",
+        amount=2500.0,
+        timestamp=datetime.now(),
+        device_id="DEV_RETRY",
+        ip_address="192.168.1.90"
+    )
+    
+    first = engine.analyze_transaction(txn)
+    retry = engine.analyze_transaction(txn)
+    batch_retry = engine.analyze_batch([txn, txn])
+    
+    assert retry == first
+    assert all(r == first for r in batch_retry)
+    assert engine.cache_manager.get_user_history("USER_RETRY")['txn_count'] == 1
+    assert engine.graph_detector.graph["USER_RETRY"]["USER_RETRY_RECV"]['weight'] == 1
+    assert engine.idempotency.get_stats()['duplicate_rate'] == 0.75
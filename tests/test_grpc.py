@@ -0,0 +1,110 @@
+import asyncio
+from datetime import datetime, timedelta
+import grpc
+from rtf_digi_payments.fraud_engine import FraudDetectionEngine
+from rtf_digi_payments.grpc_server import create_server, transaction_to_proto, transaction_from_proto
+from rtf_digi_payments.models.transaction import Transaction, BiometricData
+from rtf_digi_payments.proto import fraud_pb2, fraud_pb2_grpc
+
+
+def make_transaction(i, amount=2500.0):
+    return Transaction(
+        transaction_id=f"GRPC_{i}",
+        sender_id=f"USER_{i % 7}",
+        receiver_id=f"USER_{(i + 3) % 7}",
+        amount=amount,
+        timestamp=datetime(2024, 1, 15, 12, 0) + timedelta(seconds=i),
+        device_id=f"DEV_{i % 3}",
+        ip_address="10.0.0.1",
+        biometric=BiometricData(typing_speed=50.0 + i % 5) if i % 2 else None
+    )
+
+def test_proto_roundtrip():
+    txn = make_transaction(1)
+    txn.metadata = {"channel": "pos"}
+    assert transaction_from_proto(transaction_to_proto(txn)) == txn
+
+def test_bidirectional_stream_scores_in_order():
+    async def run():
+        engine = FraudDetectionEngine()
+        server, servicer, port = create_server(engine, port=0, host='127.0.0.1')
+        servicer.chunk_size = 16
+        await server.start()
+        try:
+            async with grpc.aio.insecure_channel(f'127.0.0.1:{port}') as channel:
+                stub = fraud_pb2_grpc.FraudDetectionStub(channel)
+
+                async def requests():
+                    for i in range(100):
+                        message = transaction_to_proto(make_transaction(i))
+                        if i == 42:
+                            message.amount = -1.0  # fails validation, stream carries on
+                        yield message
+
+                return [result async for result in stub.Analyze(requests())], servicer.get_stats()
+        finally:
+            await server.stop(None)
+
+    results, stats = asyncio.run(run())
+
+    assert [r.transaction_id for r in results] == [f"GRPC_{i}" for i in range(100)]
+    assert results[42].error and not results[42].HasField('score')
+    for i, result in enumerate(results):
+        if i != 42:
+            assert not result.error
+            assert 0.0 <= result.score.fraud_probability <= 1.0
+    assert stats['messages'] == 100 and stats['errors'] == 1 and stats['active_streams'] == 0
+
+def run_stream(engine, count):
+    async def run():
+        server, servicer, port = create_server(engine, port=0, host='127.0.0.1')
+        servicer.chunk_size = 8
+        await server.start()
+        try:
+            async with grpc.aio.insecure_channel(f'127.0.0.1:{port}') as channel:
+                stub = fraud_pb2_grpc.FraudDetectionStub(channel)
+
+                async def requests():
+                    for i in range(count):
+                        yield transaction_to_proto(make_transaction(i))
+
+                return [result async for result in stub.Analyze(requests())], servicer.get_stats()
+        finally:
+            await server.stop(None)
+
+    return asyncio.run(run())
+
+def test_stream_reports_duplicate_in_flight():
+    engine = FraudDetectionEngine()
+    # Another caller is still scoring GRPC_5 and never finishes in time
+    engine.idempotency.begin("GRPC_5")
+
+    results, stats = run_stream(engine, 16)
+
+    assert [r.transaction_id for r in results] == [f"GRPC_{i}" for i in range(16)]
+    assert results[5].error == "still being scored" and not results[5].HasField('score')
+    for i, result in enumerate(results):
+        if i != 5:
+            assert not result.error and result.HasField('score')
+    assert stats['errors'] == 1 and stats['active_streams'] == 0
+
+def test_stream_survives_engine_failure(monkeypatch):
+    engine = FraudDetectionEngine()
+    calls = []
+    analyze_batch = engine.analyze_batch
+
+    def flaky(transactions):
+        calls.append(len(transactions))
+        if len(calls) == 1:
+            raise RuntimeError("scoring backend down")
+        return analyze_batch(transactions)
+
+    monkeypatch.setattr(engine, 'analyze_batch', flaky)
+
+    results, stats = run_stream(engine, 16)
+
+    assert [r.transaction_id for r in results] == [f"GRPC_{i}" for i in range(16)]
+    failed = calls[0]
+    assert all(r.error == "RuntimeError: scoring backend down" for r in results[:failed])
+    assert all(not r.error and r.HasField('score') for r in results[failed:])
+    assert stats['errors'] == failed
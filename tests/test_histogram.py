@@ -0,0 +1,85 @@
+import threading
+import numpy as np
+from datetime import datetime
+from rtf_digi_payments.fraud_engine import FraudDetectionEngine, LATENCY_STAGES
+from rtf_digi_payments.models.transaction import Transaction, BiometricData
+from rtf_digi_payments.utils.histogram import (
+    LatencyHistogram, ShardedHistogram, bucket_index, bucket_bounds, merge_snapshots, render_prometheus, N_BUCKETS
+)
+
+
+def test_buckets_cover_range_contiguously():
+    previous_high = -1
+    for i in range(N_BUCKETS):
+        low, high = bucket_bounds(i)
+        assert low == previous_high + 1
+        assert bucket_index(low) == bucket_index(high) == i
+        previous_high = high
+
+def test_quantiles_within_one_percent():
+    rng = np.random.default_rng(3)
+    values_ms = rng.lognormal(0, 1.5, 50000)  # ~0.01ms to several seconds
+    histogram = LatencyHistogram()
+    for value in values_ms:
+        histogram.record(value)
+    for q in (50, 90, 99, 99.9):
+        exact = np.percentile(values_ms, q, method='inverted_cdf')
+        assert abs(histogram.percentile(q) - exact) <= 0.01 * exact + 0.001
+
+def test_shards_and_merge_match_single_histogram():
+    rng = np.random.default_rng(4)
+    chunks = [rng.exponential(5, 2000) for _ in range(4)]
+    sharded = ShardedHistogram()
+    threads = [threading.Thread(target=lambda c=c: [sharded.record(v) for v in c]) for c in chunks]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    single = LatencyHistogram()
+    parts = []
+    for chunk in chunks:
+        part = LatencyHistogram()
+        for value in chunk:
+            single.record(value)
+            part.record(value)
+        parts.append({'total': part})
+
+    snapshot = sharded.snapshot()
+    merged = merge_snapshots(parts)['total']
+    assert snapshot.counts == single.counts == merged.counts
+    assert snapshot.count == 8000 and merged.sum_us == single.sum_us
+
+def test_shards_of_exited_threads_are_retired():
+    sharded = ShardedHistogram()
+    for i in range(500):
+        thread = threading.Thread(target=sharded.record, args=(1.0 + i % 7,))
+        thread.start()
+        thread.join()
+    sharded.record(2.0)
+
+    assert len(sharded._shards) <= 2
+    assert sharded.snapshot().count == 501
+
+def test_engine_stage_histograms_and_sampled_timings():
+    engine = FraudDetectionEngine()
+    engine.stage_timings_every = 2
+    results = [engine.analyze_transaction(Transaction(
+        transaction_id=f"HIST_{i}", sender_id=f"USER_{i % 5}", receiver_id=f"USER_{(i + 1) % 5}",
+        amount=300.0, timestamp=datetime.now(), device_id="DEV_1", ip_address="10.0.0.1",
+        biometric=BiometricData(typing_speed=50.0)
+    )) for i in range(10)]
+
+    sampled = [r for r in results if r.stage_timings is not None]
+    assert len(sampled) == 5
+    assert set(sampled[0].stage_timings) == set(LATENCY_STAGES)
+    assert sampled[0].stage_timings['total'] == sampled[0].latency_ms
+
+    snapshot = engine.latency.snapshot()
+    assert snapshot['total'].count == 10 and snapshot['ml'].count == 10 and snapshot['state_io'].count == 10
+    assert snapshot['total'].percentile(100) >= snapshot['ml'].percentile(100)
+
+    text = render_prometheus(snapshot)
+    assert 'fraud_stage_latency_seconds_count{stage="graph"} 10' in text
+    assert 'fraud_stage_latency_seconds_bucket{stage="total",le="+Inf"} 10' in text
+    assert 'fraud_stage_latency_quantile_seconds{stage="ml",quantile="0.99"}' in text
@@ -0,0 +1,76 @@
+import threading
+import pytest
+from datetime import datetime
+from rtf_digi_payments.fraud_engine import FraudDetectionEngine
+from rtf_digi_payments.utils.idempotency import DuplicateInProgress, IdempotencyStore
+from rtf_digi_payments.models.transaction import FraudScore, Transaction
+
+
+def make_score(transaction_id):
+    return FraudScore(transaction_id=transaction_id, fraud_probability=0.1, ml_score=0.1,
+                      graph_score=0.0, biometric_score=0.5, is_fraudulent=False, latency_ms=1.0)
+
+def test_entries_expire_with_their_time_bucket():
+    now = [1000.0]
+    store = IdempotencyStore(window_seconds=60, n_buckets=6, clock=lambda: now[0])
+    
+    assert store.begin("T1") == (None, True)
+    store.complete("T1", make_score("T1"))
+    now[0] += 30
+    assert store.begin("T1")[0].transaction_id == "T1"
+    
+    now[0] += 50
+    assert store.begin("T1") == (None, True)
+    assert store.get_stats()['evicted'] == 1
+
+def test_size_bound_drops_oldest_bucket():
+    now = [0.0]
+    store = IdempotencyStore(window_seconds=100, n_buckets=10, max_entries=3, clock=lambda: now[0])
+    for i in range(5):
+        store.begin(f"T{i}")
+        store.complete(f"T{i}", make_score(f"T{i}"))
+        now[0] += 10
+    
+    assert store.get_stats()['entries'] <= 3
+    assert store.begin("T0") == (None, True)
+
+def test_concurrent_retry_waits_for_original():
+    store = IdempotencyStore()
+    assert store.begin("T1") == (None, True)
+    
+    seen = []
+    waiter = threading.Thread(target=lambda: seen.append(store.begin("T1", wait_timeout=2)))
+    waiter.start()
+    store.complete("T1", make_score("T1"))
+    waiter.join()
+    
+    assert seen[0][0].transaction_id == "T1"
+    assert seen[0][1] is False
+
+def test_retry_timing_out_behind_original_does_not_take_ownership():
+    store = IdempotencyStore()
+    assert store.begin("T1") == (None, True)
+    
+    with pytest.raises(DuplicateInProgress) as raised:
+        store.begin("T1", wait_timeout=0.01)
+    assert raised.value.transaction_ids == ["T1"]
+    assert store.get_stats()['in_flight_timeouts'] == 1
+    
+    # Once the original gives up, a retry scores it
+    store.abort("T1")
+    assert store.begin("T1", wait_timeout=0.01) == (None, True)
+
+def test_batch_leaves_out_duplicates_still_in_flight():
+    engine = FraudDetectionEngine(redis_host=None, write_behind=False)
+    transactions = [Transaction(transaction_id=f"B{i}", sender_id=f"USER_{i}", receiver_id="USER_X",
+                                amount=10.0, timestamp=datetime(2024, 1, 1, 12, i),
+                                device_id="DEV", ip_address="10.0.0.1") for i in range(3)]
+    # B1's original is being scored elsewhere and never finishes
+    engine.idempotency.begin("B1")
+    
+    with pytest.raises(DuplicateInProgress) as raised:
+        engine.analyze_batch(transactions)
+    
+    assert raised.value.transaction_ids == ["B1"]
+    assert [result and result.transaction_id for result in raised.value.results] == ["B0", None, "B2"]
+    assert engine.idempotency.begin("B0")[1] is False
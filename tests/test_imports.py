@@ -0,0 +1,44 @@
+import os
+import pytest
+from config.settings import IMPORT_TIME_BUDGET_MS, SERVING_PATH_EXCLUDED_PACKAGES
+from rtf_digi_payments.utils.importtime import measure_import, parse_importtime, slowest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ENV = dict(os.environ, PYTHONPATH=os.pathsep.join([os.path.join(ROOT, 'src'), ROOT]))
+
+
+def test_parse_importtime():
+    rows = parse_importtime(
+        "import time: self [us] | cumulative | imported package\n"
+        "import time:       120 |        120 |     numpy.core\n"
+        "import time:       300 |        420 |   numpy\n"
+        "import time:        80 |        500 | app\n"
+    )
+    assert rows == [('numpy.core', 2, 120, 120), ('numpy', 1, 300, 420), ('app', 0, 80, 500)]
+
+
+@pytest.mark.parametrize("module", ['rtf_digi_payments.api', 'rtf_digi_payments.fraud_engine'])
+def test_serving_path_excludes_heavy_packages(module):
+    measurement = measure_import(module, env=ENV)
+    assert not set(measurement['packages']) & set(SERVING_PATH_EXCLUDED_PACKAGES)
+
+
+def test_engine_imports_optional_subsystems_on_use():
+    measurement = measure_import('rtf_digi_payments.api', env=ENV)
+    optional = {'rtf_digi_payments.' + name for name in
+                ('process_pool', 'snapshot', 'batching', 'affinity', 'decision_archive', 'grpc_server')}
+    assert not optional & set(measurement['modules'])
+
+
+@pytest.mark.parametrize("module", sorted(IMPORT_TIME_BUDGET_MS))
+def test_import_time_budget(module):
+    # Fastest of three cold imports, so one slow run on a busy machine does not fail it
+    measurement = measure_import(module, repeat=3, env=ENV)
+    assert measurement['total_ms'] <= IMPORT_TIME_BUDGET_MS[module], slowest(measurement)
+
+
+def test_package_exports_load_on_first_use():
+    measurement = measure_import('rtf_digi_payments', env=ENV)
+    assert measurement['packages'] == ['rtf_digi_payments']
+    import rtf_digi_payments
+    assert rtf_digi_payments.FraudDetectionEngine.__module__ == 'rtf_digi_payments.fraud_engine'
@@ -0,0 +1,50 @@
+import random
+import sys
+from datetime import datetime
+from rtf_digi_payments.fraud_engine import FraudDetectionEngine
+from rtf_digi_payments.models.transaction import Transaction, BiometricData
+from rtf_digi_payments.utils.memory import deep_sizeof, entry_sizeof, estimate_store
+
+
+def test_deep_sizeof_counts_shared_objects_once():
+    shared = [i + 0.5 for i in range(4)]
+    keys = ["".join(["key_", c]) for c in "ab"]
+    size, objects = deep_sizeof({keys[0]: shared, keys[1]: shared})
+    expected = sys.getsizeof(dict.fromkeys(keys)) + sum(sys.getsizeof(k) for k in keys) \
+        + sys.getsizeof(shared) + sum(sys.getsizeof(v) for v in shared)
+    assert size == expected and objects == 8
+
+def test_widely_referenced_objects_not_charged():
+    # Interned literal keys are shared by every entry, not owned by one
+    entries = [{'txn_count': i + 1000} for i in range(100)]
+    size, objects = deep_sizeof(entries[0])
+    assert size == sys.getsizeof(entries[0]) + sys.getsizeof(1000) and objects == 2
+
+def test_sampled_estimate_close_to_full_walk():
+    rng = random.Random(5)
+    store = {f"USER_{i}": [float(j) for j in range(rng.randrange(40))] for i in range(20000)}
+    exact = sys.getsizeof(store) + sum(entry_sizeof(key, value)[0] for key, value in store.items())
+    estimate = estimate_store(store, 500)
+    assert estimate['entries'] == 20000 and estimate['sampled'] == 500
+    assert abs(estimate['bytes'] - exact) <= 0.05 * exact
+
+def test_engine_memory_report_and_account_usage():
+    engine = FraudDetectionEngine()
+    for i in range(60):
+        engine.analyze_transaction(Transaction(
+            transaction_id=f"MEM_{i}", sender_id=f"USER_{i % 12}", receiver_id=f"USER_{(i + 5) % 12}",
+            amount=250.0, timestamp=datetime.now(), device_id="DEV_1", ip_address="10.0.0.1",
+            biometric=BiometricData(typing_speed=40.0 + i % 7)
+        ))
+    report = engine.memory_report()
+    assert report['active_accounts'] == len(engine.known_accounts()) == 12
+    assert report['stores']['graph']['entries'] == 12 and report['stores']['graph']['edges'] == 12
+    assert report['stores']['biometric_profiles']['entries'] == 12
+    assert report['estimated_bytes'] == sum(store['bytes'] for store in report['stores'].values())
+
+    usage = engine.account_memory("USER_3")
+    assert all(usage[store] > 0 for store in ('graph', 'transaction_times', 'biometric_profiles', 'cache'))
+    assert usage['total'] == sum(v for k, v in usage.items() if k != 'total')
+    # Unknown accounts cost nothing, and asking must not create them
+    assert engine.account_memory("NOBODY")['total'] == 0
+    assert "NOBODY" not in engine.biometric_analyzer.user_profiles
@@ -0,0 +1,91 @@
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from rtf_digi_payments import fraud_engine
+from rtf_digi_payments.fraud_engine import FraudDetectionEngine
+from rtf_digi_payments.models.transaction import Transaction, FraudScore
+from rtf_digi_payments.utils.monitor import FraudMonitor
+
+
+def make_score(i, fraudulent=False):
+    return FraudScore(
+        transaction_id=f"MON_{i}", fraud_probability=0.9 if fraudulent else 0.1, ml_score=0.5,
+        graph_score=0.0, biometric_score=0.5, is_fraudulent=fraudulent, latency_ms=1.5,
+        reason="High ML fraud score" if fraudulent else None
+    )
+
+def read_lines(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+def test_decisions_written_as_json_lines(tmp_path):
+    log_file = str(tmp_path / "logs" / "decisions.log")
+    monitor = FraudMonitor(log_file)
+    monitor.log_transaction("MON_0", make_score(0))
+    monitor.log_transaction("MON_1", make_score(1, fraudulent=True).model_dump())
+    monitor.alert_high_latency("MON_2", 750.0, threshold=500)
+    monitor.alert_high_latency("MON_3", 10.0, threshold=500)
+    monitor.close()
+
+    routine, fraud, slow = read_lines(log_file)
+    assert routine == {'ts': routine['ts'], 'event': 'txn', 'txn': 'MON_0', 'fraud_probability': 0.1, 'latency_ms': 1.5}
+    assert fraud['event'] == 'fraud' and fraud['reason'] == "High ML fraud score" and fraud['txn'] == 'MON_1'
+    assert slow['event'] == 'high_latency' and slow['latency_ms'] == 750.0
+    stats = monitor.get_stats()
+    assert stats['total_transactions'] == 2 and stats['fraud_detected'] == 1
+    assert stats['log']['written'] == 3 and stats['log']['dropped'] == 0
+
+def test_rotation_keeps_backup_count(tmp_path):
+    log_file = str(tmp_path / "decisions.log")
+    monitor = FraudMonitor(log_file, max_bytes=2000, backup_count=2, flush_interval_ms=0, batch_size=8)
+    for i in range(200):
+        monitor.log_transaction(f"MON_{i}", make_score(i))
+        monitor.flush()
+    monitor.close()
+
+    assert sorted(os.listdir(tmp_path)) == ["decisions.log", "decisions.log.1", "decisions.log.2"]
+    assert all(os.path.getsize(tmp_path / name) <= 2000 for name in os.listdir(tmp_path))
+    assert monitor.get_stats()['log']['rotations'] > 2
+    # Newest records are in the live file
+    assert read_lines(log_file)[-1]['txn'] == "MON_199"
+
+def test_backpressure_samples_then_drops_without_blocking(tmp_path):
+    monitor = FraudMonitor(str(tmp_path / "decisions.log"), max_queue_size=20,
+                           sample_high_water=0.5, sample_every=10)
+    gate = threading.Event()
+    write_batch = monitor._write_batch
+    monitor._write_batch = lambda batch: (gate.wait(), write_batch(batch))
+
+    start = time.perf_counter()
+    for i in range(1000):
+        monitor.log_transaction(f"MON_{i}", make_score(i, fraudulent=i % 50 == 0))
+    elapsed = time.perf_counter() - start
+    gate.set()
+    monitor.close()
+
+    stats = monitor.get_stats()
+    log = stats['log']
+    assert elapsed < 1.0
+    assert stats['total_transactions'] == 1000
+    assert log['sampled_out'] > 0 and log['dropped'] > 0
+    assert log['enqueued'] + log['sampled_out'] + log['dropped'] == 1000
+    assert log['written'] == log['enqueued']
+
+def test_engine_logs_decisions_in_background(tmp_path, monkeypatch):
+    log_file = str(tmp_path / "engine.log")
+    monkeypatch.setattr(fraud_engine, 'DECISION_LOG_FILE', log_file)
+    engine = FraudDetectionEngine(decision_log=True)
+    transactions = [Transaction(
+        transaction_id=f"MON_ENGINE_{i}", sender_id=f"USER_{i}", receiver_id=f"USER_{i + 1}",
+        amount=100.0, timestamp=datetime.now(), device_id="DEV_1", ip_address="10.0.0.1"
+    ) for i in range(6)]
+    engine.analyze_transaction(transactions[0])
+    engine.analyze_transaction(transactions[0])  # retry: served from idempotency, not logged again
+    engine.analyze_batch(transactions[1:])
+    engine.flush()
+
+    assert [line['txn'] for line in read_lines(log_file)] == [t.transaction_id for t in transactions]
+    assert engine.get_metrics()['decision_log']['total_transactions'] == 6
+    engine.close()
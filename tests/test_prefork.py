@@ -0,0 +1,116 @@
+import os
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+import requests
+from datetime import datetime
+from fastapi.testclient import TestClient
+from rtf_digi_payments import api, fraud_engine
+from rtf_digi_payments.fraud_engine import FraudDetectionEngine
+from rtf_digi_payments.models.transaction import Transaction
+from rtf_digi_payments.utils.clock import EventClock
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_warmup_leaves_no_state_behind():
+    engine = FraudDetectionEngine()
+    engine.analyze_transaction(Transaction(
+        transaction_id="REAL_1", sender_id="REAL_A", receiver_id="REAL_B", amount=120.0,
+        timestamp=datetime.now(), device_id="DEV_1", ip_address="10.0.0.1"
+    ))
+    accounts = engine.known_accounts()
+    nodes = set(engine.graph_detector.graph.nodes)
+
+    result = engine.warmup(60)
+
+    assert result['transactions'] == 60
+    assert engine.known_accounts() == accounts
+    assert set(engine.graph_detector.graph.nodes) == nodes
+    assert engine.get_metrics()['latency']['total']['count'] == 1
+
+
+def test_warmup_leaves_event_clock_and_idempotency_alone():
+    engine = FraudDetectionEngine(idempotency=True, clock=EventClock())
+    engine.analyze_transaction(Transaction(
+        transaction_id="PAST_1", sender_id="REAL_A", receiver_id="REAL_B", amount=120.0,
+        timestamp=datetime(2024, 1, 15, 12, 0), device_id="DEV_1", ip_address="10.0.0.1"
+    ))
+    before = engine.idempotency.get_stats()
+
+    engine.warmup(40)
+
+    assert engine.clock.now() == datetime(2024, 1, 15, 12, 0)
+    assert engine.idempotency.get_stats() == before
+    assert engine.degraded_count == 0
+
+
+def test_requests_during_warmup_are_logged_and_measured(tmp_path, monkeypatch):
+    monkeypatch.setattr(fraud_engine, 'DECISION_LOG_FILE', str(tmp_path / "decisions.log"))
+    engine = FraudDetectionEngine(decision_log=True)
+    warmup = threading.Thread(target=engine.warmup, args=(200,))
+    warmup.start()
+    for i in range(20):
+        engine.analyze_transaction(Transaction(
+            transaction_id=f"DURING_{i}", sender_id=f"REAL_{i % 4}", receiver_id="REAL_B", amount=50.0,
+            timestamp=datetime.now(), device_id="DEV_1", ip_address="10.0.0.1"
+        ))
+    warmup.join()
+
+    assert engine.get_metrics()['decision_log']['total_transactions'] == 20
+    assert engine.get_metrics()['latency']['total']['count'] == 20
+    engine.close()
+
+
+def test_ready_only_after_warmup(monkeypatch):
+    monkeypatch.setattr(api, "warmup_result", None)
+    assert TestClient(api.app).get("/ready").status_code == 503
+
+    with TestClient(api.app) as client:
+        deadline = time.time() + 30
+        while client.get("/ready").status_code != 200 and time.time() < deadline:
+            time.sleep(0.05)
+        response = client.get("/ready")
+
+    assert response.status_code == 200
+    assert response.json()["warmup"]["transactions"] == api.WARMUP_TRANSACTIONS
+
+
+def test_prefork_workers_share_socket_and_stop_on_sigterm():
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([os.path.join(ROOT, "src"), ROOT]))
+    master = subprocess.Popen(
+        [sys.executable, "-m", "rtf_digi_payments.prefork", "--workers", "2", "--host", "127.0.0.1",
+         "--port", str(port), "--warmup", "20", "--log-level", "warning"],
+        env=env, cwd=ROOT, stderr=subprocess.DEVNULL
+    )
+    try:
+        pids, frozen = set(), []
+        deadline = time.time() + 60
+        while len(pids) < 2 and time.time() < deadline:
+            try:
+                response = requests.get(f"http://127.0.0.1:{port}/ready", timeout=1)
+                if response.status_code == 200:
+                    pids.add(response.json()["pid"])
+                    frozen.append(response.json()["gc_frozen_objects"])
+            except requests.RequestException:
+                time.sleep(0.05)
+
+        assert len(pids) == 2 and master.pid not in pids
+        assert min(frozen) > 0
+        payload = {"transaction_id": "PREFORK_1", "sender_id": "A", "receiver_id": "B", "amount": 10.0,
+                   "timestamp": "2024-01-15T12:00:00", "device_id": "DEV_1", "ip_address": "10.0.0.1"}
+        assert requests.post(f"http://127.0.0.1:{port}/api/v1/analyze", json=payload).status_code == 200
+
+        master.send_signal(signal.SIGTERM)
+        assert master.wait(timeout=30) == 0
+        # The master reaps its workers before exiting
+        assert not any(os.path.exists(f"/proc/{pid}") for pid in pids)
+    finally:
+        if master.poll() is None:
+            master.kill()
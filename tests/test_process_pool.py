@@ -0,0 +1,60 @@
+import random
+import numpy as np
+from datetime import datetime, timedelta
+from rtf_digi_payments.fraud_engine import FraudDetectionEngine
+from rtf_digi_payments.process_pool import publish_arrays, attach_arrays
+from rtf_digi_payments.models.transaction import Transaction, BiometricData
+
+
+def make_transactions(n):
+    rng = random.Random(5)
+    base = datetime(2024, 1, 15, 3, 0)
+    transactions = []
+    for i in range(n):
+        # Few accounts and random pairs: plenty of rings, plus first-seen edges
+        sender, receiver = rng.sample(range(20 if i < n // 2 else 12), 2)
+        transactions.append(Transaction(
+            transaction_id=f"POOL_{i}",
+            sender_id=f"USER_{sender}",
+            receiver_id=f"USER_{receiver}",
+            amount=800.0 + 6000 * (i % 7),
+            timestamp=base + timedelta(minutes=i),
+            device_id=f"DEV_{i % 3}",
+            ip_address=f"10.0.0.{i % 4}",
+            biometric=BiometricData(typing_speed=45.0 + (i % 5) * 6) if i % 2 else None
+        ))
+    return transactions
+
+def test_shared_arrays_roundtrip():
+    arrays = {'a': np.arange(5, dtype=np.int64), 'b': np.ones((2, 3)), 'c': np.frombuffer(b'xyz', dtype=np.uint8)}
+    shm, descriptor = publish_arrays(arrays)
+    try:
+        attached = attach_arrays(descriptor)
+        for key, array in arrays.items():
+            np.testing.assert_array_equal(attached[key], array)
+        del attached
+    finally:
+        shm.close()
+        shm.unlink()
+
+def test_process_pool_batch_matches_in_process():
+    transactions = make_transactions(120)
+
+    in_process = FraudDetectionEngine(idempotency=False)
+    expected = in_process.analyze_batch(transactions[:60]) + in_process.analyze_batch(transactions[60:])
+
+    pooled = FraudDetectionEngine(idempotency=False, process_pool_workers=2)
+    pooled.process_pool.min_task_rows = 8
+    try:
+        results = pooled.analyze_batch(transactions[:60]) + pooled.analyze_batch(transactions[60:])
+        stats = pooled.get_metrics()['process_pool']
+    finally:
+        pooled.close()
+
+    assert stats['tasks'] > 0
+    assert 0 < sum(r.graph_score == 0.9 for r in expected) < len(expected)
+    for got, want in zip(results, expected):
+        assert got.transaction_id == want.transaction_id
+        assert got.fraud_probability == want.fraud_probability
+        assert got.graph_score == want.graph_score
+        assert got.ml_score == want.ml_score
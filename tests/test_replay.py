@@ -0,0 +1,105 @@
+import json
+import os
+import pyarrow.parquet as pq
+import pytest
+from datetime import datetime, timedelta
+from rtf_digi_payments.decision_archive import DecisionArchive
+from rtf_digi_payments.models.transaction import TransactionRecord, FraudScore
+from rtf_digi_payments import replay as replay_module
+from rtf_digi_payments.replay import read_chunks, replay, replay_engine, to_records
+
+BASE = datetime(2024, 3, 4, 0, 0)
+
+
+def make_row(i):
+    row = {"transaction_id": f"RPL_{i}", "sender_id": f"USER_{i % 7}", "receiver_id": f"USER_{(i * 3 + 1) % 7}",
+           "amount": 50.0 + i, "timestamp": (BASE + timedelta(minutes=i)).isoformat(),
+           "device_id": f"DEV_{i % 3}", "ip_address": "10.0.0.1"}
+    if i % 2:
+        row["biometric"] = {"typing_speed": 50.0 + i % 5}
+    return row
+
+
+def write_jsonl(path, n):
+    with open(path, "w") as f:
+        for i in range(n):
+            f.write(json.dumps(make_row(i)) + "\n")
+
+
+def read_output(result):
+    return pq.ParquetDataset(result['files']).read().to_pydict()
+
+
+def test_jsonl_chunks_keep_every_column(tmp_path):
+    # The second row has a biometric key the first one lacks
+    write_jsonl(tmp_path / "in.jsonl", 2)
+    records = to_records(next(read_chunks(str(tmp_path / "in.jsonl"))))
+
+    assert records[0].biometric is None
+    assert records[1].biometric == {"typing_speed": 51.0, "swipe_velocity": None,
+                                    "pressure_pattern": None, "device_angle": None}
+    assert records[1].timestamp == BASE + timedelta(minutes=1)
+
+
+def test_single_worker_replay_matches_engine(tmp_path):
+    write_jsonl(tmp_path / "in.jsonl", 120)
+    result = replay([str(tmp_path / "in.jsonl")], str(tmp_path / "out"), workers=1, chunk_size=25, max_rows=50)
+
+    engine = replay_engine()
+    expected = engine.analyze_batch(to_records(next(read_chunks(str(tmp_path / "in.jsonl"), 120))))
+    output = read_output(result)
+
+    assert len(result['files']) == 3
+    assert output['transaction_id'] == [f"RPL_{i}" for i in range(120)]
+    assert output['fraud_probability'] == [score.fraud_probability for score in expected]
+    assert output['baseline_fraud_probability'] == [None] * 120
+    assert result['decisions'] == {'rows': 120, 'flagged': sum(score.is_fraudulent for score in expected)}
+    with open(tmp_path / "out" / "summary.json") as f:
+        assert json.load(f)['decisions']['rows'] == 120
+
+
+def test_workers_own_disjoint_senders(tmp_path):
+    write_jsonl(tmp_path / "in.jsonl", 200)
+    result = replay([str(tmp_path / "in.jsonl")], str(tmp_path / "out"), workers=2, chunk_size=40)
+
+    senders = {}
+    for path in result['files']:
+        worker = path.rsplit("part-", 1)[1][:3]
+        for sender in pq.read_table(path, columns=['sender_id']).column('sender_id').to_pylist():
+            senders.setdefault(sender, set()).add(worker)
+    assert result['decisions']['rows'] == 200
+    assert sum(pq.read_metadata(path).num_rows for path in result['files']) == 200
+    assert all(len(workers) == 1 for workers in senders.values())
+
+
+def test_archive_replay_reports_changed_decisions(tmp_path):
+    archive = DecisionArchive(str(tmp_path / "archive"))
+    for i in range(40):
+        row = make_row(i)
+        record = TransactionRecord(row["transaction_id"], row["sender_id"], row["receiver_id"], row["amount"],
+                                   datetime.fromisoformat(row["timestamp"]), row["device_id"], row["ip_address"])
+        # Every tenth decision was a (now stale) block at 0.95
+        probability = 0.95 if i % 10 == 0 else 0.0
+        archive.append(record, FraudScore(transaction_id=record.transaction_id, fraud_probability=probability,
+                                          ml_score=0.0, graph_score=0.0, biometric_score=0.0,
+                                          is_fraudulent=probability > 0.5, latency_ms=1.0))
+    archive.close()
+
+    result = replay([str(tmp_path / "archive")], str(tmp_path / "out"), workers=1)
+    decisions = result['decisions']
+    output = read_output(result)
+
+    assert decisions['compared'] == 40
+    assert decisions['flagged_before'] == 4
+    assert decisions['cleared'] - decisions['newly_flagged'] == 4 - decisions['flagged']
+    assert output['baseline_is_fraudulent'].count(True) == 4
+    assert sum(count for _, count in decisions['delta_histogram']) == 40
+
+
+def test_worker_dying_after_its_last_chunk_fails_the_run(tmp_path, monkeypatch):
+    # Forked, so the workers inherit the patched close: exit without a report
+    monkeypatch.setattr(replay_module._Partition, "close", lambda self: os._exit(3))
+    write_jsonl(tmp_path / "in.jsonl", 40)
+
+    with pytest.raises(RuntimeError, match=r"replay-\d exited with status 3"):
+        replay([str(tmp_path / "in.jsonl")], str(tmp_path / "out"), workers=2, start_method="fork")
@@ -0,0 +1,50 @@
+import threading
+from rtf_digi_payments.scheduler import StageScheduler
+
+
+def test_higher_priority_stages_run_first():
+    scheduler = StageScheduler(max_workers=1, priorities={'biometric': 0, 'graph': 2})
+    gate = threading.Event()
+    order = []
+    
+    blocker = scheduler.submit('graph', gate.wait)
+    futures = [scheduler.submit('graph', order.append, 'graph'),
+               scheduler.submit('biometric', order.append, 'biometric')]
+    gate.set()
+    for future in [blocker] + futures:
+        future.result(timeout=1)
+    
+    assert order == ['biometric', 'graph']
+    scheduler.shutdown()
+
+def test_cancelled_work_does_not_run():
+    scheduler = StageScheduler(max_workers=1)
+    gate = threading.Event()
+    ran = []
+    
+    blocker = scheduler.submit('graph', gate.wait)
+    queued = scheduler.submit('graph', ran.append, 1)
+    assert queued.cancel()
+    gate.set()
+    blocker.result(timeout=1)
+    scheduler.submit('graph', lambda: None).result(timeout=1)
+    
+    assert ran == []
+    assert scheduler.get_metrics()['stages']['graph']['cancelled'] == 1
+    scheduler.shutdown()
+
+def test_fast_stages_run_inline():
+    scheduler = StageScheduler(max_workers=2, inline_threshold_ms=5.0, min_samples=3)
+    
+    for _ in range(3):
+        scheduler.submit('biometric', lambda: 0.1).result(timeout=1)
+    assert scheduler.is_inline('biometric')
+    
+    caller = []
+    scheduler.submit('biometric', lambda: caller.append(threading.current_thread())).result()
+    assert caller == [threading.current_thread()]
+    
+    metrics = scheduler.get_metrics()
+    assert metrics['stages']['biometric']['inline_runs'] == 1
+    assert metrics['queue_depth'] == 0
+    scheduler.shutdown()
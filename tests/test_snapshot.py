@@ -0,0 +1,127 @@
+import struct
+import pytest
+from datetime import datetime, timedelta
+from rtf_digi_payments.fraud_engine import FraudDetectionEngine
+from rtf_digi_payments.models.transaction import Transaction, BiometricData
+from rtf_digi_payments import snapshot
+from rtf_digi_payments.snapshot import Snapshot, SnapshotFormatError, read_manifest
+
+NOW = datetime.now().replace(microsecond=0)
+
+
+def make_transaction(i, prefix="SNAP"):
+    return Transaction(
+        transaction_id=f"{prefix}_{i}",
+        sender_id=f"USER_{i % 15}",
+        receiver_id=f"USER_{(i * 7 + 3) % 15}",
+        amount=120.0 + i,
+        timestamp=NOW - timedelta(minutes=200 - i),
+        device_id=f"DEV_{i % 4}",
+        ip_address=f"10.0.0.{i % 3}",
+        biometric=BiometricData(typing_speed=45.0 + i % 9, swipe_velocity=100.0 + i % 5) if i % 4 else None
+    )
+
+def state_of(engine):
+    graph = engine.graph_detector.graph
+    return (
+        sorted((u, v, d['weight'], d['total_amount']) for u, v, d in graph.edges(data=True)),
+        {k: list(v) for k, v in engine.graph_detector.transaction_times.items() if v},
+        {k: dict(v) for k, v in engine.biometric_analyzer.user_profiles.items()},
+        dict(engine.cache_manager.cache)
+    )
+
+def test_snapshot_round_trip_restores_state_and_scores(tmp_path):
+    engine = FraudDetectionEngine()
+    for i in range(120):
+        engine.analyze_transaction(make_transaction(i))
+    path = str(tmp_path / "engine.snap")
+    info = engine.snapshot(path)
+    assert info['kind'] == 'full' and info['edges'] == engine.graph_detector.graph.number_of_edges()
+
+    restored = FraudDetectionEngine()
+    restored.restore(path)
+    assert state_of(restored) == state_of(engine)
+
+    probe = make_transaction(500, prefix="PROBE")
+    before, after = engine.analyze_transaction(probe), restored.analyze_transaction(probe)
+    assert (before.ml_score, before.graph_score, before.biometric_score) == \
+        (after.ml_score, after.graph_score, after.biometric_score)
+
+def test_full_restore_rebuilds_the_cache_expiry_index(tmp_path):
+    engine = FraudDetectionEngine()
+    for i in range(60):
+        engine.analyze_transaction(make_transaction(i))
+    path = str(tmp_path / "engine.snap")
+    engine.snapshot(path)
+
+    # A live engine with its own entries waiting to expire
+    live = FraudDetectionEngine()
+    for i in range(20):
+        live.analyze_transaction(make_transaction(i, prefix="LIVE").model_copy(
+            update={'sender_id': f"LIVE_{i}", 'receiver_id': f"LIVE_{i + 1}"}))
+    assert any(key.startswith("user:LIVE_") for key in live.cache_manager._expires)
+
+    live.restore(path)
+
+    cache = live.cache_manager
+    assert set(cache._expires) == set(cache.cache) == set(engine.cache_manager.cache)
+    assert cache._scheduled == {key for keys in cache._expiry_buckets.values() for key in keys} == set(cache.cache)
+
+def test_incremental_checkpoints_restore_on_start(tmp_path):
+    directory = str(tmp_path / "checkpoints")
+    engine = FraudDetectionEngine(checkpoint=True, checkpoint_dir=directory)
+    for i in range(60):
+        engine.analyze_transaction(make_transaction(i))
+    engine.checkpointer.checkpoint()
+
+    # Only two senders and their new receiver change before the next checkpoint
+    # (soon enough after the first batch that no cache entry has expired)
+    for i in range(2):
+        engine.analyze_transaction(Transaction(
+            transaction_id=f"LATE_{i}", sender_id=f"USER_{i}", receiver_id="USER_NEW", amount=75.0,
+            timestamp=NOW - timedelta(minutes=140), device_id="DEV_9", ip_address="10.0.9.9",
+            biometric=BiometricData(typing_speed=60.0)
+        ))
+    delta = engine.checkpointer.checkpoint()
+    assert delta['kind'] == 'delta' and delta['replaced_accounts'] == 3
+    assert read_manifest(directory)['deltas'] == ['delta-000002.snap']
+
+    restored = FraudDetectionEngine(checkpoint=True, checkpoint_dir=directory)
+    assert state_of(restored) == state_of(engine)
+    restored.close()
+    engine.close()
+
+def test_failed_full_checkpoint_keeps_changes_for_the_next_delta(tmp_path, monkeypatch):
+    directory = str(tmp_path / "checkpoints")
+    engine = FraudDetectionEngine(checkpoint=True, checkpoint_dir=directory)
+    for i in range(10):
+        engine.analyze_transaction(make_transaction(i))
+    engine.checkpointer.checkpoint()
+    engine.analyze_transaction(make_transaction(10))
+    changed = len(engine.checkpointer.dirty)
+
+    def failing_snapshot(*args, **kwargs):
+        raise OSError("disk full")
+    monkeypatch.setattr(snapshot, "snapshot_engine", failing_snapshot)
+    with pytest.raises(OSError):
+        engine.checkpointer.checkpoint(full=True)
+    monkeypatch.undo()
+
+    assert len(engine.checkpointer.dirty) == changed
+    delta = engine.checkpointer.checkpoint()
+    assert delta['kind'] == 'delta' and delta['replaced_accounts'] == changed
+    engine.close()
+
+def test_rejects_foreign_future_and_truncated_files(tmp_path):
+    engine = FraudDetectionEngine()
+    engine.analyze_transaction(make_transaction(1))
+    path = tmp_path / "engine.snap"
+    engine.snapshot(str(path))
+    data = path.read_bytes()
+
+    (tmp_path / "foreign.snap").write_bytes(b"NOTASNAP" + data[8:])
+    (tmp_path / "future.snap").write_bytes(data[:8] + struct.pack("<I", 99) + data[12:])
+    (tmp_path / "short.snap").write_bytes(data[:-16])
+    for name in ("foreign.snap", "future.snap", "short.snap"):
+        with pytest.raises(SnapshotFormatError):
+            Snapshot(str(tmp_path / name))
@@ -0,0 +1,82 @@
+import threading
+import pytest
+from rtf_digi_payments.utils.state_writer import StateWriter
+
+
+def test_updates_applied_in_order_per_account():
+    applied = []
+    writer = StateWriter({'event': lambda account, payloads: applied.extend((account, p) for p in payloads)})
+    
+    for i in range(200):
+        writer.submit(f"ACC{i % 3}", 'event', i)
+    writer.flush()
+    writer.close()
+    
+    for account in ("ACC0", "ACC1", "ACC2"):
+        seq = [p for a, p in applied if a == account]
+        assert seq == sorted(seq)
+        assert len(seq) > 60
+
+def test_same_kind_updates_are_coalesced():
+    calls = []
+    release = threading.Event()
+    
+    def handler(account, payloads):
+        release.wait()
+        calls.append((account, list(payloads)))
+    
+    writer = StateWriter({'count': handler}, batch_size=100, flush_interval_ms=50)
+    writer.submit("ACC", 'count', 1)
+    for _ in range(9):
+        writer.submit("ACC", 'count', 1)
+    release.set()
+    writer.flush()
+    stats = writer.get_stats()
+    writer.close()
+    
+    assert sum(sum(p) for _, p in calls) == 10
+    assert stats['handler_calls'] < 10
+    assert stats['applied'] == 10
+
+def test_bounded_queue_applies_backpressure():
+    release = threading.Event()
+    writer = StateWriter({'slow': lambda account, payloads: release.wait()},
+                         max_queue_size=2, batch_size=1, flush_interval_ms=0)
+    
+    producer = threading.Thread(target=lambda: [writer.submit("ACC", 'slow', i) for i in range(6)])
+    producer.start()
+    producer.join(timeout=0.2)
+    assert producer.is_alive()
+    
+    release.set()
+    producer.join()
+    writer.flush()
+    stats = writer.get_stats()
+    writer.close()
+    
+    assert stats['backpressure_waits'] > 0
+    assert stats['applied'] == 6
+
+def test_handler_errors_are_logged_and_raised_from_flush_and_close(caplog):
+    applied = []
+
+    def handler(account, payloads):
+        if account == "BAD":
+            raise ValueError("store down")
+        applied.extend(payloads)
+
+    writer = StateWriter({'event': handler})
+    writer.submit("BAD", 'event', 0)
+    writer.submit("ACC", 'event', 1)
+    with pytest.raises(ValueError, match="store down"):
+        writer.flush()
+    # Raised once; the writer keeps applying later updates
+    writer.submit("ACC", 'event', 2)
+    writer.flush()
+    assert applied == [1, 2]
+    assert writer.get_stats()['errors'] == 1
+    assert "event update for BAD failed" in caplog.text
+
+    writer.submit("BAD", 'event', 3)
+    with pytest.raises(ValueError):
+        writer.close()